@@ -0,0 +1,85 @@
+"""重复文件检测性能基准
+
+生成模拟下载目录(大小各异的文件，少量重复和同大小不同内容的文件)，
+对比旧版"对每个文件计算MD5"与分阶段流水线的耗时
+
+用法:
+    python benchmarks/bench_detect_duplicates.py --files 400 --max-size-kb 2048
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.tools.duplicate_finder import DuplicateFinder
+from src.tools.fs_scanner import DirectoryScanner
+
+
+def build_folder(root: Path, files: int, max_size_kb: int, seed: int = 42):
+    """生成测试文件: 约5%为完全重复，约5%为同大小但内容不同"""
+    rng = random.Random(seed)
+    created = []
+    for i in range(files):
+        roll = rng.random()
+        path = root / f"file_{i:05d}.bin"
+        if created and roll < 0.05:
+            path.write_bytes(rng.choice(created).read_bytes())
+        elif created and roll < 0.10:
+            size = rng.choice(created).stat().st_size
+            path.write_bytes(os.urandom(size))
+        else:
+            path.write_bytes(os.urandom(rng.randint(1, max_size_kb * 1024)))
+        created.append(path)
+
+
+def legacy_detect(directory: str) -> int:
+    """旧版实现: 4KB 读取对每个文件计算 MD5"""
+    groups = defaultdict(list)
+    for entry in DirectoryScanner(max_workers=1).scan(directory):
+        md5 = hashlib.md5()
+        with open(entry.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(4096), b""):
+                md5.update(chunk)
+        groups[md5.hexdigest()].append(entry)
+    return sum(1 for g in groups.values() if len(g) > 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重复文件检测性能基准")
+    parser.add_argument("--files", type=int, default=400, help="文件数量")
+    parser.add_argument("--max-size-kb", type=int, default=2048, help="单个文件最大大小(KB)")
+    parser.add_argument("--algorithm", default="fast", help="流水线哈希算法")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build_folder(Path(tmp), args.files, args.max_size_kb)
+        total = sum(f.stat().st_size for f in Path(tmp).iterdir())
+        print(f"测试目录: {args.files} 个文件, {total / 1024 / 1024:.1f} MB\n")
+
+        start = time.perf_counter()
+        legacy_groups = legacy_detect(tmp)
+        legacy = time.perf_counter() - start
+        print(f"{'legacy md5 (4KB 读取)':<32} {legacy * 1000:10.1f} ms  ({legacy_groups} 组)")
+
+        finder = DuplicateFinder(algorithm=args.algorithm)
+        start = time.perf_counter()
+        groups = finder.find(DirectoryScanner(max_workers=1).iter_entries(tmp))
+        staged = time.perf_counter() - start
+        print(f"{'staged (' + args.algorithm + ')':<32} {staged * 1000:10.1f} ms  ({len(groups)} 组)")
+        print(f"阶段统计: {finder.get_stats()}")
+
+        print(f"\n加速比: {legacy / staged:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
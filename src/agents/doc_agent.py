@@ -22,11 +22,13 @@ class DocAgent(BaseAgent):
             return self._extract_summary(task)
         elif task_type == 'compare':
             return self._compare_documents(task)
+        elif task_type == 'merge':
+            return self._mail_merge(task)
         else:
             return {"status": "error", "message": f"未知任务类型: {task_type}"}
     
     def _load_document(self, task: Dict[str, Any]) -> Dict[str, Any]:
-        doc = self.tools.load_document(task.get('file_path', ''))
+        doc = self.tools.load_document(task.get('file_path', ''), max_chars=task.get('max_chars'))
         return {"status": "success", "document": doc}
     
     def _convert_format(self, task: Dict[str, Any]) -> Dict[str, Any]:
@@ -34,9 +36,21 @@ class DocAgent(BaseAgent):
         return {"status": "success", "output_path": output}
     
     def _extract_summary(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        if task.get('file_path'):
+            result = self.tools.summarize_document(task['file_path'], length=task.get('length', 200))
+            return {"status": "success", "summary": result["summary"], "chunks": result["chunks"]}
         summary = self.tools.extract_summary(task.get('content', ''), task.get('length', 200))
         return {"status": "success", "summary": summary}
     
     def _compare_documents(self, task: Dict[str, Any]) -> Dict[str, Any]:
-        result = self.tools.compare_documents(task.get('doc1'), task.get('doc2'))
+        result = self.tools.compare_documents(
+            task.get('doc1'), task.get('doc2'), max_changes=task.get('max_changes')
+        )
         return {"status": "success", "comparison": result}
+    
+    def _mail_merge(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        result = self.tools.mail_merge(
+            task.get('template'), task.get('records'), task.get('output_dir'),
+            filename_template=task.get('filename_template')
+        )
+        return {"status": "success", "merge": result}
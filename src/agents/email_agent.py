@@ -16,6 +16,12 @@ class EmailAgent(BaseAgent):
         
         if task_type == 'read_emails':
             return self._read_emails(task)
+        elif task_type == 'fetch_email':
+            return self._fetch_email(task)
+        elif task_type == 'search':
+            return self._search_emails(task)
+        elif task_type == 'import':
+            return self._import_mailbox(task)
         elif task_type == 'classify':
             return self._classify_emails(task)
         elif task_type == 'reply':
@@ -31,10 +37,42 @@ class EmailAgent(BaseAgent):
             account=task.get('account', ''),
             password=task.get('password', ''),
             time_range=task.get('time_range'),
-            filters=task.get('filters')
+            filters=task.get('filters'),
+            folder=task.get('folder'),
+            include_body=task.get('include_body', False)
         )
         return {"status": "success", "emails": emails}
     
+    def _search_emails(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """在本地检索邮件"""
+        emails = self.tools.search_emails(
+            account=task.get('account', ''),
+            password=task.get('password', ''),
+            query=task.get('query'),
+            filters=task.get('filters'),
+            time_range=task.get('time_range')
+        )
+        return {"status": "success", "emails": emails}
+    
+    def _import_mailbox(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """导入邮件归档"""
+        result = self.tools.import_mailbox(
+            path=task.get('path', ''),
+            account=task.get('account', ''),
+            folder=task.get('folder'),
+            restart=task.get('restart', False)
+        )
+        return {"status": "success", "result": result}
+    
+    def _fetch_email(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """读取邮件正文"""
+        email = self.tools.fetch_email(
+            account=task.get('account', ''),
+            password=task.get('password', ''),
+            email_id=task.get('email_id', '')
+        )
+        return {"status": "success", "email": email}
+    
     def _classify_emails(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """分类邮件"""
         emails = task.get('emails', [])
@@ -16,6 +16,8 @@ class FileAgent(BaseAgent):
         
         if task_type == 'organize':
             return self._organize_files(task)
+        elif task_type == 'execute_plan':
+            return self._execute_plan(task)
         elif task_type == 'detect_duplicates':
             return self._detect_duplicates(task)
         elif task_type == 'clean_temp':
@@ -24,15 +26,43 @@ class FileAgent(BaseAgent):
             return self._search_files(task)
         elif task_type == 'analyze_storage':
             return self._analyze_storage(task)
+        elif task_type == 'storage_refinement':
+            return self._storage_refinement(task)
+        elif task_type == 'refresh_index':
+            return self._refresh_index(task)
+        elif task_type == 'undo':
+            return self._undo(task)
+        elif task_type == 'create_manifest':
+            return self._create_manifest(task)
+        elif task_type == 'verify_integrity':
+            return self._verify_integrity(task)
         else:
             return {"status": "error", "message": f"未知任务类型: {task_type}"}
     
+    @staticmethod
+    def _scan_options(task: Dict[str, Any], limits: bool = True) -> Dict[str, Any]:
+        """任务中的扫描过滤规则和截断条件"""
+        options = {"include": task.get('include'), "exclude": task.get('exclude')}
+        if limits:
+            options["max_files"] = task.get('max_files')
+            options["time_budget"] = task.get('time_budget')
+        return options
+    
     def _organize_files(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """整理文件"""
         result = self.tools.organize_files(
             source_dir=task.get('directory', ''),
             strategy=task.get('strategy', 'by_type'),
-            dry_run=task.get('dry_run', True)
+            dry_run=task.get('dry_run', True),
+            **self._scan_options(task)
+        )
+        return {"status": "success", "result": result}
+    
+    def _execute_plan(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """执行整理预览生成的移动计划"""
+        result = self.tools.execute_plan(
+            task.get('plan_id', ''),
+            on_conflict=task.get('on_conflict', 'rename')
         )
         return {"status": "success", "result": result}
     
@@ -40,7 +70,10 @@ class FileAgent(BaseAgent):
         """检测重复文件"""
         duplicates = self.tools.detect_duplicates(
             directory=task.get('directory', ''),
-            method=task.get('method', 'hash')
+            method=task.get('method', 'hash'),
+            algorithm=task.get('algorithm'),
+            threshold=task.get('threshold'),
+            **self._scan_options(task)
         )
         return {"status": "success", "duplicates": duplicates, "groups_count": len(duplicates)}
     
@@ -48,7 +81,9 @@ class FileAgent(BaseAgent):
         """清理临时文件"""
         result = self.tools.clean_temp_files(
             directory=task.get('directory', ''),
-            patterns=task.get('patterns')
+            patterns=task.get('patterns'),
+            min_age_days=task.get('min_age_days'),
+            **self._scan_options(task)
         )
         return {"status": "success", "result": result}
     
@@ -57,11 +92,60 @@ class FileAgent(BaseAgent):
         results = self.tools.search_files(
             search_root=task.get('directory', ''),
             keyword=task.get('keyword', ''),
-            file_types=task.get('file_types')
+            file_types=task.get('file_types'),
+            content=task.get('content', False),
+            regex=task.get('regex', False),
+            limit=task.get('limit'),
+            **self._scan_options(task)
         )
         return {"status": "success", "files": results, "count": len(results)}
     
     def _analyze_storage(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """分析磁盘空间"""
-        report = self.tools.analyze_storage(task.get('directory', ''))
+        report = self.tools.analyze_storage(
+            task.get('directory', ''),
+            top_k=task.get('top_k', 10),
+            tree_depth=task.get('tree_depth', 1),
+            approximate=task.get('approximate', False),
+            refine=task.get('refine', False),
+            **self._scan_options(task)
+        )
         return {"status": "success", "report": report}
+    
+    def _storage_refinement(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """读取后台精确空间分析结果"""
+        result = self.tools.get_storage_refinement(
+            task.get('refinement_id', ''),
+            wait=task.get('wait')
+        )
+        return {"status": "success", "result": result}
+    
+    def _refresh_index(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """刷新文件元数据索引"""
+        stats = self.tools.refresh_index(
+            task.get('directory', ''),
+            full=task.get('full', False)
+        )
+        return {"status": "success", "stats": stats}
+    
+    def _undo(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """撤销批量文件操作"""
+        result = self.tools.undo(task.get('journal_id', ''))
+        return {"status": "success", "result": result}
+    
+    def _create_manifest(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """生成完整性清单"""
+        manifest = self.tools.create_manifest(
+            task.get('directory', ''),
+            algorithm=task.get('algorithm'),
+            **self._scan_options(task, limits=False)
+        )
+        return {"status": "success", "manifest": manifest, "count": len(manifest["files"])}
+    
+    def _verify_integrity(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """校验文件完整性"""
+        result = self.tools.verify_integrity(
+            task.get('directory', ''),
+            task.get('manifest', {})
+        )
+        return {"status": "success", "result": result}
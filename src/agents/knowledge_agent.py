@@ -1,16 +1,38 @@
 """知识问答智能体 - 处理知识库问答任务"""
+import hashlib
 import logging
-from typing import Dict, Any
+from pathlib import Path
+from typing import Dict, Any, Optional
 from .base_agent import BaseAgent
+from ..core.vector_db import EPOCH_KEY
+from ..tools.document_loaders import open_document, document_type, loader_for
 
 logger = logging.getLogger(__name__)
 
 class KnowledgeAgent(BaseAgent):
     """知识问答智能体"""
     
-    def __init__(self, name, model_manager, prompt_engine, memory_manager, tools, vector_db, config=None):
+    # 文件入库时用于判断内容是否变化的哈希算法
+    CONTENT_HASH_ALGORITHM = "sha256"
+    
+    def __init__(self, name, model_manager, prompt_engine, memory_manager, tools, vector_db, config=None,
+                 answer_cache=None, hash_cache=None, ingest_queue=None, document_opener=None):
         super().__init__(name, model_manager, prompt_engine, memory_manager, tools, config)
         self.vector_db = vector_db
+        
+        # 内容哈希缓存(可选)，未变化的文件入库时无需重新读取
+        self.hash_cache = hash_cache
+        
+        # 打开文档的函数(可选)，传入 FileTools.open_document 时复用解析结果缓存
+        self.document_opener = document_opener or open_document
+        
+        # 入库队列(可选)，由文件监听服务放入变化的文档
+        self.ingest_queue = ingest_queue
+        
+        # 答案缓存(可选)，引用文档更新/删除时自动失效
+        self.answer_cache = answer_cache
+        if self.answer_cache is not None:
+            self.vector_db.add_change_listener(self.answer_cache.on_documents_changed)
     
     def execute(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """执行知识问答任务"""
@@ -22,6 +44,8 @@ class KnowledgeAgent(BaseAgent):
             return self._answer_question(task)
         elif task_type == 'index':
             return self._index_document(task)
+        elif task_type == 'process_ingestion':
+            return self._process_ingestion(task)
         else:
             return {"status": "error", "message": f"未知任务类型: {task_type}"}
     
@@ -29,6 +53,21 @@ class KnowledgeAgent(BaseAgent):
         """回答问题"""
         question = task.get('question', '')
         
+        # 优先使用缓存答案(来源文档未变更时有效)
+        if self.answer_cache is not None:
+            cached = self.answer_cache.get(question, self.vector_db)
+            if cached is not None:
+                logger.info(f"{self.name} 命中答案缓存")
+                return {
+                    "status": "success",
+                    "answer": cached["answer"],
+                    "sources": cached["sources"],
+                    "cached": True
+                }
+        
+        # 检索前记录文档版本，检索和生成期间文档被更新时缓存的答案随即失效
+        versions = self.vector_db.snapshot_versions() if self.answer_cache is not None else {}
+        
         # 语义搜索相关文档
         search_results = self.vector_db.semantic_search(question, top_k=5)
         
@@ -45,17 +84,82 @@ class KnowledgeAgent(BaseAgent):
             temperature=0.2
         )
         
+        if self.answer_cache is not None:
+            self.answer_cache.put(
+                question,
+                answer,
+                search_results,
+                {**{r["id"]: versions.get(r["id"], 0) for r in search_results},
+                 EPOCH_KEY: versions.get(EPOCH_KEY, 0)}
+            )
+        
         return {
             "status": "success",
             "answer": answer,
-            "sources": search_results
+            "sources": search_results,
+            "cached": False
         }
     
     def _index_document(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """索引文档到知识库"""
-        content = task.get('content', '')
         metadata = task.get('metadata', {})
+        if task.get('file_path'):
+            return self._index_file(task['file_path'], metadata)
         
+        content = task.get('content', '')
         doc_ids = self.vector_db.add_documents([content], [metadata])
         
         return {"status": "success", "document_ids": doc_ids}
+    
+    def _process_ingestion(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """处理入库队列中的文档变化"""
+        if self.ingest_queue is None:
+            return {"status": "error", "message": "未配置入库队列"}
+        
+        stats = {"indexed": 0, "skipped": 0, "deleted": 0, "failed": 0}
+        for path, action in self.ingest_queue.drain(task.get('batch_size', 100)):
+            try:
+                if action == "delete" or not Path(path).is_file():
+                    self.vector_db.delete_by_metadata({"source": path})
+                    stats["deleted"] += 1
+                elif self._index_file(path, task.get('metadata', {}))["skipped"]:
+                    stats["skipped"] += 1
+                else:
+                    stats["indexed"] += 1
+            except Exception as e:
+                logger.error(f"{self.name} 入库失败 {path}: {e}")
+                stats["failed"] += 1
+        
+        return {"status": "success", "stats": stats, "remaining": len(self.ingest_queue)}
+    
+    def _index_file(self, file_path: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """增量索引文件: 内容哈希未变化时跳过，变化时替换旧文档"""
+        data: Optional[bytes] = None
+        if self.hash_cache is not None:
+            content_hash = self.hash_cache.hash_file(file_path, self.CONTENT_HASH_ALGORITHM)
+        else:
+            data = Path(file_path).read_bytes()
+            content_hash = hashlib.new(self.CONTENT_HASH_ALGORITHM, data).hexdigest()
+        
+        existing = self.vector_db.get_by_metadata({"source": file_path})
+        if existing and all(d["metadata"].get("content_hash") == content_hash for d in existing):
+            logger.info(f"{self.name} 文件未变化，跳过入库: {file_path}")
+            return {"status": "success", "document_ids": [d["id"] for d in existing], "skipped": True}
+        
+        if existing:
+            # 先递增旧文档的版本，正在生成的答案写入缓存时即已过期
+            self.vector_db.invalidate_documents([d["id"] for d in existing])
+            self.vector_db.delete_by_metadata({"source": file_path})
+        
+        # PDF/DOCX/PPTX 和纯文本通过文档加载器提取正文，其他类型按 UTF-8 文本读取
+        if loader_for(document_type(file_path)) is not None:
+            with self.document_opener(file_path) as doc:
+                content = doc.text()
+        else:
+            if data is None:
+                data = Path(file_path).read_bytes()
+            content = data.decode('utf-8', errors='ignore')
+        metadata = {**metadata, "source": file_path, "content_hash": content_hash}
+        doc_ids = self.vector_db.add_documents([content], [metadata])
+        
+        return {"status": "success", "document_ids": doc_ids, "skipped": False}
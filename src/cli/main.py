@@ -9,6 +9,7 @@ project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
 from src.core import ModelManager, PromptEngine, MemoryManager, VectorDBManager
+from src.core.answer_cache import AnswerCache
 from src.tools import (
     EmailTools, FileTools, CalendarTools,
     DataTools, WebTools, FileSystemTools
@@ -50,11 +51,17 @@ class OfficeSuperAgentCLI:
         filesystem_config = self.config.get('filesystem', {})
         
         self.email_tools = EmailTools(email_config)
-        self.file_tools = FileTools()
+        self.file_tools = FileTools(
+            self.config.get('documents', {}),
+            model_manager=self.model_manager,
+            prompt_engine=self.prompt_engine
+        )
         self.calendar_tools = CalendarTools()
         self.data_tools = DataTools()
         self.web_tools = WebTools()
-        self.filesystem_tools = FileSystemTools(filesystem_config)
+        self.filesystem_tools = FileSystemTools(filesystem_config, document_opener=self.file_tools.open_document)
+        if filesystem_config.get('watch', {}).get('enabled', False):
+            self.filesystem_tools.start_watch()
         
         # 初始化智能体
         self.agents = self._initialize_agents(agents_config)
@@ -133,6 +140,14 @@ class OfficeSuperAgentCLI:
         
         # 知识问答智能体
         if 'knowledge_agent' in agents_def:
+            cache_config = agents_def['knowledge_agent'].get('answer_cache', {})
+            answer_cache = None
+            if cache_config.get('enabled', True):
+                answer_cache = AnswerCache(
+                    max_entries=cache_config.get('max_entries', 1000),
+                    ttl_seconds=cache_config.get('ttl_seconds'),
+                    invalidate_on_add=cache_config.get('invalidate_on_add', True)
+                )
             agents['knowledge'] = KnowledgeAgent(
                 name="KnowledgeAgent",
                 model_manager=self.model_manager,
@@ -140,7 +155,11 @@ class OfficeSuperAgentCLI:
                 memory_manager=self.memory_manager,
                 tools=self.web_tools,
                 vector_db=self.vector_db,
-                config=agents_def['knowledge_agent']
+                config=agents_def['knowledge_agent'],
+                answer_cache=answer_cache,
+                hash_cache=self.filesystem_tools.hash_cache,
+                ingest_queue=self.filesystem_tools.ingest_queue,
+                document_opener=self.file_tools.open_document
             )
         
         # 文件系统智能体
@@ -0,0 +1,193 @@
+"""知识问答答案缓存
+
+按规范化问题缓存最终答案，并记录引用文档的版本号；
+引用文档被更新或删除后，相关缓存自动失效；版本中的 EPOCH_KEY 记录知识库纪元，
+按条件删除或清空知识库后缓存同样失效
+"""
+
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+from .vector_db import EPOCH_KEY
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerCache:
+    """答案缓存(LRU)"""
+
+    # 规范化时去除的结尾标点
+    _TRAILING_PUNCTUATION = "?？!！.。,，;；~～ "
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: Optional[float] = None,
+        invalidate_on_add: bool = True
+    ):
+        """初始化答案缓存
+
+        Args:
+            max_entries: 最大缓存条目数
+            ttl_seconds: 条目有效期(秒)，None表示不过期
+            invalidate_on_add: 知识库新增文档时是否清空缓存(新文档可能改变检索结果)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.invalidate_on_add = invalidate_on_add
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # 反向索引: 文档ID -> 引用该文档的缓存键
+        self._doc_index: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        logger.info(f"答案缓存初始化完成，容量: {max_entries}")
+
+    @classmethod
+    def normalize_question(cls, question: str) -> str:
+        """规范化问题文本(全半角、大小写、空白、结尾标点)"""
+        text = unicodedata.normalize("NFKC", question or "").lower()
+        text = re.sub(r"\s+", " ", text).strip()
+        return text.rstrip(cls._TRAILING_PUNCTUATION)
+
+    def get(self, question: str, vector_db) -> Optional[Dict[str, Any]]:
+        """查询缓存
+
+        仅当引用文档的当前版本(及知识库纪元)与缓存时一致才返回缓存答案
+
+        Args:
+            question: 问题
+            vector_db: 向量数据库管理器(用于读取文档当前版本)
+
+        Returns:
+            缓存条目 {"answer": ..., "sources": [...]}，未命中返回None
+        """
+        key = self.normalize_question(question)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expired = (
+                self.ttl_seconds is not None
+                and time.time() - entry["created_at"] > self.ttl_seconds
+            )
+            current_versions = vector_db.get_document_versions(list(entry["versions"]))
+            if expired or current_versions != entry["versions"]:
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(
+        self,
+        question: str,
+        answer: str,
+        sources: List[Dict[str, Any]],
+        versions: Dict[str, int]
+    ):
+        """写入缓存
+
+        Args:
+            question: 问题
+            answer: 答案
+            sources: 检索到的来源文档
+            versions: 来源文档版本 {doc_id: version}，可包含 EPOCH_KEY(检索前的纪元)
+        """
+        key = self.normalize_question(question)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = {
+                "answer": answer,
+                "sources": sources,
+                "versions": dict(versions),
+                "created_at": time.time()
+            }
+            for doc_id in versions:
+                if doc_id != EPOCH_KEY:
+                    self._doc_index.setdefault(doc_id, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def on_documents_changed(self, event: str, doc_ids: Optional[List[str]] = None):
+        """知识库变更回调(注册到 VectorDBManager.add_change_listener)
+
+        Args:
+            event: 变更类型 (add/update/delete/clear)
+            doc_ids: 涉及的文档ID，None表示无法确定范围
+        """
+        if event == "add" and not self.invalidate_on_add:
+            return
+
+        if event in ("add", "clear") or doc_ids is None:
+            self.clear()
+            return
+
+        self.invalidate_documents(doc_ids)
+
+    def invalidate_documents(self, doc_ids: List[str]) -> int:
+        """使引用指定文档的缓存失效
+
+        Args:
+            doc_ids: 文档ID列表
+
+        Returns:
+            失效的条目数
+        """
+        removed = 0
+        with self._lock:
+            for doc_id in doc_ids:
+                for key in list(self._doc_index.get(doc_id, ())):
+                    self._remove(key)
+                    removed += 1
+
+        if removed:
+            logger.debug(f"答案缓存失效 {removed} 条 (文档: {doc_ids})")
+        return removed
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._doc_index.clear()
+        logger.debug("答案缓存已清空")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    def _remove(self, key: str):
+        """删除条目及其反向索引(调用方需持有锁)"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for doc_id in entry["versions"]:
+            keys = self._doc_index.get(doc_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._doc_index[doc_id]
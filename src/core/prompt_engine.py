@@ -162,6 +162,19 @@ ${content}
 - 保留核心信息
 - 结构清晰
 
+请生成摘要:"""
+
+    # 分段摘要合并提示词模板(长文档分块摘要后的汇总阶段)
+    SUMMARY_REDUCE_TEMPLATE = """以下是同一份文档按顺序排列的各部分摘要。
+
+分段摘要:
+${summaries}
+
+请将它们合并为一份完整的文档摘要:
+- 长度: ${length} 字以内
+- 覆盖各部分的核心信息，去除重复内容
+- 保持原文的先后顺序和结构
+
 请生成摘要:"""
 
     # 知识问答提示词模板
@@ -353,6 +366,22 @@ ${context}
             length=length
         )
     
+    def render_summary_reduce(self, summaries: List[str], length: int = 200) -> str:
+        """渲染分段摘要合并提示词
+        
+        Args:
+            summaries: 按文档顺序排列的分段摘要
+            length: 合并后摘要的长度限制
+            
+        Returns:
+            渲染后的提示词
+        """
+        template = Template(self.SUMMARY_REDUCE_TEMPLATE)
+        return template.safe_substitute(
+            summaries="\n\n".join(f"[{i}] {summary}" for i, summary in enumerate(summaries, 1)),
+            length=length
+        )
+    
     def render_knowledge_qa(self, question: str, context: str) -> str:
         """渲染知识问答提示词
         
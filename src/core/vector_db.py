@@ -4,12 +4,16 @@
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from typing import List, Dict, Any, Optional, Callable
 from pathlib import Path
 import yaml
 
 logger = logging.getLogger(__name__)
 
+# 版本快照中记录全局纪元的键: 影响范围未知的变更(按条件删除、清空)只递增纪元
+EPOCH_KEY = "__epoch__"
+
 
 class VectorDBManager:
     """向量数据库管理器"""
@@ -35,6 +39,12 @@ class VectorDBManager:
         self.collection = None
         self.embeddings = None
         
+        # 文档版本号(每次更新/删除递增)及变更监听器，供答案缓存等判断数据是否过期
+        self._doc_versions: Dict[str, int] = {}
+        self._epoch = 0
+        self._change_listeners: List[Callable[[str, Optional[List[str]]], None]] = []
+        self._version_lock = threading.Lock()
+        
         logger.info(f"向量数据库管理器初始化完成，存储路径: {self.persist_directory}")
     
     def _load_config(self, config_path: str) -> Dict[str, Any]:
@@ -46,6 +56,56 @@ class VectorDBManager:
             logger.error(f"加载配置文件失败: {e}")
             return {}
     
+    def add_change_listener(self, callback: Callable[[str, Optional[List[str]]], None]):
+        """注册知识库变更监听器
+        
+        Args:
+            callback: 回调函数 callback(event, doc_ids)，event 为 add/update/delete/clear，
+                doc_ids 为 None 表示影响范围未知
+        """
+        self._change_listeners.append(callback)
+    
+    def get_document_versions(self, doc_ids: List[str]) -> Dict[str, int]:
+        """获取文档当前版本号
+        
+        Args:
+            doc_ids: 文档ID列表(可包含 EPOCH_KEY，对应当前纪元)
+            
+        Returns:
+            版本号字典 {doc_id: version}
+        """
+        with self._version_lock:
+            return {doc_id: self._epoch if doc_id == EPOCH_KEY else self._doc_versions.get(doc_id, 0)
+                    for doc_id in doc_ids}
+    
+    def snapshot_versions(self) -> Dict[str, int]:
+        """获取所有文档当前版本号的快照(未出现的文档版本为 0)，EPOCH_KEY 对应当前纪元
+        
+        在检索前取快照，检索和生成答案期间发生的更新、按条件删除或清空会使快照过期
+        """
+        with self._version_lock:
+            return {**self._doc_versions, EPOCH_KEY: self._epoch}
+    
+    def invalidate_documents(self, doc_ids: List[str]):
+        """递增指定文档的版本号并通知监听器(替换文档前调用，使引用旧内容的缓存失效)"""
+        self._notify_change("update", list(doc_ids))
+    
+    def _notify_change(self, event: str, doc_ids: Optional[List[str]] = None):
+        """递增文档版本号(范围未知时递增纪元)并通知监听器"""
+        if event != "add":
+            with self._version_lock:
+                if doc_ids is None:
+                    self._epoch += 1
+                else:
+                    for doc_id in doc_ids:
+                        self._doc_versions[doc_id] = self._doc_versions.get(doc_id, 0) + 1
+        
+        for callback in self._change_listeners:
+            try:
+                callback(event, doc_ids)
+            except Exception as e:
+                logger.error(f"知识库变更回调失败: {e}")
+    
     def _init_db(self):
         """初始化数据库连接"""
         if self.client is not None:
@@ -115,6 +175,7 @@ class VectorDBManager:
             )
             
             logger.info(f"成功添加 {len(documents)} 个文档到向量数据库")
+            self._notify_change("add", list(ids))
             return ids
             
         except Exception as e:
@@ -195,6 +256,28 @@ class VectorDBManager:
             logger.error(f"获取文档失败: {e}")
             return None
     
+    def get_by_metadata(self, filter_dict: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """根据元数据查询文档(不返回正文和向量)
+        
+        Args:
+            filter_dict: 元数据过滤条件
+            
+        Returns:
+            文档列表，每个结果包含 {id, metadata}
+        """
+        self._init_db()
+        
+        try:
+            results = self.collection.get(where=filter_dict, include=["metadatas"])
+            metadatas = results.get('metadatas') or [{} for _ in results['ids']]
+            return [
+                {"id": doc_id, "metadata": metadata or {}}
+                for doc_id, metadata in zip(results['ids'], metadatas)
+            ]
+        except Exception as e:
+            logger.error(f"按元数据查询文档失败: {e}")
+            return []
+    
     def update_document(
         self,
         doc_id: str,
@@ -223,6 +306,7 @@ class VectorDBManager:
             
             self.collection.update(**update_data)
             logger.info(f"文档已更新: {doc_id}")
+            self._notify_change("update", [doc_id])
             
         except Exception as e:
             logger.error(f"更新文档失败: {e}")
@@ -239,6 +323,7 @@ class VectorDBManager:
         try:
             self.collection.delete(ids=[doc_id])
             logger.info(f"文档已删除: {doc_id}")
+            self._notify_change("delete", [doc_id])
         except Exception as e:
             logger.error(f"删除文档失败: {e}")
             raise
@@ -254,6 +339,7 @@ class VectorDBManager:
         try:
             self.collection.delete(where=filter_dict)
             logger.info(f"已删除符合条件的文档: {filter_dict}")
+            self._notify_change("delete", None)
         except Exception as e:
             logger.error(f"批量删除文档失败: {e}")
             raise
@@ -289,6 +375,7 @@ class VectorDBManager:
                 metadata={"description": "Office knowledge base"}
             )
             logger.warning("向量数据库集合已清空")
+            self._notify_change("clear", None)
         except Exception as e:
             logger.error(f"清空集合失败: {e}")
             raise
@@ -0,0 +1,425 @@
+"""文件内容全文索引
+
+用 SQLite FTS5 trigram 分词器为可提取文本的文件(纯文本、DOCX、PPTX、PDF)建立三元组索引:
+- 子串查询直接作为短语交给 FTS5，只返回包含全部三元组的候选文档
+- 正则查询从表达式中提取必须出现的字面量(长度>=3)作为候选过滤条件
+- 候选文档再用保存的正文逐个校验并生成摘录，不需要重新读取文件
+- 按文件大小、修改时间和解析器版本增量更新，未变化的文件不重新提取
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple, Callable
+
+from .fs_scanner import FileEntry, get_extension
+from .file_index import _prefix_range
+from .text_extraction import can_extract, extract_text, parser_version
+
+try:
+    from re import _parser as _sre_parse
+    from re import _constants as _sre
+except ImportError:  # Python < 3.11
+    import sre_parse as _sre_parse
+    import sre_constants as _sre
+
+logger = logging.getLogger(__name__)
+
+# trigram 分词器能利用索引的最短查询长度
+MIN_TRIGRAM = 3
+
+_REPEATS = {_sre.MAX_REPEAT, _sre.MIN_REPEAT, getattr(_sre, "POSSESSIVE_REPEAT", _sre.MAX_REPEAT)}
+
+
+def required_literals(pattern: str, flags: int = 0) -> List[str]:
+    """提取正则匹配时必须出现的字面量片段(仅长度>=3的)
+
+    只考虑顺序连接的字面量，分支、字符集和可选重复都会截断片段，
+    因此结果只是必要条件，用于缩小候选范围
+    """
+    literals: List[str] = []
+    _collect_literals(_sre_parse.parse(pattern, flags), literals)
+    return [s for s in literals if len(s) >= MIN_TRIGRAM]
+
+
+def _collect_literals(items, out: List[str]):
+    run: List[str] = []
+
+    def flush():
+        if run:
+            out.append("".join(run))
+            run.clear()
+
+    for op, av in items:
+        if op is _sre.LITERAL:
+            run.append(chr(av))
+        elif op is _sre.AT:
+            # 锚点不消耗字符
+            continue
+        elif op is _sre.SUBPATTERN:
+            flush()
+            _collect_literals(av[-1], out)
+        elif op in _REPEATS:
+            flush()
+            low, _, sub = av
+            if low >= 1:
+                _collect_literals(sub, out)
+        else:
+            flush()
+    flush()
+
+
+def _phrase(text: str) -> str:
+    """转为 FTS5 短语"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+class ContentIndex:
+    """文件内容全文索引"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS docs (
+            id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            extension TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            parser TEXT
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(content, tokenize='trigram');
+        CREATE TABLE IF NOT EXISTS roots (
+            path TEXT PRIMARY KEY,
+            refreshed_at REAL
+        );
+    """
+
+    # 修改时间距当前小于该值(秒)的文件不记录修改时间，下次刷新时重新提取
+    RACY_WINDOW = 2.0
+
+    # 每写入多少个文档提交一次
+    COMMIT_EVERY = 200
+
+    def __init__(
+        self,
+        db_path: str = "./data/cache/content_index.db",
+        max_chars: int = 1000000,
+        refresh_interval: float = 60,
+        max_workers: Optional[int] = None,
+        opener: Optional[Callable] = None
+    ):
+        """初始化内容索引
+
+        Args:
+            db_path: 索引数据库路径
+            max_chars: 每个文件最多索引的字符数
+            refresh_interval: 同一目录两次增量刷新的最小间隔(秒)
+            max_workers: 文本提取线程数
+            opener: 打开文档的函数，传入 FileTools.open_document 时复用解析结果缓存
+        """
+        self.db_path = db_path
+        self.max_chars = max_chars
+        self.refresh_interval = refresh_interval
+        self.max_workers = max_workers
+        self.opener = opener
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(docs)")}
+        if "parser" not in columns:
+            # 旧版本索引没有记录解析器版本，所有文档在下次刷新时重新提取
+            self._conn.execute("ALTER TABLE docs ADD COLUMN parser TEXT")
+        self._lock = threading.RLock()
+
+        logger.info(f"内容索引初始化完成: {db_path}")
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    # ========== 更新 ==========
+
+    def needs_refresh(self, directory: str) -> bool:
+        """判断目录是否需要刷新(未索引或超过刷新间隔)"""
+        directory = os.path.abspath(directory)
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute("SELECT path, refreshed_at FROM roots").fetchall()
+        for root, refreshed_at in rows:
+            covers = directory == root or directory.startswith(root.rstrip(os.sep) + os.sep)
+            if covers and refreshed_at is not None and now - refreshed_at < self.refresh_interval:
+                return False
+        return True
+
+    def invalidate(self, directory: Optional[str] = None):
+        """使刷新间隔失效，下次查询时重新增量刷新"""
+        with self._lock, self._conn:
+            if directory is None:
+                self._conn.execute("UPDATE roots SET refreshed_at = NULL")
+                return
+            directory = os.path.abspath(directory)
+            for (root,) in self._conn.execute("SELECT path FROM roots").fetchall():
+                related = (
+                    directory == root
+                    or directory.startswith(root.rstrip(os.sep) + os.sep)
+                    or root.startswith(directory.rstrip(os.sep) + os.sep)
+                )
+                if related:
+                    self._conn.execute("UPDATE roots SET refreshed_at = NULL WHERE path = ?", (root,))
+
+    def update(self, directory: str, entries: Iterable[FileEntry]) -> Dict[str, int]:
+        """按扫描结果增量更新目录的内容索引
+
+        大小、修改时间或解析器版本变化的文件重新提取文本，扫描中不再出现的文件从索引中删除
+
+        Args:
+            directory: 扫描根目录
+            entries: 该目录的完整文件记录流
+
+        Returns:
+            更新统计 {"indexed", "unchanged", "removed", "failed"}
+        """
+        root = os.path.abspath(directory)
+        low, high = _prefix_range(root)
+        with self._lock:
+            existing = {
+                path: (size, mtime, parser)
+                for path, size, mtime, parser in self._conn.execute(
+                    "SELECT path, size, mtime, parser FROM docs WHERE path >= ? AND path < ?", (low, high)
+                )
+            }
+
+        stats = {"indexed": 0, "unchanged": 0, "removed": 0, "failed": 0}
+        changed: List[FileEntry] = []
+        seen = set()
+        for entry in entries:
+            if not can_extract(entry.path):
+                continue
+            path = os.path.abspath(entry.path)
+            seen.add(path)
+            if existing.get(path) == (entry.size, entry.mtime, parser_version(path)):
+                stats["unchanged"] += 1
+            else:
+                changed.append(entry)
+
+        removed = [path for path in existing if path not in seen]
+        self.remove(removed)
+        stats["removed"] = len(removed)
+
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="content-index") as pool:
+            for start in range(0, len(changed), self.COMMIT_EVERY):
+                batch = changed[start:start + self.COMMIT_EVERY]
+                texts = list(pool.map(self._safe_extract, batch))
+                with self._lock, self._conn:
+                    for entry, text in zip(batch, texts):
+                        if text is None:
+                            stats["failed"] += 1
+                            continue
+                        self._write(entry, text, started)
+                        stats["indexed"] += 1
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO roots(path, refreshed_at) VALUES (?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET refreshed_at = excluded.refreshed_at",
+                (root, time.time())
+            )
+
+        logger.info(
+            f"内容索引更新 {directory}: 新增/更新 {stats['indexed']}, 未变化 {stats['unchanged']}, "
+            f"删除 {stats['removed']}, 失败 {stats['failed']}"
+        )
+        return stats
+
+    def update_file(self, path: str) -> bool:
+        """单独更新一个文件(文件已不存在时从索引删除)
+
+        Returns:
+            是否写入了索引
+        """
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self.remove([path])
+            return False
+        if not can_extract(path):
+            return False
+        name = os.path.basename(path)
+        entry = FileEntry(path, name, st.st_size, get_extension(name), st.st_ctime, st.st_mtime)
+        text = self._safe_extract(entry)
+        if text is None:
+            return False
+        with self._lock, self._conn:
+            self._write(entry, text, time.time())
+        return True
+
+    def remove(self, paths: Iterable[str]):
+        """从索引删除文件"""
+        with self._lock, self._conn:
+            for path in paths:
+                row = self._conn.execute("SELECT id FROM docs WHERE path = ?", (path,)).fetchone()
+                if row is not None:
+                    self._conn.execute("DELETE FROM docs_fts WHERE rowid = ?", row)
+                    self._conn.execute("DELETE FROM docs WHERE id = ?", row)
+
+    def remove_tree(self, directory: str) -> int:
+        """删除目录下所有文件的索引，返回删除的文档数"""
+        low, high = _prefix_range(os.path.abspath(directory))
+        with self._lock, self._conn:
+            ids = [r[0] for r in self._conn.execute(
+                "SELECT id FROM docs WHERE path >= ? AND path < ?", (low, high)
+            )]
+            self._conn.executemany("DELETE FROM docs_fts WHERE rowid = ?", ((i,) for i in ids))
+            self._conn.executemany("DELETE FROM docs WHERE id = ?", ((i,) for i in ids))
+        return len(ids)
+
+    def covers(self, path: str) -> bool:
+        """路径是否位于已建立内容索引的根目录下"""
+        path = os.path.abspath(path)
+        with self._lock:
+            roots = [r[0] for r in self._conn.execute("SELECT path FROM roots")]
+        return any(path == r or path.startswith(r.rstrip(os.sep) + os.sep) for r in roots)
+
+    def _safe_extract(self, entry: FileEntry) -> Optional[str]:
+        try:
+            return extract_text(entry.path, self.max_chars, self.opener) or ""
+        except Exception as e:
+            logger.warning(f"提取文本失败 {entry.path}: {e}")
+            return None
+
+    def _write(self, entry: FileEntry, text: str, now: float):
+        """写入一个文档(调用方持有锁并处于事务中)"""
+        # 刚修改的文件可能在同一时间粒度内再次变化，不记录修改时间以便下次重新提取
+        mtime = entry.mtime if now - entry.mtime >= self.RACY_WINDOW else -1.0
+        (doc_id,) = self._conn.execute(
+            "INSERT INTO docs(path, extension, size, mtime, parser) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET extension = excluded.extension, "
+            "size = excluded.size, mtime = excluded.mtime, parser = excluded.parser RETURNING id",
+            (os.path.abspath(entry.path), entry.extension, entry.size, mtime, parser_version(entry.path))
+        ).fetchone()
+        self._conn.execute("DELETE FROM docs_fts WHERE rowid = ?", (doc_id,))
+        self._conn.execute("INSERT INTO docs_fts(rowid, content) VALUES (?, ?)", (doc_id, text))
+
+    # ========== 查询 ==========
+
+    def search(
+        self,
+        directory: str,
+        query: str,
+        regex: bool = False,
+        case_sensitive: bool = False,
+        file_types: Optional[Iterable[str]] = None,
+        limit: Optional[int] = None,
+        snippets: int = 3
+    ) -> List[Dict[str, Any]]:
+        """搜索文件内容
+
+        Args:
+            directory: 搜索根目录
+            query: 子串或正则表达式
+            regex: query 是否为正则表达式
+            case_sensitive: 是否区分大小写
+            file_types: 扩展名过滤
+            limit: 最多返回的文件数
+            snippets: 每个文件最多返回的匹配摘录数
+
+        Returns:
+            [{"path", "name", "size", "extension", "match_count", "snippets"}]
+        """
+        flags = 0 if case_sensitive else re.IGNORECASE
+        if regex:
+            try:
+                matcher = re.compile(query, flags | re.MULTILINE)
+                literals = required_literals(query, flags)
+            except re.error as e:
+                raise ValueError(f"无效的正则表达式: {e}")
+        else:
+            matcher = re.compile(re.escape(query), flags)
+            literals = [query] if len(query) >= MIN_TRIGRAM else []
+
+        results = []
+        for path, extension, size, content in self._candidates(directory, literals, file_types):
+            found = list(self._matches(matcher, content, snippets))
+            if not found:
+                continue
+            count, excerpts = found[-1][0], [excerpt for _, excerpt in found if excerpt is not None]
+            results.append({
+                "path": path,
+                "name": os.path.basename(path),
+                "size": size,
+                "extension": extension,
+                "match_count": count,
+                "snippets": excerpts
+            })
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def _candidates(
+        self,
+        directory: str,
+        literals: List[str],
+        file_types: Optional[Iterable[str]]
+    ) -> Iterator[Tuple[str, str, int, str]]:
+        """用三元组索引筛选候选文档，没有可用字面量时遍历目录下全部文档"""
+        low, high = _prefix_range(os.path.abspath(directory))
+        sql = (
+            "SELECT d.id, d.path, d.extension, d.size, f.content FROM docs_fts f "
+            "JOIN docs d ON d.id = f.rowid WHERE d.path >= ? AND d.path < ? AND f.rowid > ?"
+        )
+        params: List[Any] = [low, high]
+        if literals:
+            sql += " AND docs_fts MATCH ?"
+            params.append(" AND ".join(_phrase(s) for s in literals))
+        if file_types:
+            types = [t.lower() for t in file_types]
+            sql += f" AND d.extension IN ({','.join('?' * len(types))})"
+            params.extend(types)
+        sql += " ORDER BY f.rowid LIMIT 100"
+
+        # 分页读取，调用方提前结束时不会一直占用连接
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(sql, (params[0], params[1], last, *params[2:])).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row[1:]
+            last = rows[-1][0]
+
+    @staticmethod
+    def _matches(matcher: "re.Pattern", content: str, limit: int) -> Iterator[Tuple[int, Optional[str]]]:
+        """逐个校验匹配，产出 (累计匹配数, 摘录)，超过摘录数后只计数"""
+        count = 0
+        for match in matcher.finditer(content):
+            if match.end() == match.start():
+                continue
+            count += 1
+            excerpt = None
+            if count <= limit:
+                start, end = max(0, match.start() - 40), min(len(content), match.end() + 40)
+                excerpt = content[start:end].replace("\n", " ")
+            yield count, excerpt
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取索引统计"""
+        with self._lock:
+            (docs,) = self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()
+            roots = [row[0] for row in self._conn.execute("SELECT path FROM roots")]
+        return {
+            "documents": docs,
+            "roots": roots,
+            "db_path": self.db_path,
+            "db_size_mb": os.path.getsize(self.db_path) / 1024 / 1024 if os.path.exists(self.db_path) else 0
+        }
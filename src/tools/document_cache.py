@@ -0,0 +1,268 @@
+"""解析结果缓存
+
+PDF/DOCX/PPTX 的解析代价较高，同一文件会被文档智能体、知识库入库等反复加载。
+解析出的元数据和逐页文本以 gzip 压缩的 JSONL 保存在磁盘上，
+以 (内容哈希, 文档类型, 解析器版本) 为键，文件改名或复制后仍能命中，
+解析器升级后自动失效。总大小超过上限时按最近访问时间淘汰(LRU)
+
+缓存文件格式: 第一行为元数据对象，之后每行一个页面文本(JSON 字符串)
+"""
+
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, Optional, Iterator
+
+from .document_loaders import Document
+from .file_hashing import hash_file, fastest_algorithm
+from .hash_cache import HashCache
+
+logger = logging.getLogger(__name__)
+
+# 缓存元数据中不保存、每次按当前文件重新生成的字段
+_FILE_FIELDS = ("file_name", "file_size", "modified_at")
+
+
+class CachedDocument(Document):
+    """从缓存文件读取的文档"""
+
+    cacheable = False
+
+    def __init__(self, path: str, file_type: str, cache_path: str, unit: str, metadata: Dict[str, Any]):
+        self.unit = unit
+        super().__init__(path, file_type)
+        self.cache_path = cache_path
+        self.metadata.update(metadata)
+        self.metadata["cached"] = True
+
+    def iter_pages(self) -> Iterator[str]:
+        with gzip.open(self.cache_path, 'rt', encoding='utf-8') as f:
+            f.readline()
+            for line in f:
+                yield json.loads(line)
+
+
+class CachingDocument(Document):
+    """首次解析时边读取边写入缓存，完整读取一遍后提交"""
+
+    def __init__(self, document: Document, cache: "DocumentCache", key: str):
+        self.unit = document.unit
+        self.path = document.path
+        self.file_type = document.file_type
+        self.metadata = document.metadata
+        self.metadata["cached"] = False
+        self._document = document
+        self._cache = cache
+        self._key = key
+
+    def page(self, index: int) -> str:
+        return self._document.page(index)
+
+    def iter_pages(self) -> Iterator[str]:
+        tmp_path = self._cache.temp_path()
+        completed = False
+        try:
+            with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=self._cache.compresslevel) as f:
+                stored = {k: v for k, v in self.metadata.items() if k not in _FILE_FIELDS and k != "cached"}
+                f.write(json.dumps(stored, ensure_ascii=False) + "\n")
+                for text in self._document.iter_pages():
+                    f.write(json.dumps(text, ensure_ascii=False) + "\n")
+                    yield text
+            completed = True
+        finally:
+            # 提前结束迭代(如 max_chars 已满足)时不保存不完整的结果
+            if completed:
+                self._cache.commit(self._key, tmp_path)
+            else:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+
+    def close(self):
+        self._document.close()
+
+
+class DocumentCache:
+    """压缩的解析结果缓存，按总大小做 LRU 淘汰"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at);
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = "./data/cache/documents",
+        max_size_mb: float = 512,
+        hash_cache: Optional[HashCache] = None,
+        algorithm: Optional[str] = None,
+        compresslevel: int = 6
+    ):
+        """初始化缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_size_mb: 缓存文件总大小上限(MB)
+            hash_cache: 内容哈希缓存，未变化的文件无需重新计算哈希
+            algorithm: 内容哈希算法，默认使用最快的可用算法
+            compresslevel: gzip 压缩级别
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.hash_cache = hash_cache
+        self.algorithm = algorithm or fastest_algorithm()
+        self.compresslevel = compresslevel
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.cache_dir / "index.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.RLock()
+
+        logger.info(f"解析结果缓存初始化完成: {cache_dir}")
+
+    def close(self):
+        """关闭索引数据库"""
+        with self._lock:
+            self._conn.close()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.jsonl.gz"
+
+    def temp_path(self) -> str:
+        """新缓存文件的临时路径(提交时改名)"""
+        return str(self.cache_dir / f".{uuid.uuid4().hex}.tmp")
+
+    def key(self, path: str, file_type: str, parser_version: str) -> str:
+        """缓存键: 内容哈希 + 文档类型 + 解析器版本"""
+        if self.hash_cache is not None:
+            digest = self.hash_cache.hash_file(path, self.algorithm)
+        else:
+            digest = hash_file(path, self.algorithm)
+        return f"{digest}-{file_type.lstrip('.')}-{parser_version}"
+
+    def open(self, path: str, file_type: str, loader) -> Document:
+        """打开文档，命中缓存时直接读取缓存文件，否则解析并在读取时写入缓存
+
+        Args:
+            path: 文件路径
+            file_type: 规范化的文档类型
+            loader: 文档加载器类(document_loaders 中的 Document 子类)
+        """
+        key = self.key(path, file_type, loader.parser_version)
+        cached = self._lookup(key)
+        if cached is not None:
+            try:
+                with gzip.open(cached, 'rt', encoding='utf-8') as f:
+                    metadata = json.loads(f.readline())
+                self.hits += 1
+                return CachedDocument(path, file_type, str(cached), metadata.get("unit", loader.unit), metadata)
+            except (OSError, EOFError, ValueError) as e:
+                logger.warning(f"缓存文件损坏，重新解析 {path}: {e}")
+                self.remove(key)
+        self.misses += 1
+        return CachingDocument(loader(path, file_type), self, key)
+
+    def _lookup(self, key: str) -> Optional[Path]:
+        """查找缓存文件并更新访问时间"""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            entry_path = self._entry_path(key)
+            if not entry_path.exists():
+                with self._conn:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return entry_path
+
+    def commit(self, key: str, tmp_path: str):
+        """把写好的临时文件登记为缓存项，超过总大小时淘汰最久未访问的项"""
+        entry_path = self._entry_path(key)
+        entry_path.parent.mkdir(exist_ok=True)
+        size = os.path.getsize(tmp_path)
+        if size > self.max_bytes:
+            os.unlink(tmp_path)
+            return
+        os.replace(tmp_path, entry_path)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, size, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, size, now, now)
+            )
+        self._evict()
+
+    def _evict(self):
+        """总大小超过上限时按访问时间从旧到新删除"""
+        with self._lock:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            victims = []
+            for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+                if total <= self.max_bytes:
+                    break
+                victims.append(key)
+                total -= size
+            with self._conn:
+                self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in victims])
+        for key in victims:
+            try:
+                self._entry_path(key).unlink()
+            except FileNotFoundError:
+                pass
+        self.evictions += len(victims)
+        logger.debug(f"解析结果缓存淘汰 {len(victims)} 项")
+
+    def remove(self, key: str):
+        """删除缓存项"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        try:
+            self._entry_path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute("SELECT key FROM entries")]
+        for key in keys:
+            self.remove(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "cache_dir": str(self.cache_dir),
+            "entries": entries,
+            "size_bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,277 @@
+"""段落级文档对比
+
+两份文档按段落切分，每个段落(空白规范化后)计算一个 64 位内容哈希，
+对比只在哈希序列上进行:
+1. 去掉首尾相同的段落
+2. 在两边都只出现一次的段落中取最长递增子序列作为锚点(patience diff)，
+   锚点把文档切成若干区间，对每个区间重复以上步骤
+3. 没有唯一段落可作锚点的区间使用代价受限的 Myers 算法，
+   超过代价上限时整个区间视为替换
+
+未修改的大段内容由锚点和首尾匹配直接跳过，常见的修订对比接近线性时间。
+第一遍只保存段落哈希和长度，差异按文档顺序产出，
+第二遍顺序读取两份文档为变化的段落补上原文，因此可以流式输出超大文档的差异
+"""
+
+import hashlib
+import logging
+import re
+from collections import Counter
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Myers 算法的默认编辑距离上限
+DEFAULT_MAX_COST = 500
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+# (类型, 旧文档起始段, 旧文档结束段, 新文档起始段, 新文档结束段)，类型为 equal/insert/delete/replace
+Opcode = Tuple[str, int, int, int, int]
+
+
+def split_paragraphs(pages: Iterable[str], continuous: bool = False) -> Iterator[str]:
+    """把逐页文本切成段落(以空行分隔)，段内空白规范化为单个空格
+
+    Args:
+        pages: 逐页/逐段文本
+        continuous: 页面是否为连续文本的切块(纯文本文档)，是则跨页拼接被切开的段落
+    """
+    pending = ""
+    for page in pages:
+        if continuous:
+            parts = _PARAGRAPH_BREAK.split(pending + page)
+            pending = parts.pop()
+        else:
+            parts = _PARAGRAPH_BREAK.split(page)
+        for part in parts:
+            text = " ".join(part.split())
+            if text:
+                yield text
+    text = " ".join(pending.split())
+    if text:
+        yield text
+
+
+def paragraph_hash(text: str) -> int:
+    """段落内容哈希"""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def fingerprint(paragraphs: Iterable[str]) -> Tuple[List[int], List[int]]:
+    """计算段落哈希序列和段落长度，不保留段落文本"""
+    hashes: List[int] = []
+    lengths: List[int] = []
+    for text in paragraphs:
+        hashes.append(paragraph_hash(text))
+        lengths.append(len(text))
+    return hashes, lengths
+
+
+def _unique_anchors(a: List[int], alo: int, ahi: int, b: List[int], blo: int, bhi: int) -> List[Tuple[int, int]]:
+    """两边都唯一的段落中，按旧文档顺序取新文档位置的最长递增子序列"""
+    counts_a = Counter(a[alo:ahi])
+    counts_b = Counter(b[blo:bhi])
+    index_b = {b[j]: j for j in range(blo, bhi) if counts_b[b[j]] == 1}
+    pairs = [(i, index_b[a[i]]) for i in range(alo, ahi) if counts_a[a[i]] == 1 and a[i] in index_b]
+    if not pairs:
+        return []
+
+    # patience sorting: tails[k] 为长度 k+1 的递增子序列末尾在 pairs 中的下标
+    tails: List[int] = []
+    previous = [-1] * len(pairs)
+    for index, (_, j) in enumerate(pairs):
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if pairs[tails[middle]][1] < j:
+                low = middle + 1
+            else:
+                high = middle
+        if low > 0:
+            previous[index] = tails[low - 1]
+        if low == len(tails):
+            tails.append(index)
+        else:
+            tails[low] = index
+
+    anchors = []
+    index = tails[-1]
+    while index != -1:
+        anchors.append(pairs[index])
+        index = previous[index]
+    anchors.reverse()
+    return anchors
+
+
+def _myers(a: List[int], alo: int, ahi: int, b: List[int], blo: int, bhi: int, max_cost: int):
+    """Myers O(ND) 算法求区间内的匹配段落，编辑距离超过 max_cost 时返回 None"""
+    n, m = ahi - alo, bhi - blo
+    v = {1: 0}
+    trace = []
+    for d in range(min(n + m, max_cost) + 1):
+        trace.append(dict(v))
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m, alo, blo)
+    return None
+
+
+def _backtrack(trace: List[Dict[int, int]], x: int, y: int, alo: int, blo: int) -> List[Tuple[int, int]]:
+    matches = []
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            matches.append((alo + x, blo + y))
+        if d > 0:
+            x, y = prev_x, prev_y
+    matches.reverse()
+    return matches
+
+
+def iter_matches(a: List[int], b: List[int], max_cost: int = DEFAULT_MAX_COST) -> Iterator[Tuple[int, int]]:
+    """按文档顺序产出相同段落的位置对 (旧文档段号, 新文档段号)"""
+    # 栈中为待处理的区间 (alo, ahi, blo, bhi) 或已确定的匹配段 (i, j, 长度)
+    stack: List[tuple] = [(0, len(a), 0, len(b))]
+    while stack:
+        item = stack.pop()
+        if len(item) == 3:
+            i, j, size = item
+            for offset in range(size):
+                yield i + offset, j + offset
+            continue
+
+        alo, ahi, blo, bhi = item
+        prefix = 0
+        while alo + prefix < ahi and blo + prefix < bhi and a[alo + prefix] == b[blo + prefix]:
+            prefix += 1
+        suffix = 0
+        while (ahi - suffix > alo + prefix and bhi - suffix > blo + prefix
+               and a[ahi - suffix - 1] == b[bhi - suffix - 1]):
+            suffix += 1
+
+        # 后处理的先入栈
+        if suffix:
+            stack.append((ahi - suffix, bhi - suffix, suffix))
+        inner = (alo + prefix, ahi - suffix, blo + prefix, bhi - suffix)
+        if inner[0] < inner[1] and inner[2] < inner[3]:
+            anchors = _unique_anchors(a, inner[0], inner[1], b, inner[2], inner[3])
+            if anchors:
+                end_i, end_j = inner[1], inner[3]
+                for i, j in reversed(anchors):
+                    stack.append((i + 1, end_i, j + 1, end_j))
+                    stack.append((i, j, 1))
+                    end_i, end_j = i, j
+                stack.append((inner[0], end_i, inner[2], end_j))
+            else:
+                matches = _myers(a, inner[0], inner[1], b, inner[2], inner[3], max_cost)
+                if matches:
+                    for i, j in reversed(matches):
+                        stack.append((i, j, 1))
+        if prefix:
+            stack.append((alo, blo, prefix))
+
+
+def iter_opcodes(a: List[int], b: List[int], max_cost: int = DEFAULT_MAX_COST) -> Iterator[Opcode]:
+    """把匹配段落转换为按顺序的编辑操作，相邻的同类操作合并"""
+    i = j = 0
+    equal_start = None
+    for mi, mj in iter_matches(a, b, max_cost):
+        if mi == i and mj == j:
+            if equal_start is None:
+                equal_start = (i, j)
+        else:
+            if equal_start is not None:
+                yield ("equal", equal_start[0], i, equal_start[1], j)
+            yield (_change_type(i, mi, j, mj), i, mi, j, mj)
+            equal_start = (mi, mj)
+        i, j = mi + 1, mj + 1
+    if equal_start is not None:
+        yield ("equal", equal_start[0], i, equal_start[1], j)
+    if i < len(a) or j < len(b):
+        yield (_change_type(i, len(a), j, len(b)), i, len(a), j, len(b))
+
+
+def _change_type(i1: int, i2: int, j1: int, j2: int) -> str:
+    if i1 == i2:
+        return "insert"
+    if j1 == j2:
+        return "delete"
+    return "replace"
+
+
+def similarity(opcodes: Iterable[Opcode], old_lengths: List[int], new_lengths: List[int]) -> float:
+    """按字符数加权的相似度: 2 * 相同段落字符数 / 两份文档总字符数"""
+    total = sum(old_lengths) + sum(new_lengths)
+    if total == 0:
+        return 1.0
+    same = 0
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            same += sum(old_lengths[i1:i2]) + sum(new_lengths[j1:j2])
+    return same / total
+
+
+class _ParagraphCursor:
+    """顺序读取段落，只保留当前请求的范围"""
+
+    def __init__(self, paragraphs: Iterable[str]):
+        self._paragraphs = iter(paragraphs)
+        self._position = 0
+
+    def take(self, start: int, end: int) -> List[str]:
+        while self._position < start:
+            next(self._paragraphs)
+            self._position += 1
+        texts = []
+        while self._position < end:
+            texts.append(next(self._paragraphs))
+            self._position += 1
+        return texts
+
+
+def iter_changes(
+    opcodes: Iterable[Opcode],
+    old_paragraphs: Iterable[str],
+    new_paragraphs: Iterable[str]
+) -> Iterator[Dict[str, Any]]:
+    """为非 equal 操作补上段落原文
+
+    Args:
+        opcodes: 按顺序的编辑操作
+        old_paragraphs: 旧文档段落(第二遍顺序读取)
+        new_paragraphs: 新文档段落
+
+    Yields:
+        {"type", "old_range": [起, 止], "new_range": [起, 止], "old": [...], "new": [...]}
+    """
+    old_cursor = _ParagraphCursor(old_paragraphs)
+    new_cursor = _ParagraphCursor(new_paragraphs)
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            continue
+        yield {
+            "type": tag,
+            "old_range": [i1, i2],
+            "new_range": [j1, j2],
+            "old": old_cursor.take(i1, i2),
+            "new": new_cursor.take(j1, j2),
+        }
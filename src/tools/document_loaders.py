@@ -0,0 +1,347 @@
+"""惰性文档加载
+
+打开文档时只读取元数据，正文按页(PDF)、段落(DOCX)、幻灯片(PPTX)或
+文本块(纯文本)通过生成器逐个读取，处理大文档时不需要把全文放入内存:
+- 纯文本通过 mmap 映射，按行边界切成文本块，只解码当前块
+- PDF 依赖可选的 pypdf，页面对象在访问时才提取文本
+- DOCX/PPTX 用 iterparse 流式解析压缩包内的 XML，元数据来自 docProps
+"""
+
+import logging
+import mmap
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pypdf
+    from pypdf import PdfReader
+except ImportError:  # 可选依赖
+    pypdf = None
+    PdfReader = None
+
+# 按纯文本读取的扩展名
+TEXT_EXTENSIONS = {
+    ".txt", ".md", ".markdown", ".rst", ".csv", ".tsv", ".json", ".xml", ".html", ".htm",
+    ".log", ".ini", ".yaml", ".yml", ".py", ".js", ".java", ".cpp", ".c", ".h", ".cs",
+    ".go", ".rs", ".php", ".rb", ".swift", ".sql", ".tex"
+}
+
+# 纯文本每个文本块的目标字节数(在其后的第一个换行处切分)
+TEXT_BLOCK_SIZE = 64 * 1024
+
+# 判断文本编码时读取的字节数
+ENCODING_SAMPLE = 64 * 1024
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_CORE_FIELDS = {
+    "{http://purl.org/dc/elements/1.1/}title": "title",
+    "{http://purl.org/dc/elements/1.1/}creator": "author",
+    "{http://purl.org/dc/elements/1.1/}subject": "subject",
+    "{http://purl.org/dc/terms/}created": "created",
+    "{http://purl.org/dc/terms/}modified": "modified",
+}
+_APP_FIELDS = {"Pages": "page_count", "Words": "word_count", "Slides": "slide_count"}
+
+
+class Document:
+    """惰性加载的文档
+
+    metadata 在打开时即可用；iter_pages 逐个产出页面文本，page 按序号读取单页，
+    text 拼接全文(可限制字符数，达到上限后不再解析后续页面)
+    """
+
+    # 页面单位: page/paragraph/slide/block
+    unit = "page"
+
+    # 解析器版本，提取逻辑变化时递增，使已缓存的解析结果失效
+    parser_version = "1"
+
+    # 解析代价是否高到值得缓存
+    cacheable = False
+
+    def __init__(self, path: str, file_type: str):
+        self.path = path
+        self.file_type = file_type
+        st = os.stat(path)
+        self.metadata: Dict[str, Any] = {
+            "file_name": os.path.basename(path),
+            "file_size": st.st_size,
+            "file_type": file_type,
+            "modified_at": datetime.fromtimestamp(st.st_mtime).isoformat(),
+            "unit": self.unit,
+        }
+
+    def iter_pages(self) -> Iterator[str]:
+        """逐个产出页面文本"""
+        raise NotImplementedError
+
+    def page(self, index: int) -> str:
+        """读取第 index 页(从0开始)"""
+        if index < 0:
+            raise IndexError(index)
+        for text in islice(self.iter_pages(), index, index + 1):
+            return text
+        raise IndexError(index)
+
+    def text(self, max_chars: Optional[int] = None, separator: str = "\n") -> str:
+        """拼接全文，max_chars 达到后停止解析"""
+        parts: List[str] = []
+        total = 0
+        for text in self.iter_pages():
+            parts.append(text)
+            total += len(text) + len(separator)
+            if max_chars is not None and total >= max_chars:
+                break
+        content = separator.join(parts)
+        return content if max_chars is None else content[:max_chars]
+
+    def close(self):
+        """释放文件句柄"""
+
+    def __enter__(self) -> "Document":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TextDocument(Document):
+    """mmap 映射的纯文本文档，按行边界切分为文本块"""
+
+    unit = "block"
+    parser_version = "text-1"
+
+    def __init__(self, path: str, file_type: str, block_size: int = TEXT_BLOCK_SIZE):
+        super().__init__(path, file_type)
+        self.block_size = block_size
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        # 已知文本块的起始偏移，顺序读取时逐步补全
+        self._offsets: List[int] = [0]
+        self.metadata["encoding"] = self._detect_encoding()
+
+    def _open(self) -> Optional[mmap.mmap]:
+        if self._map is None and self.metadata["file_size"] > 0:
+            self._file = open(self.path, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def _detect_encoding(self) -> str:
+        """根据开头的字节判断编码(UTF-8 或 GB18030)"""
+        with open(self.path, 'rb') as f:
+            sample = f.read(ENCODING_SAMPLE)
+        if sample.startswith(b"\xef\xbb\xbf"):
+            return "utf-8-sig"
+        # 样本末尾可能截断多字节字符，去掉最后一行再判断
+        if len(sample) == ENCODING_SAMPLE and b"\n" in sample:
+            sample = sample[:sample.rindex(b"\n")]
+        for encoding in ("utf-8", "gb18030"):
+            try:
+                sample.decode(encoding)
+                return encoding
+            except UnicodeDecodeError:
+                continue
+        return "utf-8"
+
+    def _block_end(self, data: mmap.mmap, start: int) -> int:
+        """从 start 开始的文本块的结束偏移(换行之后)"""
+        target = start + self.block_size
+        if target >= len(data):
+            return len(data)
+        newline = data.find(b"\n", target)
+        return len(data) if newline == -1 else newline + 1
+
+    def _decode(self, raw: bytes, first: bool) -> str:
+        encoding = self.metadata["encoding"]
+        if encoding == "utf-8-sig" and not first:
+            encoding = "utf-8"
+        return raw.decode(encoding, errors="replace")
+
+    def iter_pages(self) -> Iterator[str]:
+        data = self._open()
+        if data is None:
+            return
+        index = 0
+        while True:
+            start = self._offsets[index]
+            if start >= len(data):
+                return
+            end = self._block_end(data, start)
+            if index + 1 == len(self._offsets):
+                self._offsets.append(end)
+            yield self._decode(data[start:end], index == 0)
+            index += 1
+
+    def page(self, index: int) -> str:
+        if index < len(self._offsets) - 1:
+            data = self._open()
+            start, end = self._offsets[index], self._offsets[index + 1]
+            return self._decode(data[start:end], index == 0)
+        return super().page(index)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = None
+            self._file = None
+
+
+class PdfDocument(Document):
+    """PDF 文档，页面文本在访问时提取"""
+
+    unit = "page"
+    # 提取结果随 pypdf 版本变化
+    parser_version = f"pdf-1-pypdf{getattr(pypdf, '__version__', '')}"
+    cacheable = True
+
+    def __init__(self, path: str, file_type: str):
+        if PdfReader is None:
+            raise RuntimeError("读取 PDF 需要安装 pypdf")
+        super().__init__(path, file_type)
+        # 传入文件对象而不是路径，pypdf 按需读取对象，不会把整个文件读入内存
+        self._file = open(path, 'rb')
+        try:
+            self._reader = PdfReader(self._file)
+        except Exception:
+            self._file.close()
+            raise
+        self.metadata["page_count"] = len(self._reader.pages)
+        info = self._reader.metadata or {}
+        for key, field in (("/Title", "title"), ("/Author", "author"), ("/Subject", "subject")):
+            if info.get(key):
+                self.metadata[field] = str(info[key])
+
+    def page(self, index: int) -> str:
+        return self._reader.pages[index].extract_text() or ""
+
+    def iter_pages(self) -> Iterator[str]:
+        for index in range(self.metadata["page_count"]):
+            yield self.page(index)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class OfficeDocument(Document):
+    """DOCX/PPTX 文档，流式解析压缩包内的 XML"""
+
+    parser_version = "office-1"
+    cacheable = True
+
+    def __init__(self, path: str, file_type: str):
+        self.unit = "slide" if file_type == ".pptx" else "paragraph"
+        super().__init__(path, file_type)
+        with zipfile.ZipFile(path) as zf:
+            names = set(zf.namelist())
+            if file_type == ".pptx":
+                self._parts = sorted(
+                    (n for n in names if n.startswith("ppt/slides/slide") and n.endswith(".xml")),
+                    key=lambda n: int("".join(c for c in n if c.isdigit()) or 0)
+                )
+            else:
+                self._parts = ["word/document.xml"] if "word/document.xml" in names else []
+            self.metadata.update(self._read_properties(zf, names))
+
+    @staticmethod
+    def _read_properties(zf: zipfile.ZipFile, names) -> Dict[str, Any]:
+        """读取 docProps 中的标题、作者和统计信息"""
+        props: Dict[str, Any] = {}
+        for part, fields in (("docProps/core.xml", _CORE_FIELDS), ("docProps/app.xml", None)):
+            if part not in names:
+                continue
+            try:
+                root = ET.fromstring(zf.read(part))
+            except ET.ParseError:
+                continue
+            for element in root:
+                if fields is not None:
+                    if element.tag in fields and element.text:
+                        props[fields[element.tag]] = element.text
+                else:
+                    field = _APP_FIELDS.get(element.tag.rpartition("}")[2])
+                    if field and element.text and element.text.isdigit():
+                        props[field] = int(element.text)
+        return props
+
+    def _iter_paragraphs(self, zf: zipfile.ZipFile, part: str) -> Iterator[str]:
+        """逐段解析 XML，处理完的段落立即从树中移除"""
+        ns = _A if self.file_type == ".pptx" else _W
+        text_tag, paragraph_tag, tab_tag = ns + "t", ns + "p", _W + "tab"
+        container_tags = (_W + "body", "{http://schemas.openxmlformats.org/presentationml/2006/main}spTree")
+        container = None
+        parts: List[str] = []
+        with zf.open(part) as f:
+            for event, element in ET.iterparse(f, events=("start", "end")):
+                if event == "start":
+                    if container is None and element.tag in container_tags:
+                        container = element
+                    continue
+                tag = element.tag
+                if tag == text_tag:
+                    parts.append(element.text or "")
+                elif tag == tab_tag:
+                    parts.append("\t")
+                elif tag == paragraph_tag:
+                    text = "".join(parts)
+                    parts = []
+                    element.clear()
+                    # 已处理的顶层元素(段落、表格)不再需要，正在解析的元素仍由解析器持有
+                    if container is not None:
+                        del container[:]
+                    if text:
+                        yield text
+
+    def iter_pages(self) -> Iterator[str]:
+        with zipfile.ZipFile(self.path) as zf:
+            for part in self._parts:
+                if self.unit == "slide":
+                    yield "\n".join(self._iter_paragraphs(zf, part))
+                else:
+                    yield from self._iter_paragraphs(zf, part)
+
+
+def document_type(path: str, file_type: Optional[str] = None) -> str:
+    """规范化的文档类型(带点的小写扩展名)"""
+    file_type = (file_type or Path(path).suffix).lower()
+    return file_type if file_type.startswith(".") else "." + file_type
+
+
+def loader_for(file_type: str):
+    """文档类型对应的加载器类，不支持时返回 None"""
+    if file_type in TEXT_EXTENSIONS:
+        return TextDocument
+    if file_type == ".pdf":
+        return PdfDocument
+    if file_type in (".docx", ".pptx"):
+        return OfficeDocument
+    return None
+
+
+def open_document(path: str, file_type: Optional[str] = None) -> Document:
+    """按文件类型打开惰性文档
+
+    Args:
+        path: 文件路径
+        file_type: 文件类型(pdf/docx/txt 等)，默认取扩展名
+
+    Raises:
+        FileNotFoundError: 文件不存在
+        ValueError: 不支持的文件类型
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"文件不存在: {path}")
+    file_type = document_type(path, file_type)
+    loader = loader_for(file_type)
+    if loader is None:
+        raise ValueError(f"不支持的文档类型: {file_type}")
+    return loader(path, file_type)
@@ -0,0 +1,147 @@
+"""分阶段重复文件检测
+
+按 大小 -> 首尾部分哈希 -> 整文件哈希 逐级筛选候选文件，
+每一级只处理上一级仍有重复可能的文件，哈希计算在线程池中并行执行
+"""
+
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Iterable, Callable
+
+from .fs_scanner import FileEntry
+from .file_hashing import hash_partial, try_hash_file, DEFAULT_PARTIAL_SIZE, DEFAULT_BUFFER_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class DuplicateFinder:
+    """分阶段重复文件检测器"""
+
+    def __init__(
+        self,
+        algorithm: str = "md5",
+        max_workers: Optional[int] = None,
+        partial_size: int = DEFAULT_PARTIAL_SIZE,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        use_mmap: bool = False,
+        hash_cache=None
+    ):
+        """初始化检测器
+
+        Args:
+            algorithm: 哈希算法 (md5/sha1/sha256/blake2b/xxh64/xxh3/fast)
+            max_workers: 哈希线程数，None 使用线程池默认值
+            partial_size: 部分哈希的首尾块大小
+            buffer_size: 整文件哈希的读取缓冲区大小
+            use_mmap: 整文件哈希是否使用 mmap 读取
+            hash_cache: 哈希缓存(HashCache)，未变化的文件直接复用缓存结果
+        """
+        self.algorithm = algorithm
+        self.max_workers = max_workers
+        self.partial_size = partial_size
+        self.buffer_size = buffer_size
+        self.use_mmap = use_mmap
+        self.hash_cache = hash_cache
+        self.stats: Dict[str, int] = {}
+
+    def find(
+        self,
+        entries: Iterable[FileEntry],
+        full_hash: Optional[Callable[[FileEntry], Optional[str]]] = None
+    ) -> List[List[FileEntry]]:
+        """检测重复文件
+
+        Args:
+            entries: 文件记录流
+            full_hash: 自定义整文件哈希函数(例如读取缓存)，默认直接计算
+
+        Returns:
+            重复文件组列表
+        """
+        full_hash = full_hash or self._full_hash
+        self.stats = {"files": 0, "partial_hashed": 0, "full_hashed": 0}
+
+        # 阶段1: 按大小分组
+        size_groups: Dict[int, List[FileEntry]] = defaultdict(list)
+        for entry in entries:
+            self.stats["files"] += 1
+            size_groups[entry.size].append(entry)
+
+        duplicates: List[List[FileEntry]] = []
+        candidates: List[FileEntry] = []
+        for size, group in size_groups.items():
+            if len(group) < 2:
+                continue
+            if size == 0:
+                # 空文件内容必然相同
+                duplicates.append(group)
+            else:
+                candidates.extend(group)
+        del size_groups
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="dup-hash") as pool:
+            # 阶段2: 首尾部分哈希
+            self.stats["partial_hashed"] = len(candidates)
+            partial_groups = self._group(
+                candidates, pool.map(self._partial_hash, candidates),
+                key=lambda entry, digest: (entry.size, digest)
+            )
+
+            survivors: List[FileEntry] = []
+            for group in partial_groups:
+                if group[0].size <= 2 * self.partial_size:
+                    # 小文件的部分哈希已覆盖全部内容
+                    duplicates.append(group)
+                else:
+                    survivors.extend(group)
+
+            # 阶段3: 整文件哈希
+            self.stats["full_hashed"] = len(survivors)
+            duplicates.extend(self._group(
+                survivors, pool.map(full_hash, survivors),
+                key=lambda entry, digest: (entry.size, digest)
+            ))
+
+        logger.info(
+            f"重复检测: {self.stats['files']} 个文件, 部分哈希 {self.stats['partial_hashed']} 个, "
+            f"整文件哈希 {self.stats['full_hashed']} 个, {len(duplicates)} 组重复"
+        )
+        return duplicates
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取上一次检测的各阶段统计"""
+        return dict(self.stats)
+
+    @staticmethod
+    def _group(entries: List[FileEntry], digests: Iterable[Optional[str]], key) -> List[List[FileEntry]]:
+        """按 (大小, 哈希) 分组，返回成员数大于1的组(哈希失败的文件被忽略)"""
+        groups: Dict[Any, List[FileEntry]] = defaultdict(list)
+        for entry, digest in zip(entries, digests):
+            if digest is not None:
+                groups[key(entry, digest)].append(entry)
+        return [group for group in groups.values() if len(group) > 1]
+
+    def _partial_hash(self, entry: FileEntry) -> Optional[str]:
+        try:
+            if self.hash_cache is not None:
+                return self.hash_cache.hash_partial(entry.path, self.algorithm, self.partial_size)
+            return hash_partial(entry.path, self.algorithm, self.partial_size)
+        except Exception as e:
+            logger.error(f"计算部分哈希失败 {entry.path}: {e}")
+            return None
+
+    def _full_hash(self, entry: FileEntry) -> Optional[str]:
+        if self.hash_cache is None:
+            return try_hash_file(
+                entry.path, self.algorithm,
+                buffer_size=self.buffer_size, use_mmap=self.use_mmap
+            )
+        try:
+            return self.hash_cache.hash_file(
+                entry.path, self.algorithm,
+                buffer_size=self.buffer_size, use_mmap=self.use_mmap
+            )
+        except Exception as e:
+            logger.error(f"计算哈希失败 {entry.path}: {e}")
+            return None
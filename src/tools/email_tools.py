@@ -4,10 +4,16 @@
 """
 
 import logging
+import threading
+import time
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import json
 
+from .imap_sync import ImapConnectionPool, ImapSync, is_placeholder_host
+from .mail_import import AttachmentStore, MailImporter
+from .mailbox_store import MailboxStore
+
 logger = logging.getLogger(__name__)
 
 
@@ -24,31 +30,239 @@ class EmailTools:
         self.protocol = self.config.get("protocol", "IMAP")
         self.imap_server = self.config.get("imap_server", "")
         self.smtp_server = self.config.get("smtp_server", "")
+        self.imap_port = self.config.get("imap_port", self.config.get("port", 993))
+        self.folder = self.config.get("folder", "INBOX")
+        
+        # 本地邮件存储、IMAP 连接池和同步器(首次读取邮件时创建)
+        self._store: Optional[MailboxStore] = None
+        self._imap_sync: Optional[ImapSync] = None
+        self._imap_lock = threading.RLock()
+        # 距上次同步不足该秒数时直接查询本地
+        self.sync_interval = self.config.get("sync_interval", 30)
+        self._last_sync: Dict[tuple, float] = {}
         
         logger.info("邮件工具初始化完成")
     
+    @property
+    def imap_enabled(self) -> bool:
+        """是否配置了真实的 IMAP 服务器(未配置或为示例域名时返回模拟数据)"""
+        return not is_placeholder_host(self.imap_server)
+    
+    @property
+    def store(self) -> MailboxStore:
+        """本地邮件存储(SQLite + FTS5)"""
+        if self._store is None:
+            with self._imap_lock:
+                if self._store is None:
+                    self._store = MailboxStore(self.config.get("store_path", "./data/email/mailbox.db"))
+        return self._store
+    
+    @property
+    def imap_sync(self) -> ImapSync:
+        """IMAP 增量同步器，每个账号复用一条已认证的连接"""
+        if self._imap_sync is None:
+            with self._imap_lock:
+                if self._imap_sync is None:
+                    pool = ImapConnectionPool(
+                        self.imap_server,
+                        port=self.imap_port,
+                        use_ssl=self.config.get("use_ssl", True),
+                        timeout=self.config.get("timeout", 30)
+                    )
+                    self._imap_sync = ImapSync(pool, self.store, batch_size=self.config.get("fetch_batch_size", 500))
+        return self._imap_sync
+    
+    def import_mailbox(
+        self,
+        path: str,
+        account: str,
+        folder: Optional[str] = None,
+        restart: bool = False,
+        progress_callback=None
+    ) -> Dict[str, Any]:
+        """把 mbox 文件或 Maildir 目录导入本地邮件存储
+        
+        导入中断后再次调用会从断点继续；同一账号下 Message-ID 已存在的邮件跳过
+        
+        Args:
+            path: mbox 文件或 Maildir 目录
+            account: 导入到的邮箱账号
+            folder: 导入到的文件夹，默认为 "Imported/<归档名>"，不能是 IMAP 同步的文件夹
+            restart: 忽略断点从头导入
+            progress_callback: 进度回调，每写入一批调用一次
+            
+        Returns:
+            导入统计(处理数、新增数、重复数、失败数、每秒处理的邮件数)
+        """
+        importer = MailImporter(
+            self.store,
+            AttachmentStore(self.config.get("attachment_dir", "./data/email/attachments")),
+            batch_size=self.config.get("import_batch_size", 500)
+        )
+        return importer.import_path(path, account, folder=folder, restart=restart,
+                                    progress_callback=progress_callback)
+    
+    def close(self):
+        """关闭所有 IMAP 连接和本地存储"""
+        if self._imap_sync is not None:
+            self._imap_sync.pool.close()
+        if self._store is not None:
+            self._store.close()
+    
+    def _authenticate(self, account: str, password: str):
+        """确认密码有效(已有以该密码登录的连接时不访问服务器)，用于只读取本地存储的入口
+        
+        未配置 IMAP 服务器时本地存储只有导入的邮件，没有可用于校验的凭据，不做检查
+        
+        Raises:
+            imaplib.IMAP4.error: 登录失败
+        """
+        if self.imap_enabled:
+            self.imap_sync.pool.run(account, password, lambda conn, entry: None)
+    
+    @staticmethod
+    def _to_email(message: Dict[str, Any]) -> Dict[str, Any]:
+        """存储中的邮件转换为对外的邮件字典，id 为 文件夹:UID"""
+        email = dict(message)
+        email["id"] = f"{message['folder']}:{message['uid']}"
+        email["body_loaded"] = message.get("content") is not None
+        email["content"] = message.get("content") or ""
+        return email
+    
+    def sync_mailbox(self, account: str, password: str, folder: Optional[str] = None) -> Dict[str, Any]:
+        """增量同步文件夹，只拉取新邮件的邮件头
+        
+        Args:
+            account: 邮箱账号
+            password: 邮箱密码
+            folder: 文件夹，默认为配置中的 folder
+            
+        Returns:
+            同步结果 {"new": N, "flag_updates": N, "removed": N, ...}
+        """
+        folder = folder or self.folder
+        result = self.imap_sync.sync_folder(account, password, folder)
+        self._last_sync[(account, folder)] = time.time()
+        return result
+    
+    def search_emails(
+        self,
+        account: str,
+        password: str,
+        query: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        time_range: Optional[Dict[str, Any]] = None,
+        folder: Optional[str] = None,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """在本地已同步的邮件中全文检索(不拉取邮件)
+        
+        结果包含已拉取的正文，与 read_emails 一样需要正确的密码(已有以该密码登录的连接时不访问服务器)
+        
+        Args:
+            account: 邮箱账号
+            password: 邮箱密码
+            query: 关键词，检索主题、发件人和正文，默认取 filters 中的 query
+            filters: 过滤条件，同 read_emails
+            time_range: 时间范围
+            folder: 文件夹，默认取 filters 中的 folder，都未指定时检索全部文件夹
+            limit: 最多返回的邮件数
+        """
+        self._authenticate(account, password)
+        filters = filters or {}
+        messages = self.store.search(account, query=query or filters.get("query"),
+                                     folder=folder or filters.get("folder"), filters=filters,
+                                     time_range=time_range, limit=limit)
+        return [self._to_email(message) for message in messages]
+    
+    def fetch_email(self, account: str, password: str, email_id: str) -> Dict[str, Any]:
+        """读取邮件正文(按需从服务器拉取，之后直接读取本地)
+        
+        Args:
+            account: 邮箱账号
+            password: 邮箱密码
+            email_id: read_emails 返回的邮件ID
+            
+        Returns:
+            包含正文和附件信息的邮件
+        """
+        folder, _, uid = email_id.rpartition(":")
+        folder = folder or self.folder
+        if self.store.is_import_folder(account, folder):
+            # 导入的邮件正文已在本地存储中，服务器上没有该文件夹
+            self._authenticate(account, password)
+            message = self.store.get_message(account, folder, int(uid))
+            if message is None:
+                raise KeyError(f"邮件不存在: {email_id}")
+        else:
+            message = self.imap_sync.fetch_body(account, password, folder, int(uid))
+        message.setdefault("folder", folder)
+        return self._to_email(message)
+    
     def read_emails(
         self,
         account: str,
         password: str,
         time_range: Optional[Dict[str, Any]] = None,
-        filters: Optional[Dict[str, Any]] = None
+        filters: Optional[Dict[str, Any]] = None,
+        folder: Optional[str] = None,
+        include_body: bool = False,
+        limit: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """读取邮件
         
+        先增量同步文件夹(只拉取新邮件的邮件头，距上次同步不足 sync_interval 秒时跳过；
+        归档导入的文件夹不同步)，再在本地存储中按过滤条件和时间范围检索，按日期降序返回。
+        正文默认不拉取(content 为空，body_loaded 为 False)，需要时用 fetch_email 读取
+        
         Args:
             account: 邮箱账号
-            password: 邮箱密码
+            password: 邮箱密码(与已建立连接的登录密码一致时复用连接)
             time_range: 时间范围 {"start": "2024-01-01", "end": "2024-01-31"}
-            filters: 过滤条件 {"from": "sender@example.com", "subject_contains": "关键词"}
+            filters: 过滤条件 {"from": "sender@example.com", "subject_contains": "关键词",
+                     "to", "query": 全文关键词, "unread", "flagged", "has_attachments", "folder"}
+            folder: 文件夹，默认为配置中的 folder
+            include_body: 是否同时拉取正文
+            limit: 最多返回的邮件数，默认为配置中的 max_results
             
         Returns:
             邮件列表
         """
         logger.info(f"读取邮件: {account}")
         
-        # TODO: 实现真实的IMAP邮件读取
-        # 这里返回模拟数据
+        folder = (filters or {}).get("folder") or folder or self.folder
+        imported = self.store.is_import_folder(account, folder)
+        if not self.imap_enabled and not imported:
+            return self._mock_emails(account)
+        
+        if imported:
+            # 归档导入的文件夹只在本地，不同步
+            self._authenticate(account, password)
+        else:
+            # 距上次同步不足 sync_interval 时直接查询本地，但只对以相同密码认证过的连接，
+            # 否则同步一次(登录失败时抛出异常，不返回本地缓存的邮件)
+            recent = time.time() - self._last_sync.get((account, folder), 0) < self.sync_interval
+            if not (recent and self.imap_sync.pool.authenticated(account, password)):
+                self.sync_mailbox(account, password, folder)
+        messages = self.store.search(
+            account,
+            query=(filters or {}).get("query"),
+            folder=folder,
+            filters=filters,
+            time_range=time_range,
+            limit=limit or self.config.get("max_results", 50)
+        )
+        emails = []
+        for message in messages:
+            if include_body and message.get("content") is None:
+                message = self.imap_sync.fetch_body(account, password, folder, message["uid"])
+            emails.append(self._to_email(message))
+        
+        logger.info(f"读取到 {len(emails)} 封邮件")
+        return emails
+    
+    def _mock_emails(self, account: str) -> List[Dict[str, Any]]:
+        """未配置 IMAP 服务器时返回的模拟数据"""
         mock_emails = [
             {
                 "id": "email_001",
@@ -232,6 +446,35 @@ class EmailTools:
                     "filters": "过滤条件(可选)"
                 }
             },
+            {
+                "name": "search_emails",
+                "description": "在本地已同步的邮件中全文检索",
+                "parameters": {
+                    "account": "邮箱账号",
+                    "password": "邮箱密码",
+                    "query": "关键词",
+                    "filters": "过滤条件(可选)",
+                    "time_range": "时间范围(可选)"
+                }
+            },
+            {
+                "name": "import_mailbox",
+                "description": "导入 mbox/Maildir 邮件归档到本地存储(可断点续传)",
+                "parameters": {
+                    "path": "mbox 文件或 Maildir 目录",
+                    "account": "邮箱账号",
+                    "folder": "导入到的文件夹(可选)"
+                }
+            },
+            {
+                "name": "fetch_email",
+                "description": "读取邮件正文和附件信息",
+                "parameters": {
+                    "account": "邮箱账号",
+                    "password": "邮箱密码",
+                    "email_id": "邮件ID"
+                }
+            },
             {
                 "name": "classify_email",
                 "description": "对邮件进行分类和优先级标注",
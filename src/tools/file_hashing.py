@@ -0,0 +1,132 @@
+"""文件哈希工具
+
+提供大缓冲区/mmap 读取的整文件哈希和首尾分块的部分哈希，
+hashlib 在计算时释放 GIL，可在线程池中并行执行
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import xxhash
+except ImportError:  # 可选依赖
+    xxhash = None
+
+
+# 可用的哈希算法: 名称 -> 构造函数
+HASH_ALGORITHMS: Dict[str, Callable] = {
+    "md5": hashlib.md5,
+    "sha1": hashlib.sha1,
+    "sha256": hashlib.sha256,
+    "blake2b": lambda: hashlib.blake2b(digest_size=20),
+}
+if xxhash is not None:
+    HASH_ALGORITHMS["xxh64"] = xxhash.xxh64
+    HASH_ALGORITHMS["xxh3"] = xxhash.xxh3_128
+
+# 默认读取缓冲区 1MB
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+# 部分哈希读取的首尾块大小 64KB
+DEFAULT_PARTIAL_SIZE = 64 * 1024
+
+
+def fastest_algorithm() -> str:
+    """返回当前环境中最快的可用算法(优先 xxh3，其次 blake2b)"""
+    return "xxh3" if "xxh3" in HASH_ALGORITHMS else "blake2b"
+
+
+def new_hasher(algorithm: str = "md5"):
+    """创建哈希对象
+
+    Args:
+        algorithm: 算法名称 (md5/sha1/sha256/blake2b/xxh64/xxh3)，"fast" 表示最快可用算法
+    """
+    if algorithm == "fast":
+        algorithm = fastest_algorithm()
+    try:
+        return HASH_ALGORITHMS[algorithm]()
+    except KeyError:
+        raise ValueError(f"不支持的哈希算法: {algorithm} (可用: {', '.join(HASH_ALGORITHMS)})")
+
+
+def hash_file(
+    file_path: str,
+    algorithm: str = "md5",
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    use_mmap: bool = False
+) -> str:
+    """计算整个文件的哈希值
+
+    Args:
+        file_path: 文件路径
+        algorithm: 哈希算法
+        buffer_size: 读取缓冲区大小
+        use_mmap: 是否通过 mmap 读取
+
+    Returns:
+        十六进制哈希值
+    """
+    hasher = new_hasher(algorithm)
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if use_mmap and size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    for start in range(0, size, buffer_size):
+                        hasher.update(view[start:start + buffer_size])
+                finally:
+                    view.release()
+        else:
+            buffer = bytearray(buffer_size)
+            view = memoryview(buffer)
+            while True:
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                hasher.update(view[:n])
+    return hasher.hexdigest()
+
+
+def hash_partial(
+    file_path: str,
+    algorithm: str = "md5",
+    block_size: int = DEFAULT_PARTIAL_SIZE
+) -> str:
+    """计算文件首尾各 block_size 字节的哈希值
+
+    文件不大于 2 * block_size 时等价于整文件哈希
+
+    Args:
+        file_path: 文件路径
+        algorithm: 哈希算法
+        block_size: 首尾块大小
+
+    Returns:
+        十六进制哈希值
+    """
+    hasher = new_hasher(algorithm)
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= 2 * block_size:
+            hasher.update(f.read())
+        else:
+            hasher.update(f.read(block_size))
+            f.seek(-block_size, os.SEEK_END)
+            hasher.update(f.read(block_size))
+    return hasher.hexdigest()
+
+
+def try_hash_file(file_path: str, algorithm: str = "md5", **kwargs) -> Optional[str]:
+    """计算文件哈希，失败时记录日志并返回None"""
+    try:
+        return hash_file(file_path, algorithm, **kwargs)
+    except Exception as e:
+        logger.error(f"计算哈希失败 {file_path}: {e}")
+        return None
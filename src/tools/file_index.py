@@ -0,0 +1,444 @@
+"""文件元数据索引
+
+基于 SQLite 持久化保存文件路径、大小、修改时间、扩展名和内容哈希，
+通过比较目录修改时间增量刷新，只重新扫描发生变化的目录；
+扫描过滤规则中被排除的目录(如 node_modules)在刷新时不会被打开，也不会写入索引。
+原地修改文件不会改变目录修改时间，因此内容哈希同时记录计算时的文件大小和修改时间(纳秒)，
+读取时与当前 os.stat 不一致即视为失效
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Iterable, Tuple
+
+from .fs_scanner import FileEntry, get_extension
+from .scan_filters import PathFilter
+
+logger = logging.getLogger(__name__)
+
+
+def _prefix_range(directory: str) -> Tuple[str, str]:
+    """返回目录下所有路径的字典序区间 [dir/, dir0)，可利用主键索引"""
+    prefix = directory.rstrip(os.sep) + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+
+class FileIndex:
+    """文件元数据索引"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS directories (
+            path TEXT PRIMARY KEY,
+            parent TEXT,
+            mtime_ns INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_directories_parent ON directories(parent);
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            dir TEXT NOT NULL,
+            name TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            ctime REAL NOT NULL,
+            extension TEXT NOT NULL,
+            hash TEXT,
+            hash_size INTEGER,
+            hash_mtime_ns INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_files_dir ON files(dir);
+        CREATE INDEX IF NOT EXISTS idx_files_size ON files(size);
+        CREATE INDEX IF NOT EXISTS idx_files_extension ON files(extension);
+        CREATE TABLE IF NOT EXISTS roots (
+            path TEXT PRIMARY KEY,
+            refreshed_at REAL,
+            filter TEXT
+        );
+    """
+
+    # 目录修改时间距扫描时刻小于该值(秒)时不记录，下次强制重扫，避免同一时间粒度内的变更被漏掉
+    RACY_WINDOW = 2.0
+
+    # 刷新时每扫描多少个目录提交一次
+    COMMIT_EVERY = 500
+
+    def __init__(self, db_path: str = "./data/cache/file_index.db", refresh_interval: float = 0,
+                 path_filter: Optional[PathFilter] = None):
+        """初始化文件索引
+
+        Args:
+            db_path: 索引数据库路径
+            refresh_interval: 同一目录两次增量刷新的最小间隔(秒)，0表示每次查询都刷新
+            path_filter: 扫描过滤规则，被排除的目录不建立索引；
+                规则与建立索引时不同的根目录视为未索引，下次刷新时全量重扫
+        """
+        self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        self.path_filter = path_filter if path_filter else None
+        self._filter_signature = path_filter.signature if path_filter else ""
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        # 旧版本索引库没有哈希校验列
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(files)")}
+        for column in ("hash_size", "hash_mtime_ns"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE files ADD COLUMN {column} INTEGER")
+        if "filter" not in {row[1] for row in self._conn.execute("PRAGMA table_info(roots)")}:
+            self._conn.execute("ALTER TABLE roots ADD COLUMN filter TEXT")
+        self._conn.commit()
+        self._lock = threading.RLock()
+
+        logger.info(f"文件元数据索引初始化完成: {db_path}")
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    # ========== 刷新 ==========
+
+    def needs_refresh(self, directory: str) -> bool:
+        """判断目录是否需要刷新(未索引或超过刷新间隔)"""
+        directory = os.path.abspath(directory)
+        now = time.time()
+        for root, refreshed_at in self._roots():
+            covers = directory == root or directory.startswith(root.rstrip(os.sep) + os.sep)
+            if covers and refreshed_at is not None and now - refreshed_at < self.refresh_interval:
+                return False
+        return True
+
+    def covers(self, directory: str) -> bool:
+        """目录是否位于已建立索引的根目录下"""
+        directory = os.path.abspath(directory)
+        return self._containing_root(directory) is not None
+
+    def _roots(self) -> List[Tuple[str, Optional[float]]]:
+        """使用当前过滤规则建立索引的根目录 [(路径, 刷新时间)]"""
+        with self._lock:
+            return [
+                (path, refreshed_at) for path, refreshed_at, signature in
+                self._conn.execute("SELECT path, refreshed_at, filter FROM roots")
+                if (signature or "") == self._filter_signature
+            ]
+
+    def _containing_root(self, path: str) -> Optional[str]:
+        """包含该路径的最外层已索引根目录(过滤规则中的相对路径以它为基准)"""
+        roots = [r for r, _ in self._roots() if path == r or path.startswith(r.rstrip(os.sep) + os.sep)]
+        return min(roots, key=len) if roots else None
+
+    def _excluded(self, path: str, base: str) -> bool:
+        """目录是否被过滤规则排除(base 为规则的相对路径基准)"""
+        if self.path_filter is None or path == base:
+            return False
+        rel_path = path[len(base.rstrip(os.sep)) + 1:].replace(os.sep, "/")
+        return not self.path_filter.allows_dir(rel_path)
+
+    def invalidate(self, directory: Optional[str] = None):
+        """使刷新间隔失效，下次查询时重新增量刷新
+
+        Args:
+            directory: 发生变更的目录，None表示全部
+        """
+        with self._lock, self._conn:
+            if directory is None:
+                self._conn.execute("UPDATE roots SET refreshed_at = NULL")
+                return
+            directory = os.path.abspath(directory)
+            for (root,) in self._conn.execute("SELECT path FROM roots").fetchall():
+                related = (
+                    directory == root
+                    or directory.startswith(root.rstrip(os.sep) + os.sep)
+                    or root.startswith(directory.rstrip(os.sep) + os.sep)
+                )
+                if related:
+                    self._conn.execute("UPDATE roots SET refreshed_at = NULL WHERE path = ?", (root,))
+
+    def refresh(self, directory: str, full: bool = False) -> Dict[str, int]:
+        """增量刷新目录索引
+
+        目录修改时间未变化时沿用已索引的文件和子目录；文件原地修改不会改变
+        目录修改时间，需要 full=True 或配合文件监听才能发现
+
+        Args:
+            directory: 目录路径
+            full: 是否忽略目录修改时间，重新扫描所有目录
+
+        Returns:
+            刷新统计 {"scanned_dirs", "skipped_dirs", "updated_files", "removed_files"}
+        """
+        root = os.path.abspath(directory)
+        if not os.path.isdir(root):
+            raise FileNotFoundError(f"目录不存在: {directory}")
+
+        stats = {"scanned_dirs": 0, "skipped_dirs": 0, "updated_files": 0, "removed_files": 0}
+        started = time.time()
+
+        with self._lock:
+            base = self._containing_root(root)
+            if base is None:
+                # 未索引或过滤规则已变化: 全量重扫，删除现在被排除的子树
+                full = True
+                base = root
+            stack = [root]
+            while stack:
+                path = stack.pop()
+                try:
+                    mtime_ns = os.stat(path).st_mtime_ns
+                except OSError:
+                    self._remove_tree(path, stats)
+                    continue
+
+                row = self._conn.execute(
+                    "SELECT mtime_ns FROM directories WHERE path = ?", (path,)
+                ).fetchone()
+
+                if not full and row is not None and row[0] == mtime_ns:
+                    stats["skipped_dirs"] += 1
+                    stack.extend(r[0] for r in self._conn.execute(
+                        "SELECT path FROM directories WHERE parent = ?", (path,)
+                    ))
+                    continue
+
+                stats["scanned_dirs"] += 1
+                subdirs = self._rescan_directory(path, mtime_ns, started, stats, base)
+                stack.extend(subdirs)
+
+                # 分批提交，避免单个超大事务
+                if stats["scanned_dirs"] % self.COMMIT_EVERY == 0:
+                    self._conn.commit()
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO roots (path, refreshed_at, filter) VALUES (?, ?, ?)",
+                (root, time.time(), self._filter_signature)
+            )
+            self._conn.commit()
+
+        logger.info(
+            f"索引刷新完成 {root}: 扫描 {stats['scanned_dirs']} 个目录, "
+            f"跳过 {stats['skipped_dirs']} 个, 更新 {stats['updated_files']} 个文件"
+        )
+        return stats
+
+    def refresh_directories(self, directories: Iterable[str]) -> Dict[str, int]:
+        """重新扫描指定目录的直接子项(文件监听发现变化时调用)
+
+        不在已索引根目录下或被过滤规则排除的目录被忽略；已不存在的目录从索引中删除，
+        新出现的子目录递归扫描
+
+        Returns:
+            刷新统计 {"scanned_dirs", "skipped_dirs", "updated_files", "removed_files"}
+        """
+        stats = {"scanned_dirs": 0, "skipped_dirs": 0, "updated_files": 0, "removed_files": 0}
+        started = time.time()
+        with self._lock:
+            stack = []
+            for directory in set(os.path.abspath(d) for d in directories):
+                base = self._containing_root(directory)
+                if base is not None and not self._excluded(directory, base):
+                    stack.append((directory, base))
+                else:
+                    stats["skipped_dirs"] += 1
+            while stack:
+                path, base = stack.pop()
+                try:
+                    mtime_ns = os.stat(path).st_mtime_ns
+                except OSError:
+                    self._remove_tree(path, stats)
+                    continue
+                stats["scanned_dirs"] += 1
+                for sub in self._rescan_directory(path, mtime_ns, started, stats, base):
+                    row = self._conn.execute(
+                        "SELECT mtime_ns FROM directories WHERE path = ?", (sub,)
+                    ).fetchone()
+                    if row is None or row[0] is None:
+                        stack.append((sub, base))
+            self._conn.commit()
+        return stats
+
+    def _rescan_directory(self, path: str, mtime_ns: int, started: float, stats: Dict[str, int],
+                          base: str) -> List[str]:
+        """重新扫描单个目录的直接子项并写入索引，返回子目录列表(不含被过滤规则排除的目录)"""
+        files: Dict[str, Tuple] = {}
+        subdirs: List[str] = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_file():
+                            st = entry.stat()
+                            files[entry.path] = (
+                                entry.path, path, entry.name, st.st_size,
+                                st.st_mtime, st.st_ctime, get_extension(entry.name)
+                            )
+                        elif entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.') \
+                                and not self._excluded(entry.path, base):
+                            subdirs.append(entry.path)
+                    except OSError as e:
+                        logger.debug(f"跳过无法访问的条目 {entry.path}: {e}")
+        except OSError as e:
+            logger.warning(f"扫描目录失败 {path}: {e}")
+            return []
+
+        # 在 refresh 的事务中执行，由调用方定期提交
+        known = {
+            r[0]: (r[1], r[2]) for r in self._conn.execute(
+                "SELECT path, size, mtime FROM files WHERE dir = ?", (path,)
+            )
+        }
+        removed = [p for p in known if p not in files]
+        if removed:
+            self._conn.executemany("DELETE FROM files WHERE path = ?", ((p,) for p in removed))
+            stats["removed_files"] += len(removed)
+
+        changed = [
+            row for p, row in files.items()
+            if known.get(p) != (row[3], row[4])
+        ]
+        if changed:
+            # 大小或修改时间变化时清空内容哈希
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files "
+                "(path, dir, name, size, mtime, ctime, extension, hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, NULL)",
+                changed
+            )
+            stats["updated_files"] += len(changed)
+
+        known_dirs = {
+            r[0] for r in self._conn.execute(
+                "SELECT path FROM directories WHERE parent = ?", (path,)
+            )
+        }
+        for gone in known_dirs - set(subdirs):
+            self._remove_tree(gone, stats)
+
+        recorded_mtime = None if started - mtime_ns / 1e9 < self.RACY_WINDOW else mtime_ns
+        parent = os.path.dirname(path)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO directories (path, parent, mtime_ns) VALUES (?, ?, ?)",
+            (path, parent, recorded_mtime)
+        )
+        for sub in subdirs:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO directories (path, parent, mtime_ns) VALUES (?, ?, NULL)",
+                (sub, path)
+            )
+
+        return subdirs
+
+    def _remove_tree(self, path: str, stats: Dict[str, int]):
+        """从索引中删除目录及其所有子项(调用方负责提交事务)"""
+        low, high = _prefix_range(path)
+        cursor = self._conn.execute("DELETE FROM files WHERE path >= ? AND path < ?", (low, high))
+        stats["removed_files"] += cursor.rowcount
+        self._conn.execute(
+            "DELETE FROM directories WHERE path = ? OR (path >= ? AND path < ?)", (path, low, high)
+        )
+
+    # ========== 查询 ==========
+
+    def iter_entries(
+        self,
+        directory: str,
+        max_depth: int = -1,
+        file_types: Optional[Iterable[str]] = None,
+        batch_size: int = 1000
+    ) -> Iterator[FileEntry]:
+        """按路径顺序分批读取索引中的文件记录"""
+        root = os.path.abspath(directory)
+        low, high = _prefix_range(root)
+        where, params = self._type_clause(file_types)
+        last = low
+        base_depth = root.rstrip(os.sep).count(os.sep)
+
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT path, name, size, extension, ctime, mtime FROM files "
+                    f"WHERE path > ? AND path < ?{where} ORDER BY path LIMIT ?",
+                    (last, high, *params, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                if max_depth != -1 and row[0].count(os.sep) - base_depth - 1 > max_depth:
+                    continue
+                yield FileEntry(*row)
+            last = rows[-1][0]
+
+    def search(
+        self,
+        directory: str,
+        keyword: str,
+        file_types: Optional[Iterable[str]] = None
+    ) -> List[FileEntry]:
+        """按文件名关键词搜索(不区分大小写)"""
+        low, high = _prefix_range(os.path.abspath(directory))
+        where, params = self._type_clause(file_types)
+        pattern = "%" + keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, name, size, extension, ctime, mtime FROM files "
+                f"WHERE path >= ? AND path < ? AND name LIKE ? ESCAPE '\\'{where}",
+                (low, high, pattern, *params)
+            ).fetchall()
+        # SQLite 的 LIKE 只对 ASCII 忽略大小写，这里再做一次精确过滤
+        keyword = keyword.lower()
+        return [FileEntry(*row) for row in rows if keyword in row[1].lower()]
+
+    def get_hash(self, path: str) -> Optional[str]:
+        """读取已索引的内容哈希，文件大小或修改时间与计算哈希时不一致时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT hash, hash_size, hash_mtime_ns FROM files WHERE path = ?", (os.path.abspath(path),)
+            ).fetchone()
+        if not row or row[0] is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if (st.st_size, st.st_mtime_ns) != (row[1], row[2]):
+            return None
+        return row[0]
+
+    def set_hash(self, path: str, file_hash: str, stat: Optional[os.stat_result] = None):
+        """保存内容哈希
+
+        Args:
+            path: 文件路径
+            file_hash: 内容哈希
+            stat: 计算哈希前取得的 os.stat 结果，缺省时读取当前状态
+        """
+        try:
+            st = stat or os.stat(path)
+        except OSError:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE files SET hash = ?, hash_size = ?, hash_mtime_ns = ? WHERE path = ?",
+                (file_hash, st.st_size, st.st_mtime_ns, os.path.abspath(path))
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取索引统计信息"""
+        with self._lock:
+            files = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            dirs = self._conn.execute("SELECT COUNT(*) FROM directories").fetchone()[0]
+            roots = [r[0] for r in self._conn.execute("SELECT path FROM roots")]
+        return {"db_path": self.db_path, "files": files, "directories": dirs, "roots": roots}
+
+    @staticmethod
+    def _type_clause(file_types: Optional[Iterable[str]]) -> Tuple[str, tuple]:
+        """生成扩展名过滤条件"""
+        if not file_types:
+            return "", ()
+        types = tuple(file_types)
+        return f" AND extension IN ({','.join('?' * len(types))})", types
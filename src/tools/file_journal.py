@@ -0,0 +1,400 @@
+"""日志化批量文件操作
+
+执行前将全部操作意图写入 JSONL 日志，执行中追加完成记录，
+之后可按日志撤销整次操作。同一文件系统内直接 os.rename，
+跨设备时回退为 copy_file_range/流式复制；覆盖已有文件前
+以硬链接或 reflink 形式备份到备份目录，不复制数据
+"""
+
+import errno
+import json
+import logging
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Callable, Iterable, Set
+
+from .move_planner import MoveOp, plan_moves
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台
+    fcntl = None
+
+# Linux FICLONE ioctl: 在支持的文件系统(btrfs/xfs)上创建共享数据块的副本
+FICLONE = 0x40049409
+
+# 流式复制的缓冲区大小
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# 每追加多少条完成记录刷新一次日志
+FLUSH_EVERY = 256
+
+# 默认并发移动线程数(移动以元数据操作为主，网络文件系统上每次调用耗时较长)
+DEFAULT_MOVE_WORKERS = 8
+
+
+def _reflink(src: str, dst: str) -> bool:
+    """尝试以 reflink 方式复制文件，不支持时返回False"""
+    if fcntl is None:
+        return False
+    try:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return True
+    except OSError:
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        return False
+
+
+def copy_file(src: str, dst: str):
+    """复制文件内容和元数据
+
+    依次尝试 reflink、内核态 copy_file_range 和用户态流式复制
+    """
+    if not _reflink(src, dst):
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            copied = False
+            if hasattr(os, "copy_file_range"):
+                try:
+                    while os.copy_file_range(fsrc.fileno(), fdst.fileno(), COPY_BUFFER_SIZE * 64):
+                        pass
+                    copied = True
+                except OSError as e:
+                    if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                        raise
+                    fsrc.seek(0)
+                    fdst.seek(0)
+                    fdst.truncate()
+            if not copied:
+                shutil.copyfileobj(fsrc, fdst, COPY_BUFFER_SIZE)
+    shutil.copystat(src, dst)
+
+
+def move_file(src: str, dst: str, overwrite: bool = True):
+    """移动文件: 同一文件系统内 rename，跨设备时复制后删除源文件
+
+    overwrite 为False时不覆盖已有目标: 优先用 link+unlink 原子地拒绝覆盖，
+    文件系统不支持硬链接时退回到先检查后移动
+    """
+    if not overwrite:
+        try:
+            os.link(src, dst, follow_symlinks=False)
+        except FileExistsError:
+            raise
+        except OSError:
+            if os.path.lexists(dst):
+                raise FileExistsError(errno.EEXIST, "目标已存在", dst)
+        else:
+            os.unlink(src)
+            return
+    try:
+        os.rename(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        copy_file(src, dst)
+        os.unlink(src)
+
+
+def backup_file(src: str, dst: str):
+    """零拷贝备份: 优先硬链接，其次 reflink，最后完整复制"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        copy_file(src, dst)
+
+
+class FileJournal:
+    """日志化文件操作引擎
+
+    日志格式(每行一个 JSON 对象):
+        {"type": "begin", "id": ..., "operation": ..., "created_at": ...}
+        {"type": "mkdir", "path": ...}
+        {"type": "intent", "seq": N, "op": "move", "src": ..., "dst": ..., "backup": 备份路径或null}
+        {"type": "done", "seq": N} / {"type": "failed", "seq": N, "error": ...}
+        {"type": "commit", "success": N, "failed": N}
+        {"type": "undo", "undone": N, "failed": N}
+    """
+
+    def __init__(self, journal_dir: str = "./data/journals", backup_dir: str = "./data/backups"):
+        """初始化操作日志
+
+        Args:
+            journal_dir: 日志目录
+            backup_dir: 备份目录
+        """
+        self.journal_dir = Path(journal_dir)
+        self.backup_dir = Path(backup_dir)
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+
+    def _journal_path(self, journal_id: str) -> Path:
+        path = self.journal_dir / f"{journal_id}.jsonl"
+        if path.parent != self.journal_dir:
+            raise ValueError(f"无效的日志ID: {journal_id}")
+        return path
+
+    @staticmethod
+    def _write(f, record: Dict[str, Any]):
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def execute(
+        self,
+        operation: str,
+        moves: Iterable[Tuple[str, str]],
+        on_conflict: str = "rename",
+        max_workers: Optional[int] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """规划并日志化执行一批移动/重命名
+
+        先生成移动计划(按目标目录分组、一次性建目录、提前解决冲突)，
+        把全部意图写入日志并落盘，再用有界线程池并发执行互不依赖的移动，
+        相互依赖的移动随后按顺序执行
+
+        Args:
+            operation: 操作名称(写入日志，便于查看)
+            moves: (源路径, 目标路径) 序列
+            on_conflict: 目标冲突处理方式 (rename/overwrite/skip)
+            max_workers: 并发线程数，1 表示顺序执行
+            progress: 进度回调，每完成或失败一项调用一次
+                {"event": "moved"/"failed", "source", "target", "completed", "total", ["error"]}
+
+        Returns:
+            {"journal_id": ..., "success": N, "failed": [...], "skipped": [...], "renamed": N}
+        """
+        journal_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+        plan = plan_moves(moves, on_conflict=on_conflict, temp_tag=journal_id)
+        ops: List[MoveOp] = plan["parallel"] + plan["sequential"]
+        backup_root = self.backup_dir / journal_id
+        backups = {
+            seq: str(backup_root / f"{seq}_{os.path.basename(op.dst)}")
+            for seq, op in enumerate(ops) if op.overwrite
+        }
+        # 临时名中转的一步不算作完成的移动，结果和进度按 源->目标 的移动计数
+        total = sum(1 for op in ops if op.hop is None)
+        state = {"success": 0, "completed": 0, "failed": []}
+        failed_hops: Set[str] = set()
+
+        with open(self._journal_path(journal_id), 'w', encoding='utf-8') as f:
+            # 先写入全部意图并落盘，崩溃后也能据此撤销
+            self._write(f, {
+                "type": "begin", "id": journal_id, "operation": operation,
+                "created_at": datetime.now().isoformat(), "count": len(ops)
+            })
+            for directory in plan["directories"]:
+                for created in self._missing_dirs(directory):
+                    self._write(f, {"type": "mkdir", "path": created})
+            for seq, op in enumerate(ops):
+                self._write(f, {
+                    "type": "intent", "seq": seq, "op": "move",
+                    "src": op.src, "dst": op.dst, "backup": backups.get(seq)
+                })
+            f.flush()
+            os.fsync(f.fileno())
+
+            # 每个目标目录只创建一次
+            for directory in plan["directories"]:
+                os.makedirs(directory, exist_ok=True)
+            if backups:
+                backup_root.mkdir(parents=True, exist_ok=True)
+
+            def record(seq: int, error: Optional[BaseException]):
+                op = ops[seq]
+                if op.hop is not None and error is None:
+                    self._write(f, {"type": "done", "seq": seq})
+                    return
+                source, target = op.origin or op.src, op.hop or op.dst
+                state["completed"] += 1
+                event = {"source": source, "target": target,
+                         "completed": state["completed"], "total": total}
+                if error is None:
+                    self._write(f, {"type": "done", "seq": seq})
+                    state["success"] += 1
+                    event["event"] = "moved"
+                else:
+                    logger.error(f"移动失败 {op.src}: {error}")
+                    self._write(f, {"type": "failed", "seq": seq, "error": str(error)})
+                    state["failed"].append({"source": source, "target": target, "error": str(error)})
+                    event.update(event="failed", error=str(error))
+                    if op.hop is not None:
+                        failed_hops.add(op.dst)
+                if state["completed"] % FLUSH_EVERY == 0:
+                    f.flush()
+                if progress is not None:
+                    progress(event)
+
+            parallel_count = len(plan["parallel"])
+            self._run_parallel(ops, range(parallel_count), backups, max_workers, record)
+            for seq in range(parallel_count, len(ops)):
+                if ops[seq].src in failed_hops:
+                    # 移到临时名失败，已记为该项移动失败
+                    continue
+                record(seq, self._apply(ops[seq], backups.get(seq)))
+
+            self._write(f, {"type": "commit", "success": state["success"], "failed": len(state["failed"])})
+            f.flush()
+            os.fsync(f.fileno())
+
+        logger.info(
+            f"操作日志 {journal_id}: {state['success']} 成功, {len(state['failed'])} 失败, "
+            f"{len(plan['skipped'])} 跳过, {plan['renamed']} 个因冲突改名"
+        )
+        return {
+            "journal_id": journal_id,
+            "success": state["success"],
+            "failed": state["failed"],
+            "skipped": plan["skipped"],
+            "renamed": plan["renamed"],
+        }
+
+    @staticmethod
+    def _apply(op: MoveOp, backup: Optional[str]) -> Optional[BaseException]:
+        """执行单个移动，返回异常(成功时为None)"""
+        try:
+            if op.overwrite and os.path.lexists(op.dst):
+                backup_file(op.dst, backup)
+            move_file(op.src, op.dst, overwrite=op.overwrite)
+            return None
+        except Exception as e:
+            return e
+
+    def _run_parallel(self, ops: List[MoveOp], seqs: range, backups: Dict[int, str],
+                      max_workers: Optional[int], record: Callable):
+        """用有界线程池执行互不依赖的移动，完成结果在调用线程中写入日志"""
+        workers = max_workers or DEFAULT_MOVE_WORKERS
+        if workers <= 1 or len(seqs) <= 1:
+            for seq in seqs:
+                record(seq, self._apply(ops[seq], backups.get(seq)))
+            return
+
+        pending = {}
+        queue = iter(seqs)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="file-move") as pool:
+            while True:
+                # 在途任务数不超过线程数的4倍，避免一次性提交全部任务
+                for seq in queue:
+                    pending[pool.submit(self._apply, ops[seq], backups.get(seq))] = seq
+                    if len(pending) >= workers * 4:
+                        break
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record(pending.pop(future), future.result())
+
+    @staticmethod
+    def _missing_dirs(directory: str) -> List[str]:
+        """返回需要新建的目录(含缺失的上级目录，自上而下)"""
+        missing = []
+        path = Path(directory)
+        while not path.exists():
+            missing.append(str(path))
+            path = path.parent
+        missing.reverse()
+        return missing
+
+    def _read(self, journal_id: str) -> Iterator[Dict[str, Any]]:
+        path = self._journal_path(journal_id)
+        if not path.exists():
+            raise FileNotFoundError(f"操作日志不存在: {journal_id}")
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # 崩溃时写了一半的最后一行
+                        logger.warning(f"跳过损坏的日志行: {journal_id}")
+
+    def undo(self, journal_id: str) -> Dict[str, Any]:
+        """撤销一次操作
+
+        按相反顺序把文件移回原位置、恢复被覆盖的文件并删除新建的空目录。
+        没有完成记录的操作(例如进程崩溃)根据文件实际状态判断是否需要撤销
+
+        Args:
+            journal_id: 日志ID
+
+        Returns:
+            {"journal_id": ..., "undone": N, "failed": [...]}
+        """
+        intents: Dict[int, Dict[str, Any]] = {}
+        done = set()
+        created_dirs: List[str] = []
+        for record in self._read(journal_id):
+            kind = record.get("type")
+            if kind == "intent":
+                intents[record["seq"]] = record
+            elif kind == "done":
+                done.add(record["seq"])
+            elif kind == "mkdir":
+                created_dirs.append(record["path"])
+            elif kind == "undo":
+                raise RuntimeError(f"操作已撤销: {journal_id}")
+
+        undone = 0
+        failed = []
+        for seq in sorted(intents, reverse=True):
+            src, dst = intents[seq]["src"], intents[seq]["dst"]
+            completed = seq in done or (not os.path.lexists(src) and os.path.lexists(dst))
+            try:
+                if completed:
+                    os.makedirs(os.path.dirname(src) or ".", exist_ok=True)
+                    move_file(dst, src)
+                    undone += 1
+                backup = intents[seq].get("backup")
+                if backup and os.path.lexists(backup) and not os.path.lexists(dst):
+                    move_file(backup, dst)
+            except Exception as e:
+                logger.error(f"撤销失败 {dst} -> {src}: {e}")
+                failed.append({"source": dst, "target": src, "error": str(e)})
+
+        for directory in reversed(created_dirs):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
+
+        backup_root = self.backup_dir / journal_id
+        if backup_root.exists() and not failed:
+            shutil.rmtree(backup_root, ignore_errors=True)
+
+        with open(self._journal_path(journal_id), 'a', encoding='utf-8') as f:
+            self._write(f, {"type": "undo", "undone": undone, "failed": len(failed),
+                            "undone_at": datetime.now().isoformat()})
+
+        logger.info(f"撤销操作 {journal_id}: {undone} 个文件已还原, {len(failed)} 个失败")
+        return {"journal_id": journal_id, "undone": undone, "failed": failed}
+
+    def list_journals(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """列出最近的操作日志(仅读取开头和结尾记录)"""
+        journals = []
+        for path in sorted(self.journal_dir.glob("*.jsonl"), reverse=True)[:limit]:
+            info = {"journal_id": path.stem}
+            with open(path, 'r', encoding='utf-8') as f:
+                first = f.readline()
+                last = first
+                for line in f:
+                    if line.strip():
+                        last = line
+            try:
+                begin = json.loads(first)
+                info.update(operation=begin.get("operation"), created_at=begin.get("created_at"),
+                            count=begin.get("count"))
+                status = json.loads(last).get("type")
+                info["status"] = {"commit": "committed", "undo": "undone"}.get(status, "incomplete")
+            except json.JSONDecodeError:
+                info["status"] = "corrupted"
+            journals.append(info)
+        return journals
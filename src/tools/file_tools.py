@@ -4,45 +4,146 @@
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+import os
+import threading
+from typing import List, Dict, Any, Optional, Iterator, Iterable, Union, Callable
 from pathlib import Path
 
+from .document_loaders import Document, open_document, document_type, loader_for
+from .document_cache import DocumentCache
+from .hash_cache import HashCache
+from .summarizer import MapReduceSummarizer, SummaryCache
+from .mail_merge import MailMerge, load_template
+from .document_diff import split_paragraphs, fingerprint, iter_opcodes, iter_changes, similarity
+
 logger = logging.getLogger(__name__)
 
 
 class FileTools:
     """文件处理工具集"""
     
-    def __init__(self):
-        """初始化文件工具"""
+    def __init__(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        model_manager=None,
+        prompt_engine=None
+    ):
+        """初始化文件工具
+        
+        Args:
+            config: 配置信息
+            model_manager: 模型管理器，提供后启用分层摘要
+            prompt_engine: 提示词引擎
+        """
+        self.config = config or {}
+        self.model_manager = model_manager
+        self.prompt_engine = prompt_engine
+        self._summarizer: Optional[MapReduceSummarizer] = None
+        self._summarizer_lock = threading.Lock()
+        
+        # 解析结果缓存(首次加载需要缓存的文档时打开)
+        self._document_cache_config = self.config.get("document_cache", {})
+        self._document_cache: Optional[DocumentCache] = None
+        self._document_cache_lock = threading.Lock()
+        
         logger.info("文件工具初始化完成")
     
-    def load_document(self, file_path: str, file_type: Optional[str] = None) -> Dict[str, Any]:
+    @property
+    def document_cache(self) -> Optional[DocumentCache]:
+        """解析结果缓存，未启用时为None"""
+        config = self._document_cache_config
+        if self._document_cache is None and config.get("enabled", True):
+            with self._document_cache_lock:
+                if self._document_cache is None:
+                    hash_config = self.config.get("hash_cache", {})
+                    hash_cache = None
+                    if hash_config.get("enabled", True):
+                        hash_cache = HashCache(hash_config.get("db_path", "./data/cache/hash_cache.db"))
+                    self._document_cache = DocumentCache(
+                        cache_dir=config.get("cache_dir", "./data/cache/documents"),
+                        max_size_mb=config.get("max_size_mb", 512),
+                        hash_cache=hash_cache
+                    )
+        return self._document_cache
+    
+    @property
+    def summarizer(self) -> Optional[MapReduceSummarizer]:
+        """分层摘要生成器，未注入模型管理器时为None"""
+        if self._summarizer is None and self.model_manager is not None and self.prompt_engine is not None:
+            with self._summarizer_lock:
+                if self._summarizer is None:
+                    config = self.config.get("summarization", {})
+                    cache = None
+                    if config.get("cache_enabled", True):
+                        cache = SummaryCache(config.get("cache_db_path", "./data/cache/summaries.db"))
+                    self._summarizer = MapReduceSummarizer(
+                        self.model_manager,
+                        self.prompt_engine,
+                        cache=cache,
+                        chunk_tokens=config.get("chunk_tokens", 1500),
+                        map_length=config.get("map_length", 300),
+                        max_concurrency=config.get("max_concurrency", 4)
+                    )
+        return self._summarizer
+    
+    def open_document(self, file_path: str, file_type: Optional[str] = None) -> Document:
+        """打开惰性文档对象
+        
+        元数据立即可用，正文通过 iter_pages/page/text 按需解析，用完后调用 close。
+        PDF/DOCX/PPTX 命中解析结果缓存时直接读取缓存，未命中时在第一次完整读取后写入缓存
+        
+        Args:
+            file_path: 文件路径
+            file_type: 文件类型 (pdf, docx, txt等)，默认取扩展名
+            
+        Returns:
+            Document 文档对象
+        """
+        file_type = document_type(file_path, file_type)
+        loader = loader_for(file_type)
+        if loader is None or not loader.cacheable:
+            return open_document(file_path, file_type)
+        if not Path(file_path).is_file():
+            raise FileNotFoundError(f"文件不存在: {file_path}")
+        cache = self.document_cache
+        if cache is None:
+            return open_document(file_path, file_type)
+        return cache.open(file_path, file_type, loader)
+    
+    def iter_document(self, file_path: str, file_type: Optional[str] = None) -> Iterator[str]:
+        """逐页(PDF)、逐段(DOCX)或逐块(纯文本)产出文档文本
+        
+        Args:
+            file_path: 文件路径
+            file_type: 文件类型，默认取扩展名
+        """
+        with self.open_document(file_path, file_type) as doc:
+            yield from doc.iter_pages()
+    
+    def load_document(
+        self,
+        file_path: str,
+        file_type: Optional[str] = None,
+        max_chars: Optional[int] = None
+    ) -> Dict[str, Any]:
         """加载文档内容
         
         Args:
             file_path: 文件路径
             file_type: 文件类型 (pdf, docx, txt等)
+            max_chars: 最多读取的字符数，达到后不再解析后续页面
             
         Returns:
             文档内容对象 {"content": "...", "metadata": {...}}
         """
         logger.info(f"加载文档: {file_path}")
         
-        path = Path(file_path)
-        if not path.exists():
-            raise FileNotFoundError(f"文件不存在: {file_path}")
+        with self.open_document(file_path, file_type) as doc:
+            content = doc.text(max_chars)
+            metadata = dict(doc.metadata)
         
-        # TODO: 根据文件类型使用不同的加载器
-        # 目前返回模拟数据
-        return {
-            "content": f"文档内容示例: {path.name}",
-            "metadata": {
-                "file_name": path.name,
-                "file_size": path.stat().st_size if path.exists() else 0,
-                "file_type": file_type or path.suffix
-            }
-        }
+        metadata["char_count"] = len(content)
+        return {"content": content, "metadata": metadata}
     
     def convert_format(self, source_path: str, target_format: str) -> str:
         """文档格式转换
@@ -63,19 +164,27 @@ class FileTools:
         logger.info(f"格式转换完成: {target_path}")
         return str(target_path)
     
-    def extract_summary(self, content: str, max_length: int = 200) -> str:
+    def extract_summary(self, content: str, max_length: int = 200, mode: Optional[str] = None) -> str:
         """提取文档摘要
         
         Args:
             content: 文档内容
             max_length: 摘要最大长度
+            mode: map_reduce - 分块并发摘要后合并(需要模型)；truncate - 截取开头；
+                默认有模型时使用 map_reduce
             
         Returns:
             摘要文本
         """
         logger.info("提取文档摘要")
         
-        # TODO: 使用LLM生成摘要
+        if mode is None:
+            mode = "map_reduce" if self.summarizer is not None else "truncate"
+        if mode == "map_reduce":
+            if self.summarizer is None:
+                raise RuntimeError("分层摘要需要模型管理器和提示词引擎")
+            return self.summarizer.summarize(content, length=max_length)["summary"]
+        
         # 简单截取前N个字符作为摘要
         summary = content[:max_length]
         if len(content) > max_length:
@@ -83,6 +192,32 @@ class FileTools:
         
         return summary
     
+    def summarize_document(
+        self,
+        file_path: str,
+        length: int = 200,
+        file_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """对长文档做分层摘要，逐页读取，不把全文放入内存
+        
+        Args:
+            file_path: 文件路径
+            length: 摘要长度(字)
+            file_type: 文件类型，默认取扩展名
+            
+        Returns:
+            {"summary": 摘要, "chunks": 分块数, "cached": 命中缓存的摘要数,
+             "model_calls": 模型调用次数, "levels": 层数, "metadata": 文档元数据}
+        """
+        if self.summarizer is None:
+            raise RuntimeError("分层摘要需要模型管理器和提示词引擎")
+        logger.info(f"分层摘要: {file_path}")
+        
+        with self.open_document(file_path, file_type) as doc:
+            result = self.summarizer.summarize(doc.iter_pages(), length=length)
+            result["metadata"] = dict(doc.metadata)
+        return result
+    
     def extract_entities(self, content: str, entity_types: List[str]) -> Dict[str, List[str]]:
         """提取关键实体
         
@@ -99,49 +234,170 @@ class FileTools:
         # 返回模拟数据
         return {entity_type: [] for entity_type in entity_types}
     
-    def fill_template(self, template_path: str, data: Dict[str, Any]) -> str:
+    def fill_template(
+        self,
+        template_path: str,
+        data: Dict[str, Any],
+        output_path: Optional[str] = None
+    ) -> str:
         """填充文档模板
         
         Args:
-            template_path: 模板文件路径
+            template_path: 模板文件路径(.docx/.txt/.md/.html 等，占位符为 $name 或 ${name})
             data: 填充数据
+            output_path: 输出路径，默认为模板所在目录下的 output 文件
             
         Returns:
             生成的文档路径
+            
+        Raises:
+            MergeError: 数据缺少模板引用的字段
         """
         logger.info(f"填充模板: {template_path}")
         
-        # TODO: 实现模板填充
-        output_path = str(Path(template_path).with_name("output.docx"))
+        template = load_template(template_path)
+        if output_path is None:
+            output_path = str(Path(template_path).with_name(f"output{template.suffix}"))
+        tmp_path = f"{output_path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                template.write(data, f)
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
         
         logger.info(f"模板填充完成: {output_path}")
         return output_path
     
-    def compare_documents(self, doc1_path: str, doc2_path: str) -> Dict[str, Any]:
-        """文档对比
+    def mail_merge(
+        self,
+        template_path: str,
+        records: Union[str, Iterable[Dict[str, Any]]],
+        output_dir: str,
+        filename_template: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        overwrite: bool = False,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """批量填充模板(邮件合并)，每条记录生成一个文档
         
         Args:
-            doc1_path: 文档1路径
-            doc2_path: 文档2路径
+            template_path: 模板路径
+            records: CSV/JSONL 数据源路径，或记录字典的可迭代对象
+            output_dir: 输出目录
+            filename_template: 输出文件名模板(如 "${id}_${name}")
+            max_workers: 工作进程数，0 表示在当前进程中渲染
+            overwrite: 输出文件已存在时是否覆盖
+            progress_callback: 进度回调
             
         Returns:
-            差异报告
+            {"total", "succeeded", "failed", "errors", "error_report", "records_per_second", ...}
+        """
+        config = self.config.get("mail_merge", {})
+        merge = MailMerge(
+            template_path,
+            output_dir,
+            filename_template=filename_template,
+            max_workers=max_workers if max_workers is not None else config.get("max_workers"),
+            batch_size=config.get("batch_size", 50),
+            overwrite=overwrite
+        )
+        return merge.run(records, progress_callback=progress_callback)
+    
+    def iter_paragraphs(self, file_path: str, file_type: Optional[str] = None) -> Iterator[str]:
+        """逐段产出文档文本(空白已规范化)
+        
+        Args:
+            file_path: 文件路径
+            file_type: 文件类型，默认取扩展名
+        """
+        with self.open_document(file_path, file_type) as doc:
+            yield from split_paragraphs(doc.iter_pages(), continuous=doc.unit == "block")
+    
+    def iter_document_diff(self, doc1_path: str, doc2_path: str) -> Iterator[Dict[str, Any]]:
+        """流式产出两个文档的段落差异，内存占用只与段落数量有关
+        
+        Args:
+            doc1_path: 旧文档路径
+            doc2_path: 新文档路径
+            
+        Yields:
+            {"type": insert/delete/replace, "old_range", "new_range", "old": [段落], "new": [段落]}
+        """
+        old_hashes, _ = fingerprint(self.iter_paragraphs(doc1_path))
+        new_hashes, _ = fingerprint(self.iter_paragraphs(doc2_path))
+        max_cost = self.config.get("diff", {}).get("max_cost", 500)
+        yield from iter_changes(
+            iter_opcodes(old_hashes, new_hashes, max_cost),
+            self.iter_paragraphs(doc1_path),
+            self.iter_paragraphs(doc2_path)
+        )
+    
+    def compare_documents(
+        self,
+        doc1_path: str,
+        doc2_path: str,
+        max_changes: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """文档对比(段落级)
+        
+        Args:
+            doc1_path: 文档1路径(旧版本)
+            doc2_path: 文档2路径(新版本)
+            max_changes: 最多返回的差异数，None 表示全部
+            
+        Returns:
+            差异报告 {"differences": [...], "similarity": 相似度, "stats": {...}, "truncated": bool}
         """
         logger.info(f"对比文档: {doc1_path} vs {doc2_path}")
         
-        # TODO: 实现文档对比
-        return {
-            "differences": [],
-            "similarity": 0.85
+        old_hashes, old_lengths = fingerprint(self.iter_paragraphs(doc1_path))
+        new_hashes, new_lengths = fingerprint(self.iter_paragraphs(doc2_path))
+        max_cost = self.config.get("diff", {}).get("max_cost", 500)
+        opcodes = list(iter_opcodes(old_hashes, new_hashes, max_cost))
+        
+        stats = {"old_paragraphs": len(old_hashes), "new_paragraphs": len(new_hashes),
+                 "inserted": 0, "deleted": 0, "replaced": 0}
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == "insert":
+                stats["inserted"] += j2 - j1
+            elif tag == "delete":
+                stats["deleted"] += i2 - i1
+            elif tag == "replace":
+                stats["replaced"] += max(i2 - i1, j2 - j1)
+        
+        differences = []
+        truncated = False
+        changes = iter_changes(opcodes, self.iter_paragraphs(doc1_path), self.iter_paragraphs(doc2_path))
+        for change in changes:
+            if max_changes is not None and len(differences) >= max_changes:
+                truncated = True
+                break
+            differences.append(change)
+        changes.close()
+        
+        result = {
+            "differences": differences,
+            "similarity": round(similarity(opcodes, old_lengths, new_lengths), 4),
+            "stats": stats,
+            "truncated": truncated
         }
+        logger.info(f"文档对比完成: {len(differences)} 处差异, 相似度 {result['similarity']}")
+        return result
     
     def get_tool_descriptions(self) -> List[Dict[str, Any]]:
         """获取工具描述列表"""
         return [
             {
                 "name": "load_document",
-                "description": "加载文档内容",
-                "parameters": {"file_path": "文件路径", "file_type": "文件类型(可选)"}
+                "description": "加载文档内容(PDF/DOCX/PPTX/纯文本)",
+                "parameters": {"file_path": "文件路径", "file_type": "文件类型(可选)", "max_chars": "最多读取字符数(可选)"}
+            },
+            {
+                "name": "summarize_document",
+                "description": "长文档分层摘要(分块并发摘要后合并)",
+                "parameters": {"file_path": "文件路径", "length": "摘要长度"}
             },
             {
                 "name": "convert_format",
@@ -163,9 +419,15 @@ class FileTools:
                 "description": "填充文档模板",
                 "parameters": {"template_path": "模板路径", "data": "填充数据"}
             },
+            {
+                "name": "mail_merge",
+                "description": "批量填充模板，每条记录生成一个文档(邮件合并)",
+                "parameters": {"template_path": "模板路径", "records": "CSV/JSONL 数据源路径",
+                               "output_dir": "输出目录", "filename_template": "输出文件名模板(可选)"}
+            },
             {
                 "name": "compare_documents",
-                "description": "对比两个文档的差异",
-                "parameters": {"doc1_path": "文档1路径", "doc2_path": "文档2路径"}
+                "description": "段落级对比两个文档的差异",
+                "parameters": {"doc1_path": "文档1路径", "doc2_path": "文档2路径", "max_changes": "最多返回的差异数(可选)"}
             }
         ]
@@ -5,13 +5,28 @@
 
 import logging
 import os
-import shutil
-import hashlib
-import json
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from typing import List, Dict, Any, Optional, Iterator, Iterable, Callable
 from pathlib import Path
-from datetime import datetime
-from collections import defaultdict
+from collections import defaultdict, Counter
+
+from .fs_scanner import DirectoryScanner, FileEntry
+from .scan_filters import PathFilter, ScanLimits
+from .file_index import FileIndex
+from .file_hashing import try_hash_file
+from .duplicate_finder import DuplicateFinder
+from .near_duplicates import NearDuplicateFinder
+from .hash_cache import HashCache
+from .content_index import ContentIndex
+from .ingestion_queue import IngestionQueue
+from .watch_service import WatchService, ChangeSet
+from .text_extraction import can_extract
+from .file_journal import FileJournal
+from .move_plans import MovePlanStore, DEFAULT_MAX_PLANS, DEFAULT_MAX_AGE_DAYS
+from .rules_engine import RulesEngine
+from .storage_analysis import iter_storage_analysis, StorageEstimator, BackgroundAnalysis
+from .archive_tools import create_archive, extract_archive, list_archive, DEFAULT_CHUNK_SIZE
 
 logger = logging.getLogger(__name__)
 
@@ -19,37 +34,367 @@ logger = logging.getLogger(__name__)
 class FileSystemTools:
     """文件系统管理工具集"""
     
-    def __init__(self, config: Optional[Dict[str, Any]] = None):
+    def __init__(self, config: Optional[Dict[str, Any]] = None, document_opener: Optional[Callable] = None):
         """初始化文件系统工具
         
         Args:
             config: 配置信息
+            document_opener: 打开文档的函数 (路径, 文件类型) -> Document，内容索引和近似重复检测
+                用它提取文本；传入 FileTools.open_document 时复用解析结果缓存，默认直接解析
         """
         self.config = config or {}
+        self.document_opener = document_opener
         self.backup_dir = self.config.get("backup_directory", "./data/backups")
-        self.classification_rules = self._load_classification_rules()
+        self.rules_engine = RulesEngine.from_file(
+            self.config.get("file_classification_rules", "config/file_rules.json")
+        )
+        self.scanner = DirectoryScanner(max_workers=self.config.get("scan_workers"))
+        
+        # 默认扫描过滤规则(gitignore 风格)，各入口的 include/exclude 追加在其后
+        filter_config = self.config.get("scan_filters", {})
+        self.path_filter = PathFilter(filter_config.get("include"), filter_config.get("exclude"))
+        self.hash_algorithm = self.config.get("hash_algorithm", "md5")
+        self.hash_workers = self.config.get("hash_workers")
+        self.move_workers = self.config.get("move_workers")
+        
+        # 持久化文件元数据索引(可选)
+        index_config = self.config.get("metadata_index", {})
+        self.file_index: Optional[FileIndex] = None
+        if index_config.get("enabled", False):
+            self.file_index = FileIndex(
+                db_path=index_config.get("db_path", "./data/cache/file_index.db"),
+                refresh_interval=index_config.get("refresh_interval", 60),
+                path_filter=self.path_filter
+            )
+        
+        # 持久化内容哈希缓存(首次使用时打开)
+        self._hash_cache_config = self.config.get("hash_cache", {})
+        self._hash_cache: Optional[HashCache] = None
+        self._hash_cache_lock = threading.Lock()
+        
+        # 文件内容全文索引(首次内容搜索时打开)
+        self._content_index_config = self.config.get("content_index", {})
+        self._content_index: Optional[ContentIndex] = None
+        self._content_index_lock = threading.Lock()
+        
+        # 后台精确空间分析任务(近似模式下启动)
+        self._storage_jobs: Dict[str, BackgroundAnalysis] = {}
+        self._storage_job_seq = 0
         
         # 确保备份目录存在
         Path(self.backup_dir).mkdir(parents=True, exist_ok=True)
         
+        # 批量操作日志(撤销用)，覆盖前的备份以硬链接形式存放在备份目录
+        self.journal = FileJournal(
+            journal_dir=self.config.get("journal_directory", str(Path(self.backup_dir) / "journals")),
+            backup_dir=self.backup_dir
+        )
+        
+        # 整理预览生成的 JSONL 移动计划，可通过 execute_plan 直接执行
+        plan_retention = self.config.get("plan_retention", {})
+        self.plans = MovePlanStore(
+            self.config.get("plan_directory", str(Path(self.backup_dir).parent / "plans")),
+            max_plans=plan_retention.get("max_plans", DEFAULT_MAX_PLANS),
+            max_age_days=plan_retention.get("max_age_days", DEFAULT_MAX_AGE_DAYS)
+        )
+        
+        # 文件监听(start_watch 启动)，变化的文档放入知识库入库队列
+        self._watch_config = self.config.get("watch", {})
+        self.watch_service: Optional[WatchService] = None
+        self._ingest_roots: tuple = ()
+        self.ingest_queue = IngestionQueue(self._watch_config.get("ingest_queue_size", 100000))
+        
         logger.info("文件系统工具初始化完成")
     
-    def _load_classification_rules(self) -> Dict[str, Any]:
-        """加载文件分类规则"""
-        rules_file = self.config.get("file_classification_rules", "config/file_rules.json")
-        try:
-            with open(rules_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get("file_classification_rules", {})
-        except Exception as e:
-            logger.warning(f"加载分类规则失败: {e}, 使用默认规则")
-            return {}
+    def iter_directory(
+        self,
+        directory: str,
+        max_depth: int = -1,
+        file_types: Optional[List[str]] = None,
+        use_index: Optional[bool] = None,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        limits: Optional[ScanLimits] = None
+    ) -> Iterator[FileEntry]:
+        """流式扫描目录
+        
+        逐个产出紧凑的 FileEntry 记录，不在内存中物化完整文件列表
+        
+        Args:
+            directory: 目录路径
+            max_depth: 递归深度，-1表示无限制
+            file_types: 文件类型过滤 ['.txt', '.pdf']
+            use_index: 是否从元数据索引读取，None表示索引启用时自动使用
+            include: 追加的包含模式(gitignore 风格)
+            exclude: 追加的排除模式，命中的目录不会被打开
+            limits: 文件数/耗时截断条件，截断后 limits.truncated 为 True
+            
+        Yields:
+            FileEntry 文件记录 (path/name/size/extension/ctime/mtime)
+        """
+        if not Path(directory).exists():
+            raise FileNotFoundError(f"目录不存在: {directory}")
+        
+        path_filter = self.path_filter.merged(include, exclude)
+        # 索引按配置的过滤规则建立，追加的取反规则可能需要索引中没有的子树，此时直接扫描；
+        # 有截断条件时不触发刷新(刷新不受截断条件限制)，索引未就绪则直接扫描
+        if path_filter is not self.path_filter and path_filter.has_negations:
+            use_index = False
+        if self._index_for(directory, use_index, refresh=not limits):
+            entries = self.file_index.iter_entries(directory, max_depth=max_depth, file_types=file_types)
+            if path_filter:
+                entries = path_filter.filter_entries(entries, directory)
+        else:
+            entries = self.scanner.iter_entries(
+                directory, max_depth=max_depth, file_types=file_types, path_filter=path_filter or None
+            )
+        
+        return limits.apply(entries) if limits else entries
+    
+    @staticmethod
+    def _scan_limits(max_files: Optional[int], time_budget: Optional[float]) -> Optional[ScanLimits]:
+        """按入口参数创建截断条件，都未指定时返回 None"""
+        if max_files is None and time_budget is None:
+            return None
+        return ScanLimits(max_files=max_files, time_budget=time_budget)
+    
+    @staticmethod
+    def _truncated(limits: Optional[ScanLimits], directory: str) -> bool:
+        """扫描是否被截断，截断时记录警告"""
+        if limits is None or not limits.truncated:
+            return False
+        logger.warning(f"扫描已截断: {directory} (已处理 {limits.count} 个文件)")
+        return True
+    
+    def refresh_index(self, directory: str, full: bool = False) -> Dict[str, Any]:
+        """增量刷新文件元数据索引
+        
+        Args:
+            directory: 目录路径
+            full: 是否忽略目录修改时间全量重扫
+            
+        Returns:
+            刷新统计
+        """
+        if self.file_index is None:
+            raise RuntimeError("文件元数据索引未启用 (metadata_index.enabled)")
+        return self.file_index.refresh(directory, full=full)
+    
+    @property
+    def hash_cache(self) -> Optional[HashCache]:
+        """内容哈希缓存，未启用时为None"""
+        if self._hash_cache is None and self._hash_cache_config.get("enabled", True):
+            with self._hash_cache_lock:
+                if self._hash_cache is None:
+                    self._hash_cache = HashCache(
+                        self._hash_cache_config.get("db_path", "./data/cache/hash_cache.db")
+                    )
+        return self._hash_cache
+    
+    @property
+    def content_index(self) -> Optional[ContentIndex]:
+        """文件内容全文索引，未启用时为None"""
+        if self._content_index is None and self._content_index_config.get("enabled", True):
+            with self._content_index_lock:
+                if self._content_index is None:
+                    self._content_index = ContentIndex(
+                        db_path=self._content_index_config.get("db_path", "./data/cache/content_index.db"),
+                        max_chars=self._content_index_config.get("max_chars", 1000000),
+                        refresh_interval=self._content_index_config.get("refresh_interval", 60),
+                        max_workers=self._content_index_config.get("workers"),
+                        opener=self.document_opener
+                    )
+        return self._content_index
+    
+    def refresh_content_index(self, directory: str) -> Dict[str, int]:
+        """增量刷新目录的内容索引(只重新提取大小或修改时间变化的文件)"""
+        if self.content_index is None:
+            raise RuntimeError("内容索引未启用")
+        return self.content_index.update(directory, self.iter_directory(directory))
+    
+    def _index_for(self, directory: str, use_index: Optional[bool] = None, refresh: bool = True) -> bool:
+        """判断是否使用索引，需要时先增量刷新
+        
+        Args:
+            directory: 目录路径
+            use_index: 是否使用索引，None表示索引启用时自动使用
+            refresh: 索引未建立或已过刷新间隔时是否先刷新；为 False 时只使用已就绪的索引
+        """
+        if self.file_index is None or use_index is False:
+            return False
+        # 监听中的目录由文件事件持续更新，已建立索引时无需再刷新
+        if self.file_index.covers(directory) and (
+            self._is_watched(directory) or not self.file_index.needs_refresh(directory)
+        ):
+            return True
+        if not refresh:
+            return False
+        self.file_index.refresh(directory)
+        return True
+    
+    # ========== 文件监听 ==========
+    
+    def start_watch(
+        self,
+        roots: Optional[List[str]] = None,
+        ingest_roots: Optional[List[str]] = None,
+        backend: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """启动文件监听，持续增量更新元数据索引、内容索引、哈希缓存和知识库入库队列
+        
+        Args:
+            roots: 监听的目录，默认取配置 watch.roots
+            ingest_roots: 其中需要同步到知识库的目录，默认取配置 watch.ingest_roots
+            backend: auto/inotify/polling，默认取配置 watch.backend
+            
+        Returns:
+            监听状态
+        """
+        config = self._watch_config
+        roots = roots or config.get("roots", [])
+        if not roots:
+            raise ValueError("未指定监听目录")
+        self.stop_watch()
+        
+        if ingest_roots is None:
+            ingest_roots = config.get("ingest_roots", [])
+        self._ingest_roots = tuple(os.path.abspath(r) for r in ingest_roots)
+        
+        # 先建立索引，之后只处理变化
+        if self.file_index is not None:
+            for root in roots:
+                self.file_index.refresh(root)
+        
+        self.watch_service = WatchService(
+            roots,
+            self._apply_changes,
+            backend=backend or config.get("backend", "auto"),
+            settle=config.get("settle_seconds", 2.0),
+            max_delay=config.get("max_delay_seconds", 30.0),
+            poll_interval=config.get("poll_interval", 5.0),
+            exclude=self._watch_excludes()
+        )
+        self.watch_service.start()
+        return self.watch_service.get_stats()
+    
+    def stop_watch(self) -> Optional[Dict[str, Any]]:
+        """停止文件监听，返回最终统计(未启动时为None)"""
+        if self.watch_service is None:
+            return None
+        self.watch_service.stop()
+        stats = self.watch_service.get_stats()
+        self.watch_service = None
+        return stats
+    
+    def watch_status(self) -> Dict[str, Any]:
+        """获取文件监听状态和入库队列长度"""
+        stats = self.watch_service.get_stats() if self.watch_service is not None else {"running": False}
+        return {**stats, "ingest_queue": len(self.ingest_queue)}
+    
+    def _is_watched(self, directory: str) -> bool:
+        if self.watch_service is None or not self.watch_service.is_running:
+            return False
+        directory = os.path.abspath(directory)
+        return any(directory == r or directory.startswith(r + os.sep) for r in self.watch_service.roots)
+    
+    def _watch_excludes(self) -> List[str]:
+        """不监听工具自身的备份和缓存目录，避免写入时触发新的事件"""
+        excludes = [
+            self.backup_dir,
+            str(Path(self._hash_cache_config.get("db_path", "./data/cache/hash_cache.db")).parent),
+            str(Path(self._content_index_config.get("db_path", "./data/cache/content_index.db")).parent)
+        ]
+        if self.file_index is not None:
+            excludes.append(str(Path(self.file_index.db_path).parent))
+        return excludes
+    
+    def _apply_changes(self, changes: ChangeSet) -> Dict[str, int]:
+        """把一批合并后的文件变化同步到各个索引(在监听线程中执行)"""
+        stats = {"changed": 0, "deleted": 0, "hashed": 0, "queued": 0}
+        files = dict(changes.files)
+        
+        # 新建或整体移入的目录: 其中的文件不一定各自产生事件
+        for directory in changes.created_dirs:
+            if os.path.isdir(directory):
+                for entry in self.scanner.iter_entries(directory):
+                    files.setdefault(entry.path, "changed")
+        
+        if self.file_index is not None:
+            # 删除的目录要在刷新索引前取出其中的文件
+            for directory in changes.deleted_dirs:
+                for entry in self.file_index.iter_entries(directory):
+                    files[entry.path] = "deleted"
+            if changes.overflow:
+                logger.warning("文件事件队列溢出，完整刷新监听目录的索引")
+                for root in self.watch_service.roots:
+                    self.file_index.refresh(root, full=True)
+            else:
+                self.file_index.refresh_directories(
+                    changes.directories | changes.created_dirs | changes.deleted_dirs
+                )
+        
+        content_index = self.content_index
+        if content_index is not None:
+            if changes.overflow:
+                content_index.invalidate()
+            for directory in changes.deleted_dirs:
+                content_index.remove_tree(directory)
+        
+        if changes.overflow and self._ingest_roots:
+            # 溢出时丢失的事件无法还原，入库目录中可提取的文件全部重新入队(知识库按内容哈希跳过未变化的文件)
+            for root in self._ingest_roots:
+                if self.file_index is not None:
+                    entries = self.file_index.iter_entries(root)
+                else:
+                    entries = self.scanner.iter_entries(root) if os.path.isdir(root) else ()
+                for entry in entries:
+                    if entry.path not in files and can_extract(entry.path):
+                        self.ingest_queue.put(entry.path, "upsert")
+                        stats["queued"] += 1
+
+        warm_hashes = self._watch_config.get("warm_hash_cache", True) and self.hash_cache is not None
+        for path, kind in files.items():
+            exists = kind == "changed" and os.path.isfile(path)
+            stats["changed" if exists else "deleted"] += 1
+            if content_index is not None and can_extract(path) and content_index.covers(path):
+                if exists:
+                    content_index.update_file(path)
+                else:
+                    content_index.remove([os.path.abspath(path)])
+            if exists and warm_hashes:
+                try:
+                    self.hash_cache.hash_file(path, self.hash_algorithm)
+                    stats["hashed"] += 1
+                except OSError as e:
+                    logger.debug(f"预计算哈希失败 {path}: {e}")
+            if self._ingest_roots and can_extract(path) and any(
+                path == r or path.startswith(r + os.sep) for r in self._ingest_roots
+            ):
+                self.ingest_queue.put(path, "upsert" if exists else "delete")
+                stats["queued"] += 1
+        
+        logger.info(
+            f"同步文件变化: {changes.events} 个事件, 变化 {stats['changed']} 个, 删除 {stats['deleted']} 个, "
+            f"入库队列 +{stats['queued']}"
+        )
+        return stats
+    
+    def _after_modify(self, directory: Optional[str] = None):
+        """工具自身修改文件后，使索引刷新间隔失效"""
+        if self.file_index is not None:
+            self.file_index.invalidate(directory)
+        if self._content_index is not None:
+            self._content_index.invalidate(directory)
     
     def scan_directory(
         self,
         directory: str,
         max_depth: int = -1,
-        file_types: Optional[List[str]] = None
+        file_types: Optional[List[str]] = None,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        max_files: Optional[int] = None,
+        time_budget: Optional[float] = None
     ) -> Dict[str, Any]:
         """扫描目录结构
         
@@ -57,59 +402,35 @@ class FileSystemTools:
             directory: 目录路径
             max_depth: 递归深度，-1表示无限制
             file_types: 文件类型过滤 ['.txt', '.pdf']
+            include: 包含模式(gitignore 风格)
+            exclude: 排除模式
+            max_files: 最多扫描的文件数
+            time_budget: 扫描耗时上限(秒)
             
         Returns:
-            文件树结构 {"files": [...], "total_files": N, "total_size": bytes}
+            文件树结构 {"files": [...], "total_files": N, "total_size": bytes, "truncated": 是否截断}
         """
         logger.info(f"扫描目录: {directory}")
         
-        dir_path = Path(directory)
-        if not dir_path.exists():
-            raise FileNotFoundError(f"目录不存在: {directory}")
-        
+        limits = self._scan_limits(max_files, time_budget)
         files = []
         total_size = 0
         file_type_stats = defaultdict(int)
-        
-        def scan_recursive(path: Path, depth: int):
-            nonlocal total_size
-            
-            if max_depth != -1 and depth > max_depth:
-                return
-            
-            try:
-                for item in path.iterdir():
-                    if item.is_file():
-                        # 文件类型过滤
-                        if file_types and item.suffix not in file_types:
-                            continue
-                        
-                        file_info = {
-                            "path": str(item),
-                            "name": item.name,
-                            "size": item.stat().st_size,
-                            "extension": item.suffix,
-                            "created_at": datetime.fromtimestamp(item.stat().st_ctime).isoformat(),
-                            "modified_at": datetime.fromtimestamp(item.stat().st_mtime).isoformat()
-                        }
-                        
-                        files.append(file_info)
-                        total_size += file_info["size"]
-                        file_type_stats[item.suffix] += 1
-                        
-                    elif item.is_dir() and not item.name.startswith('.'):
-                        scan_recursive(item, depth + 1)
-            except PermissionError:
-                logger.warning(f"无权限访问: {path}")
-        
-        scan_recursive(dir_path, 0)
+        for entry in self.iter_directory(
+            directory, max_depth=max_depth, file_types=file_types,
+            include=include, exclude=exclude, limits=limits
+        ):
+            total_size += entry.size
+            file_type_stats[entry.extension] += 1
+            files.append(entry.to_dict())
         
         result = {
             "directory": directory,
             "files": files,
             "total_files": len(files),
             "total_size": total_size,
-            "file_type_stats": dict(file_type_stats)
+            "file_type_stats": dict(file_type_stats),
+            "truncated": self._truncated(limits, directory)
         }
         
         logger.info(f"扫描完成: 找到 {len(files)} 个文件, 总大小 {total_size / 1024 / 1024:.2f} MB")
@@ -128,16 +449,13 @@ class FileSystemTools:
         
         classified = defaultdict(list)
         
+        classify = self.rules_engine.classify
         for file_info in file_list:
-            extension = file_info.get("extension", "").lower()
-            category = "Others"
-            
-            # 根据规则分类
-            for cat_name, cat_info in self.classification_rules.items():
-                if extension in cat_info.get("extensions", []):
-                    category = cat_name
-                    break
-            
+            category = classify(
+                file_info.get("name", ""),
+                file_info.get("extension", ""),
+                file_info.get("size", 0)
+            )
             classified[category].append(file_info)
         
         result = dict(classified)
@@ -147,94 +465,212 @@ class FileSystemTools:
     def detect_duplicates(
         self,
         directory: str,
-        method: str = "hash"
+        method: str = "hash",
+        algorithm: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        threshold: Optional[float] = None,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        max_files: Optional[int] = None,
+        time_budget: Optional[float] = None
     ) -> List[List[Dict[str, Any]]]:
         """检测重复文件
         
+        hash/combined 方法使用分阶段流水线: 先按大小分组，再计算首尾64KB的部分哈希，
+        最后只对仍然相同的候选文件并行计算整文件哈希。
+        near 方法提取文档文本，通过 MinHash 签名和 LSH 分桶查找内容相近的文档
+        
         Args:
             directory: 目录路径
-            method: 检测方法 (hash/name/size/combined)
+            method: 检测方法 (hash/name/size/combined/near)
+            algorithm: 哈希算法 (md5/sha1/sha256/blake2b/xxh64/xxh3/fast)，默认使用配置
+            max_workers: 哈希/文本提取线程数
+            threshold: near 方法的相似度阈值(0~1)，默认使用配置
+            include: 包含模式(gitignore 风格)
+            exclude: 排除模式
+            max_files: 最多扫描的文件数(截断时只在已扫描的文件中查找)
+            time_budget: 扫描耗时上限(秒)
             
         Returns:
             重复文件组列表 [[file1, file2], [file3, file4, file5], ...]
         """
         logger.info(f"检测重复文件: {directory} (方法: {method})")
         
-        scan_result = self.scan_directory(directory)
-        files = scan_result["files"]
-        
-        duplicates = []
+        limits = self._scan_limits(max_files, time_budget)
+        entries = self.iter_directory(directory, include=include, exclude=exclude, limits=limits)
         
+        # 分组时只保留紧凑的 FileEntry，仅对重复组渲染为字典
         if method == "name":
-            # 按文件名检测
-            name_groups = defaultdict(list)
-            for file_info in files:
-                name_groups[file_info["name"]].append(file_info)
-            duplicates = [group for group in name_groups.values() if len(group) > 1]
-            
+            groups = self._group_entries(entries, lambda e: e.name)
         elif method == "size":
-            # 按文件大小检测
-            size_groups = defaultdict(list)
-            for file_info in files:
-                size_groups[file_info["size"]].append(file_info)
-            duplicates = [group for group in size_groups.values() if len(group) > 1]
-            
-        elif method == "hash":
-            # 按MD5哈希检测
-            hash_groups = defaultdict(list)
-            for file_info in files:
-                file_hash = self._calculate_file_hash(file_info["path"])
-                if file_hash:
-                    hash_groups[file_hash].append(file_info)
-            duplicates = [group for group in hash_groups.values() if len(group) > 1]
-            
-        elif method == "combined":
-            # 组合策略: 先按大小，再按哈希
-            size_groups = defaultdict(list)
-            for file_info in files:
-                size_groups[file_info["size"]].append(file_info)
-            
-            for size, group in size_groups.items():
-                if len(group) > 1:
-                    hash_groups = defaultdict(list)
-                    for file_info in group:
-                        file_hash = self._calculate_file_hash(file_info["path"])
-                        if file_hash:
-                            hash_groups[file_hash].append(file_info)
-                    duplicates.extend([g for g in hash_groups.values() if len(g) > 1])
+            groups = self._group_entries(entries, lambda e: e.size)
+        elif method in ("hash", "combined"):
+            algorithm = algorithm or self.hash_algorithm
+            finder = DuplicateFinder(
+                algorithm=algorithm,
+                max_workers=max_workers or self.hash_workers,
+                hash_cache=self.hash_cache
+            )
+            # 与索引使用相同算法时复用索引中的哈希
+            full_hash = self._entry_hash if algorithm == self.hash_algorithm else None
+            groups = finder.find(entries, full_hash=full_hash)
+        elif method == "near":
+            near_config = self.config.get("near_duplicates", {})
+            finder = NearDuplicateFinder(
+                threshold=threshold or near_config.get("threshold", 0.8),
+                num_perm=near_config.get("num_perm", 128),
+                shingle_size=near_config.get("shingle_size", 5),
+                max_workers=max_workers or self.hash_workers,
+                hash_cache=self.hash_cache,
+                opener=self.document_opener
+            )
+            groups = finder.find(entries)
+        else:
+            groups = []
+        self._truncated(limits, directory)
+        
+        duplicates = [[entry.to_dict() for entry in group] for group in groups]
         
         logger.info(f"检测到 {len(duplicates)} 组重复文件")
         return duplicates
     
-    def _calculate_file_hash(self, file_path: str) -> Optional[str]:
-        """计算文件MD5哈希值"""
+    @staticmethod
+    def _group_entries(entries: Iterable[FileEntry], key_func) -> List[List[FileEntry]]:
+        """按键分组并返回成员数大于1的组(键为None的记录被忽略)"""
+        groups = defaultdict(list)
+        for entry in entries:
+            key = key_func(entry)
+            if key is not None:
+                groups[key].append(entry)
+        return [group for group in groups.values() if len(group) > 1]
+    
+    def _entry_hash(self, entry: FileEntry) -> Optional[str]:
+        """计算文件哈希，依次复用索引和哈希缓存中未失效的哈希"""
+        if self.file_index is None:
+            return self._calculate_file_hash(entry.path)
+        
+        file_hash = self.file_index.get_hash(entry.path)
+        if file_hash is None:
+            # 先取文件状态再计算，计算期间文件被修改时下次读取会因状态不一致而重算
+            try:
+                st = os.stat(entry.path)
+            except OSError:
+                return None
+            file_hash = self._calculate_file_hash(entry.path)
+            if file_hash:
+                self.file_index.set_hash(entry.path, file_hash, st)
+        return file_hash
+    
+    def _calculate_file_hash(self, file_path: str, algorithm: Optional[str] = None) -> Optional[str]:
+        """计算文件哈希值(默认MD5)，文件未变化时直接读取哈希缓存"""
+        algorithm = algorithm or self.hash_algorithm
+        cache = self.hash_cache
+        if cache is None:
+            return try_hash_file(file_path, algorithm)
         try:
-            md5 = hashlib.md5()
-            with open(file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    md5.update(chunk)
-            return md5.hexdigest()
+            return cache.hash_file(file_path, algorithm)
         except Exception as e:
             logger.error(f"计算哈希失败 {file_path}: {e}")
             return None
     
+    def create_manifest(
+        self,
+        directory: str,
+        algorithm: Optional[str] = None,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """生成目录的完整性清单
+        
+        Args:
+            directory: 目录路径
+            algorithm: 哈希算法，默认使用配置的算法
+            include: 包含模式(gitignore 风格)
+            exclude: 排除模式
+            
+        Returns:
+            {"algorithm": 算法, "files": {相对路径: 哈希值}}
+        """
+        algorithm = algorithm or self.hash_algorithm
+        root = Path(directory)
+        files = {}
+        for entry in self.iter_directory(directory, use_index=False, include=include, exclude=exclude):
+            file_hash = self._calculate_file_hash(entry.path, algorithm)
+            if file_hash:
+                files[Path(entry.path).relative_to(root).as_posix()] = file_hash
+        
+        logger.info(f"生成完整性清单: {directory}, {len(files)} 个文件")
+        manifest = {"algorithm": algorithm, "files": files}
+        if include or exclude:
+            manifest["include"] = list(include or [])
+            manifest["exclude"] = list(exclude or [])
+        return manifest
+    
+    def verify_integrity(self, directory: str, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        """按完整性清单校验目录，未变化的文件直接使用哈希缓存
+        
+        清单生成时使用的 include/exclude 会同样应用到校验扫描
+        
+        Args:
+            directory: 目录路径
+            manifest: create_manifest 生成的清单
+            
+        Returns:
+            校验结果 (verified/mismatched/missing/unexpected)
+        """
+        algorithm = manifest.get("algorithm", self.hash_algorithm)
+        include = manifest.get("include")
+        exclude = manifest.get("exclude")
+        expected = manifest.get("files", {})
+        root = Path(directory)
+        
+        result = {"verified": 0, "mismatched": [], "missing": [], "unexpected": []}
+        seen = set()
+        for entry in self.iter_directory(directory, use_index=False, include=include, exclude=exclude):
+            rel = Path(entry.path).relative_to(root).as_posix()
+            if rel not in expected:
+                result["unexpected"].append(rel)
+                continue
+            seen.add(rel)
+            if self._calculate_file_hash(entry.path, algorithm) == expected[rel]:
+                result["verified"] += 1
+            else:
+                result["mismatched"].append(rel)
+        result["missing"] = sorted(set(expected) - seen)
+        result["ok"] = not (result["mismatched"] or result["missing"])
+        
+        logger.info(
+            f"完整性校验: {result['verified']} 个通过, {len(result['mismatched'])} 个不一致, "
+            f"{len(result['missing'])} 个缺失"
+        )
+        return result
+    
     def batch_rename(
         self,
         file_list: List[Dict[str, Any]],
-        naming_rule: str
+        naming_rule: str,
+        on_conflict: str = "rename",
+        max_workers: Optional[int] = None,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
     ) -> Dict[str, Any]:
         """批量重命名文件
         
+        执行前统一检查名称冲突(包括批次内互相冲突和与已有文件冲突)，
+        互相依赖的重命名(如 file_1 -> file_2, file_2 -> file_3)按顺序执行
+        
         Args:
             file_list: 文件列表
             naming_rule: 命名规则 (如 "file_{index}.{ext}")
+            on_conflict: 冲突处理方式 (rename: 自动加序号/overwrite: 备份后覆盖/skip: 跳过)
+            max_workers: 并发线程数
+            progress_callback: 进度回调，每完成或失败一个文件调用一次
             
         Returns:
-            重命名结果 {"success": N, "failed": [...]}
+            重命名结果 {"success": N, "failed": [...], "skipped": [...], "journal_id": 操作日志ID}
         """
         logger.info(f"批量重命名 {len(file_list)} 个文件")
         
-        success_count = 0
+        moves = []
         failed = []
         
         for i, file_info in enumerate(file_list, 1):
@@ -247,64 +683,96 @@ class FileSystemTools:
                     name=old_path.stem,
                     ext=old_path.suffix.lstrip('.')
                 )
-                new_path = old_path.parent / new_name
-                
-                # 重命名
-                old_path.rename(new_path)
-                success_count += 1
-                logger.debug(f"重命名: {old_path.name} -> {new_name}")
+                moves.append((str(old_path), str(old_path.parent / new_name)))
                 
             except Exception as e:
                 logger.error(f"重命名失败 {file_info['path']}: {e}")
                 failed.append({"file": file_info["path"], "error": str(e)})
         
-        result = {"success": success_count, "failed": failed}
-        logger.info(f"重命名完成: {success_count} 成功, {len(failed)} 失败")
+        # 日志化执行，可通过 undo(journal_id) 撤销
+        outcome = self.journal.execute(
+            "batch_rename", moves, on_conflict=on_conflict,
+            max_workers=max_workers or self.move_workers, progress=progress_callback
+        )
+        failed.extend({"file": f["source"], "error": f["error"]} for f in outcome["failed"])
+        
+        self._after_modify()
+        result = {
+            "success": outcome["success"],
+            "failed": failed,
+            "skipped": outcome["skipped"],
+            "renamed": outcome["renamed"],
+            "journal_id": outcome["journal_id"]
+        }
+        logger.info(f"重命名完成: {outcome['success']} 成功, {len(failed)} 失败")
         return result
     
     def batch_move(
         self,
-        file_mapping: Dict[str, str]
+        file_mapping: Dict[str, str],
+        on_conflict: str = "rename",
+        max_workers: Optional[int] = None,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
     ) -> Dict[str, Any]:
         """批量移动文件
         
+        先规划: 按目标目录分组、每个目录只创建一次、提前解决目标冲突，
+        再用有界线程池并发移动
+        
         Args:
             file_mapping: 文件映射 {"源路径": "目标路径"}
+            on_conflict: 冲突处理方式 (rename: 自动加序号/overwrite: 备份后覆盖/skip: 跳过)
+            max_workers: 并发线程数
+            progress_callback: 进度回调，每完成或失败一个文件调用一次
             
         Returns:
-            移动结果 {"success": N, "failed": [...]}
+            移动结果 {"success": N, "failed": [...], "skipped": [...], "journal_id": 操作日志ID}
         """
         logger.info(f"批量移动 {len(file_mapping)} 个文件")
         
-        success_count = 0
-        failed = []
+        # 日志化执行: 同一文件系统内直接 rename，覆盖前先硬链接备份
+        outcome = self.journal.execute(
+            "batch_move", file_mapping.items(), on_conflict=on_conflict,
+            max_workers=max_workers or self.move_workers, progress=progress_callback
+        )
         
-        for source, target in file_mapping.items():
-            try:
-                source_path = Path(source)
-                target_path = Path(target)
-                
-                # 确保目标目录存在
-                target_path.parent.mkdir(parents=True, exist_ok=True)
-                
-                # 移动文件
-                shutil.move(str(source_path), str(target_path))
-                success_count += 1
-                logger.debug(f"移动: {source} -> {target}")
-                
-            except Exception as e:
-                logger.error(f"移动失败 {source}: {e}")
-                failed.append({"source": source, "target": target, "error": str(e)})
+        self._after_modify()
+        result = {
+            "success": outcome["success"],
+            "failed": outcome["failed"],
+            "skipped": outcome["skipped"],
+            "renamed": outcome["renamed"],
+            "journal_id": outcome["journal_id"]
+        }
+        logger.info(f"移动完成: {outcome['success']} 成功, {len(outcome['failed'])} 失败")
+        return result
+    
+    def undo(self, journal_id: str) -> Dict[str, Any]:
+        """撤销一次批量移动/重命名/整理操作
         
-        result = {"success": success_count, "failed": failed}
-        logger.info(f"移动完成: {success_count} 成功, {len(failed)} 失败")
+        Args:
+            journal_id: 操作返回的日志ID
+            
+        Returns:
+            撤销结果 {"undone": N, "failed": [...]}
+        """
+        result = self.journal.undo(journal_id)
+        self._after_modify()
         return result
     
+    def list_journals(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """列出最近的批量操作日志"""
+        return self.journal.list_journals(limit)
+    
     def organize_files(
         self,
         source_dir: str,
         strategy: str = "by_type",
-        dry_run: bool = False
+        dry_run: bool = False,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        max_files: Optional[int] = None,
+        time_budget: Optional[float] = None
     ) -> Dict[str, Any]:
         """自动整理文件
         
@@ -312,207 +780,525 @@ class FileSystemTools:
             source_dir: 源目录
             strategy: 整理策略 (by_type/by_date/by_project/by_size)
             dry_run: 是否只预览不执行
+            include: 包含模式(gitignore 风格)
+            exclude: 排除模式
+            max_files: 最多整理的文件数
+            time_budget: 扫描耗时上限(秒)
             
         Returns:
-            整理计划或结果
+            预览时为汇总、计划ID(plan_id)和前若干条移动预览，计划本身写入 JSONL 文件；
+            执行时为移动结果
         """
         logger.info(f"整理文件: {source_dir} (策略: {strategy})")
         
-        # 扫描文件
-        scan_result = self.scan_directory(source_dir)
-        files = scan_result["files"]
-        
-        # 分类文件
-        classified = self.classify_files(files) if strategy == "by_type" else {}
-        
-        # 生成移动计划
-        move_plan = {}
-        for category, file_list in classified.items():
-            target_dir = Path(source_dir) / category
-            for file_info in file_list:
-                source_path = file_info["path"]
-                target_path = target_dir / Path(source_path).name
-                move_plan[source_path] = str(target_path)
+        limits = self._scan_limits(max_files, time_budget)
+        # 流式扫描，移动计划边生成边写入 JSONL 文件，不在内存中保存
+        # 移动在扫描结束后按计划执行，避免扫描到已移入分类目录的文件
+        total_files = 0
+        categories = Counter()
+        with self.plans.create("organize_files", source_dir=source_dir, strategy=strategy) as plan:
+            for entry in self.iter_directory(source_dir, include=include, exclude=exclude, limits=limits):
+                total_files += 1
+                if strategy != "by_type":
+                    continue
+                category = self.rules_engine.classify(entry.name, entry.extension, entry.size, entry.mtime)
+                categories[category] += 1
+                plan.add(entry.path, str(Path(source_dir) / category / entry.name))
+            truncated = self._truncated(limits, source_dir)
+            plan_info = plan.finish(total_files=total_files, categories=dict(categories), truncated=truncated)
         
         if dry_run:
-            logger.info("预览模式: 不执行实际移动")
+            logger.info(f"预览模式: 不执行实际移动，计划 {plan_info['plan_id']}")
             return {
                 "strategy": strategy,
-                "total_files": len(files),
-                "categories": {cat: len(flist) for cat, flist in classified.items()},
-                "move_plan": move_plan,
-                "dry_run": True
+                "total_files": total_files,
+                "categories": dict(categories),
+                "dry_run": True,
+                "truncated": truncated,
+                **plan_info
             }
         
         # 执行移动
-        result = self.batch_move(move_plan)
+        result = self.execute_plan(plan_info["plan_id"])
         result["strategy"] = strategy
-        result["categories"] = {cat: len(flist) for cat, flist in classified.items()}
+        result["categories"] = dict(categories)
+        result["truncated"] = truncated
         
         logger.info("文件整理完成")
         return result
     
+    def execute_plan(
+        self,
+        plan_id: str,
+        on_conflict: str = "rename",
+        max_workers: Optional[int] = None,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """按 organize_files 预览生成的计划执行移动，不重新扫描和分类
+        
+        生成计划后已不存在的源文件计入 stale，不视为失败
+        
+        Args:
+            plan_id: 预览结果中的 plan_id
+            on_conflict: 冲突处理方式 (rename/overwrite/skip)
+            max_workers: 并发线程数
+            progress_callback: 进度回调，每完成或失败一个文件调用一次
+            
+        Returns:
+            移动结果 {"success": N, "failed": [...], "skipped": [...], "stale": N, "journal_id": 操作日志ID}
+        """
+        info = self.plans.load(plan_id)
+        if info["executed"]:
+            raise RuntimeError(f"计划已执行: {plan_id} (操作日志 {info['executed']['journal_id']})")
+        logger.info(f"执行移动计划 {plan_id}: {info['summary']['moves']} 个移动")
+        
+        stale = 0
+        
+        def moves():
+            nonlocal stale
+            for src, dst in self.plans.iter_moves(plan_id):
+                if os.path.lexists(src):
+                    yield src, dst
+                else:
+                    stale += 1
+        
+        outcome = self.journal.execute(
+            "batch_move", moves(), on_conflict=on_conflict,
+            max_workers=max_workers or self.move_workers, progress=progress_callback
+        )
+        self.plans.mark_executed(plan_id, outcome["journal_id"])
+        
+        self._after_modify()
+        result = {
+            "plan_id": plan_id,
+            "success": outcome["success"],
+            "failed": outcome["failed"],
+            "skipped": outcome["skipped"],
+            "renamed": outcome["renamed"],
+            "stale": stale,
+            "journal_id": outcome["journal_id"]
+        }
+        logger.info(f"计划执行完成: {outcome['success']} 成功, {len(outcome['failed'])} 失败, {stale} 个源文件已不存在")
+        return result
+    
+    def list_plans(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """列出最近的移动计划"""
+        return self.plans.list_plans(limit)
+    
     def search_files(
         self,
         search_root: str,
         keyword: str,
-        file_types: Optional[List[str]] = None
+        file_types: Optional[List[str]] = None,
+        content: bool = False,
+        regex: bool = False,
+        case_sensitive: bool = False,
+        limit: Optional[int] = None,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        max_files: Optional[int] = None,
+        time_budget: Optional[float] = None
     ) -> List[Dict[str, Any]]:
         """文件搜索
         
         Args:
             search_root: 搜索根目录
-            keyword: 搜索关键词
+            keyword: 搜索关键词(content=True 且 regex=True 时为正则表达式)
             file_types: 文件类型过滤
+            content: 是否搜索文件内容(使用内容索引)，否则只匹配文件名
+            regex: 内容搜索时关键词是否为正则表达式
+            case_sensitive: 内容搜索是否区分大小写
+            limit: 内容搜索最多返回的文件数
+            include: 包含模式(gitignore 风格)
+            exclude: 排除模式
+            max_files: 文件名搜索最多扫描的文件数
+            time_budget: 文件名搜索的扫描耗时上限(秒)
             
         Returns:
-            匹配文件列表
+            匹配文件列表(内容搜索时附 match_count 和 snippets)
         """
         logger.info(f"搜索文件: {keyword} in {search_root}")
         
-        scan_result = self.scan_directory(search_root, file_types=file_types)
-        files = scan_result["files"]
+        if content:
+            return self._search_content(
+                search_root, keyword, file_types, regex, case_sensitive, limit, include, exclude
+            )
+        
+        limits = self._scan_limits(max_files, time_budget)
+        path_filter = self.path_filter.merged(include, exclude)
+        index_usable = path_filter is self.path_filter or not path_filter.has_negations
+        if index_usable and self._index_for(search_root, refresh=not limits):
+            matches = self.file_index.search(search_root, keyword, file_types)
+            if path_filter:
+                matches = path_filter.filter_entries(matches, search_root)
+            results = [e.to_dict() for e in matches]
+            logger.info(f"找到 {len(results)} 个匹配文件 (索引)")
+            return results
         
-        # 搜索文件名包含关键词的文件
-        results = [f for f in files if keyword.lower() in f["name"].lower()]
+        # 流式搜索文件名包含关键词的文件
+        keyword = keyword.lower()
+        results = [
+            entry.to_dict()
+            for entry in self.iter_directory(
+                search_root, file_types=file_types, include=include, exclude=exclude, limits=limits
+            )
+            if keyword in entry.name.lower()
+        ]
+        self._truncated(limits, search_root)
         
         logger.info(f"找到 {len(results)} 个匹配文件")
         return results
     
-    def analyze_storage(self, directory: str) -> Dict[str, Any]:
+    def _search_content(
+        self,
+        search_root: str,
+        query: str,
+        file_types: Optional[List[str]],
+        regex: bool,
+        case_sensitive: bool,
+        limit: Optional[int],
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """通过内容索引搜索，索引超过刷新间隔时先增量刷新
+
+        索引按默认过滤规则建立，本次的 include/exclude 在结果上过滤
+        """
+        if not Path(search_root).exists():
+            raise FileNotFoundError(f"目录不存在: {search_root}")
+        if self.content_index is None:
+            raise RuntimeError("内容索引未启用")
+        watched = self._is_watched(search_root) and self.content_index.covers(search_root)
+        if not watched and self.content_index.needs_refresh(search_root):
+            self.refresh_content_index(search_root)
+        
+        path_filter = self.path_filter.merged(include, exclude)
+        if path_filter is self.path_filter:
+            results = self.content_index.search(
+                search_root, query, regex=regex, case_sensitive=case_sensitive,
+                file_types=file_types, limit=limit
+            )
+        else:
+            root_len = len(os.path.abspath(search_root).rstrip(os.sep)) + 1
+            results = [
+                match for match in self.content_index.search(
+                    search_root, query, regex=regex, case_sensitive=case_sensitive, file_types=file_types
+                )
+                if path_filter.allows_path(match["path"][root_len:].replace(os.sep, "/"))
+            ][:limit]
+        logger.info(f"找到 {len(results)} 个内容匹配文件")
+        return results
+    
+    def analyze_storage(
+        self,
+        directory: str,
+        top_k: int = 10,
+        tree_depth: int = 1,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        approximate: bool = False,
+        time_budget: Optional[float] = None,
+        refine: bool = False,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        max_files: Optional[int] = None
+    ) -> Dict[str, Any]:
         """磁盘空间分析
         
         Args:
             directory: 目录路径
+            top_k: 报告中最大文件和最大目录的数量
+            tree_depth: 目录树展开层数
+            progress_callback: 扫描过程中接收进度快照的回调
+            approximate: 随机探测子目录，在时间预算内返回带置信区间的估计值
+                (目录已建立元数据索引时直接返回精确结果)
+            time_budget: 耗时上限(秒)；近似模式下为估计耗时，默认取配置 storage_estimate.time_budget，
+                精确模式下超时截断扫描
+            refine: 近似模式下在后台继续精确分析，结果通过 get_storage_refinement 读取
+            include: 包含模式(gitignore 风格)，指定过滤规则时不使用近似模式
+            exclude: 排除模式
+            max_files: 精确模式最多扫描的文件数
             
         Returns:
-            空间占用报告
+            空间占用报告(含类型分布、最大文件、最大目录和目录树)；
+            近似模式下为估计报告，启动后台分析时附 refinement_id
         """
         logger.info(f"分析磁盘空间: {directory}")
         
-        scan_result = self.scan_directory(directory)
-        files = scan_result["files"]
-        total_size = scan_result["total_size"]
+        filtered = bool(include or exclude or self.path_filter)
+        # 只在索引已就绪时使用索引，不在这里触发可能耗时很长的全量建立
+        if approximate and not filtered and not self._index_for(directory, refresh=False):
+            if not Path(directory).exists():
+                raise FileNotFoundError(f"目录不存在: {directory}")
+            estimate_config = self.config.get("storage_estimate", {})
+            estimator = StorageEstimator(
+                directory,
+                time_budget=time_budget if time_budget is not None else estimate_config.get("time_budget", 2.0),
+                min_probes=estimate_config.get("min_probes", 20),
+                confidence=estimate_config.get("confidence", 0.95)
+            )
+            estimate = estimator.estimate()
+            if refine and not estimate["done"]:
+                estimate["refinement_id"] = self._start_refinement(directory, estimate, top_k, tree_depth)
+            return estimate
         
-        # 按文件类型统计
-        type_stats = defaultdict(lambda: {"count": 0, "size": 0})
-        for file_info in files:
-            ext = file_info["extension"]
-            type_stats[ext]["count"] += 1
-            type_stats[ext]["size"] += file_info["size"]
+        report = None
+        for report in self.iter_storage_analysis(
+            directory, top_k=top_k, tree_depth=tree_depth, include=include, exclude=exclude,
+            max_files=max_files, time_budget=None if approximate else time_budget
+        ):
+            if not report["done"] and progress_callback:
+                progress_callback(report)
         
-        # 找出最大的文件
-        largest_files = sorted(files, key=lambda x: x["size"], reverse=True)[:10]
+        logger.info(f"空间分析完成: {report['total_size'] / 1024 / 1024:.2f} MB")
+        return report
+    
+    def _start_refinement(self, directory: str, estimate: Dict[str, Any], top_k: int, tree_depth: int) -> str:
+        """启动后台精确分析"""
+        self._storage_job_seq += 1
+        job_id = f"storage-{self._storage_job_seq}"
         
-        report = {
-            "directory": directory,
-            "total_files": len(files),
-            "total_size": total_size,
-            "total_size_mb": total_size / 1024 / 1024,
-            "type_statistics": dict(type_stats),
-            "largest_files": largest_files
-        }
+        def entries():
+            # 在后台线程中才开始扫描(索引启用时在此建立或刷新索引)
+            yield from self.iter_directory(directory)
         
-        logger.info(f"空间分析完成: {total_size / 1024 / 1024:.2f} MB")
-        return report
+        self._storage_jobs[job_id] = BackgroundAnalysis(
+            entries(), directory, estimate=estimate, top_k=top_k, tree_depth=tree_depth
+        )
+        logger.info(f"后台精确空间分析已启动: {job_id}")
+        return job_id
+    
+    def get_storage_refinement(self, refinement_id: str, wait: Optional[float] = None) -> Dict[str, Any]:
+        """读取后台精确分析的状态
+        
+        Args:
+            refinement_id: analyze_storage 返回的 refinement_id
+            wait: 最多等待完成的秒数
+            
+        Returns:
+            {"status": "running"/"done"/"failed", "report": 最新快照或最终报告, "progress": 估计进度}
+        """
+        job = self._storage_jobs.get(refinement_id)
+        if job is None:
+            raise ValueError(f"未知的分析任务: {refinement_id}")
+        if wait:
+            job.wait(wait)
+        status = job.status()
+        if status["status"] != "running":
+            del self._storage_jobs[refinement_id]
+        return status
+    
+    def iter_storage_analysis(
+        self,
+        directory: str,
+        top_k: int = 10,
+        tree_depth: int = 1,
+        emit_every: int = 10000,
+        emit_interval: float = 1.0,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        max_files: Optional[int] = None,
+        time_budget: Optional[float] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """流式空间分析，扫描中产出进度快照，最后产出 done=True 的完整报告
+        
+        Args:
+            directory: 目录路径
+            top_k: 最大文件和最大目录的数量
+            tree_depth: 目录树展开层数
+            emit_every: 每处理多少个文件检查一次是否产出快照
+            emit_interval: 两次快照的最小间隔(秒)
+            include: 包含模式(gitignore 风格)
+            exclude: 排除模式
+            max_files: 最多扫描的文件数
+            time_budget: 扫描耗时上限(秒)，截断时最终报告的 truncated 为 True
+        """
+        limits = self._scan_limits(max_files, time_budget)
+        for report in iter_storage_analysis(
+            self.iter_directory(directory, include=include, exclude=exclude, limits=limits),
+            directory,
+            top_k=top_k,
+            tree_depth=tree_depth,
+            emit_every=emit_every,
+            emit_interval=emit_interval
+        ):
+            if report["done"]:
+                report["truncated"] = self._truncated(limits, directory)
+            yield report
     
-    def clean_temp_files(self, directory: str, patterns: Optional[List[str]] = None) -> Dict[str, Any]:
+    def clean_temp_files(
+        self,
+        directory: str,
+        patterns: Optional[List[str]] = None,
+        min_age_days: Optional[float] = None,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        max_files: Optional[int] = None,
+        time_budget: Optional[float] = None
+    ) -> Dict[str, Any]:
         """清理临时文件
         
+        未指定 patterns 时使用配置 temp_file_patterns，再退回到规则文件中的
+        temp_file_cleanup_rules(含 safe_age_days 和附加的 policies)
+        
         Args:
             directory: 目录路径
             patterns: 文件模式列表 ['*.tmp', '*.cache']
+            min_age_days: 与 patterns 配合使用，只删除早于该天数的文件
+            include: 限定扫描范围的包含模式(gitignore 风格)
+            exclude: 排除模式，命中的目录不会被扫描和清理
+            max_files: 最多检查的文件数
+            time_budget: 扫描耗时上限(秒)
             
         Returns:
-            清理结果 {"deleted_count": N, "freed_space": bytes}
+            清理结果 {"deleted_count": N, "freed_space": bytes, "by_rule": {规则: 数量}, "truncated": 是否截断}
         """
         logger.info(f"清理临时文件: {directory}")
         
         if patterns is None:
-            patterns = self.config.get("temp_file_patterns", ["*.tmp", "*.cache"])
-        
-        scan_result = self.scan_directory(directory)
-        files = scan_result["files"]
+            patterns = self.config.get("temp_file_patterns")
+        if patterns is not None:
+            rules = RulesEngine.compile_patterns(patterns, min_age_days)
+        else:
+            rules = self.rules_engine.cleanup
         
         deleted_count = 0
         freed_space = 0
+        by_rule = Counter()
         
-        for file_info in files:
-            file_path = Path(file_info["path"])
-            
-            # 检查是否匹配模式
-            for pattern in patterns:
-                import fnmatch
-                if fnmatch.fnmatch(file_path.name, pattern):
-                    try:
-                        file_size = file_info["size"]
-                        file_path.unlink()
-                        deleted_count += 1
-                        freed_space += file_size
-                        logger.debug(f"删除临时文件: {file_path}")
-                    except Exception as e:
-                        logger.error(f"删除失败 {file_path}: {e}")
-                    break
+        now = time.time()
+        limits = self._scan_limits(max_files, time_budget)
+        for entry in self.iter_directory(directory, include=include, exclude=exclude, limits=limits):
+            rule = rules.match_entry(entry, directory, now)
+            if rule is None:
+                continue
+            try:
+                os.unlink(entry.path)
+                deleted_count += 1
+                freed_space += entry.size
+                by_rule[rule.name] += 1
+                logger.debug(f"删除临时文件: {entry.path}")
+            except Exception as e:
+                logger.error(f"删除失败 {entry.path}: {e}")
+        
+        if deleted_count:
+            self._after_modify(directory)
         
         result = {
             "deleted_count": deleted_count,
             "freed_space": freed_space,
-            "freed_space_mb": freed_space / 1024 / 1024
+            "freed_space_mb": freed_space / 1024 / 1024,
+            "by_rule": dict(by_rule),
+            "truncated": self._truncated(limits, directory)
         }
         
         logger.info(f"清理完成: 删除 {deleted_count} 个文件, 释放 {result['freed_space_mb']:.2f} MB")
         return result
     
-    def compress_files(self, file_list: List[str], output_path: str, format: str = "zip") -> str:
+    def compress_files(
+        self,
+        file_list: List[str],
+        output_path: str,
+        format: str = "zip",
+        level: Optional[int] = None,
+        max_workers: Optional[int] = None
+    ) -> str:
         """压缩文件
         
+        流式读取源文件并在线程池中并行压缩，按顺序写入压缩包，内存占用有上限。
+        tar.gz/tar.xz 会同时生成 .idx 分块索引，用于快速列出和按需提取成员
+        
         Args:
-            file_list: 文件路径列表
+            file_list: 文件或目录路径列表
             output_path: 输出压缩包路径
-            format: 压缩格式 (zip/tar/gz)
+            format: 压缩格式 (zip/tar/gz/xz)
+            level: 压缩级别，默认使用配置
+            max_workers: 压缩线程数，默认使用配置
             
         Returns:
             压缩包路径
         """
         logger.info(f"压缩 {len(file_list)} 个文件")
         
-        # TODO: 实现真实的压缩功能
-        logger.info(f"压缩完成: {output_path}")
+        archive_config = self.config.get("archive", {})
+        stats = create_archive(
+            file_list,
+            output_path,
+            format=format,
+            level=level if level is not None else archive_config.get("level"),
+            max_workers=max_workers or archive_config.get("workers"),
+            chunk_size=archive_config.get("chunk_size", DEFAULT_CHUNK_SIZE)
+        )
+        
+        self._after_modify(str(Path(output_path).parent))
+        logger.info(
+            f"压缩完成: {output_path} ({stats['files']} 个文件, "
+            f"{stats['total_size'] / 1024 / 1024:.2f} MB -> {stats['archive_size'] / 1024 / 1024:.2f} MB)"
+        )
         return output_path
     
-    def extract_archive(self, archive_path: str, target_dir: str) -> Dict[str, Any]:
+    def list_archive(self, archive_path: str) -> List[Dict[str, Any]]:
+        """列出压缩包内容(不解压数据)
+        
+        Args:
+            archive_path: 压缩包路径
+            
+        Returns:
+            成员列表 [{"name", "size", "mtime", "is_dir"}, ...]
+        """
+        if not Path(archive_path).exists():
+            raise FileNotFoundError(f"压缩包不存在: {archive_path}")
+        return list_archive(archive_path)
+    
+    def extract_archive(
+        self,
+        archive_path: str,
+        target_dir: str,
+        members: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
         """解压缩文件
         
         Args:
             archive_path: 压缩包路径
             target_dir: 目标目录
+            members: 只解压指定成员，None表示全部
             
         Returns:
-            解压结果 {"extracted_files": N, "target_dir": "..."}
+            解压结果 {"extracted_files": N, "bytes": 字节数, "target_dir": "..."}
         """
         logger.info(f"解压缩: {archive_path} -> {target_dir}")
         
-        # TODO: 实现真实的解压缩功能
-        result = {
-            "extracted_files": 0,
-            "target_dir": target_dir
-        }
+        result = extract_archive(
+            archive_path,
+            target_dir,
+            members=members,
+            max_workers=self.config.get("archive", {}).get("workers")
+        )
         
-        logger.info("解压缩完成")
+        self._after_modify(target_dir)
+        logger.info(f"解压缩完成: {result['extracted_files']} 个文件")
         return result
     
     def get_tool_descriptions(self) -> List[Dict[str, Any]]:
         """获取工具描述列表"""
         return [
-            {"name": "scan_directory", "description": "扫描目录结构", "parameters": {"directory": "目录路径", "max_depth": "递归深度", "file_types": "文件类型过滤"}},
+            {"name": "scan_directory", "description": "扫描目录结构", "parameters": {"directory": "目录路径", "max_depth": "递归深度", "file_types": "文件类型过滤", "include": "包含模式(gitignore风格)", "exclude": "排除模式", "max_files": "最多扫描文件数", "time_budget": "扫描耗时上限(秒)"}},
             {"name": "classify_files", "description": "文件智能分类", "parameters": {"file_list": "文件列表"}},
-            {"name": "detect_duplicates", "description": "检测重复文件", "parameters": {"directory": "目录路径", "method": "检测方法"}},
+            {"name": "detect_duplicates", "description": "检测重复文件", "parameters": {"directory": "目录路径", "method": "检测方法(hash/name/size/combined/near)", "threshold": "近似重复相似度阈值", "algorithm": "哈希算法", "include": "包含模式(gitignore风格)", "exclude": "排除模式", "max_files": "最多扫描文件数", "time_budget": "扫描耗时上限(秒)"}},
             {"name": "batch_rename", "description": "批量重命名", "parameters": {"file_list": "文件列表", "naming_rule": "命名规则"}},
             {"name": "batch_move", "description": "批量移动", "parameters": {"file_mapping": "文件映射"}},
-            {"name": "organize_files", "description": "自动整理文件", "parameters": {"source_dir": "源目录", "strategy": "整理策略", "dry_run": "预览模式"}},
-            {"name": "search_files", "description": "文件搜索", "parameters": {"search_root": "搜索根目录", "keyword": "关键词", "file_types": "文件类型"}},
-            {"name": "analyze_storage", "description": "磁盘空间分析", "parameters": {"directory": "目录路径"}},
-            {"name": "clean_temp_files", "description": "清理临时文件", "parameters": {"directory": "目录路径", "patterns": "文件模式"}},
-            {"name": "compress_files", "description": "压缩文件", "parameters": {"file_list": "文件列表", "output_path": "输出路径", "format": "压缩格式"}},
-            {"name": "extract_archive", "description": "解压缩文件", "parameters": {"archive_path": "压缩包路径", "target_dir": "目标目录"}}
+            {"name": "undo", "description": "撤销批量移动/重命名/整理操作", "parameters": {"journal_id": "操作日志ID"}},
+            {"name": "organize_files", "description": "自动整理文件(预览返回计划ID)", "parameters": {"source_dir": "源目录", "strategy": "整理策略", "dry_run": "预览模式", "include": "包含模式(gitignore风格)", "exclude": "排除模式", "max_files": "最多扫描文件数", "time_budget": "扫描耗时上限(秒)"}},
+            {"name": "execute_plan", "description": "执行整理预览生成的移动计划", "parameters": {"plan_id": "计划ID", "on_conflict": "冲突处理方式(rename/overwrite/skip)"}},
+            {"name": "start_watch", "description": "启动文件监听，自动更新索引和知识库", "parameters": {"roots": "监听目录列表", "ingest_roots": "同步到知识库的目录"}},
+            {"name": "stop_watch", "description": "停止文件监听", "parameters": {}},
+            {"name": "search_files", "description": "文件搜索(文件名或全文内容)", "parameters": {"search_root": "搜索根目录", "keyword": "关键词或正则表达式", "file_types": "文件类型", "content": "是否搜索内容", "regex": "是否为正则表达式", "include": "包含模式(gitignore风格)", "exclude": "排除模式", "max_files": "最多扫描文件数", "time_budget": "扫描耗时上限(秒)"}},
+            {"name": "analyze_storage", "description": "磁盘空间分析(按目录和类型汇总，列出最大的文件和目录)", "parameters": {"directory": "目录路径", "top_k": "最大文件/目录数量", "tree_depth": "目录树展开层数", "approximate": "是否抽样估计", "time_budget": "耗时上限(秒)", "refine": "是否后台精确分析", "include": "包含模式(gitignore风格)", "exclude": "排除模式", "max_files": "最多扫描文件数"}},
+            {"name": "get_storage_refinement", "description": "读取后台精确空间分析结果", "parameters": {"refinement_id": "分析任务ID", "wait": "最多等待秒数"}},
+            {"name": "refresh_index", "description": "增量刷新文件元数据索引", "parameters": {"directory": "目录路径", "full": "是否全量重扫"}},
+            {"name": "create_manifest", "description": "生成目录完整性清单", "parameters": {"directory": "目录路径", "algorithm": "哈希算法", "include": "包含模式(gitignore风格)", "exclude": "排除模式"}},
+            {"name": "verify_integrity", "description": "按清单校验文件完整性", "parameters": {"directory": "目录路径", "manifest": "完整性清单"}},
+            {"name": "clean_temp_files", "description": "清理临时文件", "parameters": {"directory": "目录路径", "patterns": "文件模式(可选，默认使用规则文件)", "min_age_days": "最小文件天数(可选)", "include": "包含模式(gitignore风格)", "exclude": "排除模式", "max_files": "最多扫描文件数", "time_budget": "扫描耗时上限(秒)"}},
+            {"name": "compress_files", "description": "压缩文件", "parameters": {"file_list": "文件列表", "output_path": "输出路径", "format": "压缩格式(zip/tar/gz/xz)"}},
+            {"name": "list_archive", "description": "列出压缩包内容", "parameters": {"archive_path": "压缩包路径"}},
+            {"name": "extract_archive", "description": "解压缩文件", "parameters": {"archive_path": "压缩包路径", "target_dir": "目标目录", "members": "指定成员"}}
         ]
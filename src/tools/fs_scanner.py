@@ -0,0 +1,235 @@
+"""高性能目录扫描器
+
+基于 os.scandir 遍历目录，复用 DirEntry 的 stat 结果，
+可使用多个工作线程并行遍历子目录
+"""
+
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterator, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+def get_extension(name: str) -> str:
+    """获取文件扩展名(与 Path.suffix 规则一致)"""
+    index = name.rfind('.')
+    if 0 < index < len(name) - 1:
+        return name[index:]
+    return ""
+
+
+def _relative(path: str, root_len: int) -> str:
+    """相对扫描根目录、以 / 分隔的路径"""
+    rel_path = path[root_len:]
+    return rel_path if os.sep == "/" else rel_path.replace(os.sep, "/")
+
+
+class FileEntry:
+    """扫描得到的文件记录
+
+    时间戳保持为原始数值，仅在 to_dict() 渲染时转换为 ISO 格式
+    """
+
+    __slots__ = ("path", "name", "size", "extension", "ctime", "mtime")
+
+    def __init__(self, path: str, name: str, size: int, extension: str, ctime: float, mtime: float):
+        self.path = path
+        self.name = name
+        self.size = size
+        self.extension = extension
+        self.ctime = ctime
+        self.mtime = mtime
+
+    def to_dict(self) -> Dict[str, Any]:
+        """渲染为文件信息字典"""
+        return {
+            "path": self.path,
+            "name": self.name,
+            "size": self.size,
+            "extension": self.extension,
+            "created_at": datetime.fromtimestamp(self.ctime).isoformat(),
+            "modified_at": datetime.fromtimestamp(self.mtime).isoformat()
+        }
+
+    def __repr__(self) -> str:
+        return f"FileEntry({self.path!r}, size={self.size})"
+
+
+class DirectoryScanner:
+    """目录扫描器"""
+
+    # 每个结果批次包含的最大记录数
+    BATCH_SIZE = 512
+
+    def __init__(self, max_workers: Optional[int] = None, queue_size: int = 64):
+        """初始化扫描器
+
+        Args:
+            max_workers: 并行工作线程数，1表示在调用线程中顺序扫描
+            queue_size: 结果队列容量(批次数)，限制扫描结果的内存占用
+        """
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        self.queue_size = queue_size
+
+    def scan(
+        self,
+        directory: str,
+        max_depth: int = -1,
+        file_types: Optional[Iterable[str]] = None,
+        path_filter=None
+    ) -> List[FileEntry]:
+        """扫描目录并返回全部文件记录"""
+        return list(self.iter_entries(directory, max_depth, file_types, path_filter))
+
+    def iter_entries(
+        self,
+        directory: str,
+        max_depth: int = -1,
+        file_types: Optional[Iterable[str]] = None,
+        path_filter=None
+    ) -> Iterator[FileEntry]:
+        """逐个产出文件记录
+
+        Args:
+            directory: 目录路径
+            max_depth: 递归深度，-1表示无限制
+            file_types: 文件类型过滤 ['.txt', '.pdf']
+            path_filter: 包含/排除规则(PathFilter)，被排除的目录不会被打开
+
+        Yields:
+            FileEntry 文件记录(并行模式下顺序不固定)
+        """
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(f"目录不存在: {directory}")
+
+        type_filter = frozenset(file_types) if file_types else None
+        scope = (len(directory.rstrip(os.sep)) + 1, path_filter) if path_filter else None
+
+        if self.max_workers <= 1:
+            yield from self._iter_sequential(directory, max_depth, type_filter, scope)
+        else:
+            yield from self._iter_parallel(directory, max_depth, type_filter, scope)
+
+    def _scan_one(self, path: str, depth: int, max_depth: int, type_filter, files: list, subdirs: list,
+                  scope=None):
+        """扫描单个目录，文件追加到 files，待遍历子目录追加到 subdirs
+
+        scope 为 (根目录路径长度, 过滤规则)，用于计算相对路径并在目录层面剪枝
+        """
+        descend = max_depth == -1 or depth < max_depth
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_file():
+                            extension = get_extension(entry.name)
+                            if type_filter is not None and extension not in type_filter:
+                                continue
+                            if scope is not None and not scope[1].allows_file(_relative(entry.path, scope[0])):
+                                continue
+                            st = entry.stat()
+                            files.append(FileEntry(
+                                entry.path, entry.name, st.st_size, extension,
+                                st.st_ctime, st.st_mtime
+                            ))
+                        elif descend and entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.'):
+                            if scope is not None and scope[1].excludes_dir(_relative(entry.path, scope[0])):
+                                continue
+                            subdirs.append(entry.path)
+                    except OSError as e:
+                        logger.debug(f"跳过无法访问的条目 {entry.path}: {e}")
+        except PermissionError:
+            logger.warning(f"无权限访问: {path}")
+        except OSError as e:
+            logger.warning(f"扫描目录失败 {path}: {e}")
+
+    def _iter_sequential(self, directory: str, max_depth: int, type_filter, scope=None) -> Iterator[FileEntry]:
+        """在当前线程中深度优先扫描"""
+        stack = [(directory, 0)]
+        while stack:
+            path, depth = stack.pop()
+            files: List[FileEntry] = []
+            subdirs: List[str] = []
+            self._scan_one(path, depth, max_depth, type_filter, files, subdirs, scope)
+            yield from files
+            stack.extend((sub, depth + 1) for sub in reversed(subdirs))
+
+    def _iter_parallel(self, directory: str, max_depth: int, type_filter, scope=None) -> Iterator[FileEntry]:
+        """多线程并行扫描，结果经有界队列按批次交给调用方"""
+        work: "queue.Queue" = queue.Queue()
+        results: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        lock = threading.Lock()
+        pending = [1]
+        done = object()
+
+        def emit(item) -> bool:
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def worker():
+            while not stop.is_set():
+                try:
+                    item = work.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    return
+
+                path, depth = item
+                try:
+                    files: List[FileEntry] = []
+                    subdirs: List[str] = []
+                    self._scan_one(path, depth, max_depth, type_filter, files, subdirs, scope)
+
+                    with lock:
+                        pending[0] += len(subdirs)
+                    for sub in subdirs:
+                        work.put((sub, depth + 1))
+
+                    for start in range(0, len(files), self.BATCH_SIZE):
+                        if not emit(files[start:start + self.BATCH_SIZE]):
+                            return
+                except Exception as e:
+                    # 非 OSError 的异常交给调用方重新抛出，避免调用方一直等待结果
+                    emit(e)
+                    return
+                finally:
+                    with lock:
+                        pending[0] -= 1
+                        finished = pending[0] == 0
+                    if finished:
+                        emit(done)
+
+        threads = [
+            threading.Thread(target=worker, name=f"dir-scanner-{i}", daemon=True)
+            for i in range(self.max_workers)
+        ]
+        work.put((directory, 0))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                batch = results.get()
+                if batch is done:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                yield from batch
+        finally:
+            # 正常结束或调用方提前停止迭代时，通知工作线程退出
+            stop.set()
+            for _ in threads:
+                work.put(None)
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,180 @@
+"""持久化内容哈希缓存
+
+以 (st_dev, st_ino, 大小, mtime_ns) 标识文件版本并缓存其哈希值，
+文件未变化时无需重新读取内容。供重复检测、知识库增量入库和完整性校验共用
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable
+
+from .file_hashing import hash_file, hash_partial, DEFAULT_PARTIAL_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class HashCache:
+    """内容哈希缓存
+
+    每个线程使用独立的 SQLite 连接(WAL 模式)，可被线程池和多个进程并发使用
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS digests (
+            dev INTEGER NOT NULL,
+            ino INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            digest BLOB NOT NULL,
+            PRIMARY KEY (dev, ino, kind)
+        ) WITHOUT ROWID;
+    """
+
+    # 修改时间距当前不足该值(秒)的文件不写入缓存，避免粗粒度时间戳下同一时刻内的修改被漏掉
+    RACY_WINDOW = 2.0
+
+    def __init__(self, db_path: str = "./data/cache/hash_cache.db"):
+        """初始化哈希缓存
+
+        Args:
+            db_path: 缓存数据库路径
+        """
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        conn = self._connection()
+        conn.executescript(self.SCHEMA)
+
+        logger.info(f"哈希缓存初始化完成: {db_path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """关闭当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ========== 读写 ==========
+
+    def get(self, path: str, kind: str, st: Optional[os.stat_result] = None) -> Optional[str]:
+        """读取缓存的哈希值(文件已变化时返回None)
+
+        Args:
+            path: 文件路径
+            kind: 哈希类型，如 "md5" 或 "md5:partial:65536"
+            st: 已获取的 stat 结果，避免重复系统调用
+        """
+        st = st or os.stat(path)
+        row = self._connection().execute(
+            "SELECT size, mtime_ns, digest FROM digests WHERE dev = ? AND ino = ? AND kind = ?",
+            (st.st_dev, st.st_ino, kind)
+        ).fetchone()
+
+        hit = row is not None and row[0] == st.st_size and row[1] == st.st_mtime_ns
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return row[2].hex() if hit else None
+
+    def put(self, path: str, kind: str, hexdigest: str, st: Optional[os.stat_result] = None):
+        """写入哈希值
+
+        Args:
+            path: 文件路径
+            kind: 哈希类型
+            hexdigest: 十六进制哈希值
+            st: 计算哈希前获取的 stat 结果
+        """
+        st = st or os.stat(path)
+        self._connection().execute(
+            "INSERT OR REPLACE INTO digests (dev, ino, kind, size, mtime_ns, digest) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (st.st_dev, st.st_ino, kind, st.st_size, st.st_mtime_ns, bytes.fromhex(hexdigest))
+        )
+
+    def get_or_compute(self, path: str, kind: str, compute: Callable[[str], str]) -> str:
+        """读取缓存，未命中时计算并写入
+
+        计算完成后再次检查文件版本，文件在计算期间被修改或刚刚被修改时不写入缓存
+
+        Args:
+            path: 文件路径
+            kind: 哈希类型
+            compute: 计算函数 compute(path) -> 十六进制哈希值
+        """
+        st = os.stat(path)
+        cached = self.get(path, kind, st)
+        if cached is not None:
+            return cached
+
+        digest = compute(path)
+        after = os.stat(path)
+        unchanged = (after.st_size, after.st_mtime_ns, after.st_ino) == (st.st_size, st.st_mtime_ns, st.st_ino)
+        if unchanged and time.time() - st.st_mtime_ns / 1e9 >= self.RACY_WINDOW:
+            self.put(path, kind, digest, st)
+        return digest
+
+    def hash_file(self, path: str, algorithm: str = "md5", **kwargs) -> str:
+        """获取整文件哈希(带缓存)"""
+        return self.get_or_compute(path, algorithm, lambda p: hash_file(p, algorithm, **kwargs))
+
+    def hash_partial(self, path: str, algorithm: str = "md5", block_size: int = DEFAULT_PARTIAL_SIZE) -> str:
+        """获取首尾部分哈希(带缓存)"""
+        return self.get_or_compute(
+            path, f"{algorithm}:partial:{block_size}",
+            lambda p: hash_partial(p, algorithm, block_size)
+        )
+
+    def invalidate(self, path: str):
+        """删除文件的所有缓存哈希"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        self._connection().execute(
+            "DELETE FROM digests WHERE dev = ? AND ino = ?", (st.st_dev, st.st_ino)
+        )
+
+    # ========== 维护 ==========
+
+    def clear(self):
+        """清空缓存"""
+        self._connection().execute("DELETE FROM digests")
+
+    def vacuum(self):
+        """压缩数据库文件"""
+        self._connection().execute("VACUUM")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        entries = self._connection().execute("SELECT COUNT(*) FROM digests").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "db_path": self.db_path,
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
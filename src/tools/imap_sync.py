@@ -0,0 +1,428 @@
+"""IMAP 增量同步
+
+每个账号保持一条已认证的 IMAP 连接(连接池)，多次读取复用同一连接，
+连接断开时自动重连一次。同步按文件夹增量进行:
+- 记录 UIDVALIDITY 和已同步的最大 UID，只拉取新邮件；UIDVALIDITY 变化时丢弃本地缓存重新同步
+- 服务器支持 CONDSTORE 时记录 HIGHESTMODSEQ，用 CHANGEDSINCE 只拉取标记变化的已有邮件；
+  不支持时每次同步重新拉取已知邮件的 UID FLAGS 比对
+- 先只拉取邮件头(按 UID 分批)，正文在需要时单独拉取(BODY.PEEK，不改变已读状态)
+
+同步结果写入邮件存储(mailbox_store.MailboxStore)，之后的筛选和搜索都在本地完成
+"""
+
+import email
+import hashlib
+import hmac
+import imaplib
+import logging
+import os
+import re
+import threading
+import time
+from email import policy
+from email.message import Message
+from email.utils import parsedate_to_datetime, getaddresses
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from .mailbox_store import MailboxStore
+
+logger = logging.getLogger(__name__)
+
+# 同步时拉取的邮件头字段
+HEADER_FIELDS = ("FROM", "TO", "CC", "SUBJECT", "DATE", "MESSAGE-ID", "IN-REPLY-TO")
+
+# 连接空闲超过该秒数后，使用前先用 NOOP 检查是否仍然可用
+IDLE_CHECK_SECONDS = 60
+
+_MESSAGE_START = re.compile(rb"^\d+ \(")
+_UID = re.compile(rb"\bUID (\d+)")
+_FLAGS = re.compile(rb"\bFLAGS \(([^)]*)\)")
+_SIZE = re.compile(rb"\bRFC822\.SIZE (\d+)")
+_INTERNALDATE = re.compile(rb'\bINTERNALDATE "([^"]+)"')
+
+# RFC 2606/6761 保留的示例域名，不会是真实的邮件服务器
+_RESERVED_DOMAINS = ("example", "example.com", "example.net", "example.org", "test", "invalid", "localhost.test")
+
+
+def is_placeholder_host(host: str) -> bool:
+    """服务器地址为空或为保留的示例域名"""
+    host = (host or "").strip().lower().rstrip(".")
+    return not host or any(host == d or host.endswith("." + d) for d in _RESERVED_DOMAINS)
+
+
+class ImapConnectionPool:
+    """按账号复用已认证的 IMAP 连接
+
+    IMAP 连接是有状态的(当前选中的文件夹)，同一账号的操作通过锁串行执行。
+    连接记录登录密码的摘要(HMAC，密钥只在进程内)，密码不一致的调用不会复用已认证的连接
+    """
+
+    def __init__(self, host: str, port: int = 993, use_ssl: bool = True, timeout: float = 30):
+        """初始化连接池
+
+        Args:
+            host: IMAP 服务器地址
+            port: 端口
+            use_ssl: 是否使用 SSL
+            timeout: 网络超时(秒)
+        """
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._secret = os.urandom(32)
+        self.connects = 0
+
+    def _digest(self, password: str) -> bytes:
+        return hmac.new(self._secret, password.encode("utf-8"), hashlib.sha256).digest()
+
+    def authenticated(self, account: str, password: str) -> bool:
+        """账号是否有以该密码登录的连接(用于决定能否直接返回本地缓存的邮件)"""
+        with self._lock:
+            entry = self._entries.get(account)
+        return entry is not None and entry["conn"] is not None and entry["digest"] is not None \
+            and hmac.compare_digest(entry["digest"], self._digest(password))
+
+    def _entry(self, account: str) -> Dict[str, Any]:
+        with self._lock:
+            entry = self._entries.get(account)
+            if entry is None:
+                entry = {"conn": None, "lock": threading.Lock(), "last_used": 0.0,
+                         "capabilities": (), "selected": None, "digest": None}
+                self._entries[account] = entry
+            return entry
+
+    def _connect(self, account: str, password: str, entry: Dict[str, Any]):
+        cls = imaplib.IMAP4_SSL if self.use_ssl else imaplib.IMAP4
+        conn = cls(self.host, self.port, timeout=self.timeout)
+        try:
+            conn.login(account, password)
+            # 登录后服务器可能提供更多能力
+            typ, data = conn.capability()
+            capabilities = tuple(data[0].decode().upper().split()) if typ == "OK" and data else conn.capabilities
+            if "CONDSTORE" in capabilities:
+                conn.enable("CONDSTORE")
+        except Exception:
+            self._shutdown(conn)
+            raise
+        entry.update(conn=conn, capabilities=capabilities, selected=None, digest=self._digest(password))
+        self.connects += 1
+        logger.info(f"IMAP 连接已建立: {account}@{self.host}")
+
+    @staticmethod
+    def _shutdown(conn):
+        try:
+            conn.logout()
+        except Exception:
+            try:
+                conn.shutdown()
+            except Exception:
+                pass
+
+    def run(self, account: str, password: str, operation: Callable[[imaplib.IMAP4, Dict[str, Any]], Any]):
+        """在账号的连接上执行操作，连接失效时重连并重试一次
+
+        Args:
+            account: 邮箱账号
+            password: 密码(与已建立连接的登录密码不一致时断开连接并重新登录)
+            operation: operation(conn, entry)，entry 中有 capabilities 和 selected
+        """
+        entry = self._entry(account)
+        with entry["lock"]:
+            if entry["conn"] is not None and not hmac.compare_digest(entry["digest"], self._digest(password)):
+                logger.warning(f"IMAP 密码与已认证的连接不一致，重新登录: {account}")
+                self._shutdown(entry["conn"])
+                entry.update(conn=None, selected=None, digest=None)
+            for attempt in (1, 2):
+                try:
+                    if entry["conn"] is None:
+                        self._connect(account, password, entry)
+                    elif time.time() - entry["last_used"] > IDLE_CHECK_SECONDS:
+                        entry["conn"].noop()
+                    result = operation(entry["conn"], entry)
+                    entry["last_used"] = time.time()
+                    return result
+                except (imaplib.IMAP4.abort, OSError) as e:
+                    logger.warning(f"IMAP 连接失效 {account}: {e}")
+                    if entry["conn"] is not None:
+                        self._shutdown(entry["conn"])
+                    entry.update(conn=None, selected=None, digest=None)
+                    if attempt == 2:
+                        raise
+
+    def close(self, account: Optional[str] = None):
+        """关闭指定账号或全部连接"""
+        with self._lock:
+            accounts = [account] if account else list(self._entries)
+        for name in accounts:
+            entry = self._entry(name)
+            with entry["lock"]:
+                if entry["conn"] is not None:
+                    self._shutdown(entry["conn"])
+                    entry.update(conn=None, selected=None, digest=None)
+
+
+def _parse_fetch(data: List[Any]) -> List[Tuple[bytes, List[bytes]]]:
+    """把 imaplib 的 FETCH 响应整理为 [(元数据, [字面量...])]，每封邮件一项"""
+    messages: List[Tuple[bytes, List[bytes]]] = []
+    for item in data:
+        if item is None:
+            continue
+        meta, literal = (item[0], item[1]) if isinstance(item, tuple) else (item, None)
+        if _MESSAGE_START.match(meta) or not messages:
+            messages.append((meta, []))
+        else:
+            messages[-1] = (messages[-1][0] + meta, messages[-1][1])
+        if literal is not None:
+            messages[-1][1].append(literal)
+    return messages
+
+
+def _flags(meta: bytes) -> List[str]:
+    match = _FLAGS.search(meta)
+    return match.group(1).decode(errors="replace").split() if match else []
+
+
+def _addresses(value: Optional[str]) -> str:
+    return ", ".join(addr or name for name, addr in getaddresses([value])) if value else ""
+
+
+def _iso_date(date_header: Optional[str], internaldate: Optional[str]) -> str:
+    for value, parse in ((date_header, parsedate_to_datetime),
+                         (internaldate, lambda v: datetime.strptime(v, "%d-%b-%Y %H:%M:%S %z"))):
+        if value:
+            try:
+                return parse(value.strip()).isoformat()
+            except (TypeError, ValueError):
+                continue
+    return ""
+
+
+def header_fields(headers: Message, internaldate: Optional[str] = None) -> Dict[str, Any]:
+    """从邮件头中取出存储需要的字段(发件人、收件人只保留地址，日期转为 ISO 格式)"""
+    return {
+        "message_id": str(headers.get("Message-ID", "")).strip(),
+        "from": _addresses(headers.get("From")),
+        "to": _addresses(headers.get("To")),
+        "cc": _addresses(headers.get("Cc")),
+        "subject": str(headers.get("Subject", "")),
+        "date": _iso_date(headers.get("Date"), internaldate),
+    }
+
+
+def parse_header_fetch(meta: bytes, header: bytes) -> Dict[str, Any]:
+    """把一封邮件的 FETCH 元数据和邮件头转换为邮件字典(正文未拉取时 content 为 None)"""
+    headers = email.message_from_bytes(header or b"", policy=policy.default)
+    internaldate = _INTERNALDATE.search(meta)
+    size = _SIZE.search(meta)
+    return {
+        "uid": int(_UID.search(meta).group(1)),
+        **header_fields(headers, internaldate.group(1).decode() if internaldate else None),
+        "flags": _flags(meta),
+        "size": int(size.group(1)) if size else 0,
+        "content": None,
+        "attachments": []
+    }
+
+
+def body_text(message: Message) -> str:
+    """邮件正文文本(优先纯文本，只有 HTML 时去掉标签)"""
+    body = message.get_body(preferencelist=("plain", "html"))
+    if body is None:
+        return ""
+    try:
+        content = body.get_content()
+    except (LookupError, ValueError):
+        # 未知字符集或损坏的编码
+        content = (body.get_payload(decode=True) or b"").decode("utf-8", errors="replace")
+    if body.get_content_type() == "text/html":
+        content = re.sub(r"<[^>]+>", " ", content)
+    return content.strip()
+
+
+def parse_body(raw: bytes) -> Tuple[str, List[Dict[str, Any]]]:
+    """解析完整邮件，返回 (正文文本, 附件信息列表)"""
+    message = email.message_from_bytes(raw, policy=policy.default)
+    content = body_text(message)
+    attachments = []
+    for part in message.iter_attachments():
+        payload = part.get_payload(decode=True) or b""
+        attachments.append({
+            "filename": part.get_filename() or "",
+            "content_type": part.get_content_type(),
+            "size": len(payload)
+        })
+    return content, attachments
+
+
+class ImapSync:
+    """按文件夹增量同步邮件头，按需拉取正文"""
+
+    def __init__(self, pool: ImapConnectionPool, store: MailboxStore, batch_size: int = 500):
+        """初始化
+
+        Args:
+            pool: IMAP 连接池
+            store: 邮件存储
+            batch_size: 每次 UID FETCH 拉取的邮件数
+        """
+        self.pool = pool
+        self.store = store
+        self.batch_size = max(1, batch_size)
+
+    @staticmethod
+    def _select(conn: imaplib.IMAP4, entry: Dict[str, Any], folder: str) -> Dict[str, Any]:
+        """以只读方式选中文件夹，返回 {"exists", "uidvalidity", "uidnext", "highestmodseq"}"""
+        typ, data = conn.select(_quote(folder), readonly=True)
+        if typ != "OK":
+            raise RuntimeError(f"无法打开文件夹 {folder}: {data}")
+        entry["selected"] = folder
+        status = {"exists": int(data[0] or 0)}
+        for code in ("UIDVALIDITY", "UIDNEXT", "HIGHESTMODSEQ"):
+            _, values = conn.response(code)
+            status[code.lower()] = int(values[-1]) if values and values[-1] else None
+        return status
+
+    def sync_folder(self, account: str, password: str, folder: str = "INBOX") -> Dict[str, Any]:
+        """增量同步一个文件夹
+
+        Returns:
+            {"folder", "new": 新邮件数, "flag_updates": 标记变化数, "removed": 已删除数,
+             "full_resync": 是否因 UIDVALIDITY 变化重新同步, "condstore": 是否使用 CONDSTORE}
+
+        Raises:
+            ValueError: 文件夹是归档导入的目标(本地分配的 UID 会与服务器 UID 冲突)
+        """
+        if self.store.is_import_folder(account, folder):
+            raise ValueError(f"{folder} 是归档导入的文件夹，不能与 IMAP 同步")
+        return self.pool.run(account, password, lambda conn, entry: self._sync(conn, entry, account, folder))
+
+    def _sync(self, conn: imaplib.IMAP4, entry: Dict[str, Any], account: str, folder: str) -> Dict[str, Any]:
+        started = time.time()
+        status = self._select(conn, entry, folder)
+        state = self.store.folder_state(account, folder)
+        condstore = "CONDSTORE" in entry["capabilities"] and status["highestmodseq"] is not None
+        result = {"folder": folder, "new": 0, "flag_updates": 0, "removed": 0,
+                  "full_resync": False, "condstore": condstore}
+
+        if state is not None and state["uidvalidity"] != status["uidvalidity"]:
+            logger.info(f"{folder} 的 UIDVALIDITY 已变化，重新同步")
+            self.store.reset_folder(account, folder)
+            state = None
+            result["full_resync"] = True
+        if state is None:
+            state = {"uidvalidity": status["uidvalidity"], "last_uid": 0, "highestmodseq": None}
+
+        # 已有邮件的标记变化
+        if condstore and state["last_uid"] and state["highestmodseq"] is not None \
+                and status["highestmodseq"] > state["highestmodseq"]:
+            typ, data = conn.uid("FETCH", f"1:{state['last_uid']}", "(UID FLAGS)",
+                                 f"(CHANGEDSINCE {state['highestmodseq']})")
+            if typ == "OK":
+                flags = {int(_UID.search(meta).group(1)): _flags(meta)
+                         for meta, _ in _parse_fetch(data) if _UID.search(meta)}
+                self.store.update_flags(account, folder, flags)
+                result["flag_updates"] = len(flags)
+        elif not condstore and state["last_uid"]:
+            # 没有 MODSEQ 无法得知哪些邮件变化，拉取全部已知邮件的标记(不含邮件头)与本地比对
+            typ, data = conn.uid("FETCH", f"1:{state['last_uid']}", "(UID FLAGS)")
+            if typ == "OK":
+                known = self.store.flags(account, folder)
+                flags = {}
+                for meta, _ in _parse_fetch(data):
+                    match = _UID.search(meta)
+                    if match and int(match.group(1)) in known:
+                        uid, values = int(match.group(1)), _flags(meta)
+                        if sorted(values) != sorted(known[uid]):
+                            flags[uid] = values
+                self.store.update_flags(account, folder, flags)
+                result["flag_updates"] = len(flags)
+
+        # 新邮件，只拉取邮件头，按 UID 分批
+        start = state["last_uid"] + 1
+        end = status["uidnext"] - 1 if status["uidnext"] else None
+        items = f"(UID FLAGS INTERNALDATE RFC822.SIZE BODY.PEEK[HEADER.FIELDS ({' '.join(HEADER_FIELDS)})])"
+        while end is None or start <= end:
+            # 服务器未提供 UIDNEXT 时一次拉取全部新邮件
+            batch_end = min(start + self.batch_size - 1, end) if end is not None else "*"
+            typ, data = conn.uid("FETCH", f"{start}:{batch_end}", items)
+            if typ != "OK":
+                raise RuntimeError(f"拉取邮件头失败: {data}")
+            # 范围内没有邮件时服务器可能返回 UID 更小的最后一封，需要过滤
+            messages = [parse_header_fetch(meta, literals[0] if literals else b"")
+                        for meta, literals in _parse_fetch(data) if _UID.search(meta)]
+            messages = [m for m in messages if m["uid"] >= start]
+            if messages:
+                for message in messages:
+                    message["folder"] = folder
+                self.store.add_messages(account, folder, messages)
+                state["last_uid"] = max(state["last_uid"], max(m["uid"] for m in messages))
+                result["new"] += len(messages)
+            if end is None:
+                break
+            start = batch_end + 1
+
+        # 本地邮件数多于服务器时说明有邮件被删除
+        known = self.store.uids(account, folder)
+        if len(known) > status["exists"]:
+            typ, data = conn.uid("SEARCH", "ALL")
+            if typ == "OK":
+                alive = {int(uid) for uid in b" ".join(d for d in data if d).split()}
+                removed = [uid for uid in known if uid not in alive]
+                self.store.remove_messages(account, folder, removed)
+                result["removed"] = len(removed)
+
+        state["highestmodseq"] = status["highestmodseq"] if condstore else None
+        self.store.save_folder_state(account, folder, state)
+        logger.info(
+            f"同步 {account}/{folder}: {result['new']} 封新邮件, {result['flag_updates']} 封标记变化, "
+            f"{result['removed']} 封已删除, 耗时 {time.time() - started:.2f}s"
+        )
+        return result
+
+    def fetch_body(self, account: str, password: str, folder: str, uid: int) -> Dict[str, Any]:
+        """拉取邮件正文(已拉取过的直接读取存储)
+
+        Returns:
+            完整的邮件字典
+
+        Raises:
+            KeyError: 邮件不存在
+        """
+        message = self.store.get_message(account, folder, uid)
+        # 已拉取的正文只返回给以相同密码认证过的调用方
+        if message is not None and message.get("content") is not None \
+                and self.pool.authenticated(account, password):
+            return message
+
+        def fetch(conn: imaplib.IMAP4, entry: Dict[str, Any]) -> Optional[bytes]:
+            if entry["selected"] != folder:
+                self._select(conn, entry, folder)
+            typ, data = conn.uid("FETCH", str(uid), "(UID BODY.PEEK[])")
+            for meta, literals in _parse_fetch(data) if typ == "OK" else []:
+                match = _UID.search(meta)
+                if match and int(match.group(1)) == uid and literals:
+                    return literals[0]
+            return None
+
+        raw = self.pool.run(account, password, fetch)
+        if raw is None:
+            raise KeyError(f"邮件不存在: {folder}/{uid}")
+        content, attachments = parse_body(raw)
+        if message is None:
+            message = parse_header_fetch(f"UID {uid}".encode(), raw)
+            message["folder"] = folder
+            self.store.add_messages(account, folder, [message])
+        self.store.set_body(account, folder, uid, content, attachments)
+        message.update(content=content, attachments=attachments)
+        return message
+
+
+def _quote(folder: str) -> str:
+    """带空格或特殊字符的文件夹名需要加引号"""
+    if re.fullmatch(r"[A-Za-z0-9_./-]+", folder):
+        return folder
+    return '"' + folder.replace("\\", "\\\\").replace('"', '\\"') + '"'
@@ -0,0 +1,51 @@
+"""知识库入库队列
+
+文件监听发现的变化先进入队列，由知识库智能体分批取出入库，
+同一路径的多次变化只保留最后一次操作
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 队列支持的操作
+INGEST_ACTIONS = ("upsert", "delete")
+
+
+class IngestionQueue:
+    """按路径去重的线程安全入库队列"""
+
+    def __init__(self, max_size: int = 100000):
+        """初始化队列
+
+        Args:
+            max_size: 最多排队的路径数，超出时丢弃最早的项
+        """
+        self.max_size = max_size
+        self._items: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def put(self, path: str, action: str = "upsert"):
+        """加入队列，路径已在队列中时更新操作并移到队尾"""
+        if action not in INGEST_ACTIONS:
+            raise ValueError(f"不支持的入库操作: {action}")
+        with self._lock:
+            self._items.pop(path, None)
+            self._items[path] = action
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.dropped += 1
+
+    def drain(self, max_items: Optional[int] = None) -> List[Tuple[str, str]]:
+        """按加入顺序取出最多 max_items 项"""
+        with self._lock:
+            count = len(self._items) if max_items is None else min(max_items, len(self._items))
+            return [self._items.popitem(last=False) for _ in range(count)]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
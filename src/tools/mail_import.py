@@ -0,0 +1,278 @@
+"""邮件归档导入(mbox/Maildir)
+
+把多年的归档邮件流式导入本地邮件存储，供分类和检索使用:
+- mbox 按行读取，在 "From " 分隔行处切分，每次只解析一封邮件，不需要把整个文件读入内存；
+  Maildir 逐个读取 cur/new 下的邮件文件
+- 附件写入按内容哈希(SHA-256)命名的文件，相同附件只保存一份，存储中只记录哈希和路径
+- 以 Message-ID 去重(没有 Message-ID 的邮件用内容哈希生成)，已导入或已同步的邮件跳过
+- 按批写入，每批和断点在同一事务中提交；中断后再次导入同一来源时从断点继续
+  (mbox 记录字节偏移，Maildir 记录已处理邮件的唯一名)
+- 导入的邮件 UID 在目标文件夹内本地分配，目标不能是 IMAP 同步的文件夹(否则与服务器 UID 冲突)
+"""
+
+import email
+import hashlib
+import logging
+import os
+import time
+from email import policy
+from email.parser import BytesFeedParser
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Callable, Set
+
+from .imap_sync import header_fields, body_text
+from .mailbox_store import MailboxStore
+
+logger = logging.getLogger(__name__)
+
+# Maildir 文件名中的标记与 IMAP 标记的对应关系
+_MAILDIR_FLAGS = {"S": "\\Seen", "R": "\\Answered", "F": "\\Flagged", "T": "\\Deleted", "D": "\\Draft"}
+
+
+class AttachmentStore:
+    """按内容哈希保存附件文件"""
+
+    def __init__(self, root: str = "./data/email/attachments"):
+        """初始化附件存储
+
+        Args:
+            root: 附件目录
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def put(self, data: bytes) -> Tuple[str, str]:
+        """保存附件内容，返回 (SHA-256, 文件路径)，已存在时不重复写入"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.root / digest[:2] / digest
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp_path = path.with_name(f".{digest}.{os.getpid()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest, str(path)
+
+
+def iter_mbox(path: str, offset: int = 0) -> Iterator[Tuple[int, int, bytes]]:
+    """逐封读取 mbox 文件
+
+    Args:
+        path: mbox 文件路径
+        offset: 开始读取的字节偏移(必须是某封邮件的 "From " 行)
+
+    Yields:
+        (邮件起始偏移, 下一封邮件的起始偏移, 邮件原文)
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        start = offset
+        position = offset
+        lines: List[bytes] = []
+        previous_blank = True
+        for line in f:
+            if line.startswith(b"From ") and previous_blank:
+                if lines:
+                    yield start, position, b"".join(lines)
+                start = position
+                lines = []
+            elif line.startswith(b">") and line.lstrip(b">").startswith(b"From "):
+                # mboxrd 转义的正文行
+                lines.append(line[1:])
+            else:
+                lines.append(line)
+            previous_blank = line in (b"\n", b"\r\n")
+            position += len(line)
+        if lines:
+            yield start, position, b"".join(lines)
+
+
+def maildir_key(name: str) -> str:
+    """Maildir 邮件的唯一名(去掉 cur/new 目录和 ":2," 标记后缀)，邮件被阅读移动后不变"""
+    return name.rpartition("/")[2].partition(":2,")[0]
+
+
+def iter_maildir(path: str, skip: Optional[Set[str]] = None) -> Iterator[Tuple[str, List[str], str]]:
+    """按文件名顺序逐个列出 Maildir 中的邮件
+
+    Args:
+        path: Maildir 目录(包含 cur/new)
+        skip: 已处理的邮件唯一名(maildir_key)，这些邮件被跳过
+
+    Yields:
+        (相对路径, IMAP 标记, 文件路径)
+    """
+    names = []
+    for sub in ("cur", "new"):
+        directory = os.path.join(path, sub)
+        if os.path.isdir(directory):
+            with os.scandir(directory) as entries:
+                names.extend(f"{sub}/{entry.name}" for entry in entries
+                             if entry.is_file() and not entry.name.startswith("."))
+    names.sort()
+    for name in names:
+        if skip and maildir_key(name) in skip:
+            continue
+        info = name.rpartition(":2,")[2] if ":2," in name else ""
+        flags = [_MAILDIR_FLAGS[c] for c in info if c in _MAILDIR_FLAGS]
+        yield name, flags, os.path.join(path, name)
+
+
+class MailImporter:
+    """流式导入 mbox/Maildir 到本地邮件存储"""
+
+    def __init__(self, store: MailboxStore, attachments: AttachmentStore, batch_size: int = 500):
+        """初始化
+
+        Args:
+            store: 本地邮件存储
+            attachments: 附件存储
+            batch_size: 每个事务写入的邮件数
+        """
+        self.store = store
+        self.attachments = attachments
+        self.batch_size = max(1, batch_size)
+
+    def _to_message(self, message: email.message.EmailMessage, raw_digest: str,
+                    flags: List[str], size: int) -> Dict[str, Any]:
+        """把解析后的邮件转换为存储用的字典，附件写入附件存储"""
+        fields = header_fields(message)
+        if not fields["message_id"]:
+            fields["message_id"] = f"<{raw_digest}@import.local>"
+        status = str(message.get("Status", "")) + str(message.get("X-Status", ""))
+        if "R" in status and "\\Seen" not in flags:
+            flags = flags + ["\\Seen"]
+        attachments = []
+        for part in message.iter_attachments():
+            payload = part.get_payload(decode=True) or b""
+            digest, path = self.attachments.put(payload)
+            attachments.append({
+                "filename": part.get_filename() or "",
+                "content_type": part.get_content_type(),
+                "size": len(payload),
+                "sha256": digest,
+                "path": path
+            })
+        return {**fields, "flags": flags, "size": size, "content": body_text(message), "attachments": attachments}
+
+    def _sources(self, path: str, state: Optional[Dict[str, Any]]
+                 ) -> Iterator[Tuple[str, Optional[str], List[str], Any]]:
+        """产出 (断点位置, Maildir 邮件唯一名, 标记, 邮件内容来源)
+
+        mbox 只会追加，断点为字节偏移；Maildir 中的邮件会在 new/cur 间移动，文件名顺序不能作为断点，
+        改为跳过已处理的唯一名
+        """
+        if os.path.isdir(path):
+            skip = self.store.import_items(path) if state else None
+            for name, flags, file_path in iter_maildir(path, skip):
+                yield name, maildir_key(name), flags, file_path
+        else:
+            offset = int(state["position"]) if state and state["position"] else 0
+            if offset > os.path.getsize(path):
+                logger.warning(f"{path} 比上次导入时短，从头开始导入")
+                offset = 0
+            for _, end, raw in iter_mbox(path, offset):
+                yield str(end), None, [], raw
+
+    @staticmethod
+    def _parse(source) -> Tuple[email.message.EmailMessage, str, int]:
+        """解析一封邮件，返回 (邮件, 原文哈希, 大小)"""
+        digest = hashlib.sha256()
+        if isinstance(source, bytes):
+            digest.update(source)
+            return email.message_from_bytes(source, policy=policy.default), digest.hexdigest(), len(source)
+        # Maildir 文件分块读取，边计算哈希边解析
+        parser = BytesFeedParser(policy=policy.default)
+        size = 0
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+                parser.feed(chunk)
+                size += len(chunk)
+        return parser.close(), digest.hexdigest(), size
+
+    def import_path(
+        self,
+        path: str,
+        account: str,
+        folder: Optional[str] = None,
+        restart: bool = False,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """导入 mbox 文件或 Maildir 目录
+
+        Args:
+            path: mbox 文件或 Maildir 目录
+            account: 导入到的账号
+            folder: 导入到的文件夹，默认为 "Imported/<归档名>"
+            restart: 忽略断点从头导入(已导入的邮件仍按 Message-ID 去重)
+            progress_callback: 进度回调，每提交一批调用一次
+
+        Returns:
+            {"source", "folder", "processed", "imported", "duplicates", "errors",
+             "resumed": 是否从断点继续, "elapsed", "messages_per_second"}
+
+        Raises:
+            FileNotFoundError: 归档不存在
+            ValueError: 目标文件夹是 IMAP 同步的文件夹
+        """
+        source = str(Path(path).resolve())
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"归档不存在: {path}")
+        folder = folder or f"Imported/{Path(source).name}"
+        if self.store.folder_state(account, folder) is not None:
+            raise ValueError(f"{folder} 是 IMAP 同步的文件夹，不能作为导入目标")
+        if restart:
+            self.store.clear_import_state(source)
+        state = self.store.import_state(source)
+        resumed = bool(state and state["position"])
+
+        started = time.time()
+        totals = {"processed": state["processed"] if state else 0,
+                  "imported": state["imported"] if state else 0,
+                  "duplicates": state["duplicates"] if state else 0}
+        result = {"source": source, "folder": folder, "errors": 0, "resumed": resumed}
+        processed_now = 0
+        batch: List[Dict[str, Any]] = []
+        items: List[str] = []
+        position = state["position"] if state else None
+        logger.info(f"开始导入 {path} -> {account}/{folder}" + (" (从断点继续)" if resumed else ""))
+
+        def commit(finished: bool = False):
+            checkpoint = {"position": position, "processed": totals["processed"], "finished": finished,
+                          "imported": totals["imported"], "duplicates": totals["duplicates"]}
+            inserted = self.store.import_batch(account, folder, batch, source, checkpoint, items)
+            totals["imported"] += inserted
+            totals["duplicates"] += len(batch) - inserted
+            batch.clear()
+            items.clear()
+            if progress_callback is not None:
+                elapsed = time.time() - started
+                progress_callback({**totals, "errors": result["errors"], "position": position,
+                                   "messages_per_second": processed_now / elapsed if elapsed else 0.0})
+
+        for position, key, flags, item in self._sources(source, state):
+            totals["processed"] += 1
+            processed_now += 1
+            if key is not None:
+                items.append(key)
+            try:
+                message, digest, size = self._parse(item)
+                batch.append(self._to_message(message, digest, flags, size))
+            except Exception as e:
+                result["errors"] += 1
+                logger.warning(f"解析邮件失败 {path}@{position}: {e}")
+            if totals["processed"] % self.batch_size == 0:
+                commit()
+        commit(finished=True)
+
+        elapsed = time.time() - started
+        result.update(totals)
+        result["elapsed"] = elapsed
+        result["messages_per_second"] = processed_now / elapsed if elapsed else 0.0
+        logger.info(
+            f"导入完成 {path}: 处理 {processed_now} 封, 新增 {totals['imported']} 封, "
+            f"重复 {totals['duplicates']} 封, 失败 {result['errors']} 封, "
+            f"{result['messages_per_second']:.0f} 封/秒"
+        )
+        return result
@@ -0,0 +1,382 @@
+"""批量模板填充(邮件合并)
+
+模板只解析一次，编译为 "文本片段 + 字段引用" 的序列，渲染一条记录只需按顺序拼接。
+占位符与 PromptEngine 一致使用 string.Template 语法 ($name / ${name})，
+${a.b} 读取嵌套字段，$$ 表示字面的 $:
+- 纯文本/Markdown/HTML 模板整体编译，HTML 中的字段值会转义
+- DOCX 模板只编译正文、页眉、页脚等 XML 部件，其余部件(图片、样式)原样复制；
+  Word 常把占位符拆到多个 run 中，编译时会跳过占位符内部的标签并在字段值之后保留这些标签
+
+记录从 CSV/JSONL 流式读取，按批分发给工作进程，进程内直接写出文件，
+在途批次数有上限，内存占用与记录总数无关。单条记录出错(缺少字段、数据格式错误、写入失败)
+只记入错误报告，不中断整个批次
+"""
+
+import csv
+import html
+import json
+import logging
+import os
+import re
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple, Union, Callable
+from xml.sax.saxutils import escape as xml_escape
+
+logger = logging.getLogger(__name__)
+
+# 错误报告中随结果返回的条数(完整列表写入输出目录的错误文件)
+MAX_REPORTED_ERRORS = 100
+
+ERROR_FILE = "merge_errors.jsonl"
+
+# DOCX 中需要填充的部件
+_DOCX_PARTS = re.compile(r"word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml$")
+
+_TAGS = r"(?:<[^>]*>)*"
+# 占位符: $$、$name、${name}；XML 模板中 $ 与 { 以及字段名中间可能夹着标签
+_PLACEHOLDER = re.compile(r"\$(?:(\$)|([_a-zA-Z][_a-zA-Z0-9]*)|\{([ \t_a-zA-Z0-9.]+)\})")
+_XML_PLACEHOLDER = re.compile(
+    r"\$(?:(\$)|([_a-zA-Z][_a-zA-Z0-9]*)|(" + _TAGS + r")\{((?:[ \t_a-zA-Z0-9.]|<[^>]*>)+)\})"
+)
+_TAG = re.compile(r"<[^>]*>")
+_UNSAFE_FILENAME = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+class MergeError(Exception):
+    """单条记录的渲染错误"""
+
+
+class CompiledTemplate:
+    """编译后的模板: 字面文本与字段路径交替的片段序列"""
+
+    def __init__(self, source: str, xml: bool = False, escape: Optional[Callable[[str], str]] = None):
+        """编译模板
+
+        Args:
+            source: 模板文本
+            xml: 是否为 XML 部件(占位符中可能夹着标签)
+            escape: 字段值的转义函数
+        """
+        self.escape = escape
+        # 偶数位为字面文本，奇数位为字段路径(元组)
+        self.segments: List[Union[str, Tuple[str, ...]]] = []
+        literal: List[str] = []
+        position = 0
+        pattern = _XML_PLACEHOLDER if xml else _PLACEHOLDER
+        for match in pattern.finditer(source):
+            literal.append(source[position:match.start()])
+            position = match.end()
+            if match.group(1):
+                literal.append("$")
+                continue
+            if xml and match.group(4) is not None:
+                name = _TAG.sub("", match.group(4))
+                # 被跳过的标签放在字段值之后，保持 XML 结构完整
+                trailing = match.group(3) + "".join(_TAG.findall(match.group(4)))
+            else:
+                name = match.group(2) or match.group(3)
+                trailing = ""
+            self.segments.append("".join(literal))
+            self.segments.append(tuple(name.strip().split(".")))
+            literal = [trailing]
+        literal.append(source[position:])
+        self.segments.append("".join(literal))
+
+    @property
+    def fields(self) -> List[str]:
+        """模板引用的字段(去重，保持顺序)"""
+        return list(dict.fromkeys(".".join(path) for path in self.segments[1::2]))
+
+    def render(self, record: Dict[str, Any]) -> str:
+        """用一条记录渲染模板
+
+        Raises:
+            MergeError: 记录缺少模板引用的字段
+        """
+        parts = []
+        for index, segment in enumerate(self.segments):
+            if index % 2 == 0:
+                parts.append(segment)
+                continue
+            value: Any = record
+            for key in segment:
+                if not isinstance(value, dict) or key not in value:
+                    raise MergeError(f"缺少字段: {'.'.join(segment)}")
+                value = value[key]
+            text = "" if value is None else str(value)
+            parts.append(self.escape(text) if self.escape else text)
+        return "".join(parts)
+
+
+class TextMergeTemplate:
+    """纯文本/Markdown/HTML 模板"""
+
+    def __init__(self, path: str):
+        self.suffix = Path(path).suffix.lower()
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            source = f.read()
+        escape = html.escape if self.suffix in (".html", ".htm") else None
+        self.compiled = CompiledTemplate(source, escape=escape)
+        self.fields = self.compiled.fields
+
+    def write(self, record: Dict[str, Any], f):
+        f.write(self.compiled.render(record).encode("utf-8"))
+
+
+class DocxMergeTemplate:
+    """DOCX 模板，只编译包含正文的 XML 部件"""
+
+    suffix = ".docx"
+
+    def __init__(self, path: str):
+        self.entries: List[Tuple[zipfile.ZipInfo, Union[bytes, CompiledTemplate]]] = []
+        fields: List[str] = []
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                data = zf.read(info)
+                if _DOCX_PARTS.match(info.filename):
+                    compiled = CompiledTemplate(data.decode("utf-8"), xml=True, escape=xml_escape)
+                    fields.extend(compiled.fields)
+                    self.entries.append((info, compiled))
+                else:
+                    self.entries.append((info, data))
+        self.fields = list(dict.fromkeys(fields))
+
+    def write(self, record: Dict[str, Any], f):
+        # 先渲染全部部件，缺少字段时不产生残缺的文件
+        rendered = [
+            (info, part.render(record).encode("utf-8") if isinstance(part, CompiledTemplate) else part)
+            for info, part in self.entries
+        ]
+        with zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for info, data in rendered:
+                zf.writestr(info, data)
+
+
+def load_template(path: str):
+    """按扩展名加载并编译模板
+
+    Raises:
+        FileNotFoundError: 模板不存在
+        ValueError: 不支持的模板类型
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"模板不存在: {path}")
+    suffix = Path(path).suffix.lower()
+    if suffix == ".docx":
+        return DocxMergeTemplate(path)
+    if suffix in (".txt", ".md", ".html", ".htm", ".xml", ".csv", ".json", ".eml"):
+        return TextMergeTemplate(path)
+    raise ValueError(f"不支持的模板类型: {suffix}")
+
+
+def iter_records(path: str) -> Iterator[Union[Dict[str, Any], MergeError]]:
+    """流式读取 CSV/JSONL 数据源，无法解析的行产出 MergeError"""
+    suffix = Path(path).suffix.lower()
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if suffix == ".csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                # 多出的值放在键 None 下，缺少的值为 None
+                if None in row or None in row.values():
+                    yield MergeError(f"第 {reader.line_num} 行字段数与表头不一致")
+                else:
+                    yield row
+        elif suffix in (".jsonl", ".ndjson"):
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield MergeError(f"JSON 格式错误: {e}")
+                    continue
+                yield record if isinstance(record, dict) else MergeError("记录不是 JSON 对象")
+        else:
+            raise ValueError(f"不支持的数据源类型: {suffix}")
+
+
+class _Renderer:
+    """渲染并写出单条记录(在工作进程中运行)"""
+
+    def __init__(self, template, output_dir: str, filename: CompiledTemplate, overwrite: bool):
+        self.template = template
+        self.output_dir = output_dir
+        self.filename = filename
+        self.overwrite = overwrite
+
+    def output_name(self, index: int, record: Dict[str, Any]) -> str:
+        name = self.filename.render({**record, "_index": index})
+        name = _UNSAFE_FILENAME.sub("_", name).strip(" .")[:150] or f"record_{index}"
+        if not name.lower().endswith(self.template.suffix):
+            name += self.template.suffix
+        return name
+
+    def render(self, index: int, record) -> Tuple[int, Optional[str], Optional[str]]:
+        """返回 (序号, 输出路径, 错误)"""
+        if isinstance(record, MergeError):
+            return index, None, str(record)
+        try:
+            path = os.path.join(self.output_dir, self.output_name(index, record))
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'wb') as f:
+                    self.template.write(record, f)
+                if self.overwrite:
+                    os.replace(tmp_path, path)
+                else:
+                    # 硬链接在目标已存在时失败，避免并发写入互相覆盖
+                    try:
+                        os.link(tmp_path, path)
+                    except FileExistsError:
+                        raise MergeError(f"输出文件已存在: {os.path.basename(path)}")
+            finally:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+            return index, path, None
+        except (MergeError, OSError, ValueError, TypeError) as e:
+            return index, None, str(e)
+
+    def render_batch(self, batch: List[Tuple[int, Any]]) -> List[Tuple[int, Optional[str], Optional[str]]]:
+        return [self.render(index, record) for index, record in batch]
+
+
+_worker_renderer: Optional[_Renderer] = None
+
+
+def _init_worker(renderer: _Renderer):
+    global _worker_renderer
+    _worker_renderer = renderer
+
+
+def _render_batch(batch):
+    return _worker_renderer.render_batch(batch)
+
+
+class MailMerge:
+    """批量模板填充"""
+
+    def __init__(
+        self,
+        template_path: str,
+        output_dir: str,
+        filename_template: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        batch_size: int = 50,
+        overwrite: bool = False
+    ):
+        """初始化
+
+        Args:
+            template_path: 模板路径(.docx/.txt/.md/.html 等)
+            output_dir: 输出目录
+            filename_template: 输出文件名模板(如 "${id}_${name}")，默认按记录序号命名；
+                $_index 为记录序号(从1开始)
+            max_workers: 工作进程数，0 表示在当前进程中渲染，默认为 CPU 数
+            batch_size: 每次分发给工作进程的记录数
+            overwrite: 输出文件已存在时是否覆盖
+        """
+        self.template = load_template(template_path)
+        self.output_dir = str(output_dir)
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.batch_size = max(1, batch_size)
+        stem = Path(template_path).stem
+        self.renderer = _Renderer(
+            self.template,
+            self.output_dir,
+            CompiledTemplate(filename_template or f"{stem.replace('$', '$$')}_${{_index}}"),
+            overwrite
+        )
+
+    @property
+    def fields(self) -> List[str]:
+        """模板引用的字段"""
+        return self.template.fields
+
+    def _batches(self, records: Iterable) -> Iterator[List[Tuple[int, Any]]]:
+        batch = []
+        for index, record in enumerate(records, 1):
+            batch.append((index, record))
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _results(self, records: Iterable) -> Iterator[Tuple[int, Optional[str], Optional[str]]]:
+        """按记录顺序产出渲染结果，在途批次数有上限"""
+        batches = self._batches(records)
+        if self.max_workers <= 1:
+            for batch in batches:
+                yield from self.renderer.render_batch(batch)
+            return
+        with ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=_init_worker, initargs=(self.renderer,)
+        ) as pool:
+            pending = deque()
+            for batch in batches:
+                pending.append(pool.submit(_render_batch, batch))
+                if len(pending) >= self.max_workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def run(
+        self,
+        records: Union[str, Iterable[Dict[str, Any]]],
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """渲染全部记录
+
+        Args:
+            records: CSV/JSONL 数据源路径，或记录字典的可迭代对象(可以是生成器)
+            progress_callback: 进度回调，每完成或失败一条记录调用一次
+
+        Returns:
+            {"output_dir", "total", "succeeded", "failed", "errors": [前若干条错误],
+             "error_report": 完整错误文件路径, "elapsed", "records_per_second"}
+        """
+        started = time.time()
+        os.makedirs(self.output_dir, exist_ok=True)
+        if isinstance(records, (str, Path)):
+            records = iter_records(str(records))
+        logger.info(f"开始批量填充模板，输出到 {self.output_dir}")
+
+        result: Dict[str, Any] = {"output_dir": self.output_dir, "total": 0, "succeeded": 0,
+                                  "failed": 0, "errors": [], "error_report": None}
+        error_path = os.path.join(self.output_dir, ERROR_FILE)
+        error_file = None
+        try:
+            for index, path, error in self._results(records):
+                result["total"] += 1
+                event = {"index": index, "output": path, "completed": result["total"]}
+                if error is None:
+                    result["succeeded"] += 1
+                    event["event"] = "rendered"
+                else:
+                    result["failed"] += 1
+                    event.update(event="failed", error=error)
+                    logger.warning(f"第 {index} 条记录填充失败: {error}")
+                    if error_file is None:
+                        error_file = open(error_path, 'w', encoding='utf-8')
+                        result["error_report"] = error_path
+                    error_file.write(json.dumps({"index": index, "error": error}, ensure_ascii=False) + "\n")
+                    if len(result["errors"]) < MAX_REPORTED_ERRORS:
+                        result["errors"].append({"index": index, "error": error})
+                if progress_callback is not None:
+                    progress_callback(event)
+        finally:
+            if error_file is not None:
+                error_file.close()
+
+        result["elapsed"] = time.time() - started
+        result["records_per_second"] = result["total"] / result["elapsed"] if result["elapsed"] else 0.0
+        logger.info(
+            f"批量填充完成: {result['succeeded']} 成功, {result['failed']} 失败, "
+            f"{result['records_per_second']:.1f} 条/秒"
+        )
+        return result
@@ -0,0 +1,437 @@
+"""本地邮件存储
+
+IMAP 增量同步的结果保存在 SQLite 中，筛选和搜索在本地完成，只有新邮件才需要访问服务器:
+- messages 表按 (账号, 文件夹, UID) 唯一，日期和文件夹上有索引
+- messages_fts 为外部内容的 FTS5 索引(主题、发件人、正文)，由触发器维护；
+  使用 trigram 分词，中文等无空格的文本也能按子串检索，少于3个字符的关键词退回 LIKE
+- folders 表保存每个文件夹的同步状态(UIDVALIDITY、已同步的最大 UID、HIGHESTMODSEQ)
+- imports 表保存归档导入的断点，与导入的邮件在同一事务中提交
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Set
+
+logger = logging.getLogger(__name__)
+
+# trigram 分词能检索的最短关键词
+_MIN_FTS_TERM = 3
+
+
+def _timestamp(value: Optional[str], end_of_day: bool = False) -> Optional[float]:
+    """ISO 日期/时间转换为时间戳，只有日期时 end_of_day 取当天结束"""
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    if end_of_day and len(str(value)) == 10:
+        moment = moment.replace(hour=23, minute=59, second=59, microsecond=999999)
+    if moment.tzinfo is None:
+        moment = moment.astimezone()
+    return moment.timestamp()
+
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+class MailboxStore:
+    """SQLite 邮件存储，提供 ImapSync 需要的存储接口和本地检索"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY,
+            account TEXT NOT NULL,
+            folder TEXT NOT NULL,
+            uid INTEGER NOT NULL,
+            message_id TEXT,
+            sender TEXT,
+            recipients TEXT,
+            cc TEXT,
+            subject TEXT,
+            date TEXT,
+            date_ts REAL,
+            flags TEXT NOT NULL DEFAULT '[]',
+            size INTEGER NOT NULL DEFAULT 0,
+            content TEXT,
+            attachments TEXT NOT NULL DEFAULT '[]',
+            UNIQUE (account, folder, uid)
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_date ON messages(account, date_ts);
+        CREATE INDEX IF NOT EXISTS idx_messages_folder ON messages(account, folder, date_ts);
+        CREATE INDEX IF NOT EXISTS idx_messages_message_id ON messages(message_id);
+
+        CREATE TABLE IF NOT EXISTS folders (
+            account TEXT NOT NULL,
+            folder TEXT NOT NULL,
+            uidvalidity INTEGER,
+            last_uid INTEGER NOT NULL DEFAULT 0,
+            highestmodseq INTEGER,
+            PRIMARY KEY (account, folder)
+        );
+
+        CREATE TABLE IF NOT EXISTS imports (
+            source TEXT PRIMARY KEY,
+            account TEXT NOT NULL,
+            folder TEXT NOT NULL,
+            position TEXT,
+            processed INTEGER NOT NULL DEFAULT 0,
+            imported INTEGER NOT NULL DEFAULT 0,
+            duplicates INTEGER NOT NULL DEFAULT 0,
+            finished INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL NOT NULL
+        );
+
+        -- 已处理的 Maildir 邮件(唯一名，不含 cur/new 和标记后缀)，邮件在 new/cur 间移动后仍能识别
+        CREATE TABLE IF NOT EXISTS import_items (
+            source TEXT NOT NULL,
+            name TEXT NOT NULL,
+            PRIMARY KEY (source, name)
+        ) WITHOUT ROWID;
+
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+            subject, sender, content,
+            content='messages', content_rowid='id', tokenize='trigram'
+        );
+        CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts(rowid, subject, sender, content)
+            VALUES (new.id, new.subject, new.sender, new.content);
+        END;
+        CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, subject, sender, content)
+            VALUES ('delete', old.id, old.subject, old.sender, old.content);
+        END;
+        CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE OF subject, sender, content ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, subject, sender, content)
+            VALUES ('delete', old.id, old.subject, old.sender, old.content);
+            INSERT INTO messages_fts(rowid, subject, sender, content)
+            VALUES (new.id, new.subject, new.sender, new.content);
+        END;
+    """
+
+    _COLUMNS = ("account, folder, uid, message_id, sender, recipients, cc, subject, date, date_ts, "
+                "flags, size, content, attachments")
+
+    def __init__(self, db_path: str = "./data/email/mailbox.db"):
+        """初始化邮件存储
+
+        Args:
+            db_path: 数据库路径
+        """
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.RLock()
+
+        logger.info(f"邮件存储初始化完成: {db_path}")
+
+    def close(self):
+        """关闭数据库"""
+        with self._lock:
+            self._conn.close()
+
+    # ---- 同步状态 ----
+
+    def folder_state(self, account: str, folder: str) -> Optional[Dict[str, Any]]:
+        """文件夹同步状态 {"uidvalidity", "last_uid", "highestmodseq"}"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT uidvalidity, last_uid, highestmodseq FROM folders WHERE account = ? AND folder = ?",
+                (account, folder)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def save_folder_state(self, account: str, folder: str, state: Dict[str, Any]):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO folders (account, folder, uidvalidity, last_uid, highestmodseq) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (account, folder, state.get("uidvalidity"), state.get("last_uid", 0), state.get("highestmodseq"))
+            )
+
+    def reset_folder(self, account: str, folder: str):
+        """UIDVALIDITY 变化时清空文件夹"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE account = ? AND folder = ?", (account, folder))
+            self._conn.execute("DELETE FROM folders WHERE account = ? AND folder = ?", (account, folder))
+
+    # ---- 邮件 ----
+
+    @staticmethod
+    def _row_values(account: str, folder: str, message: Dict[str, Any]) -> Tuple:
+        return (
+            account, folder, message["uid"], message.get("message_id") or None,
+            message.get("from", ""), message.get("to", ""), message.get("cc", ""), message.get("subject", ""),
+            message.get("date", ""), _timestamp(message.get("date")),
+            json.dumps(message.get("flags", []), ensure_ascii=False), message.get("size", 0),
+            message.get("content"), json.dumps(message.get("attachments", []), ensure_ascii=False)
+        )
+
+    def add_messages(self, account: str, folder: str, messages: Iterable[Dict[str, Any]]):
+        """写入邮件(同一 UID 已存在时覆盖)，一批在一个事务中完成"""
+        rows = [self._row_values(account, folder, message) for message in messages]
+        # 用 UPSERT 而不是 INSERT OR REPLACE: REPLACE 删除旧行时不触发删除触发器，全文索引会残留旧内容
+        updates = ", ".join(f"{column} = excluded.{column}" for column in self._COLUMNS.split(", ")[3:])
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO messages ({self._COLUMNS}) VALUES ({', '.join('?' * 14)}) "
+                f"ON CONFLICT (account, folder, uid) DO UPDATE SET {updates}",
+                rows
+            )
+
+    def import_state(self, source: str) -> Optional[Dict[str, Any]]:
+        """归档导入的断点 {"position", "processed", "imported", "duplicates", "finished"}"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT account, folder, position, processed, imported, duplicates, finished "
+                "FROM imports WHERE source = ?", (source,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def is_import_folder(self, account: str, folder: str) -> bool:
+        """文件夹是否为归档导入的目标(其 UID 由本地分配，不能再与 IMAP 同步)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM imports WHERE account = ? AND folder = ? LIMIT 1", (account, folder)
+            ).fetchone() is not None
+
+    def import_items(self, source: str) -> Set[str]:
+        """来源中已处理的邮件唯一名(Maildir 断点)"""
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT name FROM import_items WHERE source = ?", (source,))}
+
+    def clear_import_state(self, source: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM imports WHERE source = ?", (source,))
+            self._conn.execute("DELETE FROM import_items WHERE source = ?", (source,))
+
+    def import_batch(
+        self,
+        account: str,
+        folder: str,
+        messages: List[Dict[str, Any]],
+        source: str,
+        checkpoint: Dict[str, Any],
+        items: Iterable[str] = ()
+    ) -> int:
+        """在一个事务中写入一批导入的邮件并保存断点
+
+        同一账号下 Message-ID 已存在的邮件跳过(包括 IMAP 同步来的邮件)，
+        UID 在文件夹内顺序分配。IMAP 同步的文件夹的 UID 由服务器分配，不能作为导入目标
+
+        Args:
+            account: 邮箱账号
+            folder: 导入到的文件夹
+            messages: 邮件字典列表(不需要 uid)
+            source: 导入来源(归档路径)
+            checkpoint: 断点 {"position", "processed", "imported", "duplicates", "finished"}，
+                imported/duplicates 为本批之前的累计值
+            items: 本批处理过的邮件唯一名(Maildir)，与断点一起记录
+
+        Returns:
+            实际写入的邮件数
+
+        Raises:
+            ValueError: 目标文件夹是 IMAP 同步的文件夹
+        """
+        rows = []
+        for message in messages:
+            values = self._row_values(account, folder, {**message, "uid": None})
+            rows.append(values[:2] + (account, folder) + values[3:] + (account, values[3]))
+        # UID 在插入时按行取文件夹内当前最大值 + 1，跳过的重复邮件不占用 UID
+        columns = "?, ?, (SELECT COALESCE(MAX(uid), 0) + 1 FROM messages WHERE account = ? AND folder = ?), " \
+            + ", ".join("?" * 11)
+        with self._lock, self._conn:
+            if self._conn.execute("SELECT 1 FROM folders WHERE account = ? AND folder = ?",
+                                  (account, folder)).fetchone():
+                raise ValueError(f"{folder} 是 IMAP 同步的文件夹，不能作为导入目标")
+            cursor = self._conn.executemany(
+                f"INSERT INTO messages ({self._COLUMNS}) SELECT {columns} "
+                "WHERE NOT EXISTS (SELECT 1 FROM messages WHERE account = ? AND message_id = ?)",
+                rows
+            )
+            inserted = cursor.rowcount
+            self._conn.execute(
+                "INSERT OR REPLACE INTO imports (source, account, folder, position, processed, imported, "
+                "duplicates, finished, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (source, account, folder, checkpoint.get("position"), checkpoint.get("processed", 0),
+                 checkpoint.get("imported", 0) + inserted,
+                 checkpoint.get("duplicates", 0) + len(messages) - inserted,
+                 int(bool(checkpoint.get("finished"))), time.time())
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO import_items (source, name) VALUES (?, ?)",
+                [(source, name) for name in items]
+            )
+        return inserted
+
+    def update_flags(self, account: str, folder: str, flags: Dict[int, List[str]]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE messages SET flags = ? WHERE account = ? AND folder = ? AND uid = ?",
+                [(json.dumps(values), account, folder, uid) for uid, values in flags.items()]
+            )
+
+    def remove_messages(self, account: str, folder: str, uids: Iterable[int]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM messages WHERE account = ? AND folder = ? AND uid = ?",
+                [(account, folder, uid) for uid in uids]
+            )
+
+    def uids(self, account: str, folder: str) -> List[int]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT uid FROM messages WHERE account = ? AND folder = ? ORDER BY uid", (account, folder)
+            )]
+
+    def flags(self, account: str, folder: str) -> Dict[int, List[str]]:
+        """文件夹中各邮件的标记 {UID: [标记...]}"""
+        with self._lock:
+            return {uid: json.loads(flags or "[]") for uid, flags in self._conn.execute(
+                "SELECT uid, flags FROM messages WHERE account = ? AND folder = ?", (account, folder)
+            )}
+
+    def set_body(self, account: str, folder: str, uid: int, content: str, attachments: List[Dict[str, Any]]):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE messages SET content = ?, attachments = ? WHERE account = ? AND folder = ? AND uid = ?",
+                (content, json.dumps(attachments, ensure_ascii=False), account, folder, uid)
+            )
+
+    @staticmethod
+    def _to_message(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "account": row["account"],
+            "folder": row["folder"],
+            "uid": row["uid"],
+            "message_id": row["message_id"] or "",
+            "from": row["sender"],
+            "to": row["recipients"],
+            "cc": row["cc"],
+            "subject": row["subject"],
+            "date": row["date"],
+            "flags": json.loads(row["flags"]),
+            "size": row["size"],
+            "content": row["content"],
+            "attachments": json.loads(row["attachments"])
+        }
+
+    def get_message(self, account: str, folder: str, uid: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM messages WHERE account = ? AND folder = ? AND uid = ?", (account, folder, uid)
+            ).fetchone()
+        return self._to_message(row) if row else None
+
+    def list_messages(self, account: str, folder: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """按日期降序列出文件夹中的邮件"""
+        return self.search(account, folder=folder, limit=limit)
+
+    # ---- 检索 ----
+
+    def search(
+        self,
+        account: str,
+        query: Optional[str] = None,
+        folder: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        time_range: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = 50,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """在本地检索邮件，按日期降序返回
+
+        Args:
+            account: 邮箱账号
+            query: 全文关键词(空格分隔，全部匹配)，检索主题、发件人和正文
+            folder: 文件夹，None 表示全部文件夹
+            filters: {"from": 发件人包含, "to": 收件人包含, "subject_contains": 主题包含,
+                      "unread": 是否未读, "flagged": 是否标星, "has_attachments": 是否有附件}
+            time_range: {"start": "2024-01-01", "end": "2024-01-31"}，只有日期的 end 包含当天
+            limit: 最多返回数，None 表示不限
+            offset: 跳过的条数
+        """
+        filters = dict(filters or {})
+        folder = folder or filters.pop("folder", None)
+        where = ["m.account = ?"]
+        params: List[Any] = [account]
+        match_terms: List[str] = []
+
+        def text_condition(column: str, fts_column: Optional[str], value: str):
+            for term in str(value).split():
+                if fts_column and len(term) >= _MIN_FTS_TERM:
+                    match_terms.append(f"{fts_column} : {_fts_phrase(term)}")
+                else:
+                    where.append(f"{column} LIKE ? ESCAPE '\\'")
+                    params.append("%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+
+        if folder:
+            where.append("m.folder = ?")
+            params.append(folder)
+        start = _timestamp((time_range or {}).get("start"))
+        end = _timestamp((time_range or {}).get("end"), end_of_day=True)
+        if start is not None:
+            where.append("m.date_ts >= ?")
+            params.append(start)
+        if end is not None:
+            where.append("m.date_ts <= ?")
+            params.append(end)
+        if query:
+            for term in query.split():
+                if len(term) >= _MIN_FTS_TERM:
+                    match_terms.append(_fts_phrase(term))
+                else:
+                    text_condition("(m.subject || ' ' || m.sender || ' ' || COALESCE(m.content, ''))", None, term)
+        if filters.get("from"):
+            text_condition("m.sender", "sender", filters["from"])
+        if filters.get("subject_contains"):
+            text_condition("m.subject", "subject", filters["subject_contains"])
+        if filters.get("to"):
+            text_condition("(m.recipients || ' ' || m.cc)", None, filters["to"])
+        if "unread" in filters:
+            where.append(("NOT " if filters["unread"] else "") + "m.flags LIKE '%\\\\Seen%'")
+        if "flagged" in filters:
+            where.append(("" if filters["flagged"] else "NOT ") + "m.flags LIKE '%\\\\Flagged%'")
+        if "has_attachments" in filters:
+            where.append("m.attachments " + ("!=" if filters["has_attachments"] else "=") + " '[]'")
+
+        sql = "SELECT m.* FROM messages m"
+        if match_terms:
+            sql += " JOIN messages_fts f ON f.rowid = m.id"
+            where.append("messages_fts MATCH ?")
+            params.append(" AND ".join(match_terms))
+        sql += " WHERE " + " AND ".join(where) + " ORDER BY m.date_ts DESC, m.id DESC"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._to_message(row) for row in rows]
+
+    def get_stats(self, account: Optional[str] = None) -> Dict[str, Any]:
+        """邮件数量统计"""
+        sql = "SELECT folder, COUNT(*), SUM(content IS NOT NULL) FROM messages"
+        params: Tuple = ()
+        if account:
+            sql += " WHERE account = ?"
+            params = (account,)
+        with self._lock:
+            rows = self._conn.execute(sql + " GROUP BY folder", params).fetchall()
+        return {
+            "messages": sum(row[1] for row in rows),
+            "bodies": sum(row[2] or 0 for row in rows),
+            "folders": {row[0]: row[1] for row in rows}
+        }
@@ -0,0 +1,176 @@
+"""批量移动规划
+
+在执行前一次性完成: 按目标目录分组、每个目录只列出一次已有文件、
+提前解决目标冲突，并把相互依赖的移动(目标是另一项的源文件)排成顺序执行，
+其余互不相关的移动可以并发执行
+"""
+
+import os
+from collections import defaultdict
+from typing import List, Dict, Any, Tuple, Set, Iterable, Optional
+
+# 冲突处理方式
+CONFLICT_POLICIES = ("rename", "overwrite", "skip")
+
+
+class MoveOp:
+    """单个移动操作
+
+    打破循环时一项移动拆成两步: 先移到临时名(hop 为最终目标)，再从临时名移入目标(origin 为原始源)
+    """
+
+    __slots__ = ("src", "dst", "overwrite", "hop", "origin")
+
+    def __init__(self, src: str, dst: str, overwrite: bool = False,
+                 hop: Optional[str] = None, origin: Optional[str] = None):
+        self.src = src
+        self.dst = dst
+        self.overwrite = overwrite
+        self.hop = hop
+        self.origin = origin
+
+    def __repr__(self) -> str:
+        return f"MoveOp({self.src!r} -> {self.dst!r})"
+
+
+def _list_names(directory: str) -> Set[str]:
+    """列出目录下已有的名称(目录不存在时为空)"""
+    try:
+        with os.scandir(directory) as it:
+            return {entry.name for entry in it}
+    except (FileNotFoundError, NotADirectoryError):
+        return set()
+
+
+def _free_name(name: str, occupied: Set[str]) -> str:
+    """生成不冲突的文件名: report.pdf -> report (1).pdf"""
+    stem, ext = os.path.splitext(name)
+    n = 1
+    while f"{stem} ({n}){ext}" in occupied:
+        n += 1
+    return f"{stem} ({n}){ext}"
+
+
+def plan_moves(
+    moves: Iterable[Tuple[str, str]],
+    on_conflict: str = "rename",
+    temp_tag: str = "tmp"
+) -> Dict[str, Any]:
+    """生成移动计划
+
+    Args:
+        moves: (源路径, 目标路径) 序列
+        on_conflict: 目标已存在或多个源指向同一目标时的处理方式
+            rename - 目标改名为 "name (n).ext"; overwrite - 备份后覆盖; skip - 跳过
+        temp_tag: 打破循环依赖(如 a->b, b->a)时临时文件名使用的标记
+
+    Returns:
+        {"parallel": [MoveOp], "sequential": [MoveOp], "directories": [目录],
+         "skipped": [{"source", "target", "reason"}], "renamed": N}
+    """
+    if on_conflict not in CONFLICT_POLICIES:
+        raise ValueError(f"不支持的冲突处理方式: {on_conflict} (可用: {', '.join(CONFLICT_POLICIES)})")
+
+    ops: List[MoveOp] = []
+    skipped: List[Dict[str, str]] = []
+    seen_sources: Set[str] = set()
+    for src, dst in moves:
+        src, dst = os.path.abspath(src), os.path.abspath(dst)
+        if src == dst:
+            skipped.append({"source": src, "target": dst, "reason": "源路径与目标相同"})
+        elif src in seen_sources:
+            skipped.append({"source": src, "target": dst, "reason": "重复的源路径"})
+        else:
+            seen_sources.add(src)
+            ops.append(MoveOp(src, dst))
+
+    # 按目标目录分组，每个目录只列出一次
+    by_dir: Dict[str, List[MoveOp]] = defaultdict(list)
+    for op in ops:
+        by_dir[os.path.dirname(op.dst)].append(op)
+
+    # 即将被移走的源文件不算占用
+    vacating: Dict[str, Set[str]] = defaultdict(set)
+    for op in ops:
+        vacating[os.path.dirname(op.src)].add(os.path.basename(op.src))
+
+    directories = []
+    renamed = 0
+    planned: List[MoveOp] = []
+    for directory, group in by_dir.items():
+        existing = _list_names(directory)
+        if not existing and not os.path.isdir(directory):
+            directories.append(directory)
+        occupied = set(existing)
+        claimed: Set[str] = set()
+        for op in group:
+            name = os.path.basename(op.dst)
+            clash_batch = name in claimed
+            clash_disk = name in existing and name not in vacating[directory]
+            if clash_batch or clash_disk:
+                if on_conflict == "skip":
+                    skipped.append({"source": op.src, "target": op.dst, "reason": "目标已存在"})
+                    continue
+                if on_conflict == "rename" or clash_batch:
+                    name = _free_name(name, occupied | claimed)
+                    op.dst = os.path.join(directory, name)
+                    renamed += 1
+                else:
+                    op.overwrite = True
+            claimed.add(name)
+            occupied.add(name)
+            planned.append(op)
+
+    parallel, sequential = _order(planned, temp_tag)
+    return {
+        "parallel": parallel,
+        "sequential": sequential,
+        "directories": directories,
+        "skipped": skipped,
+        "renamed": renamed,
+    }
+
+
+def _order(ops: List[MoveOp], temp_tag: str) -> Tuple[List[MoveOp], List[MoveOp]]:
+    """拆分为可并发执行的独立移动和需按依赖顺序执行的移动
+
+    目标是另一项源文件的移动必须等待那一项完成。目标互不相同，
+    依赖关系只会构成链和环: 链从末端开始依次执行，环先把其中一项移到临时名再展开
+    """
+    sources = {op.src for op in ops}
+    targets = {op.dst for op in ops}
+    chained = [op for op in ops if op.dst in sources or op.src in targets]
+    if not chained:
+        return ops, []
+    chained_sources = {op.src for op in chained}
+    parallel = [op for op in ops if op.src not in chained_sources]
+
+    by_dst = {op.dst: op for op in chained}
+    sequential: List[MoveOp] = []
+    done: Set[str] = set()
+
+    # 链: 从目标位置空闲的一项开始，依次执行等待其源位置的那一项
+    for op in chained:
+        if op.dst in sources:
+            continue
+        current = op
+        while current is not None and current.src not in done:
+            sequential.append(current)
+            done.add(current.src)
+            current = by_dst.get(current.src)
+
+    # 环: 先把一项移到临时名腾出位置，沿环执行后再从临时名移入目标
+    for op in chained:
+        if op.src in done:
+            continue
+        directory, name = os.path.split(op.src)
+        temp = os.path.join(directory, f".{name}.{temp_tag}")
+        sequential.append(MoveOp(op.src, temp, hop=op.dst))
+        done.add(op.src)
+        current = by_dst.get(op.src)
+        while current is not None and current is not op:
+            sequential.append(current)
+            done.add(current.src)
+            current = by_dst.get(current.src)
+        sequential.append(MoveOp(temp, op.dst, op.overwrite, origin=op.src))
+    return parallel, sequential
@@ -0,0 +1,257 @@
+"""流式移动计划
+
+整理预览不再把完整的 {源路径: 目标路径} 字典放进结果，而是边扫描边写入
+JSONL 计划文件，结果中只返回汇总和计划ID，之后可按计划ID直接执行，
+无需重新扫描和分类
+
+计划格式(每行一个 JSON 对象):
+    {"type": "plan", "id": ..., "operation": ..., "created_at": ..., 其他元数据}
+    {"type": "move", "src": ..., "dst": ...}
+    {"type": "summary", "moves": N, 其他汇总}
+    {"type": "executed", "journal_id": ..., "executed_at": ...}
+
+执行后计划压缩为计划头、汇总和执行记录(移动明细已写入可撤销的操作日志)；
+新建计划时按数量和保留天数清理旧计划，避免计划文件无限累积
+"""
+
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 结果中附带的预览条数
+PREVIEW_SIZE = 20
+
+# 读取计划尾部记录时的块大小
+TAIL_BLOCK = 64 * 1024
+
+# 默认保留的计划数和天数
+DEFAULT_MAX_PLANS = 50
+DEFAULT_MAX_AGE_DAYS = 30
+
+
+class MovePlanWriter:
+    """计划写入器，写入临时文件，finish 时改名为正式计划"""
+
+    def __init__(self, path: Path, header: Dict[str, Any], preview_size: int = PREVIEW_SIZE):
+        self.path = path
+        self.plan_id = header["id"]
+        self._tmp_path = path.with_suffix(".part")
+        self._file = open(self._tmp_path, 'w', encoding='utf-8')
+        self._write(header)
+        self.count = 0
+        self.preview: List[Dict[str, str]] = []
+        self._preview_size = preview_size
+
+    def _write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def add(self, src: str, dst: str):
+        """追加一个移动"""
+        self._write({"type": "move", "src": src, "dst": dst})
+        if self.count < self._preview_size:
+            self.preview.append({"source": src, "target": dst})
+        self.count += 1
+
+    def finish(self, **summary) -> Dict[str, Any]:
+        """写入汇总记录并发布计划"""
+        summary = {"type": "summary", "moves": self.count, **summary}
+        self._write(summary)
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        logger.info(f"移动计划 {self.plan_id}: {self.count} 个移动")
+        return {"plan_id": self.plan_id, "plan_path": str(self.path), "move_count": self.count,
+                "preview": self.preview}
+
+    def discard(self):
+        """放弃未完成的计划"""
+        self._file.close()
+        try:
+            os.unlink(self._tmp_path)
+        except OSError:
+            pass
+
+    def __enter__(self) -> "MovePlanWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._file.closed:
+            self.discard()
+
+
+class MovePlanStore:
+    """计划文件目录"""
+
+    def __init__(self, plan_dir: str = "./data/plans", max_plans: Optional[int] = DEFAULT_MAX_PLANS,
+                 max_age_days: Optional[float] = DEFAULT_MAX_AGE_DAYS):
+        """初始化计划目录
+
+        Args:
+            plan_dir: 计划文件目录
+            max_plans: 最多保留的计划数，None 表示不限
+            max_age_days: 计划保留天数，None 表示不限
+        """
+        self.plan_dir = Path(plan_dir)
+        self.plan_dir.mkdir(parents=True, exist_ok=True)
+        self.max_plans = max_plans
+        self.max_age_days = max_age_days
+
+    def _plan_path(self, plan_id: str) -> Path:
+        path = self.plan_dir / f"{plan_id}.jsonl"
+        if path.parent != self.plan_dir:
+            raise ValueError(f"无效的计划ID: {plan_id}")
+        return path
+
+    @staticmethod
+    def _write(f, record: Dict[str, Any]):
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def create(self, operation: str, preview_size: int = PREVIEW_SIZE, **meta) -> MovePlanWriter:
+        """新建计划
+
+        Args:
+            operation: 生成计划的操作名称
+            preview_size: 结果中附带的预览条数
+            **meta: 写入计划头的元数据(源目录、策略等)
+        """
+        self.prune(reserve=1)
+        plan_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+        header = {"type": "plan", "id": plan_id, "operation": operation,
+                  "created_at": datetime.now().isoformat(), **meta}
+        return MovePlanWriter(self._plan_path(plan_id), header, preview_size)
+
+    def _tail(self, path: Path) -> List[Dict[str, Any]]:
+        """读取文件末尾的记录(从后往前)，只解析最后一个块"""
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - TAIL_BLOCK))
+            lines = f.read().splitlines()
+        if size > TAIL_BLOCK:
+            lines = lines[1:]
+        records = []
+        for line in reversed(lines):
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+            if records[-1].get("type") == "summary":
+                break
+        return records
+
+    def load(self, plan_id: str) -> Dict[str, Any]:
+        """读取计划头和汇总，不读取移动列表
+
+        Returns:
+            {"plan_id", "operation", "created_at", ..., "summary": {...}, "executed": 执行记录或None}
+        """
+        path = self._plan_path(plan_id)
+        if not path.exists():
+            raise FileNotFoundError(f"移动计划不存在: {plan_id}")
+        with open(path, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+        info = {k: v for k, v in header.items() if k not in ("type", "id")}
+        info.update(plan_id=plan_id, summary=None, executed=None)
+        for record in self._tail(path):
+            kind = record.pop("type", None)
+            if kind == "summary":
+                info["summary"] = record
+            elif kind == "executed" and info["executed"] is None:
+                info["executed"] = record
+        if info["summary"] is None:
+            raise RuntimeError(f"移动计划不完整: {plan_id}")
+        return info
+
+    def iter_moves(self, plan_id: str) -> Iterator[Tuple[str, str]]:
+        """逐个读取计划中的 (源路径, 目标路径)"""
+        with open(self._plan_path(plan_id), 'r', encoding='utf-8') as f:
+            for line in f:
+                # 移动记录由 add 写入，类型总在最前，无需解析其他记录
+                if line.startswith('{"type": "move"'):
+                    record = json.loads(line)
+                    yield record["src"], record["dst"]
+
+    def mark_executed(self, plan_id: str, journal_id: str):
+        """记录计划已执行(对应的操作日志可撤销)，并去掉已执行的移动明细"""
+        path = self._plan_path(plan_id)
+        with open(path, 'r', encoding='utf-8') as f:
+            header = f.readline()
+        summary = next((r for r in self._tail(path) if r.get("type") == "summary"), None)
+        tmp_path = path.with_suffix(".part")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(header)
+            if summary is not None:
+                self._write(f, summary)
+            self._write(f, {"type": "executed", "journal_id": journal_id,
+                            "executed_at": datetime.now().isoformat()})
+        os.replace(tmp_path, path)
+
+    def prune(self, reserve: int = 0) -> int:
+        """按保留天数和数量删除旧计划及遗留的未完成计划
+
+        Args:
+            reserve: 为即将新建的计划预留的数量
+
+        Returns:
+            删除的文件数
+        """
+        cutoff = time.time() - self.max_age_days * 86400 if self.max_age_days is not None else None
+        plans = []
+        removed = 0
+        for path in self.plan_dir.iterdir():
+            if path.suffix not in (".jsonl", ".part"):
+                continue
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            # 未完成的计划超过一天视为中断遗留
+            expired = mtime < time.time() - 86400 if path.suffix == ".part" else \
+                cutoff is not None and mtime < cutoff
+            if expired:
+                removed += self._unlink(path)
+            elif path.suffix == ".jsonl":
+                plans.append((path.name[:15], mtime, path))
+        keep = max(self.max_plans - reserve, 0) if self.max_plans is not None else None
+        if keep is not None and len(plans) > keep:
+            # 按计划ID中的创建时间排序，同一秒内的按修改时间
+            for _, _, path in sorted(plans)[:len(plans) - keep]:
+                removed += self._unlink(path)
+        if removed:
+            logger.info(f"清理了 {removed} 个旧移动计划")
+        return removed
+
+    @staticmethod
+    def _unlink(path: Path) -> int:
+        try:
+            path.unlink()
+            return 1
+        except OSError:
+            return 0
+
+    def list_plans(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """列出最近的计划"""
+        plans = []
+        for path in sorted(self.plan_dir.glob("*.jsonl"), reverse=True)[:limit]:
+            try:
+                info = self.load(path.stem)
+            except (RuntimeError, json.JSONDecodeError):
+                plans.append({"plan_id": path.stem, "status": "corrupted"})
+                continue
+            info["status"] = "executed" if info["executed"] else "pending"
+            plans.append(info)
+        return plans
+
+    def delete(self, plan_id: str) -> bool:
+        """删除计划文件"""
+        try:
+            self._plan_path(plan_id).unlink()
+            return True
+        except FileNotFoundError:
+            return False
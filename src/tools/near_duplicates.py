@@ -0,0 +1,222 @@
+"""近似重复文档检测
+
+提取文档文本后构建字符 shingle 集合，用单次哈希 MinHash(one permutation hashing)
+生成固定长度签名，再按 LSH 分段分桶，只对落入同一桶的候选对估算相似度，
+整体耗时与文件数近似线性，而不是两两比较
+"""
+
+import hashlib
+import logging
+import re
+import unicodedata
+from array import array
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Callable
+
+from .fs_scanner import FileEntry
+from .text_extraction import can_extract, extract_text, parser_version
+
+logger = logging.getLogger(__name__)
+
+_MASK64 = (1 << 64) - 1
+# 空桶填充时使用的黄金分割常数
+_GOLDEN64 = 0x9E3779B97F4A7C15
+_WHITESPACE = re.compile(r"\s+")
+
+
+def shingles(text: str, size: int = 5) -> set:
+    """生成字符 shingle 集合(NFKC 规范化、转小写并去除空白)
+
+    使用字符而不是单词切分，中文文本同样适用
+    """
+    text = _WHITESPACE.sub("", unicodedata.normalize("NFKC", text).lower())
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash_signature(tokens: Iterable[str], num_perm: int = 128) -> Optional[array]:
+    """计算单次哈希 MinHash 签名
+
+    每个 shingle 只哈希一次，按哈希值落入 num_perm 个桶并保留桶内最小值，
+    空桶用右侧最近的非空桶旋转填充
+
+    Returns:
+        长度为 num_perm 的无符号64位数组，没有 shingle 时返回None
+    """
+    bins = [_MASK64] * num_perm
+    for token in tokens:
+        h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+        i = h % num_perm
+        value = h // num_perm
+        if value < bins[i]:
+            bins[i] = value
+
+    filled = [value != _MASK64 for value in bins]
+    if not any(filled):
+        return None
+
+    for i in range(num_perm):
+        if filled[i]:
+            continue
+        distance = 1
+        j = (i + 1) % num_perm
+        while not filled[j]:
+            distance += 1
+            j = (j + 1) % num_perm
+        bins[i] = (bins[j] + distance * _GOLDEN64) & _MASK64
+    return array("Q", bins)
+
+
+def estimate_similarity(sig1: array, sig2: array) -> float:
+    """由签名估算 Jaccard 相似度"""
+    return sum(1 for a, b in zip(sig1, sig2) if a == b) / len(sig1)
+
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """选择 LSH 分段数和每段行数，使 S 曲线拐点 (1/b)^(1/r) 最接近阈值"""
+    best = (num_perm, 1)
+    best_error = float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if bands == 0:
+            break
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class NearDuplicateFinder:
+    """基于 MinHash/LSH 的近似重复文档检测器"""
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        shingle_size: int = 5,
+        max_chars: int = 200000,
+        max_workers: Optional[int] = None,
+        hash_cache=None,
+        opener: Optional[Callable] = None
+    ):
+        """初始化检测器
+
+        Args:
+            threshold: 相似度阈值(估算的 Jaccard 相似度)
+            num_perm: 签名长度
+            shingle_size: 字符 shingle 长度
+            max_chars: 每个文件最多提取的字符数
+            max_workers: 文本提取线程数
+            hash_cache: 哈希缓存(HashCache)，用于缓存未变化文件的签名
+            opener: 打开文档的函数，传入 FileTools.open_document 时复用解析结果缓存
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError(f"相似度阈值必须在 (0, 1] 范围内: {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.max_chars = max_chars
+        self.max_workers = max_workers
+        self.hash_cache = hash_cache
+        self.opener = opener
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        self.stats: Dict[str, int] = {}
+
+    @property
+    def cache_kind(self) -> str:
+        """签名在哈希缓存中的类型标识"""
+        return f"minhash:{self.num_perm}:{self.shingle_size}:{self.max_chars}"
+
+    def signature(self, path: str) -> Optional[array]:
+        """计算文件签名，启用缓存时文件未变化则直接读取"""
+        if self.hash_cache is None:
+            return self._compute_signature(path)
+        kind = f"{self.cache_kind}:{parser_version(path)}"
+        packed = self.hash_cache.get_or_compute(path, kind, self._packed_signature)
+        return self._unpack(packed)
+
+    def _compute_signature(self, path: str) -> Optional[array]:
+        text = extract_text(path, self.max_chars, self.opener)
+        if not text:
+            return None
+        return minhash_signature(shingles(text, self.shingle_size), self.num_perm)
+
+    def _packed_signature(self, path: str) -> str:
+        """计算签名并编码为十六进制(无文本时为空串，同样写入缓存)"""
+        sig = self._compute_signature(path)
+        return sig.tobytes().hex() if sig is not None else ""
+
+    def _unpack(self, packed: str) -> Optional[array]:
+        if not packed:
+            return None
+        sig = array("Q")
+        sig.frombytes(bytes.fromhex(packed))
+        return sig
+
+    def _safe_signature(self, entry: FileEntry) -> Optional[array]:
+        try:
+            return self.signature(entry.path)
+        except Exception as e:
+            logger.warning(f"计算签名失败 {entry.path}: {e}")
+            return None
+
+    def find(self, entries: Iterable[FileEntry]) -> List[List[FileEntry]]:
+        """检测近似重复文档
+
+        Args:
+            entries: 文件记录流(不支持文本提取的文件被忽略)
+
+        Returns:
+            近似重复文件组列表
+        """
+        candidates = [e for e in entries if e.size > 0 and can_extract(e.path)]
+        self.stats = {"files": len(candidates), "signatures": 0, "candidate_pairs": 0, "groups": 0}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="minhash") as pool:
+            signatures = list(pool.map(self._safe_signature, candidates))
+
+        docs = [(entry, sig) for entry, sig in zip(candidates, signatures) if sig is not None]
+        self.stats["signatures"] = len(docs)
+
+        # LSH 分桶: 任一分段完全相同的文档成为候选对
+        buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+        for idx, (_, sig) in enumerate(docs):
+            for band in range(self.bands):
+                start = band * self.rows
+                buckets[(band, sig[start:start + self.rows].tobytes())].append(idx)
+
+        parent = list(range(len(docs)))
+
+        def root(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        # 每个桶内只与第一个成员比较，已在同一组的跳过，比较次数与桶大小成线性关系
+        for members in buckets.values():
+            first = members[0]
+            for j in members[1:]:
+                if root(first) == root(j):
+                    continue
+                self.stats["candidate_pairs"] += 1
+                if estimate_similarity(docs[first][1], docs[j][1]) >= self.threshold:
+                    parent[root(j)] = root(first)
+
+        groups: Dict[int, List[FileEntry]] = defaultdict(list)
+        for idx, (entry, _) in enumerate(docs):
+            groups[root(idx)].append(entry)
+        result = [group for group in groups.values() if len(group) > 1]
+        self.stats["groups"] = len(result)
+
+        logger.info(
+            f"近似重复检测: {self.stats['files']} 个文档, {self.stats['signatures']} 个签名, "
+            f"{self.stats['candidate_pairs']} 个候选对, {len(result)} 组"
+        )
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取上一次检测的统计"""
+        return dict(self.stats)
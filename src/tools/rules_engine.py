@@ -0,0 +1,258 @@
+"""文件规则引擎
+
+把 config/file_rules.json 编译为:
+- 扩展名 -> 分类 的哈希表
+- 所有文件名通配符合并成的一个正则(命名分组标识命中的规则)
+- 每条规则的大小/时间/路径谓词
+
+对扫描流中的每个文件只做一次字典查找和一次正则匹配，
+规则数量增加时单个文件的判定成本基本不变
+
+temp_file_cleanup_rules.policies 中每条策略可组合以下字段，按顺序取第一个命中的策略:
+- patterns/extensions: 文件名通配符/扩展名
+- min_size/max_size: 字节数或 "10MB" 形式
+- min_age_days/max_age_days: 按修改时间计算的天数
+- path_include/path_exclude: 相对扫描根目录的路径通配符，根目录下的子目录不带前导 "*/"
+  (如同时写 ".git/*" 和 "*/.git/*" 才能覆盖根目录及各级子目录中的 .git)
+- enabled: 为 false 时忽略该策略
+"""
+
+import fnmatch
+import json
+import logging
+import os
+import re
+import time
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple, Union
+
+from .fs_scanner import FileEntry
+
+logger = logging.getLogger(__name__)
+
+_SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4}
+_SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?B?)\s*$", re.IGNORECASE)
+
+
+def parse_size(value: Union[int, float, str, None]) -> Optional[int]:
+    """解析大小，支持整数字节数或 "10MB" 形式"""
+    if value is None or isinstance(value, (int, float)):
+        return None if value is None else int(value)
+    match = _SIZE_PATTERN.match(value)
+    if not match:
+        raise ValueError(f"无法解析的大小: {value}")
+    number, unit = match.groups()
+    unit = unit.upper()
+    if unit and not unit.endswith("B"):
+        unit += "B"
+    return int(float(number) * _SIZE_UNITS[unit])
+
+
+def compile_globs(patterns: Iterable[str], group_prefix: Optional[str] = None,
+                  ignore_case: bool = False) -> Optional["re.Pattern"]:
+    """把多个通配符合并为一个正则
+
+    指定 group_prefix 时每个模式放入命名分组 {prefix}{序号}，
+    匹配结果的 lastgroup 即为第一个命中的模式
+    """
+    parts = []
+    for i, pattern in enumerate(patterns):
+        translated = fnmatch.translate(pattern)
+        parts.append(f"(?P<{group_prefix}{i}>{translated})" if group_prefix else f"(?:{translated})")
+    if not parts:
+        return None
+    return re.compile("|".join(parts), re.IGNORECASE if ignore_case else 0)
+
+
+class FileRule:
+    """单条文件规则: 文件名/扩展名条件加可选的大小、时间、路径谓词"""
+
+    __slots__ = ("name", "patterns", "extensions", "min_size", "max_size",
+                 "min_age", "max_age", "path_include", "path_exclude")
+
+    def __init__(
+        self,
+        name: str,
+        patterns: Optional[List[str]] = None,
+        extensions: Optional[List[str]] = None,
+        min_size=None,
+        max_size=None,
+        min_age_days: Optional[float] = None,
+        max_age_days: Optional[float] = None,
+        path_include: Optional[List[str]] = None,
+        path_exclude: Optional[List[str]] = None
+    ):
+        self.name = name
+        self.patterns = list(patterns or [])
+        self.extensions = [e.lower() for e in (extensions or [])]
+        self.min_size = parse_size(min_size)
+        self.max_size = parse_size(max_size)
+        self.min_age = min_age_days * 86400 if min_age_days is not None else None
+        self.max_age = max_age_days * 86400 if max_age_days is not None else None
+        self.path_include = compile_globs(path_include or [])
+        self.path_exclude = compile_globs(path_exclude or [])
+
+    @classmethod
+    def from_dict(cls, name: str, spec: Dict[str, Any]) -> "FileRule":
+        return cls(
+            name=spec.get("name", name),
+            patterns=spec.get("patterns"),
+            extensions=spec.get("extensions"),
+            min_size=spec.get("min_size"),
+            max_size=spec.get("max_size"),
+            min_age_days=spec.get("min_age_days", spec.get("safe_age_days")),
+            max_age_days=spec.get("max_age_days"),
+            path_include=spec.get("path_include"),
+            path_exclude=spec.get("path_exclude"),
+        )
+
+    @property
+    def has_predicates(self) -> bool:
+        return any(x is not None for x in (
+            self.min_size, self.max_size, self.min_age, self.max_age, self.path_include, self.path_exclude
+        ))
+
+    def check(self, size: int, mtime: float, rel_path: str, now: float) -> bool:
+        """检查大小、时间和路径谓词"""
+        if self.min_size is not None and size < self.min_size:
+            return False
+        if self.max_size is not None and size > self.max_size:
+            return False
+        age = now - mtime
+        if self.min_age is not None and age < self.min_age:
+            return False
+        if self.max_age is not None and age > self.max_age:
+            return False
+        if self.path_include is not None and not self.path_include.match(rel_path):
+            return False
+        if self.path_exclude is not None and self.path_exclude.match(rel_path):
+            return False
+        return True
+
+
+class CompiledRuleSet:
+    """编译后的规则集，按规则顺序返回第一个命中的规则"""
+
+    def __init__(self, rules: List[FileRule]):
+        self.rules = rules
+        self._extensions: Dict[str, List[int]] = {}
+        self._pattern_owner: List[int] = []
+        globs = []
+        for idx, rule in enumerate(rules):
+            for ext in rule.extensions:
+                self._extensions.setdefault(ext, []).append(idx)
+            for pattern in rule.patterns:
+                self._pattern_owner.append(idx)
+                globs.append(pattern)
+        self._regex = compile_globs(globs, group_prefix="p")
+        self._single = [compile_globs(rule.patterns) for rule in rules]
+        self._needs_path = any(rule.path_include or rule.path_exclude for rule in rules)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def _candidates(self, name: str, extension: str) -> Iterator[int]:
+        """按规则顺序产出文件名或扩展名命中的规则序号"""
+        first = None
+        if self._regex is not None:
+            match = self._regex.match(name)
+            if match:
+                first = self._pattern_owner[int(match.lastgroup[1:])]
+        by_ext = self._extensions.get(extension.lower(), ())
+        hits = sorted(set(by_ext) | ({first} if first is not None else set()))
+        for idx in hits:
+            yield idx
+        if first is None:
+            return
+        # 第一个命中的规则谓词不满足时，再检查排在后面的其他通配符规则(少见路径)
+        for idx in range(first + 1, len(self.rules)):
+            if idx not in hits and self._single[idx] is not None and self._single[idx].match(name):
+                yield idx
+
+    def match(self, name: str, extension: str, size: int = 0, mtime: float = 0.0,
+              rel_path: str = "", now: Optional[float] = None) -> Optional[FileRule]:
+        """返回第一个完全命中的规则"""
+        now = time.time() if now is None else now
+        for idx in self._candidates(name, extension):
+            rule = self.rules[idx]
+            if not rule.has_predicates or rule.check(size, mtime, rel_path or name, now):
+                return rule
+        return None
+
+    def match_entry(self, entry: FileEntry, root: Optional[str] = None,
+                    now: Optional[float] = None) -> Optional[FileRule]:
+        """对扫描记录求值"""
+        rel_path = entry.name
+        if root is not None and self._needs_path:
+            rel_path = os.path.relpath(entry.path, root).replace(os.sep, "/")
+        return self.match(entry.name, entry.extension, entry.size, entry.mtime, rel_path, now)
+
+
+class RulesEngine:
+    """文件分类与清理规则引擎"""
+
+    DEFAULT_CATEGORY = "Others"
+
+    def __init__(self, rules: Optional[Dict[str, Any]] = None):
+        """编译规则
+
+        Args:
+            rules: file_rules.json 的内容
+        """
+        rules = rules or {}
+        self.classification = CompiledRuleSet([
+            FileRule.from_dict(name, spec)
+            for name, spec in rules.get("file_classification_rules", {}).items()
+        ])
+        self.cleanup = self.compile_cleanup(rules.get("temp_file_cleanup_rules", {}))
+
+    @classmethod
+    def from_file(cls, rules_file: str) -> "RulesEngine":
+        """从规则文件加载，失败时使用空规则"""
+        try:
+            with open(rules_file, 'r', encoding='utf-8') as f:
+                return cls(json.load(f))
+        except Exception as e:
+            logger.warning(f"加载规则文件失败: {e}, 使用默认规则")
+            return cls()
+
+    @staticmethod
+    def compile_cleanup(spec: Dict[str, Any]) -> CompiledRuleSet:
+        """编译清理规则: 顶层 patterns/safe_age_days 为默认规则，policies 为附加策略"""
+        rules = []
+        if spec.get("patterns"):
+            rules.append(FileRule(
+                "temp_files",
+                patterns=spec["patterns"],
+                min_age_days=spec.get("safe_age_days")
+            ))
+        for i, policy in enumerate(spec.get("policies", [])):
+            if policy.get("enabled", True):
+                rules.append(FileRule.from_dict(f"policy_{i}", policy))
+        return CompiledRuleSet(rules)
+
+    @staticmethod
+    def compile_patterns(patterns: List[str], min_age_days: Optional[float] = None) -> CompiledRuleSet:
+        """把临时指定的通配符列表编译为单条规则"""
+        return CompiledRuleSet([FileRule("custom", patterns=patterns, min_age_days=min_age_days)])
+
+    def classify(self, name: str, extension: str = "", size: int = 0, mtime: float = 0.0) -> str:
+        """返回文件所属分类"""
+        rule = self.classification.match(name, extension, size, mtime)
+        return rule.name if rule else self.DEFAULT_CATEGORY
+
+    def evaluate(
+        self,
+        entries: Iterable[FileEntry],
+        root: Optional[str] = None,
+        cleanup: Optional[CompiledRuleSet] = None
+    ) -> Iterator[Tuple[FileEntry, str, Optional[FileRule]]]:
+        """单次遍历扫描流，同时求出分类和命中的清理规则
+
+        Yields:
+            (文件记录, 分类, 命中的清理规则或None)
+        """
+        cleanup = cleanup if cleanup is not None else self.cleanup
+        now = time.time()
+        for entry in entries:
+            category = self.classify(entry.name, entry.extension, entry.size, entry.mtime)
+            yield entry, category, cleanup.match_entry(entry, root, now)
@@ -0,0 +1,220 @@
+"""扫描过滤规则
+
+gitignore 风格的包含/排除模式，在扫描开始前编译一次:
+- 排除规则在目录层面判断，命中的子树不会被打开
+- 包含规则只作用于文件(有包含规则时，只保留命中的文件)
+- 规则按 gitignore 语义解释: "!" 取反、末尾 "/" 只匹配目录、
+  含 "/" 的模式相对扫描根目录锚定，否则匹配任意层级的名称，"**" 匹配多级目录，
+  多条规则命中时以最后一条为准
+
+另提供 ScanLimits，用于在文件数或耗时超限时提前结束扫描
+"""
+
+import json
+import os
+import re
+import time
+from typing import List, Optional, Iterable, Iterator
+
+from .fs_scanner import FileEntry
+
+
+def _translate(pattern: str) -> str:
+    """把 gitignore 风格的通配符转换为正则(不含锚定)"""
+    i, n = 0, len(pattern)
+    parts = []
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**/", i):
+                parts.append("(?:.*/)?")
+                i += 3
+                continue
+            if pattern.startswith("**", i) and i + 2 == n:
+                parts.append(".*")
+                i += 2
+                continue
+            parts.append("[^/]*")
+        elif c == "?":
+            parts.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                parts.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            parts.append(re.escape(pattern[i]))
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return "".join(parts)
+
+
+class _Rule:
+    __slots__ = ("pattern", "regex", "compiled", "negate", "dir_only")
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.negate = pattern.startswith("!")
+        body = pattern[1:] if self.negate else pattern
+        self.dir_only = body.endswith("/")
+        body = body.rstrip("/")
+        anchored = "/" in body
+        body = body.lstrip("/")
+        prefix = "" if anchored or body.startswith("**/") else "(?:.*/)?"
+        self.regex = prefix + _translate(body)
+        self.compiled = re.compile(self.regex + r"\Z")
+
+
+class PathFilter:
+    """编译后的包含/排除规则"""
+
+    def __init__(self, include: Optional[Iterable[str]] = None, exclude: Optional[Iterable[str]] = None):
+        """编译规则
+
+        Args:
+            include: 包含模式，为空表示包含全部文件
+            exclude: 排除模式
+        """
+        self.include = self._parse(include)
+        self.exclude = self._parse(exclude)
+        self._exclude_any = self._combine(self.exclude, dirs=False)
+        self._exclude_dirs = self._combine(self.exclude, dirs=True)
+        self._include_any = self._combine(self.include, dirs=False)
+
+    @staticmethod
+    def _parse(patterns: Optional[Iterable[str]]) -> List[_Rule]:
+        rules = []
+        for pattern in patterns or ():
+            pattern = pattern.strip()
+            if pattern and not pattern.startswith("#"):
+                rules.append(_Rule(pattern))
+        return rules
+
+    @staticmethod
+    def _combine(rules: List[_Rule], dirs: bool) -> Optional["re.Pattern"]:
+        """没有取反规则时把适用的规则合并为一个正则"""
+        if any(rule.negate for rule in rules):
+            return None
+        parts = [rule.regex for rule in rules if dirs or not rule.dir_only]
+        return re.compile("(?:" + "|".join(parts) + r")\Z") if parts else None
+
+    def __bool__(self) -> bool:
+        return bool(self.include or self.exclude)
+
+    @property
+    def signature(self) -> str:
+        """规则的文本表示，用于判断持久化数据是否按相同规则生成"""
+        return json.dumps([[r.pattern for r in self.include], [r.pattern for r in self.exclude]])
+
+    @property
+    def has_negations(self) -> bool:
+        """是否含有取反规则(可能重新包含上级规则排除的内容)"""
+        return any(rule.negate for rule in self.include + self.exclude)
+
+    def merged(self, include: Optional[Iterable[str]] = None,
+               exclude: Optional[Iterable[str]] = None) -> "PathFilter":
+        """在现有规则之后追加规则，返回新的过滤器"""
+        if not include and not exclude:
+            return self
+        return PathFilter(
+            [r.pattern for r in self.include] + list(include or []),
+            [r.pattern for r in self.exclude] + list(exclude or [])
+        )
+
+    @staticmethod
+    def _last_match(rules: List[_Rule], rel_path: str, is_dir: bool) -> Optional[bool]:
+        for rule in reversed(rules):
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.compiled.match(rel_path):
+                return not rule.negate
+        return None
+
+    def excludes_dir(self, rel_path: str) -> bool:
+        """目录是否被排除(rel_path 为相对扫描根目录、以 / 分隔的路径)"""
+        if not self.exclude:
+            return False
+        if self._exclude_dirs is not None:
+            return self._exclude_dirs.match(rel_path) is not None
+        return bool(self._last_match(self.exclude, rel_path, True))
+
+    def allows_file(self, rel_path: str) -> bool:
+        """文件是否保留(不检查上级目录)"""
+        if self.exclude:
+            if self._exclude_any is not None:
+                if self._exclude_any.match(rel_path):
+                    return False
+            elif self._last_match(self.exclude, rel_path, False):
+                return False
+        if self.include:
+            if self._include_any is not None:
+                return self._include_any.match(rel_path) is not None
+            return bool(self._last_match(self.include, rel_path, False))
+        return True
+
+    def allows_path(self, rel_path: str) -> bool:
+        """文件及其所有上级目录是否都未被排除(用于不能剪枝的数据源，如元数据索引)"""
+        parent = rel_path.rpartition("/")[0]
+        return self._dir_allowed(parent, {}) and self.allows_file(rel_path)
+
+    def allows_dir(self, rel_dir: str) -> bool:
+        """目录及其所有上级目录是否都未被排除"""
+        return self._dir_allowed(rel_dir, {})
+
+    def _dir_allowed(self, rel_dir: str, cache: dict) -> bool:
+        """目录及其上级目录都未被排除(结果缓存在 cache 中)"""
+        if not rel_dir:
+            return True
+        allowed = cache.get(rel_dir)
+        if allowed is None:
+            parent = rel_dir.rpartition("/")[0]
+            allowed = self._dir_allowed(parent, cache) and not self.excludes_dir(rel_dir)
+            cache[rel_dir] = allowed
+        return allowed
+
+    def filter_entries(self, entries: Iterable[FileEntry], root: str) -> Iterator[FileEntry]:
+        """按完整规则过滤文件记录流"""
+        root_len = len(os.path.abspath(root).rstrip(os.sep)) + 1
+        cache: dict = {}
+        for entry in entries:
+            rel_path = os.path.abspath(entry.path)[root_len:].replace(os.sep, "/")
+            if self._dir_allowed(rel_path.rpartition("/")[0], cache) and self.allows_file(rel_path):
+                yield entry
+
+
+class ScanLimits:
+    """扫描截断条件: 最多文件数和耗时上限(秒)"""
+
+    def __init__(self, max_files: Optional[int] = None, time_budget: Optional[float] = None):
+        self.max_files = max_files
+        self.time_budget = time_budget
+        self.truncated = False
+        self.count = 0
+
+    def __bool__(self) -> bool:
+        return self.max_files is not None or self.time_budget is not None
+
+    def apply(self, entries: Iterator[FileEntry]) -> Iterator[FileEntry]:
+        """超过限制时停止迭代并关闭底层扫描"""
+        deadline = time.monotonic() + self.time_budget if self.time_budget is not None else None
+        try:
+            for entry in entries:
+                if self.max_files is not None and self.count >= self.max_files:
+                    self.truncated = True
+                    return
+                if deadline is not None and time.monotonic() > deadline:
+                    self.truncated = True
+                    return
+                self.count += 1
+                yield entry
+        finally:
+            close = getattr(entries, "close", None)
+            if close is not None:
+                close()
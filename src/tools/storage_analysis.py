@@ -0,0 +1,422 @@
+"""磁盘空间层级分析
+
+在一次流式扫描中完成(类似 du):
+- 每个文件只累加到所在目录的自身统计，扫描结束后按深度自底向上汇总到上级目录
+- 按扩展名统计数量和大小
+- 最大文件用有界最小堆保留，最大目录在汇总后用 heapq.nlargest 选出
+- 扫描过程中可按文件数或时间间隔产出进度快照
+
+对超大目录树另提供随机探测的近似估计(StorageEstimator)，
+以及在后台继续精确扫描的 BackgroundAnalysis
+"""
+
+import heapq
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from statistics import NormalDist
+from typing import List, Dict, Any, Optional, Iterable, Iterator
+
+from .fs_scanner import FileEntry, get_extension
+
+logger = logging.getLogger(__name__)
+
+# 目录统计下标: 递归大小, 递归文件数, 自身大小, 自身文件数
+_SIZE, _FILES, _OWN_SIZE, _OWN_FILES = range(4)
+
+
+def _depth(path: str) -> int:
+    """路径层级(根目录为0)"""
+    return path.rstrip(os.sep).count(os.sep)
+
+
+class StorageAnalyzer:
+    """单次遍历的层级空间统计"""
+
+    def __init__(self, root: str, top_k: int = 10, tree_depth: int = 1):
+        """初始化分析器
+
+        Args:
+            root: 分析的根目录
+            top_k: 保留的最大文件数和最大目录数
+            tree_depth: 报告中目录树展开的层数(0 表示只有根目录)
+        """
+        self.root = root
+        self.top_k = top_k
+        self.tree_depth = tree_depth
+        self.total_files = 0
+        self.total_size = 0
+        self.type_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"count": 0, "size": 0})
+        # 目录 -> [自身大小, 自身文件数]，扫描时只记录直接包含的文件
+        self._own: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        self._largest: List[tuple] = []
+        self.started = time.time()
+
+    def add(self, entry: FileEntry):
+        """累加一个文件"""
+        self.total_files += 1
+        self.total_size += entry.size
+
+        stats = self.type_stats[entry.extension]
+        stats["count"] += 1
+        stats["size"] += entry.size
+
+        own = self._own[os.path.dirname(entry.path)]
+        own[0] += entry.size
+        own[1] += 1
+
+        item = (entry.size, self.total_files, entry)
+        if len(self._largest) < self.top_k:
+            heapq.heappush(self._largest, item)
+        elif item > self._largest[0]:
+            heapq.heapreplace(self._largest, item)
+
+    def largest_files(self) -> List[Dict[str, Any]]:
+        return [item[2].to_dict() for item in sorted(self._largest, reverse=True)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """扫描进行中的统计快照(目录汇总要等扫描结束)"""
+        return {
+            "done": False,
+            "directory": self.root,
+            "total_files": self.total_files,
+            "total_size": self.total_size,
+            "total_size_mb": self.total_size / 1024 / 1024,
+            "directories_seen": len(self._own),
+            "largest_files": self.largest_files(),
+            "elapsed": time.time() - self.started
+        }
+
+    def _rollup(self) -> Dict[str, List[int]]:
+        """自底向上汇总目录大小
+
+        按深度分桶后从最深一层开始，把每个目录的递归统计加到父目录，
+        不含文件的中间目录在汇总时补齐
+        """
+        root = os.path.abspath(self.root)
+        root_depth = _depth(root)
+        dirs: Dict[str, List[int]] = {}
+        by_depth: Dict[int, List[str]] = defaultdict(list)
+        for path, (size, files) in self._own.items():
+            path = os.path.abspath(path)
+            if path in dirs:
+                node = dirs[path]
+                node[_SIZE] += size
+                node[_FILES] += files
+                node[_OWN_SIZE] += size
+                node[_OWN_FILES] += files
+                continue
+            dirs[path] = [size, files, size, files]
+            by_depth[_depth(path)].append(path)
+        dirs.setdefault(root, [0, 0, 0, 0])
+
+        for depth in range(max(by_depth, default=root_depth), root_depth, -1):
+            for path in by_depth.get(depth, ()):
+                parent = os.path.dirname(path)
+                node = dirs.get(parent)
+                if node is None:
+                    node = dirs[parent] = [0, 0, 0, 0]
+                    by_depth[depth - 1].append(parent)
+                node[_SIZE] += dirs[path][_SIZE]
+                node[_FILES] += dirs[path][_FILES]
+        return dirs
+
+    @staticmethod
+    def _dir_dict(path: str, node: List[int]) -> Dict[str, Any]:
+        return {
+            "path": path,
+            "size": node[_SIZE],
+            "files": node[_FILES],
+            "own_size": node[_OWN_SIZE],
+            "own_files": node[_OWN_FILES]
+        }
+
+    def _tree(self, dirs: Dict[str, List[int]], root: str) -> Dict[str, Any]:
+        """构建展开到 tree_depth 层的目录树，子目录按大小降序"""
+        root_depth = _depth(root)
+        children: Dict[str, List[str]] = defaultdict(list)
+        for path in dirs:
+            if path != root and _depth(path) - root_depth <= self.tree_depth:
+                children[os.path.dirname(path)].append(path)
+
+        def build(path: str) -> Dict[str, Any]:
+            node = self._dir_dict(path, dirs[path])
+            subdirs = sorted(children.get(path, ()), key=lambda p: dirs[p][_SIZE], reverse=True)
+            if subdirs:
+                node["children"] = [build(sub) for sub in subdirs]
+            return node
+
+        return build(root)
+
+    def report(self) -> Dict[str, Any]:
+        """生成最终报告"""
+        dirs = self._rollup()
+        root = os.path.abspath(self.root)
+        # 大小相同时上层目录优先
+        largest_dirs = heapq.nlargest(
+            self.top_k,
+            ((node[_SIZE], -_depth(path), path) for path, node in dirs.items() if path != root)
+        )
+        return {
+            "done": True,
+            "directory": self.root,
+            "total_files": self.total_files,
+            "total_size": self.total_size,
+            "total_size_mb": self.total_size / 1024 / 1024,
+            "type_statistics": dict(self.type_stats),
+            "largest_files": self.largest_files(),
+            "largest_directories": [self._dir_dict(path, dirs[path]) for _, _, path in largest_dirs],
+            "directory_tree": self._tree(dirs, root),
+            "elapsed": time.time() - self.started
+        }
+
+
+def iter_storage_analysis(
+    entries: Iterable[FileEntry],
+    root: str,
+    top_k: int = 10,
+    tree_depth: int = 1,
+    emit_every: int = 10000,
+    emit_interval: float = 1.0
+) -> Iterator[Dict[str, Any]]:
+    """流式空间分析
+
+    每处理 emit_every 个文件检查一次，距上次产出超过 emit_interval 秒时产出进度快照，
+    最后产出 done=True 的完整报告
+
+    Yields:
+        进度快照或最终报告
+    """
+    analyzer = StorageAnalyzer(root, top_k=top_k, tree_depth=tree_depth)
+    last_emit = time.time()
+    for entry in entries:
+        analyzer.add(entry)
+        if analyzer.total_files % emit_every == 0:
+            now = time.time()
+            if now - last_emit >= emit_interval:
+                last_emit = now
+                yield analyzer.snapshot()
+    yield analyzer.report()
+
+
+class StorageEstimator:
+    """基于随机探测的近似空间估计(Knuth 估计量)
+
+    每次探测从根目录出发，逐层随机选择一个子目录直到叶子目录。
+    沿途每个目录的文件统计乘以到达该目录的概率倒数(各层分支数之积)
+    累加得到一次总量的无偏估计，多次探测取均值并按样本方差给出置信区间。
+    已列出的目录会缓存，靠近根的目录在后续探测中不再重复读取
+    """
+
+    def __init__(
+        self,
+        root: str,
+        time_budget: float = 2.0,
+        min_probes: int = 20,
+        max_probes: int = 100000,
+        confidence: float = 0.95,
+        seed: Optional[int] = None
+    ):
+        """初始化估计器
+
+        Args:
+            root: 根目录
+            time_budget: 估计耗时上限(秒)，达到 min_probes 后生效
+            min_probes: 最少探测次数
+            max_probes: 最多探测次数
+            confidence: 置信水平
+            seed: 随机种子(用于复现)
+        """
+        self.root = root
+        self.time_budget = time_budget
+        self.min_probes = min_probes
+        self.max_probes = max_probes
+        self.confidence = confidence
+        self.rng = random.Random(seed)
+        # 目录 -> (文件数, 总大小, {扩展名: [数量, 大小]}, 子目录列表)
+        self._listings: Dict[str, tuple] = {}
+        # 已发现但尚未列出的子目录
+        self._unlisted: set = set()
+
+    def _list(self, path: str) -> tuple:
+        listing = self._listings.get(path)
+        if listing is not None:
+            return listing
+        files = size = 0
+        types: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        subdirs = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_file():
+                            st = entry.stat()
+                            files += 1
+                            size += st.st_size
+                            stats = types[get_extension(entry.name)]
+                            stats[0] += 1
+                            stats[1] += st.st_size
+                        elif entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.'):
+                            subdirs.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.debug(f"探测时无法读取目录 {path}: {e}")
+        listing = (files, size, dict(types), subdirs)
+        self._listings[path] = listing
+        self._unlisted.discard(path)
+        self._unlisted.update(sub for sub in subdirs if sub not in self._listings)
+        return listing
+
+    def _probe(self) -> tuple:
+        """一次随机探测，返回 (文件数估计, 大小估计, 目录数估计, {扩展名: [数量估计, 大小估计]})"""
+        weight = 1
+        est_files = est_size = est_dirs = 0
+        est_types: Dict[str, List[float]] = defaultdict(lambda: [0, 0])
+        path = self.root
+        while True:
+            files, size, types, subdirs = self._list(path)
+            est_files += weight * files
+            est_size += weight * size
+            est_dirs += weight
+            for ext, (count, ext_size) in types.items():
+                stats = est_types[ext]
+                stats[0] += weight * count
+                stats[1] += weight * ext_size
+            if not subdirs:
+                return est_files, est_size, est_dirs, est_types
+            weight *= len(subdirs)
+            path = subdirs[self.rng.randrange(len(subdirs))]
+
+    def _interval(self, samples: List[float]) -> Dict[str, float]:
+        """均值及正态近似置信区间"""
+        n = len(samples)
+        mean = sum(samples) / n
+        if n > 1:
+            variance = sum((x - mean) ** 2 for x in samples) / (n - 1)
+            margin = NormalDist().inv_cdf((1 + self.confidence) / 2) * math.sqrt(variance / n)
+        else:
+            margin = float("inf")
+        return {"estimate": mean, "low": max(0.0, mean - margin), "high": mean + margin}
+
+    def estimate(self) -> Dict[str, Any]:
+        """在时间预算内探测并返回估计结果"""
+        started = time.time()
+        files_samples: List[float] = []
+        size_samples: List[float] = []
+        dirs_samples: List[float] = []
+        type_totals: Dict[str, List[float]] = defaultdict(lambda: [0, 0])
+
+        while len(files_samples) < self.max_probes:
+            if len(files_samples) >= self.min_probes and time.time() - started >= self.time_budget:
+                break
+            est_files, est_size, est_dirs, est_types = self._probe()
+            files_samples.append(est_files)
+            size_samples.append(est_size)
+            dirs_samples.append(est_dirs)
+            for ext, (count, ext_size) in est_types.items():
+                totals = type_totals[ext]
+                totals[0] += count
+                totals[1] += ext_size
+            # 全部目录都已列出时探测结果不再有新信息，直接返回精确值
+            if self._fully_listed():
+                break
+
+        probes = len(files_samples)
+        total_files = self._interval(files_samples)
+        total_size = self._interval(size_samples)
+        exact = self._fully_listed()
+        if exact:
+            known = self._known_totals()
+            total_files = {"estimate": known[0], "low": known[0], "high": known[0]}
+            total_size = {"estimate": known[1], "low": known[1], "high": known[1]}
+        else:
+            # 已列出目录中的文件是确定存在的，区间下限不低于它
+            known = self._known_totals()
+            total_files["low"] = max(total_files["low"], known[0])
+            total_size["low"] = max(total_size["low"], known[1])
+
+        size_sum = sum(t[1] for t in type_totals.values()) or 1
+        type_distribution = {
+            ext: {"count": count / probes, "size": ext_size / probes, "size_share": ext_size / size_sum}
+            for ext, (count, ext_size) in sorted(type_totals.items(), key=lambda kv: kv[1][1], reverse=True)
+        }
+        result = {
+            "done": exact,
+            "approximate": not exact,
+            "directory": self.root,
+            "total_files": total_files,
+            "total_size": total_size,
+            "total_size_mb": total_size["estimate"] / 1024 / 1024,
+            "total_directories": self._interval(dirs_samples)["estimate"],
+            "type_distribution": type_distribution,
+            "confidence": self.confidence,
+            "probes": probes,
+            "directories_listed": len(self._listings),
+            "elapsed": time.time() - started
+        }
+        logger.info(
+            f"近似空间分析: {probes} 次探测, 估计 {total_files['estimate']:.0f} 个文件, "
+            f"{result['total_size_mb']:.2f} MB"
+        )
+        return result
+
+    def _fully_listed(self) -> bool:
+        return bool(self._listings) and not self._unlisted
+
+    def _known_totals(self) -> tuple:
+        files = size = 0
+        for listed_files, listed_size, _, _ in self._listings.values():
+            files += listed_files
+            size += listed_size
+        return files, size
+
+
+class BackgroundAnalysis:
+    """在后台线程中运行精确分析，可随时读取最新进度或最终报告"""
+
+    def __init__(self, entries: Iterable[FileEntry], root: str, estimate: Optional[Dict[str, Any]] = None,
+                 **kwargs):
+        self.root = root
+        self.estimate = estimate
+        self.latest: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(entries, kwargs), name="storage-refine", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, entries: Iterable[FileEntry], kwargs: Dict[str, Any]):
+        try:
+            for report in iter_storage_analysis(entries, self.root, **kwargs):
+                self.latest = report
+        except Exception as e:
+            logger.error(f"后台空间分析失败 {self.root}: {e}")
+            self.error = str(e)
+        finally:
+            self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待分析结束，返回是否已结束"""
+        return self._done.wait(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        """当前状态: running/done/failed，附最新快照及相对估计值的进度"""
+        if self.error is not None:
+            state = "failed"
+        elif self._done.is_set():
+            state = "done"
+        else:
+            state = "running"
+        result: Dict[str, Any] = {"status": state, "report": self.latest}
+        if self.error is not None:
+            result["error"] = self.error
+        if self.estimate and self.latest and state == "running":
+            expected = self.estimate["total_files"]["estimate"]
+            result["progress"] = min(1.0, self.latest["total_files"] / expected) if expected else None
+        return result
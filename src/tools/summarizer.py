@@ -0,0 +1,283 @@
+"""长文档分层摘要(map-reduce)
+
+文档按段落切成与模型上下文匹配的分块，各分块并发生成摘要(并发数受模型服务限制)，
+再把分块摘要逐层合并为最终摘要。分块边界由段落内容决定，
+编辑文档后只有改动附近的分块变化，分块摘要按内容缓存，未变化的分块不再调用模型
+
+模型管理器和提示词引擎由调用方注入，本模块不依赖 src.core
+"""
+
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# 单次提示词中文档内容的字符上限(与 PromptEngine.render_document_summary 的截断长度一致)
+MAX_CHUNK_CHARS = 5000
+
+_CJK = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[。！？；.!?;])\s*")
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的 token 数: 中日韩字符约每字一个，其余约每4个字符一个"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _split_long(paragraph: str, max_tokens: int, max_chars: int) -> Iterator[str]:
+    """把超长段落按句子切开，单句仍超长时按字符硬切"""
+    piece = ""
+    for sentence in _SENTENCE_END.split(paragraph):
+        while len(sentence) > max_chars or estimate_tokens(sentence) > max_tokens:
+            cut = min(max_chars, max(1, len(sentence) * max_tokens // estimate_tokens(sentence)))
+            if piece:
+                yield piece
+                piece = ""
+            yield sentence[:cut]
+            sentence = sentence[cut:]
+        if piece and (len(piece) + len(sentence) > max_chars
+                      or estimate_tokens(piece) + estimate_tokens(sentence) > max_tokens):
+            yield piece
+            piece = ""
+        piece += sentence
+    if piece:
+        yield piece
+
+
+def iter_chunks(
+    pages: Iterable[str],
+    chunk_tokens: int = 1500,
+    max_chars: int = MAX_CHUNK_CHARS,
+    boundary_divisor: int = 4
+) -> Iterator[str]:
+    """把逐页文本切成分块
+
+    分块至少达到 chunk_tokens 的一半后，在内容哈希满足条件的段落之后切分，
+    因此插入或删除段落只影响附近的分块；达到 chunk_tokens 或 max_chars 时强制切分
+
+    Args:
+        pages: 逐页/逐段文本
+        chunk_tokens: 每个分块的 token 上限
+        max_chars: 每个分块的字符上限
+        boundary_divisor: 内容切分点的稀疏程度，越大分块越接近上限
+    """
+    min_tokens = chunk_tokens // 2
+    parts: List[str] = []
+    tokens = 0
+    chars = 0
+    for page in pages:
+        for paragraph in _PARAGRAPH_BREAK.split(page):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            for piece in _split_long(paragraph, chunk_tokens, max_chars):
+                piece_tokens = estimate_tokens(piece)
+                if parts and (tokens + piece_tokens > chunk_tokens or chars + len(piece) + 2 > max_chars):
+                    yield "\n\n".join(parts)
+                    parts, tokens, chars = [], 0, 0
+                parts.append(piece)
+                tokens += piece_tokens
+                chars += len(piece) + 2
+                if tokens >= min_tokens and zlib.crc32(piece.encode("utf-8")) % boundary_divisor == 0:
+                    yield "\n\n".join(parts)
+                    parts, tokens, chars = [], 0, 0
+    if parts:
+        yield "\n\n".join(parts)
+
+
+class SummaryCache:
+    """分块摘要缓存，以 (模型, 摘要长度, 阶段, 分块内容) 的哈希为键"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS summaries (
+            key TEXT PRIMARY KEY,
+            summary TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, db_path: str = "./data/cache/summaries.db"):
+        """初始化摘要缓存
+
+        Args:
+            db_path: 缓存数据库路径
+        """
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def key(model_tag: str, stage: str, length: int, text: str) -> str:
+        return hashlib.sha256(f"{model_tag}\0{stage}\0{length}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, summary: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, created_at) VALUES (?, ?, ?)",
+                (key, summary, time.time())
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class MapReduceSummarizer:
+    """分层摘要生成器"""
+
+    def __init__(
+        self,
+        model_manager,
+        prompt_engine,
+        cache: Optional[SummaryCache] = None,
+        chunk_tokens: int = 1500,
+        map_length: int = 300,
+        max_concurrency: int = 4,
+        task_type: str = "document_summary"
+    ):
+        """初始化摘要生成器
+
+        Args:
+            model_manager: 模型管理器(提供 invoke(messages, task_type=...))
+            prompt_engine: 提示词引擎(提供 render_document_summary/render_summary_reduce)
+            cache: 分块摘要缓存，None 表示不缓存
+            chunk_tokens: 每个分块的 token 上限
+            map_length: 分块摘要和中间层摘要的长度(字)
+            max_concurrency: 同时进行的模型调用数，应与模型服务的并发能力一致
+            task_type: 模型调用使用的任务类型
+        """
+        self.model_manager = model_manager
+        self.prompt_engine = prompt_engine
+        self.cache = cache
+        self.chunk_tokens = chunk_tokens
+        self.map_length = map_length
+        self.max_concurrency = max(1, max_concurrency)
+        self.task_type = task_type
+        strategy = getattr(model_manager, "model_strategies", {}).get(task_type, {})
+        self._model_tag = f"{task_type}:{strategy.get('model', '')}"
+        self._stats_lock = threading.Lock()
+
+    def _invoke(self, prompt: str) -> str:
+        return self.model_manager.invoke([{"role": "user", "content": prompt}], task_type=self.task_type).strip()
+
+    def _summarize(self, stage: str, payload, length: int, stats: Dict[str, int]) -> str:
+        """生成一个摘要(map 阶段 payload 为分块文本，reduce 阶段为摘要列表)"""
+        text = payload if stage == "map" else "\0".join(payload)
+        key = SummaryCache.key(self._model_tag, stage, length, text) if self.cache is not None else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                with self._stats_lock:
+                    stats["cached"] += 1
+                return cached
+        if stage == "map":
+            prompt = self.prompt_engine.render_document_summary(payload, length)
+        else:
+            prompt = self.prompt_engine.render_summary_reduce(payload, length)
+        summary = self._invoke(prompt)
+        with self._stats_lock:
+            stats["model_calls"] += 1
+        if key is not None:
+            self.cache.put(key, summary)
+        return summary
+
+    def _run(self, pool: ThreadPoolExecutor, stage: str, payloads: Iterable, length: int,
+             stats: Dict[str, int]) -> List[str]:
+        """并发生成一批摘要，按输入顺序返回；在途任务数有上限，分块无需全部读入内存"""
+        results: List[str] = []
+        pending = deque()
+        for payload in payloads:
+            if stage == "map":
+                stats["chunks"] += 1
+            pending.append(pool.submit(self._summarize, stage, payload, length, stats))
+            if len(pending) >= self.max_concurrency * 2:
+                results.append(pending.popleft().result())
+        while pending:
+            results.append(pending.popleft().result())
+        return results
+
+    def _groups(self, summaries: List[str]) -> List[List[str]]:
+        """把摘要按 token 预算分组，供下一层合并"""
+        groups: List[List[str]] = []
+        group: List[str] = []
+        tokens = 0
+        for summary in summaries:
+            summary_tokens = estimate_tokens(summary)
+            # 每组至少两个摘要，保证每一层的数量都在减少
+            if len(group) >= 2 and (tokens + summary_tokens > self.chunk_tokens or len(group) >= 16):
+                groups.append(group)
+                group, tokens = [], 0
+            group.append(summary)
+            tokens += summary_tokens
+        if group:
+            groups.append(group)
+        return groups
+
+    def summarize(self, pages: Iterable[str], length: int = 200) -> Dict[str, Any]:
+        """生成文档摘要
+
+        Args:
+            pages: 逐页/逐段文本(可以是生成器)，也可以直接传入全文字符串
+            length: 最终摘要长度(字)
+
+        Returns:
+            {"summary", "chunks", "cached", "model_calls", "levels", "elapsed"}
+        """
+        started = time.time()
+        if isinstance(pages, str):
+            pages = [pages]
+        stats = {"chunks": 0, "cached": 0, "model_calls": 0}
+        chunks = iter_chunks(pages, self.chunk_tokens)
+        levels = 1
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="summarize") as pool:
+            first = next(chunks, None)
+            second = next(chunks, None)
+            if first is None:
+                summary = ""
+            elif second is None:
+                # 只有一个分块时直接生成最终摘要
+                stats["chunks"] = 1
+                summary = self._summarize("map", first, length, stats)
+            else:
+                summaries = self._run(pool, "map", self._chain(first, second, chunks), self.map_length, stats)
+                while True:
+                    levels += 1
+                    groups = self._groups(summaries)
+                    if len(groups) == 1:
+                        summary = self._summarize("reduce", groups[0], length, stats)
+                        break
+                    summaries = self._run(pool, "reduce", groups, self.map_length, stats)
+
+        result = {"summary": summary, "levels": levels, "elapsed": time.time() - started, **stats}
+        logger.info(
+            f"分层摘要完成: {stats['chunks']} 个分块, {levels} 层, "
+            f"{stats['model_calls']} 次模型调用, {stats['cached']} 个命中缓存"
+        )
+        return result
+
+    @staticmethod
+    def _chain(first: str, second: str, rest: Iterator[str]) -> Iterator[str]:
+        yield first
+        yield second
+        yield from rest
@@ -0,0 +1,54 @@
+"""轻量文本提取
+
+内容索引、近似重复检测等只需要正文字符串的场景使用的统一入口，
+解析由 document_loaders 中的惰性加载器完成(与文档智能体、解析结果缓存同一套解析器和
+解析器版本)；达到字符上限后不再解析后续页面。DOCX 只提取正文，不含页眉页脚
+"""
+
+import logging
+from pathlib import Path
+from typing import Optional, Callable
+
+from .document_loaders import TEXT_EXTENSIONS, PdfDocument, PdfReader, loader_for, open_document
+
+logger = logging.getLogger(__name__)
+
+EXTRACTABLE_EXTENSIONS = TEXT_EXTENSIONS | {".docx", ".pptx", ".pdf"}
+
+
+def can_extract(path: str) -> bool:
+    """判断文件类型是否支持文本提取"""
+    return Path(path).suffix.lower() in EXTRACTABLE_EXTENSIONS
+
+
+def parser_version(path: str) -> Optional[str]:
+    """文件类型对应的解析器版本，提取结果需要随解析器失效时作为缓存键的一部分"""
+    loader = loader_for(Path(path).suffix.lower())
+    return loader.parser_version if loader is not None else None
+
+
+def extract_text(path: str, max_chars: Optional[int] = None,
+                 opener: Optional[Callable] = None) -> Optional[str]:
+    """提取文件正文文本
+
+    Args:
+        path: 文件路径
+        max_chars: 最多提取的字符数，None 表示不限制
+        opener: 打开文档的函数 (路径, 文件类型) -> Document，
+            传入 FileTools.open_document 时复用解析结果缓存，默认直接解析
+
+    Returns:
+        文本内容，不支持的类型或提取失败时返回None
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix not in EXTRACTABLE_EXTENSIONS:
+        return None
+    if loader_for(suffix) is PdfDocument and PdfReader is None:
+        logger.debug("未安装 pypdf，跳过 PDF 文本提取")
+        return None
+    try:
+        with (opener or open_document)(path, suffix) as doc:
+            return doc.text(max_chars)
+    except Exception as e:
+        logger.warning(f"提取文本失败 {path}: {e}")
+    return None
@@ -0,0 +1,413 @@
+"""文件监听服务
+
+在 Linux 上通过 ctypes 调用 inotify 递归监听目录，其他平台或监听数达到上限时
+退回到定期扫描比较。短时间内的大量事件合并为一个变更集，在事件平息(settle)后
+或积压超过 max_delay 时交给处理函数，由其增量更新各类索引
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import List, Dict, Any, Optional, Iterable, Callable, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# inotify 事件掩码(见 <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK
+)
+_REMOVED = IN_DELETE | IN_MOVED_FROM
+_EVENT_HEADER = struct.Struct("iIII")
+
+# 监听器产出的事件: (路径, "changed"/"deleted"/"overflow", 是否目录)
+WatchEvent = Tuple[str, str, bool]
+
+
+class WatchLimitError(OSError):
+    """inotify 监听数达到系统上限"""
+
+
+def _is_excluded(path: str, exclude: Tuple[str, ...]) -> bool:
+    return any(path == ex or path.startswith(ex + os.sep) for ex in exclude)
+
+
+def _iter_dirs(root: str, exclude: Tuple[str, ...]) -> Iterable[str]:
+    """深度优先列出目录树(跳过隐藏目录和排除目录，与目录扫描器一致)"""
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        if _is_excluded(path, exclude):
+            continue
+        yield path
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.'):
+                            stack.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.debug(f"无法列出目录 {path}: {e}")
+
+
+class InotifyWatcher:
+    """基于 inotify 的递归目录监听"""
+
+    def __init__(self, roots: Iterable[str], exclude: Tuple[str, ...] = ()):
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify 仅支持 Linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 失败: {os.strerror(err)}")
+        self.exclude = exclude
+        self._paths: Dict[int, str] = {}
+        self._wds: Dict[str, int] = {}
+        try:
+            for root in roots:
+                self._add_tree(root)
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def watch_count(self) -> int:
+        return len(self._wds)
+
+    def _add_tree(self, root: str):
+        for path in _iter_dirs(root, self.exclude):
+            if path in self._wds:
+                continue
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    raise WatchLimitError(err, "inotify 监听数达到上限(fs.inotify.max_user_watches)")
+                logger.debug(f"无法监听目录 {path}: {os.strerror(err)}")
+                continue
+            self._paths[wd] = path
+            self._wds[path] = wd
+
+    def _remove_tree(self, root: str):
+        prefix = root + os.sep
+        for path in [p for p in self._wds if p == root or p.startswith(prefix)]:
+            wd = self._wds.pop(path)
+            self._paths.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def read(self, timeout: float) -> List[WatchEvent]:
+        """等待并读取事件"""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        chunks = []
+        while True:
+            try:
+                chunks.append(os.read(self._fd, 65536))
+            except BlockingIOError:
+                break
+        events: List[WatchEvent] = []
+        for chunk in chunks:
+            self._parse(chunk, events)
+        return events
+
+    def _parse(self, data: bytes, events: List[WatchEvent]):
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += _EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                events.append(("", "overflow", True))
+                continue
+            if mask & IN_IGNORED:
+                path = self._paths.pop(wd, None)
+                if path is not None and self._wds.get(path) == wd:
+                    del self._wds[path]
+                continue
+            parent = self._paths.get(wd)
+            if parent is None or not name:
+                continue
+
+            path = os.path.join(parent, os.fsdecode(name))
+            is_dir = bool(mask & IN_ISDIR)
+            if is_dir and (name.startswith(b".") or _is_excluded(path, self.exclude)):
+                continue
+            if mask & _REMOVED:
+                if is_dir:
+                    self._remove_tree(path)
+                events.append((path, "deleted", is_dir))
+            else:
+                if is_dir and mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        self._add_tree(path)
+                    except WatchLimitError as e:
+                        logger.warning(f"{e}, 新目录 {path} 未被监听")
+                events.append((path, "changed", is_dir))
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher:
+    """定期扫描比较文件大小和修改时间的监听(inotify 不可用时使用)"""
+
+    def __init__(self, roots: Iterable[str], exclude: Tuple[str, ...] = (), interval: float = 5.0):
+        self.roots = list(roots)
+        self.exclude = exclude
+        self.interval = interval
+        self._files, self._dirs = self._snapshot()
+        self._next_poll = time.monotonic() + interval
+
+    def _snapshot(self) -> Tuple[Dict[str, Tuple[int, int]], Set[str]]:
+        files: Dict[str, Tuple[int, int]] = {}
+        dirs: Set[str] = set()
+        for root in self.roots:
+            for path in _iter_dirs(root, self.exclude):
+                dirs.add(path)
+                try:
+                    with os.scandir(path) as it:
+                        for entry in it:
+                            try:
+                                if entry.is_file(follow_symlinks=False):
+                                    st = entry.stat(follow_symlinks=False)
+                                    files[entry.path] = (st.st_size, st.st_mtime_ns)
+                            except OSError:
+                                continue
+                except OSError:
+                    continue
+        return files, dirs
+
+    def read(self, timeout: float) -> List[WatchEvent]:
+        """到达扫描间隔时扫描一次并与上次结果比较"""
+        wait = self._next_poll - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, timeout))
+            if time.monotonic() < self._next_poll:
+                return []
+        files, dirs = self._snapshot()
+        self._next_poll = time.monotonic() + self.interval
+
+        events: List[WatchEvent] = []
+        for path in dirs - self._dirs:
+            events.append((path, "changed", True))
+        for path in self._dirs - dirs:
+            events.append((path, "deleted", True))
+        for path, signature in files.items():
+            if self._files.get(path) != signature:
+                events.append((path, "changed", False))
+        for path in self._files.keys() - files.keys():
+            events.append((path, "deleted", False))
+        self._files, self._dirs = files, dirs
+        return events
+
+    @property
+    def watch_count(self) -> int:
+        return len(self._dirs)
+
+    def close(self):
+        pass
+
+
+class ChangeSet:
+    """合并后的变更集"""
+
+    __slots__ = ("files", "directories", "created_dirs", "deleted_dirs", "overflow", "events",
+                 "first_at", "last_at")
+
+    def __init__(self):
+        # 文件路径 -> "changed"/"deleted"，同一文件只保留最后一次状态
+        self.files: Dict[str, str] = {}
+        # 直接子项发生变化、需要重新列出的目录
+        self.directories: Set[str] = set()
+        self.created_dirs: Set[str] = set()
+        self.deleted_dirs: Set[str] = set()
+        self.overflow = False
+        self.events = 0
+        self.first_at: Optional[float] = None
+        self.last_at: Optional[float] = None
+
+    def add(self, path: str, kind: str, is_dir: bool, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        self.events += 1
+        self.first_at = self.first_at or now
+        self.last_at = now
+        if kind == "overflow":
+            self.overflow = True
+            return
+        self.directories.add(os.path.dirname(path))
+        if not is_dir:
+            self.files[path] = kind
+        elif kind == "deleted":
+            self.created_dirs.discard(path)
+            self.deleted_dirs.add(path)
+        else:
+            self.deleted_dirs.discard(path)
+            self.created_dirs.add(path)
+
+    def __bool__(self) -> bool:
+        return self.events > 0
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "events": self.events,
+            "files": len(self.files),
+            "directories": len(self.directories),
+            "created_dirs": len(self.created_dirs),
+            "deleted_dirs": len(self.deleted_dirs),
+            "overflow": int(self.overflow)
+        }
+
+
+class WatchService:
+    """后台文件监听服务"""
+
+    BACKENDS = ("auto", "inotify", "polling")
+
+    def __init__(
+        self,
+        roots: Iterable[str],
+        handler: Callable[[ChangeSet], None],
+        backend: str = "auto",
+        settle: float = 2.0,
+        max_delay: float = 30.0,
+        poll_interval: float = 5.0,
+        exclude: Optional[Iterable[str]] = None
+    ):
+        """初始化监听服务
+
+        Args:
+            roots: 监听的根目录
+            handler: 处理变更集的函数(在监听线程中调用)
+            backend: auto - 优先 inotify，不可用时轮询; inotify; polling
+            settle: 最后一个事件后等待多久(秒)再处理，期间的新事件合并到同一变更集
+            max_delay: 变更集最长积压时间(秒)，持续有事件时也会按该间隔处理
+            poll_interval: 轮询模式的扫描间隔(秒)
+            exclude: 不监听的目录(如缓存和备份目录，避免写索引触发新事件)
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"不支持的监听方式: {backend} (可用: {', '.join(self.BACKENDS)})")
+        self.roots = [os.path.abspath(r) for r in roots]
+        for root in self.roots:
+            if not os.path.isdir(root):
+                raise FileNotFoundError(f"目录不存在: {root}")
+        self.handler = handler
+        self.backend = backend
+        self.settle = settle
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.exclude = tuple(os.path.abspath(p) for p in (exclude or ()))
+
+        self._watcher = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.active_backend: Optional[str] = None
+        self.stats = {"batches": 0, "events": 0, "errors": 0}
+
+    def _open_watcher(self):
+        if self.backend in ("auto", "inotify"):
+            try:
+                watcher = InotifyWatcher(self.roots, self.exclude)
+                self.active_backend = "inotify"
+                return watcher
+            except OSError as e:
+                if self.backend == "inotify":
+                    raise
+                logger.warning(f"inotify 不可用({e})，改用轮询监听")
+        self.active_backend = "polling"
+        return PollingWatcher(self.roots, self.exclude, self.poll_interval)
+
+    def start(self):
+        """启动监听线程"""
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._watcher = self._open_watcher()
+        self._thread = threading.Thread(target=self._run, name="watch-service", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"文件监听已启动({self.active_backend}): {len(self.roots)} 个根目录, "
+            f"{self._watcher.watch_count} 个目录"
+        )
+
+    def stop(self, timeout: float = 5.0):
+        """停止监听(未处理的变更会先处理完)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        logger.info("文件监听已停止")
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        changes = ChangeSet()
+        try:
+            while not self._stop.is_set():
+                try:
+                    events = self._watcher.read(timeout=min(self.settle, 0.5) or 0.05)
+                except Exception as e:
+                    logger.error(f"读取监听事件失败: {e}")
+                    self.stats["errors"] += 1
+                    time.sleep(1)
+                    continue
+                now = time.monotonic()
+                for path, kind, is_dir in events:
+                    changes.add(path, kind, is_dir, now)
+                if changes and (now - changes.last_at >= self.settle or now - changes.first_at >= self.max_delay):
+                    self._dispatch(changes)
+                    changes = ChangeSet()
+            if changes:
+                self._dispatch(changes)
+        finally:
+            self._watcher.close()
+
+    def _dispatch(self, changes: ChangeSet):
+        self.stats["batches"] += 1
+        self.stats["events"] += changes.events
+        try:
+            self.handler(changes)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"处理文件变更失败: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取监听统计"""
+        return {
+            **self.stats,
+            "running": self.is_running,
+            "backend": self.active_backend,
+            "roots": list(self.roots),
+            "watched_dirs": self._watcher.watch_count if self._watcher is not None else 0
+        }
@@ -134,3 +134,245 @@ def cleanup_test_data():
     for dir_path in test_dirs:
         if os.path.exists(dir_path):
             shutil.rmtree(dir_path)
+
+
+DOCX_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+@pytest.fixture
+def make_docx():
+    """生成只含正文和 docProps 的最小 DOCX 文件的工厂函数"""
+    import zipfile
+
+    def _make_docx(path, paragraphs, title="季度报告"):
+        body = "".join(
+            f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p>' if text else '<w:p/>'
+            for text in paragraphs
+        )
+        table = '<w:tbl><w:tr><w:tc><w:p><w:r><w:t>单元格</w:t></w:r></w:p></w:tc></w:tr></w:tbl>'
+        with zipfile.ZipFile(path, "w") as zf:
+            zf.writestr("word/document.xml",
+                        f'<?xml version="1.0"?><w:document xmlns:w="{DOCX_W_NS}">'
+                        f'<w:body>{body}{table}</w:body></w:document>')
+            zf.writestr("docProps/core.xml",
+                        '<?xml version="1.0"?><cp:coreProperties '
+                        'xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+                        'xmlns:dc="http://purl.org/dc/elements/1.1/">'
+                        f'<dc:title>{title}</dc:title><dc:creator>张三</dc:creator></cp:coreProperties>')
+            zf.writestr("docProps/app.xml",
+                        '<?xml version="1.0"?><Properties '
+                        'xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties">'
+                        '<Pages>3</Pages><Words>120</Words></Properties>')
+        return path
+
+    return _make_docx
+
+
+class FakeImapServer:
+    """用于测试的本地 IMAP 服务器，实现同步用到的最小命令集
+
+    支持 CAPABILITY/LOGIN/ENABLE/SELECT/EXAMINE/NOOP/LOGOUT/UID FETCH/UID SEARCH，
+    condstore=True 时提供 HIGHESTMODSEQ 和 CHANGEDSINCE
+    """
+
+    def __init__(self, user="user@test.local", password="secret", condstore=True):
+        import socket
+        import socketserver
+        import threading
+
+        self.user = user
+        self.password = password
+        self.condstore = condstore
+        self.folders = {}
+        self.logins = 0
+        self.commands = []
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                server._serve(self.rfile, self.wfile)
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server(("127.0.0.1", 0), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def folder(self, name):
+        return self.folders.setdefault(name, {"uidvalidity": 1000, "uidnext": 1, "modseq": 1, "messages": []})
+
+    def add_message(self, folder, subject, body="正文", sender="boss@company.com",
+                    date="Mon, 15 Jan 2024 10:00:00 +0800", flags=(), attachment=None):
+        """追加一封邮件，返回其 UID"""
+        from email.message import EmailMessage
+        from email.policy import SMTP
+        message = EmailMessage()
+        message["From"] = sender
+        message["To"] = self.user
+        message["Subject"] = subject
+        message["Date"] = date
+        message["Message-ID"] = f"<msg-{sum(b['uidnext'] for b in self.folders.values())}@test.local>"
+        message.set_content(body)
+        if attachment:
+            message.add_attachment(attachment[1], maintype="application", subtype="octet-stream",
+                                   filename=attachment[0])
+        with self.lock:
+            box = self.folder(folder)
+            uid = box["uidnext"]
+            box["uidnext"] += 1
+            box["modseq"] += 1
+            box["messages"].append({"uid": uid, "flags": list(flags), "modseq": box["modseq"],
+                                    "raw": message.as_bytes(policy=SMTP)})
+        return uid
+
+    def set_flags(self, folder, uid, flags):
+        with self.lock:
+            box = self.folder(folder)
+            box["modseq"] += 1
+            for message in box["messages"]:
+                if message["uid"] == uid:
+                    message.update(flags=list(flags), modseq=box["modseq"])
+
+    def expunge(self, folder, uid):
+        with self.lock:
+            box = self.folder(folder)
+            box["messages"] = [m for m in box["messages"] if m["uid"] != uid]
+
+    # ---- 协议实现 ----
+
+    @staticmethod
+    def _uid_set(spec, messages):
+        last = messages[-1]["uid"] if messages else 0
+        uids = set()
+        for part in spec.split(","):
+            low, _, high = part.partition(":")
+            low = last if low == "*" else int(low)
+            high = low if not high else (last if high == "*" else int(high))
+            if "*" in part and messages and low > high:
+                low, high = high, low
+            uids.update(m["uid"] for m in messages if min(low, high) <= m["uid"] <= max(low, high))
+        return uids
+
+    @staticmethod
+    def _header_fields(raw, names):
+        head = raw.split(b"\r\n\r\n", 1)[0].split(b"\r\n")
+        lines, keep = [], False
+        for line in head:
+            if line[:1] in (b" ", b"\t"):
+                if keep:
+                    lines.append(line)
+                continue
+            keep = line.split(b":", 1)[0].strip().upper().decode() in names
+            if keep:
+                lines.append(line)
+        return b"\r\n".join(lines) + b"\r\n\r\n"
+
+    def _fetch(self, write, box, spec, items, changedsince):
+        import re
+        field_match = re.search(r"HEADER\.FIELDS \(([^)]*)\)", items)
+        names = field_match.group(1).upper().split() if field_match else []
+        for seq, message in enumerate(box["messages"], 1):
+            if message["uid"] not in self._uid_set(spec, box["messages"]):
+                continue
+            if changedsince is not None and message["modseq"] <= changedsince:
+                continue
+            parts = [f"UID {message['uid']}", f"FLAGS ({' '.join(message['flags'])})"]
+            if self.condstore and (changedsince is not None or "MODSEQ" in items):
+                parts.append(f"MODSEQ ({message['modseq']})")
+            if "INTERNALDATE" in items:
+                parts.append('INTERNALDATE "15-Jan-2024 10:00:00 +0800"')
+            if "RFC822.SIZE" in items:
+                parts.append(f"RFC822.SIZE {len(message['raw'])}")
+            literal = None
+            if field_match:
+                literal = self._header_fields(message["raw"], names)
+                parts.append(f"BODY[HEADER.FIELDS ({' '.join(names)})] {{{len(literal)}}}")
+            elif "BODY.PEEK[]" in items:
+                literal = message["raw"]
+                parts.append(f"BODY[] {{{len(literal)}}}")
+            line = f"* {seq} FETCH ({' '.join(parts)}".encode()
+            write(line + b"\r\n" + literal + b")\r\n" if literal is not None else line + b")\r\n")
+
+    def _serve(self, rfile, wfile):
+        import re
+
+        def write(data):
+            wfile.write(data if isinstance(data, bytes) else data.encode() + b"\r\n")
+            wfile.flush()
+
+        write("* OK [CAPABILITY IMAP4rev1] fake server ready")
+        selected = None
+        while True:
+            line = rfile.readline()
+            if not line:
+                return
+            tag, _, rest = line.decode().strip().partition(" ")
+            command, _, args = rest.partition(" ")
+            command = command.upper()
+            with self.lock:
+                self.commands.append(rest)
+                if command == "CAPABILITY":
+                    write("* CAPABILITY IMAP4rev1" + (" CONDSTORE ENABLE" if self.condstore else ""))
+                    write(f"{tag} OK done")
+                elif command == "LOGIN":
+                    user, password = args.split(" ", 1)
+                    if (user.strip('"'), password.strip('"')) == (self.user, self.password):
+                        self.logins += 1
+                        write(f"{tag} OK logged in")
+                    else:
+                        write(f"{tag} NO authentication failed")
+                elif command == "ENABLE":
+                    write("* ENABLED CONDSTORE")
+                    write(f"{tag} OK enabled")
+                elif command in ("SELECT", "EXAMINE"):
+                    selected = args.strip('"')
+                    box = self.folder(selected)
+                    write(f"* {len(box['messages'])} EXISTS")
+                    write(f"* OK [UIDVALIDITY {box['uidvalidity']}] ok")
+                    write(f"* OK [UIDNEXT {box['uidnext']}] ok")
+                    if self.condstore:
+                        write(f"* OK [HIGHESTMODSEQ {box['modseq']}] ok")
+                    write(f"{tag} OK [READ-ONLY] done")
+                elif command == "NOOP":
+                    write(f"{tag} OK done")
+                elif command == "LOGOUT":
+                    write("* BYE")
+                    write(f"{tag} OK bye")
+                    return
+                elif command == "UID":
+                    sub, _, args = args.partition(" ")
+                    box = self.folder(selected)
+                    if sub.upper() == "SEARCH":
+                        write("* SEARCH " + " ".join(str(m["uid"]) for m in box["messages"]))
+                    else:
+                        spec, _, items = args.partition(" ")
+                        match = re.search(r"\(CHANGEDSINCE (\d+)\)\s*$", items)
+                        self._fetch(write, box, spec, items, int(match.group(1)) if match else None)
+                    write(f"{tag} OK done")
+                else:
+                    write(f"{tag} BAD unknown command")
+
+
+@pytest.fixture
+def imap_server():
+    """本地 IMAP 测试服务器"""
+    server = FakeImapServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def imap_server_without_condstore():
+    """不支持 CONDSTORE 的本地 IMAP 测试服务器"""
+    server = FakeImapServer(condstore=False)
+    yield server
+    server.close()
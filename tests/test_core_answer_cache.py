@@ -0,0 +1,249 @@
+"""AnswerCache 单元测试"""
+import pytest
+from unittest.mock import Mock
+from src.core.answer_cache import AnswerCache
+from src.core.vector_db import EPOCH_KEY
+from src.agents.knowledge_agent import KnowledgeAgent
+from src.tools.file_tools import FileTools
+
+
+class FakeVectorDB:
+    """记录文档版本的向量数据库替身"""
+
+    def __init__(self):
+        self.versions = {}
+        self.epoch = 0
+        self.listeners = []
+        self.semantic_search = Mock(return_value=[
+            {"id": "doc1", "document": "报销需在30天内提交", "metadata": {}, "distance": 0.1},
+            {"id": "doc2", "document": "差旅标准见附件", "metadata": {}, "distance": 0.2}
+        ])
+
+    def add_change_listener(self, callback):
+        self.listeners.append(callback)
+
+    def get_document_versions(self, doc_ids):
+        return {doc_id: self.epoch if doc_id == EPOCH_KEY else self.versions.get(doc_id, 0)
+                for doc_id in doc_ids}
+
+    def snapshot_versions(self):
+        return {**self.versions, EPOCH_KEY: self.epoch}
+
+    def update_document(self, doc_id):
+        self.invalidate_documents([doc_id])
+
+    def invalidate_documents(self, doc_ids):
+        for doc_id in doc_ids:
+            self.versions[doc_id] = self.versions.get(doc_id, 0) + 1
+        for callback in self.listeners:
+            callback("update", list(doc_ids))
+
+    def delete_by_metadata(self, filter_dict):
+        self.epoch += 1
+        for callback in self.listeners:
+            callback("delete", None)
+
+
+class TestAnswerCache:
+    """测试答案缓存"""
+
+    def test_normalize_question(self):
+        """测试问题规范化"""
+        assert AnswerCache.normalize_question("  报销流程是什么？ ") == "报销流程是什么"
+        assert AnswerCache.normalize_question("How   to Apply?") == "how to apply"
+        assert AnswerCache.normalize_question("ＡＢＣ") == "abc"
+
+    def test_put_and_get(self):
+        """测试写入和命中"""
+        cache = AnswerCache()
+        db = FakeVectorDB()
+
+        cache.put("报销流程?", "答案", [], {"doc1": 0})
+
+        entry = cache.get("报销流程", db)
+        assert entry is not None
+        assert entry["answer"] == "答案"
+        assert cache.get_stats()["hits"] == 1
+
+    def test_version_mismatch_invalidates(self):
+        """测试来源文档版本变化后不再命中"""
+        cache = AnswerCache()
+        db = FakeVectorDB()
+
+        cache.put("q", "a", [], {"doc1": 0})
+        db.versions["doc1"] = 1
+
+        assert cache.get("q", db) is None
+        assert cache.get_stats()["entries"] == 0
+
+    def test_invalidate_documents(self):
+        """测试按文档失效"""
+        cache = AnswerCache()
+        cache.put("q1", "a1", [], {"doc1": 0})
+        cache.put("q2", "a2", [], {"doc2": 0})
+
+        removed = cache.invalidate_documents(["doc1"])
+
+        assert removed == 1
+        assert cache.get("q1", FakeVectorDB()) is None
+        assert cache.get("q2", FakeVectorDB()) is not None
+
+    def test_add_event_clears_cache(self):
+        """测试新增文档时清空缓存"""
+        cache = AnswerCache()
+        cache.put("q", "a", [], {"doc1": 0})
+
+        cache.on_documents_changed("add", ["doc3"])
+
+        assert cache.get_stats()["entries"] == 0
+
+    def test_add_event_kept_when_disabled(self):
+        """测试关闭新增失效时保留缓存"""
+        cache = AnswerCache(invalidate_on_add=False)
+        cache.put("q", "a", [], {"doc1": 0})
+
+        cache.on_documents_changed("add", ["doc3"])
+
+        assert cache.get_stats()["entries"] == 1
+
+    def test_lru_eviction(self):
+        """测试LRU淘汰"""
+        cache = AnswerCache(max_entries=2)
+        db = FakeVectorDB()
+        cache.put("q1", "a1", [], {})
+        cache.put("q2", "a2", [], {})
+        cache.get("q1", db)
+        cache.put("q3", "a3", [], {})
+
+        assert cache.get("q2", db) is None
+        assert cache.get("q1", db) is not None
+        assert cache.get("q3", db) is not None
+
+    def test_ttl_expiry(self):
+        """测试过期"""
+        cache = AnswerCache(ttl_seconds=0)
+        cache.put("q", "a", [], {})
+        cache._entries["q"]["created_at"] -= 1
+
+        assert cache.get("q", FakeVectorDB()) is None
+
+
+class TestKnowledgeAgentAnswerCache:
+    """测试知识问答智能体使用答案缓存"""
+
+    @pytest.fixture
+    def agent(self, mock_model_manager, mock_prompt_engine, mock_memory_manager):
+        mock_prompt_engine.render_knowledge_qa = Mock(return_value="qa prompt")
+        return KnowledgeAgent(
+            name="KnowledgeAgent",
+            model_manager=mock_model_manager,
+            prompt_engine=mock_prompt_engine,
+            memory_manager=mock_memory_manager,
+            tools=Mock(),
+            vector_db=FakeVectorDB(),
+            answer_cache=AnswerCache()
+        )
+
+    def test_second_question_served_from_cache(self, agent):
+        """测试重复问题直接命中缓存"""
+        first = agent.execute({"type": "qa", "question": "报销流程是什么?"})
+        second = agent.execute({"type": "qa", "question": "报销流程是什么"})
+
+        assert first["cached"] is False
+        assert second["cached"] is True
+        assert second["answer"] == first["answer"]
+        assert agent.vector_db.semantic_search.call_count == 1
+        assert agent.model_manager.invoke.call_count == 1
+
+    def test_update_cited_document_invalidates(self, agent):
+        """测试更新被引用文档后重新生成答案"""
+        agent.execute({"type": "qa", "question": "报销流程是什么?"})
+        agent.vector_db.update_document("doc2")
+        result = agent.execute({"type": "qa", "question": "报销流程是什么?"})
+
+        assert result["cached"] is False
+        assert agent.model_manager.invoke.call_count == 2
+
+    def test_update_during_generation_invalidates(self, agent):
+        """测试生成答案期间来源文档被更新时，缓存的答案不会被命中"""
+        def invoke(*args, **kwargs):
+            agent.vector_db.update_document("doc1")
+            return "基于旧内容的答案"
+
+        agent.model_manager.invoke.side_effect = invoke
+        agent.execute({"type": "qa", "question": "报销流程是什么?"})
+        agent.model_manager.invoke.side_effect = None
+        result = agent.execute({"type": "qa", "question": "报销流程是什么?"})
+
+        assert result["cached"] is False
+        assert agent.model_manager.invoke.call_count == 2
+
+    def test_reindex_during_generation_invalidates(self, agent, tmp_path):
+        """测试生成答案期间来源文件被重新入库时，缓存的答案不会被命中"""
+        path = tmp_path / "制度.md"
+        path.write_text("报销需在15天内提交", encoding="utf-8")
+        agent.vector_db.get_by_metadata = Mock(return_value=[
+            {"id": "doc1", "metadata": {"source": str(path), "content_hash": "旧内容"}}
+        ])
+        agent.vector_db.add_documents = Mock(return_value=["doc3"])
+
+        def invoke(*args, **kwargs):
+            agent.execute({"type": "index", "file_path": str(path)})
+            return "基于旧内容的答案"
+
+        agent.model_manager.invoke.side_effect = invoke
+        agent.execute({"type": "qa", "question": "报销流程是什么?"})
+        agent.model_manager.invoke.side_effect = None
+        result = agent.execute({"type": "qa", "question": "报销流程是什么?"})
+
+        assert result["cached"] is False
+        assert agent.model_manager.invoke.call_count == 2
+
+    def test_unscoped_delete_invalidates(self, agent):
+        """测试按条件删除(影响范围未知)递增纪元后，检索前写入的答案不会被命中"""
+        def invoke(*args, **kwargs):
+            agent.vector_db.delete_by_metadata({"source": "旧文件"})
+            return "基于旧内容的答案"
+
+        agent.model_manager.invoke.side_effect = invoke
+        agent.execute({"type": "qa", "question": "报销流程是什么?"})
+        agent.model_manager.invoke.side_effect = None
+        result = agent.execute({"type": "qa", "question": "报销流程是什么?"})
+
+        assert result["cached"] is False
+        assert agent.model_manager.invoke.call_count == 2
+
+
+class TestKnowledgeAgentIngestion:
+    """测试知识问答智能体文件入库"""
+
+    def test_office_documents_use_loaders(self, mock_model_manager, mock_prompt_engine, mock_memory_manager,
+                                          make_docx, tmp_path):
+        """测试 DOCX 通过文档加载器提取正文(命中解析结果缓存)，不按 UTF-8 解码压缩包字节"""
+        tools = FileTools({
+            "document_cache": {"cache_dir": str(tmp_path / "cache" / "documents")},
+            "hash_cache": {"db_path": str(tmp_path / "cache" / "hash_cache.db")}
+        })
+        path = str(make_docx(tmp_path / "制度.docx", ["报销需在30天内提交"]))
+        with tools.open_document(path) as doc:
+            doc.text()
+        vector_db = FakeVectorDB()
+        vector_db.get_by_metadata = Mock(return_value=[])
+        vector_db.add_documents = Mock(return_value=["doc1"])
+        agent = KnowledgeAgent(
+            name="KnowledgeAgent",
+            model_manager=mock_model_manager,
+            prompt_engine=mock_prompt_engine,
+            memory_manager=mock_memory_manager,
+            tools=Mock(),
+            vector_db=vector_db,
+            document_opener=tools.open_document
+        )
+
+        result = agent.execute({"type": "index", "file_path": path})
+
+        assert result["document_ids"] == ["doc1"]
+        (content,), (metadata,) = vector_db.add_documents.call_args[0]
+        assert content == "报销需在30天内提交\n单元格"
+        assert metadata["source"] == path
+        assert tools.document_cache.get_stats()["hits"] == 1
@@ -2,7 +2,7 @@
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 from pathlib import Path
-from src.core.vector_db import VectorDBManager
+from src.core.vector_db import VectorDBManager, EPOCH_KEY
 
 
 class TestVectorDBManager:
@@ -198,3 +198,28 @@ class TestVectorDBManager:
         assert stats['collection_name'] == manager.collection_name
         assert stats['document_count'] == 100
         assert stats['persist_directory'] == manager.persist_directory
+    
+    def test_change_listener_and_versions(self, temp_config_file):
+        """测试文档版本号与变更通知"""
+        manager = VectorDBManager(temp_config_file)
+        manager.client = Mock()
+        manager.collection = Mock()
+        manager.embeddings = Mock()
+        manager.embeddings.embed_documents.return_value = [[0.1, 0.2]]
+        
+        events = []
+        manager.add_change_listener(lambda event, ids: events.append((event, ids)))
+        
+        assert manager.get_document_versions(['doc1']) == {'doc1': 0}
+        
+        manager.update_document('doc1', document="新内容")
+        manager.delete_document('doc1')
+        
+        assert manager.get_document_versions(['doc1']) == {'doc1': 2}
+        assert manager.snapshot_versions() == {'doc1': 2, EPOCH_KEY: 0}
+        assert events == [('update', ['doc1']), ('delete', ['doc1'])]
+        
+        manager.delete_by_metadata({'source': 'a.txt'})
+        
+        assert manager.snapshot_versions() == {'doc1': 2, EPOCH_KEY: 1}
+        assert manager.get_document_versions([EPOCH_KEY]) == {EPOCH_KEY: 1}
@@ -0,0 +1,160 @@
+"""流式压缩与解压单元测试"""
+import gzip
+import lzma
+import os
+import tarfile
+import zipfile
+import pytest
+from src.tools.archive_tools import create_archive, extract_archive, list_archive, safe_member_path
+
+
+@pytest.fixture
+def project(tmp_path):
+    """创建测试项目目录"""
+    root = tmp_path / "project"
+    (root / "src" / "pkg").mkdir(parents=True)
+    (root / "README.md").write_text("# 项目说明\n" * 200, encoding="utf-8")
+    (root / "src" / "pkg" / "main.py").write_text("print('hello')\n" * 1000)
+    (root / "src" / "data.bin").write_bytes(os.urandom(300 * 1024))
+    (root / "photo.jpg").write_bytes(os.urandom(50 * 1024))
+    return root
+
+
+def read_tree(root):
+    return {
+        p.relative_to(root).as_posix(): p.read_bytes()
+        for p in sorted(root.rglob("*")) if p.is_file()
+    }
+
+
+class TestZip:
+    """测试zip格式"""
+
+    def test_roundtrip_readable_by_zipfile(self, project, tmp_path):
+        out = tmp_path / "out.zip"
+        stats = create_archive([str(project)], str(out), "zip", max_workers=3)
+
+        assert stats["files"] == 4
+        with zipfile.ZipFile(out) as zf:
+            assert zf.testzip() is None
+            methods = {i.filename: i.compress_type for i in zf.infolist()}
+        assert methods["project/photo.jpg"] == zipfile.ZIP_STORED
+        assert methods["project/src/pkg/main.py"] == zipfile.ZIP_DEFLATED
+        assert methods["project/src/data.bin"] == zipfile.ZIP_STORED
+
+        extract_archive(str(out), str(tmp_path / "x"))
+        assert read_tree(tmp_path / "x" / "project") == read_tree(project)
+
+    def test_list_and_select(self, project, tmp_path):
+        out = tmp_path / "out.zip"
+        create_archive([str(project)], str(out), "zip")
+
+        names = {m["name"] for m in list_archive(str(out))}
+        assert "project/README.md" in names
+
+        result = extract_archive(str(out), str(tmp_path / "x"), members=["project/README.md"])
+        assert result["extracted_files"] == 1
+        assert [p.name for p in (tmp_path / "x").rglob("*") if p.is_file()] == ["README.md"]
+
+    def test_single_files_use_basename(self, project, tmp_path):
+        out = tmp_path / "out.zip"
+        create_archive([str(project / "README.md"), str(project / "photo.jpg")], str(out))
+
+        assert sorted(m["name"] for m in list_archive(str(out))) == ["README.md", "photo.jpg"]
+
+
+class TestTar:
+    """测试tar格式"""
+
+    @pytest.mark.parametrize("fmt,suffix", [("tar", ".tar"), ("gz", ".tar.gz"), ("xz", ".tar.xz")])
+    def test_roundtrip(self, project, tmp_path, fmt, suffix):
+        out = tmp_path / f"out{suffix}"
+        create_archive([str(project)], str(out), fmt, chunk_size=64 * 1024, max_workers=3)
+
+        # 标准库可直接读取多分块拼接的压缩流
+        with tarfile.open(out, "r:*") as tar:
+            assert len(tar.getnames()) == 4
+
+        extract_archive(str(out), str(tmp_path / "x"))
+        assert read_tree(tmp_path / "x" / "project") == read_tree(project)
+
+    @pytest.mark.parametrize("fmt", ["gz", "xz"])
+    def test_indexed_random_access(self, project, tmp_path, fmt, monkeypatch):
+        out = tmp_path / f"out.{fmt}"
+        create_archive([str(project)], str(out), fmt, chunk_size=32 * 1024)
+        assert os.path.exists(str(out) + ".idx")
+
+        # 列出内容和按需提取都不应整体解压
+        monkeypatch.setattr(tarfile, "open", lambda *a, **k: pytest.fail("不应顺序解压"))
+        names = {m["name"] for m in list_archive(str(out))}
+        assert "project/src/data.bin" in names
+
+        result = extract_archive(str(out), str(tmp_path / "x"), members=["project/src/data.bin"])
+        assert result["extracted_files"] == 1
+        assert (tmp_path / "x" / "project" / "src" / "data.bin").read_bytes() == \
+            (project / "src" / "data.bin").read_bytes()
+
+    @pytest.mark.parametrize("fmt", ["gz", "xz"])
+    def test_extract_without_index(self, project, tmp_path, fmt):
+        """测试缺少索引时顺序解压多分块拼接的压缩包"""
+        out = tmp_path / f"out.tar.{fmt}"
+        create_archive([str(project)], str(out), fmt, chunk_size=16 * 1024)
+        os.remove(str(out) + ".idx")
+
+        result = extract_archive(str(out), str(tmp_path / "x"))
+        assert result["extracted_files"] == 4
+        assert read_tree(tmp_path / "x" / "project") == read_tree(project)
+
+    def test_extract_without_data_filter(self, project, tmp_path, monkeypatch):
+        """测试没有 tarfile.data_filter 的 Python 版本仍拒绝越界链接"""
+        monkeypatch.delattr(tarfile, "data_filter")
+        out = tmp_path / "out.tar"
+        create_archive([str(project)], str(out), "tar")
+        extract_archive(str(out), str(tmp_path / "x"))
+        assert read_tree(tmp_path / "x" / "project") == read_tree(project)
+
+        bad = tmp_path / "bad.tar"
+        with tarfile.open(bad, "w") as tar:
+            link = tarfile.TarInfo("link")
+            link.type, link.linkname = tarfile.SYMTYPE, "../../etc/passwd"
+            tar.addfile(link)
+        with pytest.raises(ValueError):
+            extract_archive(str(bad), str(tmp_path / "y"))
+        assert not os.path.lexists(tmp_path / "y" / "link")
+
+    def test_stale_index_ignored(self, project, tmp_path):
+        out = tmp_path / "out.tar.gz"
+        create_archive([str(project)], str(out), "gz")
+        with open(out, "ab") as f:
+            f.write(gzip.compress(b""))
+
+        assert len(list_archive(str(out))) == 4
+
+    def test_xz_multistream_decodes_with_lzma(self, project, tmp_path):
+        out = tmp_path / "out.tar.xz"
+        create_archive([str(project)], str(out), "xz", chunk_size=16 * 1024)
+
+        assert len(lzma.decompress(out.read_bytes())) % 512 == 0
+
+
+class TestSafety:
+    """测试路径安全"""
+
+    def test_reject_traversal(self, tmp_path):
+        with pytest.raises(ValueError):
+            safe_member_path(str(tmp_path), "../evil.txt")
+        with pytest.raises(ValueError):
+            safe_member_path(str(tmp_path), "/etc/passwd")
+
+    def test_zip_traversal_rejected(self, tmp_path):
+        bad = tmp_path / "bad.zip"
+        with zipfile.ZipFile(bad, "w") as zf:
+            zf.writestr("../evil.txt", "x")
+
+        with pytest.raises(ValueError):
+            extract_archive(str(bad), str(tmp_path / "x"))
+        assert not (tmp_path / "evil.txt").exists()
+
+    def test_unknown_format(self, project, tmp_path):
+        with pytest.raises(ValueError):
+            create_archive([str(project)], str(tmp_path / "a.rar"), "rar")
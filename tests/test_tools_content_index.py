@@ -0,0 +1,114 @@
+"""文件内容全文索引单元测试"""
+import os
+import pytest
+from src.tools.content_index import ContentIndex, required_literals
+from src.tools.file_tools import FileTools
+from src.tools.fs_scanner import DirectoryScanner
+from src.tools.near_duplicates import NearDuplicateFinder
+
+
+@pytest.fixture
+def docs(tmp_path, make_docx):
+    root = tmp_path / "docs"
+    (root / "sub").mkdir(parents=True)
+    (root / "a.txt").write_text("The quick brown fox\njumps over the lazy dog", encoding="utf-8")
+    (root / "sub" / "b.md").write_text("版本 version 2.10 发布\n合同编号 HT-2024-001", encoding="utf-8")
+    (root / "c.bin").write_bytes(b"quick brown")
+    make_docx(root / "d.docx", ["Quarterly budget report"])
+    old = 1_600_000_000
+    for path in root.rglob("*"):
+        if path.is_file():
+            os.utime(path, (old, old))
+    return root
+
+
+@pytest.fixture
+def index(tmp_path, docs):
+    idx = ContentIndex(str(tmp_path / "cache" / "content.db"))
+    idx.update(str(docs), DirectoryScanner(max_workers=1).iter_entries(str(docs)))
+    yield idx
+    idx.close()
+
+
+def refresh(index, root):
+    return index.update(str(root), DirectoryScanner(max_workers=1).iter_entries(str(root)))
+
+
+class TestContentIndex:
+    """测试内容索引"""
+
+    def test_required_literals(self):
+        assert required_literals(r"hello\s+world") == ["hello", "world"]
+        assert required_literals(r"(foo|bar)baz") == ["baz"]
+        assert required_literals(r"a.c") == []
+
+    def test_substring_search(self, index, docs):
+        results = index.search(str(docs), "BROWN fox")
+
+        assert [r["name"] for r in results] == ["a.txt"]
+        assert results[0]["match_count"] == 1
+        assert "quick brown fox" in results[0]["snippets"][0]
+
+    def test_case_sensitive_and_docx(self, index, docs):
+        assert index.search(str(docs), "budget report")[0]["name"] == "d.docx"
+        assert index.search(str(docs), "quarterly", case_sensitive=True) == []
+
+    def test_regex_search(self, index, docs):
+        results = index.search(str(docs), r"version \d+\.\d+", regex=True)
+        assert [r["name"] for r in results] == ["b.md"]
+
+        results = index.search(str(docs), r"HT-\d{4}-\d+", regex=True, file_types=[".md"])
+        assert results[0]["snippets"][0].strip().endswith("HT-2024-001")
+
+    def test_short_query_scans(self, index, docs):
+        assert {r["name"] for r in index.search(str(docs), "发布")} == {"b.md"}
+
+    def test_incremental_update(self, index, docs):
+        stats = refresh(index, docs)
+        assert stats == {"indexed": 0, "unchanged": 3, "removed": 0, "failed": 0}
+
+        (docs / "a.txt").write_text("completely different", encoding="utf-8")
+        os.utime(docs / "a.txt", (1_700_000_000, 1_700_000_000))
+        (docs / "sub" / "b.md").unlink()
+        stats = refresh(index, docs)
+
+        assert stats["indexed"] == 1 and stats["removed"] == 1
+        assert index.search(str(docs), "brown fox") == []
+        assert index.search(str(docs), "version") == []
+        assert index.search(str(docs), "different")[0]["name"] == "a.txt"
+
+    def test_parser_upgrade_reextracts(self, index, docs):
+        """测试解析器版本变化的文档在下次刷新时重新提取"""
+        with index._conn:
+            index._conn.execute("UPDATE docs SET parser = 'office-0' WHERE path LIKE '%.docx'")
+
+        stats = refresh(index, docs)
+
+        assert stats["indexed"] == 1 and stats["unchanged"] == 2
+        assert index.search(str(docs), "budget report")[0]["name"] == "d.docx"
+
+    def test_extraction_uses_document_cache(self, docs, tmp_path):
+        """测试传入 FileTools.open_document 时内容索引和近似重复检测共用解析结果缓存"""
+        tools = FileTools({
+            "document_cache": {"cache_dir": str(tmp_path / "cache" / "documents")},
+            "hash_cache": {"db_path": str(tmp_path / "cache" / "hash_cache.db")}
+        })
+        index = ContentIndex(str(tmp_path / "cache" / "shared.db"), opener=tools.open_document)
+        refresh(index, docs)
+        assert tools.document_cache.get_stats()["misses"] == 1
+        assert index.search(str(docs), "budget report")[0]["name"] == "d.docx"
+
+        NearDuplicateFinder(opener=tools.open_document).find(
+            DirectoryScanner(max_workers=1).iter_entries(str(docs))
+        )
+
+        assert tools.document_cache.get_stats()["hits"] == 1
+        index.close()
+
+    def test_search_scoped_to_directory(self, index, docs):
+        assert index.search(str(docs / "sub"), "quick") == []
+        assert index.get_stats()["documents"] == 3
+
+    def test_invalid_regex(self, index, docs):
+        with pytest.raises(ValueError):
+            index.search(str(docs), "(unclosed", regex=True)
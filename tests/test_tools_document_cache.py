@@ -0,0 +1,86 @@
+"""解析结果缓存单元测试"""
+import os
+import pytest
+from src.tools.document_cache import DocumentCache, CachedDocument
+from src.tools.document_loaders import OfficeDocument
+from src.tools.file_tools import FileTools
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """创建临时目录中的缓存"""
+    return DocumentCache(cache_dir=str(tmp_path / "cache"), max_size_mb=1)
+
+
+class TestDocumentCache:
+    """测试解析结果缓存"""
+
+    def test_second_open_hits_cache(self, make_docx, cache, tmp_path):
+        """测试完整读取一遍后再次打开命中缓存"""
+        path = str(make_docx(tmp_path / "a.docx", ["甲", "乙"]))
+
+        first = cache.open(path, ".docx", OfficeDocument)
+        assert first.metadata["cached"] is False
+        assert list(first.iter_pages()) == ["甲", "乙", "单元格"]
+
+        second = cache.open(path, ".docx", OfficeDocument)
+        assert isinstance(second, CachedDocument)
+        assert list(second.iter_pages()) == ["甲", "乙", "单元格"]
+        assert second.metadata["title"] == "季度报告"
+        assert second.metadata["file_name"] == "a.docx"
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_partial_read_not_cached(self, make_docx, cache, tmp_path):
+        """测试提前结束读取时不保存不完整的结果"""
+        path = str(make_docx(tmp_path / "a.docx", ["甲", "乙"]))
+
+        cache.open(path, ".docx", OfficeDocument).text(max_chars=1)
+
+        assert cache.get_stats()["entries"] == 0
+        assert not [name for name in os.listdir(cache.cache_dir) if name.endswith(".tmp")]
+
+    def test_keyed_by_content_and_parser_version(self, make_docx, cache, tmp_path):
+        """测试复制的文件命中缓存，解析器版本变化时失效"""
+        original = str(make_docx(tmp_path / "a.docx", ["甲"]))
+        list(cache.open(original, ".docx", OfficeDocument).iter_pages())
+
+        copy = tmp_path / "copy.docx"
+        copy.write_bytes(open(original, "rb").read())
+        assert isinstance(cache.open(str(copy), ".docx", OfficeDocument), CachedDocument)
+
+        class NewParser(OfficeDocument):
+            parser_version = "office-2"
+
+        assert not isinstance(cache.open(original, ".docx", NewParser), CachedDocument)
+
+    def test_lru_eviction(self, make_docx, tmp_path):
+        """测试超过总大小时淘汰最久未访问的项"""
+        cache = DocumentCache(cache_dir=str(tmp_path / "cache"), max_size_mb=0.0025)
+        paths = []
+        for i in range(3):
+            # 随机内容的文档，每个压缩后约 1.1KB，上限只能容纳两个
+            text = os.urandom(1000).hex()
+            paths.append(str(make_docx(tmp_path / f"d{i}.docx", [text])))
+            list(cache.open(paths[-1], ".docx", OfficeDocument).iter_pages())
+            if i == 1:
+                # 访问第一个文档，使第二个成为最久未访问的项
+                cache.open(paths[0], ".docx", OfficeDocument)
+
+        assert cache.evictions >= 1
+        assert isinstance(cache.open(paths[2], ".docx", OfficeDocument), CachedDocument)
+        assert not isinstance(cache.open(paths[1], ".docx", OfficeDocument), CachedDocument)
+        assert cache.get_stats()["size_bytes"] <= cache.max_bytes
+
+    def test_load_document_uses_cache(self, make_docx, tmp_path):
+        """测试 load_document 透明使用缓存"""
+        tools = FileTools({
+            "document_cache": {"cache_dir": str(tmp_path / "cache")},
+            "hash_cache": {"db_path": str(tmp_path / "hash_cache.db")}
+        })
+        path = str(make_docx(tmp_path / "a.docx", ["甲"]))
+
+        first = tools.load_document(path)
+        second = tools.load_document(path)
+
+        assert first["content"] == second["content"] == "甲\n单元格"
+        assert (first["metadata"]["cached"], second["metadata"]["cached"]) == (False, True)
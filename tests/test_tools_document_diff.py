@@ -0,0 +1,116 @@
+"""段落级文档对比单元测试"""
+import random
+import pytest
+from src.tools.document_diff import split_paragraphs, iter_opcodes, similarity
+from src.tools.file_tools import FileTools
+
+
+def apply_opcodes(a, b, opcodes):
+    """按编辑操作由 a 重建 b，并检查 equal 区间确实相同"""
+    result = []
+    position_a = position_b = 0
+    for tag, i1, i2, j1, j2 in opcodes:
+        assert (i1, j1) == (position_a, position_b)
+        if tag == "equal":
+            assert a[i1:i2] == b[j1:j2]
+        result.extend(b[j1:j2])
+        position_a, position_b = i2, j2
+    assert (position_a, position_b) == (len(a), len(b))
+    return result
+
+
+class TestOpcodes:
+    """测试编辑操作"""
+
+    def test_insert_delete_replace(self):
+        """测试插入、删除和替换"""
+        a = [1, 2, 3, 4, 5, 6]
+        b = [1, 9, 3, 4, 6, 7]
+
+        opcodes = list(iter_opcodes(a, b))
+
+        assert [op[0] for op in opcodes] == ["equal", "replace", "equal", "delete", "equal", "insert"]
+        assert apply_opcodes(a, b, opcodes) == b
+
+    def test_repeated_paragraphs_use_myers(self):
+        """测试没有唯一段落时退回 Myers 算法"""
+        a = [1, 1, 2, 2, 1, 1]
+        b = [1, 2, 1, 2, 1, 1]
+
+        opcodes = list(iter_opcodes(a, b))
+
+        assert apply_opcodes(a, b, opcodes) == b
+        assert sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == "equal") == 5
+
+    def test_random_edits_roundtrip(self):
+        """测试随机修改后编辑操作可以还原新文档"""
+        rng = random.Random(7)
+        for _ in range(50):
+            a = [rng.randrange(30) for _ in range(rng.randrange(60))]
+            b = list(a)
+            for _ in range(rng.randrange(8)):
+                position = rng.randrange(len(b) + 1)
+                if b and rng.random() < 0.5:
+                    del b[position:position + rng.randrange(1, 4)]
+                else:
+                    b[position:position] = [rng.randrange(40) for _ in range(rng.randrange(1, 4))]
+            assert apply_opcodes(a, b, list(iter_opcodes(a, b, max_cost=5))) == b
+
+    def test_similarity(self):
+        """测试按字符数加权的相似度"""
+        opcodes = list(iter_opcodes([1, 2], [1, 3]))
+
+        assert similarity(opcodes, [10, 10], [10, 30]) == pytest.approx(20 / 60)
+        assert similarity([], [], []) == 1.0
+
+
+def test_split_paragraphs_across_blocks():
+    """测试纯文本切块处被切开的段落会拼接"""
+    pages = ["第一段\n\n第二", "段  继续\n\n第三段"]
+
+    assert list(split_paragraphs(pages, continuous=True)) == ["第一段", "第二段 继续", "第三段"]
+    assert list(split_paragraphs(pages)) == ["第一段", "第二", "段 继续", "第三段"]
+
+
+class TestCompareDocuments:
+    """测试 FileTools 文档对比"""
+
+    @pytest.fixture
+    def contracts(self, tmp_path):
+        clauses = [f"第{i}条 甲方应按约定履行第{i}项义务。" for i in range(300)]
+        revised = list(clauses)
+        revised[10] = "第10条 甲方应在三十日内履行第10项义务。"
+        del revised[100]
+        revised.insert(200, "新增条款 双方可协商延期。")
+        old, new = tmp_path / "v1.txt", tmp_path / "v2.txt"
+        old.write_text("\n\n".join(clauses), encoding="utf-8")
+        new.write_text("\n\n".join(revised), encoding="utf-8")
+        return str(old), str(new)
+
+    def test_compare_documents(self, contracts):
+        """测试返回结构化差异和相似度"""
+        result = FileTools().compare_documents(*contracts)
+
+        assert [d["type"] for d in result["differences"]] == ["replace", "delete", "insert"]
+        assert result["differences"][0]["new"] == ["第10条 甲方应在三十日内履行第10项义务。"]
+        assert result["differences"][1]["old"] == ["第100条 甲方应按约定履行第100项义务。"]
+        assert result["differences"][2]["new_range"] == [200, 201]
+        assert 0.98 < result["similarity"] < 1
+        assert result["stats"]["old_paragraphs"] == 300
+
+    def test_max_changes_and_streaming(self, contracts):
+        """测试限制差异数量和流式输出"""
+        tools = FileTools()
+
+        limited = tools.compare_documents(*contracts, max_changes=1)
+        streamed = list(tools.iter_document_diff(*contracts))
+
+        assert len(limited["differences"]) == 1 and limited["truncated"]
+        assert [d["type"] for d in streamed] == ["replace", "delete", "insert"]
+
+    def test_identical_documents(self, contracts):
+        """测试相同文档"""
+        result = FileTools().compare_documents(contracts[0], contracts[0])
+
+        assert result["differences"] == []
+        assert result["similarity"] == 1.0
@@ -0,0 +1,121 @@
+"""惰性文档加载单元测试"""
+import pytest
+from src.tools.document_loaders import TextDocument, open_document
+from src.tools.file_tools import FileTools
+from src.tools.text_extraction import extract_text
+
+class TestTextDocument:
+    """测试纯文本文档"""
+
+    def test_blocks_split_on_line_boundaries(self, tmp_path):
+        """测试按行边界切分文本块并可随机读取"""
+        lines = [f"第{i}行内容" for i in range(200)]
+        path = tmp_path / "long.txt"
+        path.write_text("\n".join(lines), encoding="utf-8")
+
+        with TextDocument(str(path), ".txt", block_size=256) as doc:
+            blocks = list(doc.iter_pages())
+            assert len(blocks) > 1
+            assert all(block.endswith("\n") for block in blocks[:-1])
+            assert "".join(blocks) == "\n".join(lines)
+            assert doc.page(2) == blocks[2]
+
+    def test_detects_gb18030(self, tmp_path):
+        """测试识别 GB18030 编码"""
+        path = tmp_path / "gbk.txt"
+        path.write_bytes("中文内容".encode("gb18030"))
+
+        with open_document(str(path)) as doc:
+            assert doc.metadata["encoding"] == "gb18030"
+            assert doc.text() == "中文内容"
+
+    def test_empty_file(self, tmp_path):
+        """测试空文件"""
+        path = tmp_path / "empty.md"
+        path.write_bytes(b"")
+
+        with open_document(str(path)) as doc:
+            assert list(doc.iter_pages()) == []
+
+
+class TestOfficeDocument:
+    """测试 DOCX 文档"""
+
+    def test_paragraphs_streamed(self, make_docx, tmp_path):
+        """测试逐段产出正文并跳过空段落"""
+        path = make_docx(tmp_path / "report.docx", ["第一段", "", "第二段 &amp; 附录"])
+
+        with open_document(str(path)) as doc:
+            assert list(doc.iter_pages()) == ["第一段", "第二段 & 附录", "单元格"]
+            assert doc.page(1) == "第二段 & 附录"
+
+    def test_metadata_without_parsing_body(self, make_docx, tmp_path):
+        """测试从 docProps 读取元数据"""
+        path = make_docx(tmp_path / "report.docx", ["正文"])
+
+        doc = open_document(str(path))
+
+        assert doc.metadata["title"] == "季度报告"
+        assert doc.metadata["author"] == "张三"
+        assert doc.metadata["page_count"] == 3
+        assert doc.metadata["unit"] == "paragraph"
+
+    def test_extract_text_uses_loader(self, make_docx, tmp_path):
+        """测试轻量文本提取与加载器输出一致"""
+        path = str(make_docx(tmp_path / "report.docx", ["第一段", "第二段 &amp; 附录"]))
+
+        with open_document(path) as doc:
+            assert extract_text(path) == doc.text()
+            assert extract_text(path, max_chars=5) == doc.text(5)
+
+
+@pytest.fixture
+def file_tools(tmp_path):
+    """创建缓存位于临时目录的FileTools实例"""
+    return FileTools({
+        "document_cache": {"cache_dir": str(tmp_path / ".cache" / "documents")},
+        "hash_cache": {"db_path": str(tmp_path / ".cache" / "hash_cache.db")}
+    })
+
+
+class TestFileToolsLoadDocument:
+    """测试 FileTools 文档加载入口"""
+
+    def test_load_document_max_chars(self, make_docx, file_tools, tmp_path):
+        """测试限制读取字符数"""
+        path = make_docx(tmp_path / "report.docx", [f"段落{i}" for i in range(100)])
+
+        result = file_tools.load_document(str(path), max_chars=10)
+
+        assert result["content"] == "段落0\n段落1\n段落"
+        assert result["metadata"]["file_name"] == "report.docx"
+
+    def test_iter_document(self, make_docx, file_tools, tmp_path):
+        """测试逐页读取"""
+        path = make_docx(tmp_path / "report.docx", ["甲", "乙"])
+
+        assert list(file_tools.iter_document(str(path))) == ["甲", "乙", "单元格"]
+
+    def test_unsupported_and_missing(self, file_tools, tmp_path):
+        """测试不支持的类型和不存在的文件"""
+        path = tmp_path / "image.png"
+        path.write_bytes(b"\x89PNG")
+
+        with pytest.raises(ValueError):
+            file_tools.load_document(str(path))
+        with pytest.raises(FileNotFoundError):
+            file_tools.load_document(str(tmp_path / "missing.txt"))
+
+    def test_pdf_pages(self, tmp_path):
+        """测试 PDF 按页读取(需要 pypdf)"""
+        pypdf = pytest.importorskip("pypdf")
+        writer = pypdf.PdfWriter()
+        for _ in range(3):
+            writer.add_blank_page(width=72, height=72)
+        path = tmp_path / "blank.pdf"
+        with open(path, "wb") as f:
+            writer.write(f)
+
+        with open_document(str(path)) as doc:
+            assert doc.metadata["page_count"] == 3
+            assert len(list(doc.iter_pages())) == 3
@@ -0,0 +1,97 @@
+"""DuplicateFinder 与文件哈希单元测试"""
+import hashlib
+import pytest
+from src.tools.duplicate_finder import DuplicateFinder
+from src.tools.file_hashing import hash_file, hash_partial, new_hasher, HASH_ALGORITHMS
+from src.tools.fs_scanner import DirectoryScanner
+
+
+class TestFileHashing:
+    """测试文件哈希"""
+
+    @pytest.mark.parametrize("use_mmap", [False, True])
+    def test_hash_file_matches_hashlib(self, tmp_path, use_mmap):
+        """测试整文件哈希与hashlib一致"""
+        data = bytes(range(256)) * 5000
+        path = tmp_path / "data.bin"
+        path.write_bytes(data)
+
+        digest = hash_file(str(path), "md5", buffer_size=4096, use_mmap=use_mmap)
+
+        assert digest == hashlib.md5(data).hexdigest()
+
+    def test_hash_partial_small_file_equals_full(self, tmp_path):
+        """测试小文件部分哈希等于整文件哈希"""
+        path = tmp_path / "small.txt"
+        path.write_bytes(b"x" * 100)
+
+        assert hash_partial(str(path), block_size=64) == hash_file(str(path))
+
+    def test_hash_partial_ignores_middle(self, tmp_path):
+        """测试部分哈希只读取首尾块"""
+        a = tmp_path / "a.bin"
+        b = tmp_path / "b.bin"
+        a.write_bytes(b"H" * 10 + b"1" * 100 + b"T" * 10)
+        b.write_bytes(b"H" * 10 + b"2" * 100 + b"T" * 10)
+
+        assert hash_partial(str(a), block_size=10) == hash_partial(str(b), block_size=10)
+        assert hash_file(str(a)) != hash_file(str(b))
+
+    def test_algorithms(self):
+        """测试算法选择"""
+        assert "blake2b" in HASH_ALGORITHMS
+        assert new_hasher("fast") is not None
+        with pytest.raises(ValueError):
+            new_hasher("crc0")
+
+
+class TestDuplicateFinder:
+    """测试分阶段重复检测"""
+
+    @pytest.fixture
+    def entries(self, tmp_path):
+        big = b"A" * 300
+        (tmp_path / "big1.bin").write_bytes(big)
+        (tmp_path / "big2.bin").write_bytes(big)
+        # 大小和首尾相同、中间不同
+        (tmp_path / "big3.bin").write_bytes(b"A" * 100 + b"B" * 100 + b"A" * 100)
+        (tmp_path / "small1.txt").write_text("dup")
+        (tmp_path / "small2.txt").write_text("dup")
+        (tmp_path / "unique.txt").write_text("unique content")
+        (tmp_path / "empty1").write_bytes(b"")
+        (tmp_path / "empty2").write_bytes(b"")
+        return DirectoryScanner(max_workers=1).scan(str(tmp_path))
+
+    @pytest.mark.parametrize("algorithm", ["md5", "blake2b", "fast"])
+    def test_find(self, entries, algorithm):
+        """测试检测结果"""
+        finder = DuplicateFinder(algorithm=algorithm, partial_size=50, max_workers=2)
+
+        groups = finder.find(entries)
+
+        names = sorted(sorted(e.name for e in g) for g in groups)
+        assert names == [["big1.bin", "big2.bin"], ["empty1", "empty2"], ["small1.txt", "small2.txt"]]
+
+    def test_stage_statistics(self, entries):
+        """测试只有候选文件进入后续阶段"""
+        finder = DuplicateFinder(partial_size=50)
+
+        finder.find(entries)
+        stats = finder.get_stats()
+
+        assert stats["files"] == 8
+        # 唯一大小的文件和空文件不计算哈希
+        assert stats["partial_hashed"] == 5
+        assert stats["full_hashed"] == 3
+
+    def test_custom_full_hash(self, entries):
+        """测试自定义整文件哈希函数"""
+        calls = []
+
+        def full_hash(entry):
+            calls.append(entry.name)
+            return hash_file(entry.path)
+
+        DuplicateFinder(partial_size=50).find(entries, full_hash=full_hash)
+
+        assert sorted(calls) == ["big1.bin", "big2.bin", "big3.bin"]
@@ -0,0 +1,193 @@
+"""FileIndex 单元测试"""
+import os
+import shutil
+import pytest
+from src.tools.file_index import FileIndex
+from src.tools.scan_filters import PathFilter
+from src.tools.filesystem_tools import FileSystemTools
+
+
+def age_tree(root, past=1600000000):
+    """将目录修改时间设为固定的过去时刻，使其超出索引的竞态窗口"""
+    for dirpath, dirnames, _ in os.walk(root):
+        os.utime(dirpath, (past, past))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """创建测试目录结构"""
+    root = tmp_path / "tree"
+    (root / "sub" / "deep").mkdir(parents=True)
+    (root / "a.txt").write_text("aaa")
+    (root / "Report.PDF").write_bytes(b"0" * 100)
+    (root / "sub" / "b.txt").write_text("bbbbb")
+    (root / "sub" / "deep" / "c.log").write_text("c")
+    age_tree(root)
+    return root
+
+
+@pytest.fixture
+def index(tmp_path):
+    """创建FileIndex实例"""
+    idx = FileIndex(str(tmp_path / "cache" / "file_index.db"))
+    yield idx
+    idx.close()
+
+
+class TestFileIndex:
+    """测试文件元数据索引"""
+
+    def test_initial_refresh(self, index, tree):
+        """测试首次刷新索引全部文件"""
+        stats = index.refresh(str(tree))
+
+        assert stats["scanned_dirs"] == 3
+        assert stats["updated_files"] == 4
+        names = sorted(e.name for e in index.iter_entries(str(tree)))
+        assert names == ["Report.PDF", "a.txt", "b.txt", "c.log"]
+
+    def test_unchanged_directories_skipped(self, index, tree):
+        """测试目录修改时间未变时跳过扫描"""
+        index.refresh(str(tree))
+        stats = index.refresh(str(tree))
+
+        assert stats["scanned_dirs"] == 0
+        assert stats["skipped_dirs"] == 3
+
+    def test_incremental_add_and_remove(self, index, tree):
+        """测试只重扫变化的目录"""
+        index.refresh(str(tree))
+        (tree / "sub" / "new.txt").write_text("new")
+        (tree / "a.txt").unlink()
+
+        stats = index.refresh(str(tree))
+
+        assert stats["scanned_dirs"] == 2
+        assert stats["removed_files"] == 1
+        names = sorted(e.name for e in index.iter_entries(str(tree)))
+        assert names == ["Report.PDF", "b.txt", "c.log", "new.txt"]
+
+    def test_removed_subtree(self, index, tree):
+        """测试删除子目录后清理索引"""
+        index.refresh(str(tree))
+        shutil.rmtree(tree / "sub")
+
+        index.refresh(str(tree))
+
+        assert sorted(e.name for e in index.iter_entries(str(tree))) == ["Report.PDF", "a.txt"]
+        assert index.get_stats()["directories"] == 1
+
+    def test_in_place_edit_invalidates_hash(self, index, tree):
+        """测试原地修改后(目录修改时间不变)不再返回旧哈希，全量刷新清除旧哈希"""
+        index.refresh(str(tree))
+        index.set_hash(str(tree / "a.txt"), "oldhash")
+        assert index.get_hash(str(tree / "a.txt")) == "oldhash"
+        (tree / "a.txt").write_text("modified content")
+        age_tree(tree)
+
+        index.refresh(str(tree))
+        assert index.get_hash(str(tree / "a.txt")) is None
+
+        index.refresh(str(tree), full=True)
+        row = index._conn.execute("SELECT hash FROM files WHERE path = ?", (str(tree / "a.txt"),)).fetchone()
+        assert row[0] is None
+
+    def test_filter_change_rebuilds_root(self, index, tree, tmp_path):
+        """测试过滤规则变化后重新建立索引并删除被排除的子树"""
+        index.refresh(str(tree))
+        index.close()
+
+        filtered = FileIndex(str(tmp_path / "cache" / "file_index.db"), path_filter=PathFilter(exclude=["deep/"]))
+        assert not filtered.covers(str(tree))
+        stats = filtered.refresh(str(tree))
+        assert stats["removed_files"] == 1
+        assert sorted(e.name for e in filtered.iter_entries(str(tree))) == ["Report.PDF", "a.txt", "b.txt"]
+        assert filtered.refresh_directories([str(tree / "sub" / "deep")])["scanned_dirs"] == 0
+        filtered.close()
+
+    def test_iter_entries_filters(self, index, tree):
+        """测试深度和类型过滤"""
+        index.refresh(str(tree))
+
+        assert sorted(e.name for e in index.iter_entries(str(tree), max_depth=0)) == ["Report.PDF", "a.txt"]
+        assert sorted(e.name for e in index.iter_entries(str(tree), file_types=[".txt"])) == ["a.txt", "b.txt"]
+        assert [e.name for e in index.iter_entries(str(tree / "sub"))] == ["b.txt", "c.log"]
+
+    def test_search(self, index, tree):
+        """测试文件名搜索不区分大小写"""
+        index.refresh(str(tree))
+
+        assert [e.name for e in index.search(str(tree), "report")] == ["Report.PDF"]
+        assert index.search(str(tree), "%") == []
+
+    def test_refresh_interval(self, tmp_path, tree):
+        """测试刷新间隔与失效"""
+        idx = FileIndex(str(tmp_path / "idx.db"), refresh_interval=3600)
+        assert idx.needs_refresh(str(tree))
+
+        idx.refresh(str(tree))
+        assert not idx.needs_refresh(str(tree / "sub"))
+
+        idx.invalidate(str(tree / "sub"))
+        assert idx.needs_refresh(str(tree))
+        idx.close()
+
+
+class TestFileSystemToolsWithIndex:
+    """测试FileSystemTools使用索引"""
+
+    @pytest.fixture
+    def tools(self, tmp_path):
+        return FileSystemTools({
+            "backup_directory": str(tmp_path / "backups"),
+            "metadata_index": {"enabled": True, "db_path": str(tmp_path / "cache" / "idx.db")},
+            "hash_cache": {"enabled": False}
+        })
+
+    def test_analyze_storage_from_index(self, tools, tree):
+        """测试从索引生成空间报告"""
+        report = tools.analyze_storage(str(tree))
+
+        assert report["total_files"] == 4
+        assert report["total_size"] == 109
+        assert report["largest_files"][0]["name"] == "Report.PDF"
+
+    def test_search_files_from_index(self, tools, tree):
+        """测试从索引搜索文件"""
+        results = tools.search_files(str(tree), "b", file_types=[".txt"])
+
+        assert [f["name"] for f in results] == ["b.txt"]
+
+    def test_duplicate_hash_stored_in_index(self, tools, tree):
+        """测试重复检测复用索引中的哈希"""
+        data = b"x" * (256 * 1024)
+        (tree / "big1.bin").write_bytes(data)
+        (tree / "sub" / "big2.bin").write_bytes(data)
+
+        groups = tools.detect_duplicates(str(tree), method="combined")
+
+        assert len(groups) == 1
+        assert tools.file_index.get_hash(str(tree / "big1.bin")) is not None
+
+    def test_duplicates_after_in_place_edit(self, tools, tree):
+        """测试原地修改同样大小的文件后不再报告为重复"""
+        data = bytearray(b"x" * (512 * 1024))
+        (tree / "big1.bin").write_bytes(data)
+        (tree / "sub" / "big2.bin").write_bytes(data)
+        age_tree(tree)
+        assert len(tools.detect_duplicates(str(tree), method="hash")) == 1
+
+        data[256 * 1024] = ord("y")
+        with open(tree / "big1.bin", "r+b") as f:
+            f.write(data)
+        os.utime(tree / "big1.bin", ns=(os.stat(tree / "big1.bin").st_atime_ns, 1700000000 * 10 ** 9))
+        age_tree(tree)
+
+        assert tools.detect_duplicates(str(tree), method="hash") == []
+
+    def test_refresh_index_disabled(self, tmp_path):
+        """测试未启用索引时刷新报错"""
+        tools = FileSystemTools({"backup_directory": str(tmp_path / "backups")})
+
+        with pytest.raises(RuntimeError):
+            tools.refresh_index(str(tmp_path))
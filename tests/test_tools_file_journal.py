@@ -0,0 +1,227 @@
+"""日志化批量文件操作单元测试"""
+import errno
+import json
+import os
+import pytest
+from src.tools import file_journal
+from src.tools.file_journal import FileJournal, copy_file, move_file
+from src.tools.filesystem_tools import FileSystemTools
+
+
+@pytest.fixture
+def journal(tmp_path):
+    """创建FileJournal实例"""
+    return FileJournal(str(tmp_path / "journals"), str(tmp_path / "backups"))
+
+
+@pytest.fixture
+def files(tmp_path):
+    root = tmp_path / "work"
+    root.mkdir()
+    for name in ("a.txt", "b.txt", "c.txt"):
+        (root / name).write_text(name)
+    return root
+
+
+class TestFileJournal:
+    """测试操作日志与撤销"""
+
+    def test_execute_and_undo(self, journal, files):
+        """测试移动后撤销还原并清理新建目录"""
+        moves = [(str(files / "a.txt"), str(files / "new" / "deep" / "a.txt")),
+                 (str(files / "b.txt"), str(files / "b2.txt"))]
+
+        result = journal.execute("batch_move", moves)
+        assert result["success"] == 2
+        assert (files / "new" / "deep" / "a.txt").read_text() == "a.txt"
+
+        undo = journal.undo(result["journal_id"])
+
+        assert undo["undone"] == 2
+        assert (files / "a.txt").read_text() == "a.txt"
+        assert (files / "b.txt").exists() and not (files / "b2.txt").exists()
+        assert not (files / "new").exists()
+
+    def test_overwrite_backed_up_by_hardlink(self, journal, files, tmp_path):
+        """测试覆盖已有文件前以硬链接备份，撤销时恢复"""
+        target = files / "c.txt"
+        inode = target.stat().st_ino
+
+        result = journal.execute("batch_move", [(str(files / "a.txt"), str(target))], on_conflict="overwrite")
+        assert target.read_text() == "a.txt"
+        backups = list((tmp_path / "backups" / result["journal_id"]).iterdir())
+        assert len(backups) == 1 and backups[0].stat().st_ino == inode
+
+        journal.undo(result["journal_id"])
+
+        assert (files / "a.txt").read_text() == "a.txt"
+        assert target.read_text() == "c.txt"
+
+    def test_parallel_with_progress(self, journal, tmp_path):
+        """测试并发移动并逐项回报进度"""
+        src = tmp_path / "many"
+        src.mkdir()
+        moves = []
+        for i in range(200):
+            (src / f"f{i}.txt").write_text(str(i))
+            moves.append((str(src / f"f{i}.txt"), str(tmp_path / "out" / f"d{i % 7}" / f"f{i}.txt")))
+        events = []
+
+        result = journal.execute("batch_move", moves, max_workers=4, progress=events.append)
+
+        assert result["success"] == 200
+        assert len(events) == 200 and events[-1]["completed"] == 200
+        assert {e["event"] for e in events} == {"moved"}
+        assert (tmp_path / "out" / "d3" / "f3.txt").read_text() == "3"
+
+        journal.undo(result["journal_id"])
+        assert len(list(src.iterdir())) == 200
+        assert not (tmp_path / "out").exists()
+
+    def test_chained_renames_and_undo(self, journal, files):
+        """测试互相依赖的重命名"""
+        result = journal.execute("batch_rename", [(str(files / "a.txt"), str(files / "b.txt")),
+                                                  (str(files / "b.txt"), str(files / "a.txt"))])
+
+        assert result["success"] == 2
+        assert (files / "a.txt").read_text() == "b.txt"
+        assert (files / "b.txt").read_text() == "a.txt"
+
+        journal.undo(result["journal_id"])
+        assert (files / "a.txt").read_text() == "a.txt"
+        assert sorted(p.name for p in files.iterdir()) == ["a.txt", "b.txt", "c.txt"]
+
+    def test_rotation_counts_moves_not_steps(self, journal, files):
+        """测试循环移动按完成的移动计数，临时中转不计入"""
+        events = []
+        result = journal.execute("batch_rename", [(str(files / "a.txt"), str(files / "b.txt")),
+                                                  (str(files / "b.txt"), str(files / "c.txt")),
+                                                  (str(files / "c.txt"), str(files / "a.txt"))],
+                                 progress=events.append)
+
+        assert result["success"] == 3 and result["failed"] == []
+        assert [e["total"] for e in events] == [3, 3, 3]
+        assert all(not os.path.basename(e["source"]).startswith(".") for e in events)
+        assert (files / "a.txt").read_text() == "c.txt"
+
+    def test_no_clobber_without_overwrite(self, journal, files, monkeypatch):
+        """测试执行时目标被其他进程占用则失败而不是覆盖"""
+        from src.tools import move_planner
+        monkeypatch.setattr(move_planner, "_list_names", lambda d: set())
+
+        result = journal.execute("batch_move", [(str(files / "a.txt"), str(files / "c.txt"))])
+
+        assert result["success"] == 0 and len(result["failed"]) == 1
+        assert (files / "c.txt").read_text() == "c.txt"
+
+    def test_failures_recorded(self, journal, files):
+        """测试单个失败不影响其余操作"""
+        result = journal.execute("batch_move", [
+            (str(files / "missing.txt"), str(files / "x.txt")),
+            (str(files / "a.txt"), str(files / "y.txt")),
+        ])
+
+        assert result["success"] == 1
+        assert result["failed"][0]["source"].endswith("missing.txt")
+        assert journal.undo(result["journal_id"])["undone"] == 1
+
+    def test_undo_incomplete_journal(self, journal, files):
+        """测试进程中断(缺少完成记录)时按文件状态撤销"""
+        result = journal.execute("batch_move", [(str(files / "a.txt"), str(files / "z.txt"))])
+        path = journal.journal_dir / f"{result['journal_id']}.jsonl"
+        lines = [l for l in path.read_text().splitlines() if json.loads(l)["type"] in ("begin", "intent")]
+        path.write_text("\n".join(lines) + "\n")
+
+        assert journal.list_journals()[0]["status"] == "incomplete"
+        assert journal.undo(result["journal_id"])["undone"] == 1
+        assert (files / "a.txt").exists()
+
+    def test_undo_twice_rejected(self, journal, files):
+        result = journal.execute("batch_move", [(str(files / "a.txt"), str(files / "z.txt"))])
+        journal.undo(result["journal_id"])
+
+        with pytest.raises(RuntimeError):
+            journal.undo(result["journal_id"])
+        assert journal.list_journals()[0]["status"] == "undone"
+
+    def test_invalid_journal_id(self, journal):
+        with pytest.raises(FileNotFoundError):
+            journal.undo("nonexistent")
+        with pytest.raises(ValueError):
+            journal.undo("../escape")
+
+
+class TestCopyFallback:
+    """测试跨设备回退"""
+
+    def test_cross_device_move(self, tmp_path, monkeypatch):
+        """测试 rename 返回 EXDEV 时复制后删除"""
+        src = tmp_path / "src.bin"
+        src.write_bytes(os.urandom(3 * 1024 * 1024))
+        data = src.read_bytes()
+
+        def exdev(a, b):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        monkeypatch.setattr(file_journal.os, "rename", exdev)
+
+        move_file(str(src), str(tmp_path / "dst.bin"))
+
+        assert not src.exists()
+        assert (tmp_path / "dst.bin").read_bytes() == data
+
+    def test_streamed_copy(self, tmp_path, monkeypatch):
+        """测试不支持 copy_file_range 时流式复制"""
+        monkeypatch.delattr(file_journal.os, "copy_file_range", raising=False)
+        src = tmp_path / "src.bin"
+        src.write_bytes(b"x" * 10000)
+
+        copy_file(str(src), str(tmp_path / "dst.bin"))
+
+        assert (tmp_path / "dst.bin").read_bytes() == b"x" * 10000
+
+
+class TestFileSystemToolsUndo:
+    """测试FileSystemTools批量操作可撤销"""
+
+    def test_organize_and_undo(self, tmp_path, files):
+        tools = FileSystemTools({
+            "backup_directory": str(tmp_path / "backups"),
+            "hash_cache": {"enabled": False}
+        })
+
+        result = tools.organize_files(str(files), strategy="by_type")
+        assert result["success"] == 3
+        assert (files / "Documents" / "a.txt").exists()
+        assert tools.list_journals()[0]["operation"] == "batch_move"
+
+        tools.undo(result["journal_id"])
+        assert sorted(p.name for p in files.iterdir()) == ["a.txt", "b.txt", "c.txt"]
+
+    def test_organize_resolves_name_collisions(self, tmp_path, files):
+        """测试整理时不同子目录中的同名文件不会互相覆盖"""
+        (files / "sub").mkdir()
+        (files / "sub" / "a.txt").write_text("nested")
+        tools = FileSystemTools({
+            "backup_directory": str(tmp_path / "backups"),
+            "hash_cache": {"enabled": False}
+        })
+
+        result = tools.organize_files(str(files), strategy="by_type")
+
+        assert result["success"] == 4 and result["renamed"] == 1
+        contents = sorted(p.read_text() for p in (files / "Documents").iterdir())
+        assert contents == ["a.txt", "b.txt", "c.txt", "nested"]
+
+    def test_batch_rename_and_undo(self, tmp_path, files):
+        tools = FileSystemTools({
+            "backup_directory": str(tmp_path / "backups"),
+            "hash_cache": {"enabled": False}
+        })
+        file_list = [{"path": str(files / n)} for n in ("a.txt", "b.txt")]
+
+        result = tools.batch_rename(file_list, "doc_{index}.{ext}")
+        assert result["success"] == 2
+        assert (files / "doc_1.txt").read_text() == "a.txt"
+
+        tools.undo(result["journal_id"])
+        assert sorted(p.name for p in files.iterdir()) == ["a.txt", "b.txt", "c.txt"]
@@ -0,0 +1,322 @@
+"""FileSystemTools 单元测试"""
+import os
+import pytest
+from datetime import datetime
+from pathlib import Path
+from src.tools.filesystem_tools import FileSystemTools
+from src.tools.fs_scanner import DirectoryScanner, FileEntry, get_extension
+
+
+@pytest.fixture
+def fs_tools(tmp_path):
+    """创建FileSystemTools实例"""
+    config = {
+        "backup_directory": str(tmp_path / "backups"),
+        "file_classification_rules": "config/file_rules.json",
+        "hash_cache": {"db_path": str(tmp_path / ".cache" / "hash_cache.db")},
+        "content_index": {"db_path": str(tmp_path / ".cache" / "content_index.db")}
+    }
+    return FileSystemTools(config)
+
+
+@pytest.fixture
+def sample_tree(tmp_path):
+    """创建测试目录结构"""
+    root = tmp_path / "tree"
+    (root / "docs" / "deep").mkdir(parents=True)
+    (root / ".hidden").mkdir()
+    (root / "a.txt").write_text("hello")
+    (root / "b.py").write_text("print('b')")
+    (root / "docs" / "report.pdf").write_bytes(b"%PDF" + b"0" * 100)
+    (root / "docs" / "deep" / "notes.txt").write_text("notes")
+    (root / ".hidden" / "secret.txt").write_text("secret")
+    return root
+
+
+class TestDirectoryScanner:
+    """测试目录扫描器"""
+
+    def test_get_extension(self):
+        """测试扩展名规则与Path.suffix一致"""
+        for name in ["a.txt", "archive.tar.gz", ".bashrc", "noext", "trailing."]:
+            assert get_extension(name) == Path(name).suffix
+
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_scan_all_files(self, sample_tree, workers):
+        """测试扫描全部文件并跳过隐藏目录"""
+        entries = DirectoryScanner(max_workers=workers).scan(str(sample_tree))
+        names = sorted(e.name for e in entries)
+
+        assert names == ["a.txt", "b.py", "notes.txt", "report.pdf"]
+        assert all(isinstance(e, FileEntry) for e in entries)
+
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_scan_max_depth(self, sample_tree, workers):
+        """测试递归深度限制"""
+        scanner = DirectoryScanner(max_workers=workers)
+
+        assert sorted(e.name for e in scanner.scan(str(sample_tree), max_depth=0)) == ["a.txt", "b.py"]
+        assert "notes.txt" not in [e.name for e in scanner.scan(str(sample_tree), max_depth=1)]
+
+    def test_scan_file_types(self, sample_tree):
+        """测试文件类型过滤"""
+        entries = DirectoryScanner(max_workers=2).scan(str(sample_tree), file_types=[".txt"])
+
+        assert sorted(e.name for e in entries) == ["a.txt", "notes.txt"]
+
+    def test_raw_timestamps(self, sample_tree):
+        """测试时间戳保持原始数值直到渲染"""
+        entry = DirectoryScanner(max_workers=1).scan(str(sample_tree), max_depth=0)[0]
+
+        assert isinstance(entry.mtime, float)
+        info = entry.to_dict()
+        assert info["modified_at"] == datetime.fromtimestamp(entry.mtime).isoformat()
+        assert info["size"] == os.path.getsize(entry.path)
+
+    def test_early_stop(self, tmp_path):
+        """测试提前停止迭代时工作线程正常退出"""
+        for i in range(20):
+            sub = tmp_path / f"d{i}"
+            sub.mkdir()
+            for j in range(50):
+                (sub / f"f{j}.txt").write_text("x")
+
+        iterator = DirectoryScanner(max_workers=4, queue_size=1).iter_entries(str(tmp_path))
+        first = next(iterator)
+        iterator.close()
+
+        assert first.name.endswith(".txt")
+
+    def test_worker_error_reraised(self, sample_tree):
+        """测试工作线程中的非 OSError 异常在调用方重新抛出，而不是一直等待结果"""
+        scanner = DirectoryScanner(max_workers=4)
+        scan_one = scanner._scan_one
+
+        def failing(path, *args):
+            if path != str(sample_tree):
+                raise ValueError("解析失败")
+            return scan_one(path, *args)
+
+        scanner._scan_one = failing
+        with pytest.raises(ValueError, match="解析失败"):
+            scanner.scan(str(sample_tree))
+
+    def test_missing_directory(self):
+        """测试目录不存在"""
+        with pytest.raises(FileNotFoundError):
+            DirectoryScanner().scan("/nonexistent/path/for/test")
+
+
+class TestFileSystemTools:
+    """测试文件系统工具集"""
+
+    def test_scan_directory(self, fs_tools, sample_tree):
+        """测试扫描目录"""
+        result = fs_tools.scan_directory(str(sample_tree))
+
+        assert result["total_files"] == 4
+        assert result["total_size"] == sum(f["size"] for f in result["files"])
+        assert result["file_type_stats"][".txt"] == 2
+        assert "created_at" in result["files"][0]
+
+    def test_scan_directory_not_found(self, fs_tools):
+        """测试扫描不存在的目录"""
+        with pytest.raises(FileNotFoundError):
+            fs_tools.scan_directory("/nonexistent/path/for/test")
+
+    def test_iter_directory_streams_entries(self, fs_tools, sample_tree):
+        """测试流式扫描产出紧凑记录"""
+        iterator = fs_tools.iter_directory(str(sample_tree))
+
+        assert not isinstance(iterator, list)
+        entries = list(iterator)
+        assert len(entries) == 4
+        assert all(isinstance(e, FileEntry) for e in entries)
+
+    def test_iter_directory_not_found(self, fs_tools):
+        """测试流式扫描不存在的目录"""
+        with pytest.raises(FileNotFoundError):
+            fs_tools.iter_directory("/nonexistent/path/for/test")
+
+    @pytest.mark.parametrize("method", ["hash", "combined"])
+    def test_detect_duplicates_by_content(self, fs_tools, tmp_path, method):
+        """测试按内容检测重复文件"""
+        (tmp_path / "x1.txt").write_text("same content")
+        (tmp_path / "x2.txt").write_text("same content")
+        (tmp_path / "y.txt").write_text("same size!!!")
+        (tmp_path / "z.txt").write_text("other")
+
+        groups = fs_tools.detect_duplicates(str(tmp_path), method=method)
+
+        assert len(groups) == 1
+        assert sorted(f["name"] for f in groups[0]) == ["x1.txt", "x2.txt"]
+
+    def test_detect_near_duplicates(self, fs_tools, tmp_path):
+        """测试检测近似重复文档"""
+        text = "季度销售报告 " + " ".join(f"第{i}项 数据 {i * 7}" for i in range(200))
+        (tmp_path / "report.txt").write_text(text, encoding="utf-8")
+        (tmp_path / "report_v2.txt").write_text(text.replace("第3项", "第三项"), encoding="utf-8")
+        (tmp_path / "notes.md").write_text("完全不同的会议记录内容 " * 50, encoding="utf-8")
+
+        groups = fs_tools.detect_duplicates(str(tmp_path), method="near", threshold=0.8)
+
+        assert len(groups) == 1
+        assert sorted(f["name"] for f in groups[0]) == ["report.txt", "report_v2.txt"]
+
+    def test_compress_and_extract(self, fs_tools, sample_tree, tmp_path):
+        """测试压缩、列出与解压"""
+        output = tmp_path / "out" / "tree.tar.xz"
+
+        assert fs_tools.compress_files([str(sample_tree)], str(output), format="tar.xz") == str(output)
+        names = {m["name"] for m in fs_tools.list_archive(str(output))}
+        assert "tree/docs/report.pdf" in names
+
+        result = fs_tools.extract_archive(str(output), str(tmp_path / "restored"), members=["tree/a.txt"])
+        assert result["extracted_files"] == 1
+        assert (tmp_path / "restored" / "tree" / "a.txt").read_text() == "hello"
+
+    def test_manifest_and_verify_integrity(self, fs_tools, sample_tree):
+        """测试生成完整性清单并校验"""
+        manifest = fs_tools.create_manifest(str(sample_tree), algorithm="sha256")
+        assert "docs/report.pdf" in manifest["files"]
+        assert fs_tools.verify_integrity(str(sample_tree), manifest)["ok"]
+
+        (sample_tree / "a.txt").write_text("tampered")
+        (sample_tree / "b.py").unlink()
+        (sample_tree / "new.txt").write_text("new")
+        result = fs_tools.verify_integrity(str(sample_tree), manifest)
+
+        assert not result["ok"]
+        assert result["mismatched"] == ["a.txt"]
+        assert result["missing"] == ["b.py"]
+        assert result["unexpected"] == ["new.txt"]
+
+    def test_detect_duplicates_by_name(self, fs_tools, sample_tree):
+        """测试按文件名检测重复文件"""
+        (sample_tree / "docs" / "a.txt").write_text("different")
+
+        groups = fs_tools.detect_duplicates(str(sample_tree), method="name")
+
+        assert len(groups) == 1
+        assert {f["name"] for f in groups[0]} == {"a.txt"}
+
+    def test_search_files(self, fs_tools, sample_tree):
+        """测试文件名搜索"""
+        results = fs_tools.search_files(str(sample_tree), "NOTE")
+
+        assert [f["name"] for f in results] == ["notes.txt"]
+
+    def test_search_file_content(self, fs_tools, sample_tree):
+        """测试全文内容搜索"""
+        results = fs_tools.search_files(str(sample_tree), "NOTES", content=True)
+        assert [f["name"] for f in results] == ["notes.txt"]
+
+        (sample_tree / "a.txt").write_text("more notes here")
+        fs_tools.content_index.invalidate()
+        results = fs_tools.search_files(str(sample_tree), r"notes?\b", content=True, regex=True)
+        assert {f["name"] for f in results} == {"a.txt", "notes.txt"}
+
+    def test_analyze_storage(self, fs_tools, tmp_path):
+        """测试空间分析与最大文件排序"""
+        for i in range(15):
+            (tmp_path / f"f{i:02d}.bin").write_bytes(b"0" * (i + 1))
+
+        report = fs_tools.analyze_storage(str(tmp_path))
+
+        assert report["total_files"] == 15
+        assert report["total_size"] == sum(range(1, 16))
+        assert report["type_statistics"][".bin"]["count"] == 15
+        assert [f["size"] for f in report["largest_files"]] == list(range(15, 5, -1))
+
+    def test_analyze_storage_directories(self, fs_tools, tmp_path):
+        """测试目录自底向上汇总与最大目录"""
+        root = tmp_path / "data"
+        (root / "a" / "b" / "c").mkdir(parents=True)
+        (root / "x").mkdir()
+        (root / "top.bin").write_bytes(b"0" * 5)
+        (root / "a" / "b" / "c" / "deep.bin").write_bytes(b"0" * 100)
+        (root / "x" / "small.bin").write_bytes(b"0" * 10)
+
+        report = fs_tools.analyze_storage(str(root), top_k=2)
+
+        assert [(d["path"], d["size"]) for d in report["largest_directories"]] == [
+            (str(root / "a"), 100), (str(root / "a" / "b"), 100)
+        ]
+        tree = report["directory_tree"]
+        assert (tree["size"], tree["files"], tree["own_size"]) == (115, 3, 5)
+        assert [c["path"] for c in tree["children"]] == [str(root / "a"), str(root / "x")]
+        assert "children" not in tree["children"][0]
+
+    def test_iter_storage_analysis_progress(self, fs_tools, tmp_path):
+        """测试流式分析产出进度快照"""
+        for i in range(5):
+            (tmp_path / f"f{i}.bin").write_bytes(b"0")
+
+        results = list(fs_tools.iter_storage_analysis(str(tmp_path), emit_every=2, emit_interval=0))
+
+        assert [r["done"] for r in results] == [False, False, True]
+        assert results[0]["total_files"] == 2
+        assert results[-1]["total_files"] == 5
+
+    def test_clean_temp_files(self, fs_tools, sample_tree):
+        """测试清理临时文件"""
+        (sample_tree / "x.tmp").write_text("tmp")
+        (sample_tree / "docs" / "y.cache").write_text("cache!")
+
+        result = fs_tools.clean_temp_files(str(sample_tree), patterns=["*.tmp", "*.cache"])
+
+        assert result["deleted_count"] == 2
+        assert result["freed_space"] == 9
+        assert not (sample_tree / "x.tmp").exists()
+        assert (sample_tree / "a.txt").exists()
+
+    def test_organize_files_dry_run(self, fs_tools, sample_tree):
+        """测试整理预览"""
+        result = fs_tools.organize_files(str(sample_tree), dry_run=True)
+
+        assert result["dry_run"] is True
+        assert result["total_files"] == 4
+        assert result["categories"]["Documents"] == 3
+        assert "move_plan" not in result
+        moves = dict(fs_tools.plans.iter_moves(result["plan_id"]))
+        assert moves[str(sample_tree / "b.py")] == str(sample_tree / "Code" / "b.py")
+        assert {"source": str(sample_tree / "b.py"), "target": str(sample_tree / "Code" / "b.py")} in result["preview"]
+        assert (sample_tree / "b.py").exists()
+    
+    def test_execute_plan(self, fs_tools, sample_tree):
+        """测试按预览计划执行整理，不重新扫描"""
+        plan_id = fs_tools.organize_files(str(sample_tree), dry_run=True)["plan_id"]
+        (sample_tree / "a.txt").unlink()
+        (sample_tree / "late.txt").write_text("added after preview")
+        
+        result = fs_tools.execute_plan(plan_id)
+        
+        assert (result["success"], result["stale"]) == (3, 1)
+        assert (sample_tree / "Code" / "b.py").exists()
+        assert (sample_tree / "late.txt").exists()
+        assert fs_tools.list_plans()[0]["status"] == "executed"
+        with pytest.raises(RuntimeError):
+            fs_tools.execute_plan(plan_id)
+        
+        fs_tools.undo(result["journal_id"])
+        assert (sample_tree / "b.py").exists()
+
+    def test_plans_compacted_and_pruned(self, fs_tools, sample_tree):
+        """测试执行后计划只保留汇总，旧计划按数量清理"""
+        result = fs_tools.organize_files(str(sample_tree), dry_run=False)
+        plan_path = fs_tools.plans.plan_dir / f"{result['plan_id']}.jsonl"
+        assert len(plan_path.read_text(encoding="utf-8").splitlines()) == 3
+        assert list(fs_tools.plans.iter_moves(result["plan_id"])) == []
+        assert fs_tools.list_plans()[0]["summary"]["moves"] == 4
+
+        fs_tools.plans.max_plans = 2
+        plan_ids = [fs_tools.organize_files(str(sample_tree), dry_run=True)["plan_id"] for _ in range(3)]
+        assert sorted(p["plan_id"] for p in fs_tools.list_plans()) == sorted(plan_ids[1:])
+
+    def test_organize_files(self, fs_tools, sample_tree):
+        """测试执行整理"""
+        result = fs_tools.organize_files(str(sample_tree), dry_run=False)
+
+        assert result["success"] == 4
+        assert (sample_tree / "Code" / "b.py").exists()
+        assert (sample_tree / "Documents" / "notes.txt").exists()
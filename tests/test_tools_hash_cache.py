@@ -0,0 +1,92 @@
+"""HashCache 单元测试"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from src.tools.hash_cache import HashCache
+from src.tools.file_hashing import hash_file, hash_partial
+
+
+def write_old(path, data, past=1600000000):
+    """写入文件并将修改时间设为过去时刻，使其超出缓存的竞态窗口"""
+    path.write_bytes(data)
+    os.utime(path, (past, past))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """创建HashCache实例"""
+    c = HashCache(str(tmp_path / "cache" / "hash_cache.db"))
+    yield c
+    c.close()
+
+
+class TestHashCache:
+    """测试内容哈希缓存"""
+
+    def test_hit_after_first_compute(self, cache, tmp_path):
+        """测试首次计算后命中缓存"""
+        f = tmp_path / "a.bin"
+        write_old(f, b"hello")
+
+        assert cache.hash_file(str(f), "sha256") == hash_file(str(f), "sha256")
+        assert cache.hash_file(str(f), "sha256") == hash_file(str(f), "sha256")
+
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+    def test_modified_file_misses(self, cache, tmp_path):
+        """测试文件修改后缓存失效"""
+        f = tmp_path / "a.bin"
+        write_old(f, b"hello")
+        cache.hash_file(str(f))
+
+        write_old(f, b"world", past=1600000100)
+
+        assert cache.get(str(f), "md5") is None
+        assert cache.hash_file(str(f)) == hash_file(str(f))
+
+    def test_recent_file_not_cached(self, cache, tmp_path):
+        """测试刚修改的文件不写入缓存"""
+        f = tmp_path / "fresh.bin"
+        f.write_bytes(b"fresh")
+
+        cache.hash_file(str(f))
+
+        assert cache.get_stats()["entries"] == 0
+
+    def test_kinds_are_separate(self, cache, tmp_path):
+        """测试不同算法和部分哈希分别缓存"""
+        f = tmp_path / "big.bin"
+        write_old(f, os.urandom(300 * 1024))
+
+        assert cache.hash_partial(str(f), "md5") == hash_partial(str(f), "md5")
+        assert cache.hash_file(str(f), "md5") == hash_file(str(f), "md5")
+        assert cache.get_stats()["entries"] == 2
+
+        cache.invalidate(str(f))
+        assert cache.get_stats()["entries"] == 0
+
+    def test_persistent_across_instances(self, cache, tmp_path):
+        """测试缓存持久化"""
+        f = tmp_path / "a.bin"
+        write_old(f, b"persist")
+        cache.hash_file(str(f))
+
+        reopened = HashCache(cache.db_path)
+        assert reopened.get(str(f), "md5") == hash_file(str(f))
+        reopened.close()
+
+    def test_concurrent_workers(self, cache, tmp_path):
+        """测试多线程并发读写"""
+        files = []
+        for i in range(40):
+            f = tmp_path / f"f{i}.bin"
+            write_old(f, os.urandom(1024))
+            files.append(str(f))
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            first = list(pool.map(cache.hash_file, files))
+            second = list(pool.map(cache.hash_file, files))
+
+        assert first == second == [hash_file(f) for f in files]
+        assert cache.get_stats()["entries"] == 40
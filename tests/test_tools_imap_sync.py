@@ -0,0 +1,188 @@
+"""IMAP 增量同步单元测试(使用本地测试服务器)"""
+import imaplib
+import socket
+import pytest
+from src.tools.imap_sync import ImapConnectionPool, ImapSync, is_placeholder_host
+from src.tools.mailbox_store import MailboxStore
+from src.tools.email_tools import EmailTools
+
+
+@pytest.fixture
+def sync(imap_server, tmp_path):
+    pool = ImapConnectionPool("127.0.0.1", imap_server.port, use_ssl=False, timeout=5)
+    yield ImapSync(pool, MailboxStore(str(tmp_path / "mailbox.db")), batch_size=2)
+    pool.close()
+
+
+def header_fetches(server):
+    return [c for c in server.commands if c.upper().startswith("UID FETCH") and "HEADER.FIELDS" in c]
+
+
+class TestImapSync:
+    """测试增量同步"""
+
+    def test_incremental_headers_only(self, imap_server, sync):
+        """测试只拉取新邮件的邮件头，并复用同一连接"""
+        for i in range(5):
+            imap_server.add_message("INBOX", f"邮件{i}")
+
+        first = sync.sync_folder(imap_server.user, imap_server.password)
+        imap_server.commands.clear()
+        imap_server.add_message("INBOX", "新邮件")
+        second = sync.sync_folder(imap_server.user, imap_server.password)
+
+        assert (first["new"], second["new"]) == (5, 1)
+        assert len(header_fetches(imap_server)) == 1
+        assert header_fetches(imap_server)[0].startswith("UID FETCH 6:6 ")
+        assert not [c for c in imap_server.commands if "BODY.PEEK[]" in c]
+        assert imap_server.logins == 1 and sync.pool.connects == 1
+        message = sync.store.get_message(imap_server.user, "INBOX", 6)
+        assert message["subject"] == "新邮件" and message["content"] is None
+
+    def test_nothing_new(self, imap_server, sync):
+        """测试没有新邮件时不拉取邮件头"""
+        imap_server.add_message("INBOX", "旧邮件")
+        sync.sync_folder(imap_server.user, imap_server.password)
+        imap_server.commands.clear()
+
+        assert sync.sync_folder(imap_server.user, imap_server.password)["new"] == 0
+        assert header_fetches(imap_server) == []
+
+    def test_condstore_flag_changes_and_expunge(self, imap_server, sync):
+        """测试 CONDSTORE 标记变化和已删除邮件"""
+        uids = [imap_server.add_message("INBOX", f"邮件{i}") for i in range(3)]
+        sync.sync_folder(imap_server.user, imap_server.password)
+
+        imap_server.set_flags("INBOX", uids[0], ["\\Seen"])
+        imap_server.expunge("INBOX", uids[2])
+        result = sync.sync_folder(imap_server.user, imap_server.password)
+
+        assert result["condstore"] and result["flag_updates"] == 1 and result["removed"] == 1
+        assert sync.store.get_message(imap_server.user, "INBOX", uids[0])["flags"] == ["\\Seen"]
+        assert sync.store.uids(imap_server.user, "INBOX") == uids[:2]
+
+    def test_flag_changes_without_condstore(self, imap_server_without_condstore, tmp_path):
+        """测试服务器不支持 CONDSTORE 时重新拉取已知邮件的标记"""
+        server = imap_server_without_condstore
+        pool = ImapConnectionPool("127.0.0.1", server.port, use_ssl=False, timeout=5)
+        sync = ImapSync(pool, MailboxStore(str(tmp_path / "mailbox.db")))
+        uids = [server.add_message("INBOX", f"邮件{i}") for i in range(3)]
+        sync.sync_folder(server.user, server.password)
+
+        server.set_flags("INBOX", uids[1], ["\\Seen", "\\Flagged"])
+        result = sync.sync_folder(server.user, server.password)
+        pool.close()
+
+        assert not result["condstore"] and result["flag_updates"] == 1 and result["new"] == 0
+        assert sync.store.get_message(server.user, "INBOX", uids[1])["flags"] == ["\\Seen", "\\Flagged"]
+        assert sync.store.get_message(server.user, "INBOX", uids[0])["flags"] == []
+
+    def test_uidvalidity_change_resyncs(self, imap_server, sync):
+        """测试 UIDVALIDITY 变化后重新同步"""
+        imap_server.add_message("INBOX", "邮件")
+        sync.sync_folder(imap_server.user, imap_server.password)
+        imap_server.folder("INBOX")["uidvalidity"] += 1
+
+        result = sync.sync_folder(imap_server.user, imap_server.password)
+
+        assert result["full_resync"] and result["new"] == 1
+
+    def test_body_on_demand_and_reconnect(self, imap_server, sync):
+        """测试按需拉取正文，连接断开后自动重连"""
+        uid = imap_server.add_message("INBOX", "带附件", body="请查收合同", attachment=("合同.pdf", b"%PDF"))
+        sync.sync_folder(imap_server.user, imap_server.password)
+        # 模拟服务器断开连接
+        sync.pool._entries[imap_server.user]["conn"].sock.shutdown(socket.SHUT_RDWR)
+
+        message = sync.fetch_body(imap_server.user, imap_server.password, "INBOX", uid)
+
+        assert message["content"] == "请查收合同"
+        assert message["attachments"] == [{"filename": "合同.pdf", "content_type": "application/octet-stream", "size": 4}]
+        assert sync.pool.connects == 2
+
+    def test_wrong_password_not_reused(self, imap_server, sync):
+        """测试密码不一致时不复用已认证的连接，也不返回已拉取的正文"""
+        uid = imap_server.add_message("INBOX", "机密", body="机密正文")
+        sync.sync_folder(imap_server.user, imap_server.password)
+        sync.fetch_body(imap_server.user, imap_server.password, "INBOX", uid)
+
+        with pytest.raises(imaplib.IMAP4.error):
+            sync.sync_folder(imap_server.user, "wrong")
+        with pytest.raises(imaplib.IMAP4.error):
+            sync.fetch_body(imap_server.user, "wrong", "INBOX", uid)
+        assert not sync.pool.authenticated(imap_server.user, imap_server.password)
+
+        assert sync.fetch_body(imap_server.user, imap_server.password, "INBOX", uid)["content"] == "机密正文"
+        assert sync.pool.authenticated(imap_server.user, imap_server.password)
+        assert imap_server.logins == 2
+
+
+def test_placeholder_hosts():
+    """测试示例域名不视为真实服务器"""
+    assert is_placeholder_host("imap.example.com") and is_placeholder_host("")
+    assert not is_placeholder_host("imap.company.com")
+
+
+def test_email_tools_read_and_fetch(imap_server, tmp_path):
+    """测试 EmailTools 读取邮件头和按需读取正文"""
+    imap_server.add_message("INBOX", "早", date="Mon, 15 Jan 2024 08:00:00 +0800")
+    imap_server.add_message("INBOX", "晚", body="晚上的正文", date="Mon, 15 Jan 2024 20:00:00 +0800")
+    tools = EmailTools({"imap_server": "127.0.0.1", "imap_port": imap_server.port, "use_ssl": False,
+                        "store_path": str(tmp_path / "mailbox.db")})
+
+    emails = tools.read_emails(imap_server.user, imap_server.password)
+    full = tools.fetch_email(imap_server.user, imap_server.password, emails[0]["id"])
+    tools.close()
+
+    assert [e["subject"] for e in emails] == ["晚", "早"]
+    assert emails[0]["body_loaded"] is False
+    assert full["content"] == "晚上的正文" and full["id"] == "INBOX:2"
+
+
+def test_email_tools_cache_requires_password(imap_server, tmp_path):
+    """测试同步间隔内的本地邮件只对以相同密码认证的调用方返回"""
+    imap_server.add_message("INBOX", "机密")
+    tools = EmailTools({"imap_server": "127.0.0.1", "imap_port": imap_server.port, "use_ssl": False,
+                        "store_path": str(tmp_path / "mailbox.db"), "sync_interval": 3600})
+
+    assert len(tools.read_emails(imap_server.user, imap_server.password)) == 1
+    with pytest.raises(imaplib.IMAP4.error):
+        tools.read_emails(imap_server.user, "wrong")
+    tools.close()
+
+
+def test_email_tools_search_requires_password(imap_server, tmp_path):
+    """测试本地检索同样需要正确的密码，filters 中的 query 作为关键词"""
+    imap_server.add_message("INBOX", "季度预算")
+    imap_server.add_message("INBOX", "团建通知")
+    tools = EmailTools({"imap_server": "127.0.0.1", "imap_port": imap_server.port, "use_ssl": False,
+                        "store_path": str(tmp_path / "mailbox.db")})
+    tools.read_emails(imap_server.user, imap_server.password)
+
+    found = tools.search_emails(imap_server.user, imap_server.password, filters={"query": "预算"})
+    with pytest.raises(imaplib.IMAP4.error):
+        tools.search_emails(imap_server.user, "wrong", query="预算")
+    tools.close()
+
+    assert [e["subject"] for e in found] == ["季度预算"]
+
+
+def test_email_tools_read_imported_folder(imap_server, tmp_path):
+    """测试归档导入的文件夹不与服务器同步，正文从本地读取，仍需正确的密码"""
+    mbox = tmp_path / "2019.mbox"
+    mbox.write_bytes(b"From a@company.com Mon Jan  1 00:00:00 2024\nFrom: a@company.com\n"
+                     b"Subject: old\nMessage-ID: <old@archive.test>\n\narchived body\n")
+    tools = EmailTools({"imap_server": "127.0.0.1", "imap_port": imap_server.port, "use_ssl": False,
+                        "store_path": str(tmp_path / "mailbox.db"),
+                        "attachment_dir": str(tmp_path / "attachments")})
+    tools.import_mailbox(str(mbox), imap_server.user)
+
+    emails = tools.read_emails(imap_server.user, imap_server.password, folder="Imported/2019.mbox")
+    full = tools.fetch_email(imap_server.user, imap_server.password, emails[0]["id"])
+    with pytest.raises(imaplib.IMAP4.error):
+        tools.read_emails(imap_server.user, "wrong", folder="Imported/2019.mbox")
+    tools.close()
+
+    assert [e["subject"] for e in emails] == ["old"]
+    assert full["content"] == "archived body"
+    assert not [c for c in imap_server.commands if "Imported" in c]
@@ -0,0 +1,164 @@
+"""邮件归档导入单元测试"""
+import os
+from email import policy
+from email.message import EmailMessage
+
+import pytest
+from src.tools.imap_sync import ImapSync
+from src.tools.mail_import import AttachmentStore, MailImporter, iter_mbox
+from src.tools.mailbox_store import MailboxStore
+
+
+def raw_message(index, subject=None, body="正文", message_id=True, attachment=None, status=None):
+    message = EmailMessage()
+    message["From"] = f"sender{index}@company.com"
+    message["To"] = "me@company.com"
+    message["Subject"] = subject or f"归档邮件 {index}"
+    message["Date"] = f"Mon, {index % 28 + 1:02d} Jan 2024 10:00:00 +0800"
+    if message_id:
+        message["Message-ID"] = f"<{index}@archive.test>"
+    if status:
+        message["Status"] = status
+    message.set_content(body)
+    if attachment:
+        message.add_attachment(attachment[1], maintype="application", subtype="pdf", filename=attachment[0])
+    return message.as_bytes(policy=policy.SMTP).replace(b"\r\n", b"\n")
+
+
+def write_mbox(path, messages):
+    with open(path, 'wb') as f:
+        for index, raw in enumerate(messages):
+            f.write(b"From sender@company.com Mon Jan  1 00:00:00 2024\n")
+            # mboxrd: 正文中以 From 开头的行转义
+            f.write(b"\n".join(b">" + line if line.lstrip(b">").startswith(b"From ") else line
+                               for line in raw.split(b"\n")))
+            f.write(b"\n")
+    return str(path)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MailboxStore(str(tmp_path / "mailbox.db"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def importer(store, tmp_path):
+    return MailImporter(store, AttachmentStore(str(tmp_path / "attachments")), batch_size=2)
+
+
+class TestMailImport:
+    """测试 mbox/Maildir 导入"""
+
+    def test_iter_mbox_unescapes_from_lines(self, tmp_path):
+        """测试按 From 分隔行切分邮件并还原正文中转义的 From 行"""
+        path = write_mbox(tmp_path / "a.mbox", [raw_message(1, body="From here on\nok"), raw_message(2)])
+        messages = list(iter_mbox(path))
+        assert len(messages) == 2
+        assert b"\nFrom here on\n" in messages[0][2]
+        assert messages[1][0] == messages[0][1]
+        assert messages[1][1] == os.path.getsize(path)
+
+    def test_import_mbox(self, importer, store, tmp_path):
+        """测试导入 mbox: 去重、附件按内容保存、无 Message-ID 的邮件、已读状态"""
+        pdf = b"%PDF-1.4 contract"
+        path = write_mbox(tmp_path / "2019.mbox", [
+            raw_message(1, subject="合同审批", attachment=("合同.pdf", pdf), status="RO"),
+            raw_message(2, attachment=("副本.pdf", pdf)),
+            raw_message(1, subject="合同审批"),
+            raw_message(3, message_id=False),
+            raw_message(3, message_id=False),
+        ])
+        events = []
+        result = importer.import_path(path, "me", progress_callback=events.append)
+
+        assert result["folder"] == "Imported/2019.mbox"
+        assert (result["processed"], result["imported"], result["duplicates"], result["errors"]) == (5, 3, 2, 0)
+        assert result["messages_per_second"] > 0
+        assert [event["processed"] for event in events] == [2, 4, 5]
+
+        messages = store.list_messages("me", "Imported/2019.mbox")
+        assert sorted(m["uid"] for m in messages) == [1, 2, 3]
+        contract = store.search("me", query="合同审批")[0]
+        assert "\\Seen" in contract["flags"]
+        attachment = contract["attachments"][0]
+        assert attachment["filename"] == "合同.pdf" and attachment["size"] == len(pdf)
+        with open(attachment["path"], 'rb') as f:
+            assert f.read() == pdf
+        # 相同内容的附件只保存一份
+        assert len(list((tmp_path / "attachments").rglob("*"))) == 2
+
+    def test_resume_after_interruption(self, importer, store, tmp_path):
+        """测试中断后从断点继续，不重复处理已提交的邮件"""
+        path = write_mbox(tmp_path / "big.mbox", [raw_message(i) for i in range(1, 8)])
+
+        def interrupt(event):
+            if event["processed"] >= 4:
+                raise KeyboardInterrupt
+
+        with pytest.raises(KeyboardInterrupt):
+            importer.import_path(path, "me", progress_callback=interrupt)
+        assert store.import_state(str(tmp_path / "big.mbox"))["processed"] == 4
+
+        events = []
+        result = importer.import_path(path, "me", progress_callback=events.append)
+        assert result["resumed"] is True
+        assert (result["processed"], result["imported"], result["duplicates"]) == (7, 7, 0)
+        assert events[0]["processed"] == 6
+        assert len(store.list_messages("me", "Imported/big.mbox")) == 7
+
+        # 全部导入后再次导入不重复写入
+        again = importer.import_path(path, "me")
+        assert again["imported"] == 7 and store.get_stats("me")["messages"] == 7
+
+    def test_import_maildir(self, importer, store, tmp_path):
+        """测试导入 Maildir，标记来自文件名，与 IMAP 同步的邮件按 Message-ID 去重"""
+        maildir = tmp_path / "Maildir"
+        for sub in ("cur", "new", "tmp"):
+            (maildir / sub).mkdir(parents=True)
+        (maildir / "cur" / "1.host:2,FS").write_bytes(raw_message(1, subject="重要通知"))
+        (maildir / "cur" / "2.host:2,").write_bytes(raw_message(2))
+        (maildir / "new" / "3.host").write_bytes(b"\xff\xfe not really an email")
+        store.add_messages("me", "INBOX", [{"uid": 9, "message_id": "<2@archive.test>", "subject": "已同步"}])
+
+        result = importer.import_path(str(maildir), "me", folder="Archive/2020")
+        assert (result["processed"], result["imported"], result["duplicates"]) == (3, 2, 1)
+
+        notice = store.search("me", query="重要通知", folder="Archive/2020")[0]
+        assert set(notice["flags"]) == {"\\Seen", "\\Flagged"}
+        assert notice["content"].strip() == "正文"
+        assert store.import_state(str(maildir))["position"] == "new/3.host"
+
+    def test_maildir_resume_after_new_mail_is_read(self, importer, store, tmp_path):
+        """测试再次导入 Maildir 时，之后投递并被阅读(移入 cur)的邮件不会因文件名排序被跳过"""
+        maildir = tmp_path / "Maildir"
+        for sub in ("cur", "new", "tmp"):
+            (maildir / sub).mkdir(parents=True)
+        (maildir / "new" / "1000.a.host").write_bytes(raw_message(1))
+        importer.import_path(str(maildir), "me", folder="Archive")
+
+        # 已导入的邮件被阅读后移入 cur，另有一封新邮件
+        (maildir / "new" / "1000.a.host").rename(maildir / "cur" / "1000.a.host:2,S")
+        (maildir / "cur" / "2000.b.host:2,S").write_bytes(raw_message(2))
+        result = importer.import_path(str(maildir), "me", folder="Archive")
+
+        assert result["resumed"] is True
+        assert (result["processed"], result["imported"], result["duplicates"]) == (2, 2, 0)
+        assert len(store.list_messages("me", "Archive")) == 2
+
+    def test_synced_folders_not_import_targets(self, importer, store, tmp_path):
+        """测试 IMAP 同步的文件夹不能作为导入目标，导入的文件夹也不能再同步"""
+        store.add_messages("me", "INBOX", [{"uid": 1, "message_id": "<synced@test>", "subject": "已同步"}])
+        store.save_folder_state("me", "INBOX", {"uidvalidity": 1, "last_uid": 1, "highestmodseq": None})
+        path = write_mbox(tmp_path / "a.mbox", [raw_message(1)])
+
+        with pytest.raises(ValueError):
+            importer.import_path(path, "me", folder="INBOX")
+        with pytest.raises(ValueError):
+            store.import_batch("me", "INBOX", [{"message_id": "<x@test>"}], path, {"position": None})
+        assert [m["subject"] for m in store.list_messages("me", "INBOX")] == ["已同步"]
+
+        importer.import_path(path, "me", folder="Archive")
+        with pytest.raises(ValueError):
+            ImapSync(None, store).sync_folder("me", "secret", "Archive")
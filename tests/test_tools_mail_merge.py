@@ -0,0 +1,87 @@
+"""批量模板填充单元测试"""
+import json
+import pytest
+from src.tools.mail_merge import CompiledTemplate, MailMerge, MergeError
+from src.tools.document_loaders import open_document
+from src.tools.file_tools import FileTools
+
+
+class TestCompiledTemplate:
+    """测试模板编译"""
+
+    def test_render_fields(self):
+        """测试简单字段、嵌套字段和 $$"""
+        template = CompiledTemplate("$name 您好，订单 ${order.id} 金额 $$${amount}")
+
+        assert template.fields == ["name", "order.id", "amount"]
+        assert template.render({"name": "李四", "order": {"id": 7}, "amount": 99}) == "李四 您好，订单 7 金额 $99"
+
+    def test_missing_field(self):
+        """测试缺少字段"""
+        with pytest.raises(MergeError):
+            CompiledTemplate("${order.id}").render({"order": {}})
+
+    def test_xml_placeholder_split_across_runs(self):
+        """测试 Word 把占位符拆到多个 run 时仍能识别并保持 XML 结构"""
+        source = "<w:t>${</w:t></w:r><w:r><w:t>na</w:t></w:r><w:r><w:t>me}</w:t>"
+        template = CompiledTemplate(source, xml=True, escape=lambda s: s.replace("&", "&amp;"))
+
+        assert template.fields == ["name"]
+        assert template.render({"name": "A&B"}) == "<w:t>A&amp;B</w:t></w:r><w:r><w:t></w:t></w:r><w:r><w:t></w:t>"
+
+
+class TestMailMerge:
+    """测试批量填充"""
+
+    def test_docx_from_csv_with_errors(self, make_docx, tmp_path):
+        """测试 DOCX 模板和 CSV 数据源，错误记录不中断批次"""
+        template = make_docx(tmp_path / "letter.docx", ["尊敬的 $</w:t></w:r><w:r><w:t>{name}：", "合同编号 ${contract}"])
+        data = tmp_path / "records.csv"
+        data.write_text("name,contract\n张三,C-1\n李四\n王五,C-3,多余\n", encoding="utf-8")
+
+        result = MailMerge(str(template), tmp_path / "out", "${_index}_${name}", max_workers=0).run(str(data))
+
+        assert (result["total"], result["succeeded"], result["failed"]) == (3, 1, 2)
+        assert [e["index"] for e in result["errors"]] == [2, 3]
+        with open_document(str(tmp_path / "out" / "1_张三.docx")) as doc:
+            assert list(doc.iter_pages())[:2] == ["尊敬的 张三：", "合同编号 C-1"]
+        with open(result["error_report"], encoding="utf-8") as f:
+            assert [json.loads(line)["index"] for line in f] == [2, 3]
+
+    def test_worker_processes(self, tmp_path):
+        """测试多进程渲染 JSONL 数据源"""
+        template = tmp_path / "notice.html"
+        template.write_text("<p>${name}</p>", encoding="utf-8")
+        data = tmp_path / "records.jsonl"
+        lines = [json.dumps({"id": i, "name": f"<用户{i}>"}) for i in range(40)] + ["{坏行"]
+        data.write_text("\n".join(lines), encoding="utf-8")
+        events = []
+
+        merge = MailMerge(str(template), tmp_path / "out", "${id}", max_workers=2, batch_size=7)
+        result = merge.run(str(data), progress_callback=events.append)
+
+        assert (result["succeeded"], result["failed"]) == (40, 1)
+        assert [e["index"] for e in events] == list(range(1, 42))
+        assert (tmp_path / "out" / "39.html").read_text(encoding="utf-8") == "<p>&lt;用户39&gt;</p>"
+
+    def test_existing_output_not_overwritten(self, tmp_path):
+        """测试输出文件已存在时记为错误"""
+        template = tmp_path / "a.txt"
+        template.write_text("$x", encoding="utf-8")
+
+        result = MailMerge(str(template), tmp_path / "out", "same", max_workers=0).run([{"x": 1}, {"x": 2}])
+
+        assert result["failed"] == 1
+        assert (tmp_path / "out" / "same.txt").read_text() == "1"
+        assert not list((tmp_path / "out").glob("*.tmp"))
+
+
+def test_fill_template(tmp_path):
+    """测试填充单个模板"""
+    template = tmp_path / "memo.md"
+    template.write_text("# ${title}", encoding="utf-8")
+
+    output = FileTools().fill_template(str(template), {"title": "周报"})
+
+    assert output.endswith("output.md")
+    assert open(output, encoding="utf-8").read() == "# 周报"
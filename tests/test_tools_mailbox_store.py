@@ -0,0 +1,87 @@
+"""本地邮件存储单元测试"""
+import pytest
+from src.tools.mailbox_store import MailboxStore
+from src.tools.email_tools import EmailTools
+
+
+def message(uid, subject, sender="colleague@company.com", date="2024-01-15T10:00:00+08:00",
+            content=None, flags=(), attachments=(), folder="INBOX"):
+    return {"uid": uid, "folder": folder, "message_id": f"<{uid}@test>", "from": sender, "to": "me@company.com",
+            "cc": "", "subject": subject, "date": date, "flags": list(flags), "size": 100,
+            "content": content, "attachments": list(attachments)}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MailboxStore(str(tmp_path / "mailbox.db"))
+    store.add_messages("me", "INBOX", [
+        message(1, "项目进度汇报", sender="boss@company.com", date="2024-01-10T09:00:00+08:00"),
+        message(2, "系统通知", sender="notification@service.com", date="2024-01-20T09:00:00+08:00",
+                flags=["\\Seen"]),
+        message(3, "Quarterly report", content="合同附件请查收", date="2024-02-01T09:00:00+08:00",
+                attachments=[{"filename": "合同.pdf"}]),
+    ])
+    store.add_messages("me", "Archive", [message(4, "归档的项目资料", date="2023-12-01T09:00:00+08:00")])
+    yield store
+    store.close()
+
+
+def subjects(messages):
+    return [m["subject"] for m in messages]
+
+
+class TestMailboxStore:
+    """测试本地检索"""
+
+    def test_full_text_search(self, store):
+        """测试全文检索主题、发件人和正文(含中文子串和短关键词)"""
+        assert subjects(store.search("me", query="进度汇")) == ["项目进度汇报"]
+        assert subjects(store.search("me", query="合同附件")) == ["Quarterly report"]
+        assert subjects(store.search("me", query="QUARTERLY")) == ["Quarterly report"]
+        assert subjects(store.search("me", query="项目")) == ["项目进度汇报", "归档的项目资料"]
+
+    def test_filters_and_time_range(self, store):
+        """测试发件人、已读、附件、文件夹和时间范围过滤"""
+        assert subjects(store.search("me", filters={"from": "boss@company.com"})) == ["项目进度汇报"]
+        assert subjects(store.search("me", folder="INBOX", filters={"unread": True})) == \
+            ["Quarterly report", "项目进度汇报"]
+        assert subjects(store.search("me", filters={"has_attachments": True})) == ["Quarterly report"]
+        assert subjects(store.search("me", time_range={"start": "2024-01-01", "end": "2024-01-20"})) == \
+            ["系统通知", "项目进度汇报"]
+        assert store.search("other") == []
+
+    def test_fts_follows_updates(self, store):
+        """测试正文更新和删除后全文索引同步变化"""
+        store.set_body("me", "INBOX", 1, "请于周五前提交", [])
+        assert subjects(store.search("me", query="周五前")) == ["项目进度汇报"]
+
+        store.add_messages("me", "INBOX", [message(1, "项目进度汇报(更正)", content="改为周四")])
+        assert store.search("me", query="周五前") == []
+        assert subjects(store.search("me", query="周四")) == ["项目进度汇报(更正)"]
+
+        store.remove_messages("me", "INBOX", [1])
+        assert store.search("me", query="周五前") == []
+
+        store.reset_folder("me", "INBOX")
+        assert store.get_stats("me")["folders"] == {"Archive": 1}
+
+
+def test_read_emails_filters_locally(imap_server, tmp_path):
+    """测试 read_emails 的过滤条件在本地执行，间隔内不重复同步"""
+    imap_server.add_message("INBOX", "项目进度汇报", sender="boss@company.com")
+    imap_server.add_message("INBOX", "系统通知", sender="notification@service.com",
+                            date="Sat, 20 Jan 2024 09:00:00 +0800")
+    tools = EmailTools({"imap_server": "127.0.0.1", "imap_port": imap_server.port, "use_ssl": False,
+                        "store_path": str(tmp_path / "mailbox.db"), "sync_interval": 300})
+
+    everything = tools.read_emails(imap_server.user, imap_server.password)
+    imap_server.commands.clear()
+    from_boss = tools.read_emails(imap_server.user, imap_server.password, filters={"from": "boss"})
+    january = tools.read_emails(imap_server.user, imap_server.password,
+                                time_range={"start": "2024-01-16", "end": "2024-01-31"})
+    tools.close()
+
+    assert len(everything) == 2
+    assert subjects(from_boss) == ["项目进度汇报"]
+    assert subjects(january) == ["系统通知"]
+    assert imap_server.commands == ["LOGOUT"]
@@ -0,0 +1,70 @@
+"""批量移动规划单元测试"""
+import os
+import pytest
+from src.tools.move_planner import plan_moves
+
+
+@pytest.fixture
+def work(tmp_path):
+    root = tmp_path / "work"
+    (root / "dest").mkdir(parents=True)
+    (root / "dest" / "report.pdf").write_text("existing")
+    for name in ("a.txt", "b.txt", "report.pdf"):
+        (root / name).write_text(name)
+    return root
+
+
+def targets(plan):
+    return {op.src: op.dst for op in plan["parallel"] + plan["sequential"]}
+
+
+class TestPlanMoves:
+    """测试移动规划"""
+
+    def test_groups_new_directories(self, work):
+        plan = plan_moves([(str(work / "a.txt"), str(work / "new" / "a.txt")),
+                           (str(work / "b.txt"), str(work / "new" / "b.txt"))])
+
+        assert plan["directories"] == [str(work / "new")]
+        assert len(plan["parallel"]) == 2 and plan["sequential"] == []
+
+    def test_rename_on_disk_conflict(self, work):
+        plan = plan_moves([(str(work / "report.pdf"), str(work / "dest" / "report.pdf"))])
+
+        assert targets(plan)[str(work / "report.pdf")] == str(work / "dest" / "report (1).pdf")
+        assert plan["renamed"] == 1
+
+    def test_rename_batch_conflict(self, work):
+        plan = plan_moves([(str(work / "a.txt"), str(work / "dest" / "x.txt")),
+                           (str(work / "b.txt"), str(work / "dest" / "x.txt"))])
+
+        assert sorted(os.path.basename(d) for d in targets(plan).values()) == ["x (1).txt", "x.txt"]
+
+    def test_overwrite_and_skip(self, work):
+        move = [(str(work / "report.pdf"), str(work / "dest" / "report.pdf"))]
+
+        assert plan_moves(move, on_conflict="overwrite")["parallel"][0].overwrite
+        skipped = plan_moves(move, on_conflict="skip")
+        assert skipped["parallel"] == [] and len(skipped["skipped"]) == 1
+
+        with pytest.raises(ValueError):
+            plan_moves(move, on_conflict="bogus")
+
+    def test_chain_ordered(self, work):
+        """测试链式重命名按依赖顺序执行且不视为冲突"""
+        plan = plan_moves([(str(work / "a.txt"), str(work / "b.txt")),
+                           (str(work / "b.txt"), str(work / "c.txt"))])
+
+        assert plan["parallel"] == [] and plan["renamed"] == 0
+        assert [os.path.basename(op.src) for op in plan["sequential"]] == ["b.txt", "a.txt"]
+
+    def test_cycle_uses_temp_name(self, work):
+        plan = plan_moves([(str(work / "a.txt"), str(work / "b.txt")),
+                           (str(work / "b.txt"), str(work / "a.txt"))], temp_tag="t")
+
+        steps = [(os.path.basename(op.src), os.path.basename(op.dst)) for op in plan["sequential"]]
+        assert steps == [("a.txt", ".a.txt.t"), ("b.txt", "a.txt"), (".a.txt.t", "b.txt")]
+
+    def test_identity_skipped(self, work):
+        plan = plan_moves([(str(work / "a.txt"), str(work / "a.txt"))])
+        assert plan["parallel"] == [] and plan["skipped"][0]["reason"]
@@ -0,0 +1,115 @@
+"""近似重复文档检测单元测试"""
+import os
+import random
+import pytest
+from src.tools.fs_scanner import DirectoryScanner
+from src.tools.hash_cache import HashCache
+from src.tools.near_duplicates import (
+    NearDuplicateFinder, shingles, minhash_signature, estimate_similarity, lsh_params
+)
+from src.tools.text_extraction import extract_text
+
+
+def make_text(seed, words=600):
+    rng = random.Random(seed)
+    vocab = ["合同", "甲方", "乙方", "付款", "交付", "违约", "条款", "期限", "金额", "签署",
+             "contract", "party", "payment", "delivery", "term", "clause"]
+    return " ".join(rng.choice(vocab) + str(rng.randint(0, 99)) for _ in range(words))
+
+
+def edit(text, seed, changes=10):
+    rng = random.Random(seed)
+    words = text.split(" ")
+    for _ in range(changes):
+        words[rng.randrange(len(words))] = f"修改{rng.randint(0, 999)}"
+    return " ".join(words)
+
+
+@pytest.fixture
+def corpus(tmp_path, make_docx):
+    """一份合同的多个修改副本加若干无关文档"""
+    root = tmp_path / "docs"
+    root.mkdir()
+    base = make_text(1)
+    (root / "合同.txt").write_text(base, encoding="utf-8")
+    (root / "合同_v2.txt").write_text(edit(base, 2), encoding="utf-8")
+    make_docx(root / "合同_v2_final(1).docx", edit(base, 3).split(" 违约"))
+    for i in range(5):
+        (root / f"other_{i}.md").write_text(make_text(100 + i), encoding="utf-8")
+    (root / "image.bin").write_bytes(os.urandom(1024))
+    past = 1600000000
+    for f in root.iterdir():
+        os.utime(f, (past, past))
+    return root
+
+
+class TestMinHash:
+    """测试签名与参数"""
+
+    def test_shingles_normalize_whitespace_and_case(self):
+        assert shingles("AB c", 2) == shingles("a bc", 2) == {"ab", "bc"}
+        assert shingles("", 5) == set()
+        assert shingles("ab", 5) == {"ab"}
+
+    def test_similarity_estimate(self):
+        a = shingles(make_text(1))
+        b = shingles(edit(make_text(1), 2, changes=60))
+        jaccard = len(a & b) / len(a | b)
+
+        estimate = estimate_similarity(minhash_signature(a, 256), minhash_signature(b, 256))
+
+        assert abs(estimate - jaccard) < 0.1
+
+    def test_lsh_params(self):
+        bands, rows = lsh_params(0.8, 128)
+        assert bands * rows <= 128
+        assert abs((1 / bands) ** (1 / rows) - 0.8) < 0.05
+
+    def test_invalid_threshold(self):
+        with pytest.raises(ValueError):
+            NearDuplicateFinder(threshold=0)
+
+
+class TestNearDuplicateFinder:
+    """测试近似重复检测"""
+
+    def test_docx_text_extraction(self, corpus):
+        text = extract_text(str(corpus / "合同_v2_final(1).docx"))
+        assert "甲方" in text or "乙方" in text
+
+    def test_finds_edited_copies(self, corpus):
+        finder = NearDuplicateFinder(threshold=0.7)
+        groups = finder.find(DirectoryScanner().iter_entries(str(corpus)))
+
+        assert len(groups) == 1
+        assert sorted(e.name for e in groups[0]) == ["合同.txt", "合同_v2.txt", "合同_v2_final(1).docx"]
+        assert finder.get_stats()["files"] == 8
+
+    def test_strict_threshold(self, corpus):
+        groups = NearDuplicateFinder(threshold=1.0).find(DirectoryScanner().iter_entries(str(corpus)))
+        assert groups == []
+
+    def test_signatures_cached(self, corpus, tmp_path):
+        cache = HashCache(str(tmp_path / "cache.db"))
+        finder = NearDuplicateFinder(threshold=0.7, hash_cache=cache)
+        first = finder.find(DirectoryScanner().iter_entries(str(corpus)))
+        misses = cache.get_stats()["misses"]
+
+        second = finder.find(DirectoryScanner().iter_entries(str(corpus)))
+
+        assert [sorted(e.name for e in g) for g in first] == [sorted(e.name for e in g) for g in second]
+        assert cache.get_stats()["misses"] == misses
+        assert cache.get_stats()["hits"] == 8
+        cache.close()
+
+    def test_large_bucket_compared_linearly(self, tmp_path):
+        """测试大量相同文档落入同一桶时比较次数与文档数成线性关系"""
+        text = make_text(7)
+        for i in range(40):
+            (tmp_path / f"copy_{i}.txt").write_text(text, encoding="utf-8")
+        finder = NearDuplicateFinder(threshold=0.8)
+
+        groups = finder.find(DirectoryScanner().iter_entries(str(tmp_path)))
+
+        assert len(groups) == 1 and len(groups[0]) == 40
+        assert finder.get_stats()["candidate_pairs"] == 39
@@ -0,0 +1,94 @@
+"""文件规则引擎单元测试"""
+import json
+import os
+import time
+import pytest
+from src.tools.fs_scanner import FileEntry
+from src.tools.rules_engine import RulesEngine, FileRule, CompiledRuleSet, parse_size
+
+
+DAY = 86400
+
+
+def entry(path, size=10, age_days=0.0):
+    mtime = time.time() - age_days * DAY
+    name = os.path.basename(path)
+    return FileEntry(path, name, size, os.path.splitext(name)[1].lower(), mtime, mtime)
+
+
+@pytest.fixture
+def engine():
+    return RulesEngine({
+        "file_classification_rules": {
+            "Documents": {"extensions": [".pdf", ".txt"]},
+            "Notes": {"extensions": [".txt"], "patterns": ["README*"]},
+            "Screenshots": {"patterns": ["Screenshot*.png"]},
+            "Images": {"extensions": [".PNG"]},
+        },
+        "temp_file_cleanup_rules": {
+            "patterns": ["*.tmp", "~$*"],
+            "safe_age_days": 7,
+            "policies": [
+                {"name": "big_logs", "patterns": ["*.log"], "min_size": "1KB",
+                 "path_exclude": ["keep/*"]},
+                {"name": "disabled", "patterns": ["*"], "enabled": False},
+            ],
+        },
+    })
+
+
+class TestRulesEngine:
+    """测试规则引擎"""
+
+    def test_parse_size(self):
+        assert parse_size("10MB") == 10 * 1024 * 1024
+        assert parse_size("1.5k") == 1536
+        assert parse_size(42) == 42
+        with pytest.raises(ValueError):
+            parse_size("lots")
+
+    def test_classify_first_rule_wins(self, engine):
+        assert engine.classify("a.txt", ".txt") == "Documents"
+        assert engine.classify("README", "") == "Notes"
+        assert engine.classify("Screenshot 1.png", ".png") == "Screenshots"
+        assert engine.classify("photo.png", ".png") == "Images"
+        assert engine.classify("x.bin", ".bin") == "Others"
+
+    def test_cleanup_age_gate(self, engine):
+        assert engine.cleanup.match_entry(entry("/r/a.tmp", age_days=1), "/r") is None
+        assert engine.cleanup.match_entry(entry("/r/a.tmp", age_days=8), "/r").name == "temp_files"
+        assert engine.cleanup.match_entry(entry("/r/~$doc.docx", age_days=30), "/r").name == "temp_files"
+
+    def test_cleanup_size_and_path_predicates(self, engine):
+        cleanup = engine.cleanup
+        assert len(cleanup) == 2
+        assert cleanup.match_entry(entry("/r/app.log", size=2048), "/r").name == "big_logs"
+        assert cleanup.match_entry(entry("/r/app.log", size=10), "/r") is None
+        assert cleanup.match_entry(entry("/r/keep/app.log", size=2048), "/r") is None
+
+    def test_shipped_policies_skip_git_at_any_depth(self):
+        with open("config/file_rules.json", encoding="utf-8") as f:
+            policy = json.load(f)["temp_file_cleanup_rules"]["policies"][0]
+        rule = FileRule.from_dict("old_logs", policy)
+        assert rule.check(2 * 1024 * 1024, 0, "logs/app.log", time.time())
+        assert not rule.check(2 * 1024 * 1024, 0, ".git/app.log", time.time())
+        assert not rule.check(2 * 1024 * 1024, 0, "repo/.git/app.log", time.time())
+
+    def test_falls_through_to_later_pattern_rule(self):
+        rules = CompiledRuleSet([
+            FileRule("recent", patterns=["*.tmp"], max_age_days=1),
+            FileRule("any", patterns=["a*"]),
+        ])
+        assert rules.match_entry(entry("/r/a.tmp", age_days=0)).name == "recent"
+        assert rules.match_entry(entry("/r/a.tmp", age_days=3)).name == "any"
+        assert rules.match_entry(entry("/r/b.tmp", age_days=3)) is None
+
+    def test_evaluate_single_pass(self, engine):
+        entries = [entry("/r/a.txt"), entry("/r/b.tmp", age_days=10)]
+        result = [(e.name, cat, rule.name if rule else None) for e, cat, rule in engine.evaluate(entries, "/r")]
+        assert result == [("a.txt", "Documents", None), ("b.tmp", "Others", "temp_files")]
+
+    def test_missing_rules_file(self, tmp_path):
+        engine = RulesEngine.from_file(str(tmp_path / "missing.json"))
+        assert engine.classify("a.txt", ".txt") == "Others"
+        assert len(engine.cleanup) == 0
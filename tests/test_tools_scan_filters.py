@@ -0,0 +1,184 @@
+"""扫描过滤规则单元测试"""
+import os
+import pytest
+from src.tools.fs_scanner import DirectoryScanner
+from src.tools.scan_filters import PathFilter, ScanLimits
+from src.tools.filesystem_tools import FileSystemTools
+
+
+@pytest.fixture
+def project_tree(tmp_path):
+    """创建含依赖目录和构建产物的目录结构"""
+    root = tmp_path / "project"
+    for sub in ["src/pkg", "node_modules/lib", "build/out", "docs/build"]:
+        (root / sub).mkdir(parents=True)
+    (root / "README.md").write_text("readme")
+    (root / "src" / "main.py").write_text("main")
+    (root / "src" / "pkg" / "util.py").write_text("util")
+    (root / "src" / "pkg" / "debug.log").write_text("log")
+    (root / "node_modules" / "lib" / "index.js").write_text("js")
+    (root / "build" / "out" / "app.bin").write_text("bin")
+    (root / "docs" / "build" / "page.html").write_text("html")
+    return root
+
+
+def names(entries):
+    return sorted(os.path.basename(e.path) for e in entries)
+
+
+class TestPathFilter:
+    """测试 gitignore 风格规则"""
+
+    def test_unanchored_name_matches_any_level(self):
+        """测试不含斜杠的模式匹配任意层级"""
+        path_filter = PathFilter(exclude=["*.log", "build/"])
+
+        assert not path_filter.allows_file("a/b/debug.log")
+        assert path_filter.excludes_dir("docs/build")
+        assert not path_filter.excludes_dir("docs/builder")
+        # 末尾斜杠的模式只匹配目录
+        assert path_filter.allows_file("build")
+
+    def test_anchored_and_double_star(self):
+        """测试含斜杠的模式相对根目录锚定，** 匹配多级目录"""
+        path_filter = PathFilter(exclude=["/build/", "docs/**/draft_*"])
+
+        assert path_filter.excludes_dir("build")
+        assert not path_filter.excludes_dir("docs/build")
+        assert not path_filter.allows_file("docs/draft_a.md")
+        assert not path_filter.allows_file("docs/2024/q1/draft_b.md")
+        assert path_filter.allows_file("notes/draft_c.md")
+
+    def test_negation_last_match_wins(self):
+        """测试取反规则以最后命中的规则为准"""
+        path_filter = PathFilter(exclude=["*.log", "!keep.log"])
+
+        assert not path_filter.allows_file("x/debug.log")
+        assert path_filter.allows_file("x/keep.log")
+
+    def test_include_applies_to_files(self):
+        """测试包含规则只作用于文件"""
+        path_filter = PathFilter(include=["*.py"], exclude=["tests/"])
+
+        assert path_filter.allows_file("src/a.py")
+        assert not path_filter.allows_file("src/a.txt")
+        assert not path_filter.excludes_dir("src")
+        assert not path_filter.allows_path("tests/test_a.py")
+
+    def test_merged_keeps_base_rules(self):
+        """测试追加规则保留默认规则"""
+        base = PathFilter(exclude=["node_modules/"])
+
+        assert base.merged() is base
+        merged = base.merged(exclude=["*.log"])
+        assert merged.excludes_dir("node_modules")
+        assert not merged.allows_file("a.log")
+        assert not PathFilter()
+
+
+class TestScannerPruning:
+    """测试扫描时按目录剪枝"""
+
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_excluded_directories_not_opened(self, project_tree, monkeypatch, workers):
+        """测试被排除的子树不会被打开"""
+        opened = []
+        real_scandir = os.scandir
+
+        def tracking_scandir(path):
+            opened.append(os.path.relpath(path, project_tree))
+            return real_scandir(path)
+
+        monkeypatch.setattr(os, "scandir", tracking_scandir)
+        path_filter = PathFilter(exclude=["node_modules/", "build/", "*.log"])
+        entries = DirectoryScanner(max_workers=workers).scan(str(project_tree), path_filter=path_filter)
+
+        assert names(entries) == ["README.md", "main.py", "util.py"]
+        assert not any(p.startswith(("node_modules", "build", os.path.join("docs", "build"))) for p in opened)
+
+    def test_scan_limits_max_files(self, project_tree):
+        """测试达到文件数上限时截断"""
+        limits = ScanLimits(max_files=2)
+        entries = list(limits.apply(DirectoryScanner(max_workers=1).iter_entries(str(project_tree))))
+
+        assert len(entries) == 2
+        assert limits.truncated
+
+    def test_scan_limits_not_truncated(self, project_tree):
+        """测试未超限时不标记截断"""
+        limits = ScanLimits(max_files=100, time_budget=60)
+        entries = list(limits.apply(DirectoryScanner(max_workers=1).iter_entries(str(project_tree))))
+
+        assert len(entries) == 7
+        assert not limits.truncated
+
+
+class TestFileSystemToolsFilters:
+    """测试文件系统工具入口的过滤和截断"""
+
+    def test_default_filters_from_config(self, project_tree, tmp_path):
+        """测试配置中的默认规则与调用参数叠加"""
+        tools = FileSystemTools({
+            "backup_directory": str(tmp_path / "backups"),
+            "hash_cache": {"db_path": str(tmp_path / ".cache" / "hash_cache.db")},
+            "scan_filters": {"exclude": ["node_modules/"]}
+        })
+
+        result = tools.scan_directory(str(project_tree), exclude=["build/"], max_files=3)
+
+        assert result["total_files"] == 3
+        assert result["truncated"] is True
+        full = tools.scan_directory(str(project_tree), exclude=["build/"])
+        assert sorted(f["name"] for f in full["files"]) == ["README.md", "debug.log", "main.py", "util.py"]
+        assert full["truncated"] is False
+
+    def test_index_refresh_prunes_excluded_directories(self, project_tree, tmp_path, monkeypatch):
+        """测试启用索引时排除的目录在刷新时也不会被打开"""
+        tools = FileSystemTools({
+            "backup_directory": str(tmp_path / "backups"),
+            "hash_cache": {"enabled": False},
+            "metadata_index": {"enabled": True, "db_path": str(tmp_path / "index.db")},
+            "scan_filters": {"exclude": ["node_modules/"]}
+        })
+        opened = []
+        scandir = os.scandir
+        monkeypatch.setattr(os, "scandir", lambda path=".": opened.append(os.path.basename(path)) or scandir(path))
+
+        entries = list(tools.iter_directory(str(project_tree)))
+
+        assert "node_modules" not in opened and "lib" not in opened
+        assert "index.js" not in names(entries)
+        assert tools.file_index.get_stats()["files"] == 6
+
+    def test_limits_do_not_trigger_index_refresh(self, project_tree, tmp_path, monkeypatch):
+        """测试有截断条件时不触发索引刷新，索引就绪后再使用索引"""
+        tools = FileSystemTools({
+            "backup_directory": str(tmp_path / "backups"),
+            "hash_cache": {"enabled": False},
+            "metadata_index": {"enabled": True, "db_path": str(tmp_path / "index.db")}
+        })
+        refresh = tools.file_index.refresh
+        calls = []
+        monkeypatch.setattr(tools.file_index, "refresh", lambda *a, **k: calls.append(a) or refresh(*a, **k))
+
+        result = tools.scan_directory(str(project_tree), max_files=2)
+        assert result["truncated"] is True and calls == []
+        tools.search_files(str(project_tree), "main", max_files=2)
+        assert calls == []
+
+        tools.refresh_index(str(project_tree))
+        assert tools.search_files(str(project_tree), "main", max_files=2)[0]["name"] == "main.py"
+        assert len(calls) == 1
+
+    def test_manifest_records_filters(self, project_tree, tmp_path):
+        """测试清单记录过滤规则并在校验时复用"""
+        tools = FileSystemTools({
+            "backup_directory": str(tmp_path / "backups"),
+            "hash_cache": {"db_path": str(tmp_path / ".cache" / "hash_cache.db")}
+        })
+
+        manifest = tools.create_manifest(str(project_tree), include=["*.py"])
+        assert sorted(manifest["files"]) == ["src/main.py", "src/pkg/util.py"]
+
+        (project_tree / "notes.txt").write_text("new")
+        assert tools.verify_integrity(str(project_tree), manifest)["ok"]
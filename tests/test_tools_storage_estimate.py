@@ -0,0 +1,97 @@
+"""近似空间分析单元测试"""
+import pytest
+from src.tools.filesystem_tools import FileSystemTools
+from src.tools.storage_analysis import StorageEstimator
+
+
+@pytest.fixture
+def uniform_tree(tmp_path):
+    """每层3个子目录、每个目录2个文件的均匀目录树"""
+    root = tmp_path / "tree"
+
+    def build(path, depth):
+        path.mkdir(parents=True)
+        (path / "a.txt").write_bytes(b"0" * 10)
+        (path / "b.bin").write_bytes(b"0" * 30)
+        if depth:
+            for i in range(3):
+                build(path / f"d{i}", depth - 1)
+
+    build(root, 2)
+    return root
+
+
+class TestStorageEstimator:
+    """测试随机探测估计"""
+
+    def test_uniform_tree_estimate_is_exact(self, uniform_tree):
+        """均匀树上每次探测都等于真实值"""
+        result = StorageEstimator(str(uniform_tree), time_budget=0, min_probes=2, seed=1).estimate()
+
+        assert result["approximate"] is True
+        assert result["total_files"]["estimate"] == 26
+        assert result["total_size"]["estimate"] == 13 * 40
+        assert result["total_directories"] == 13
+        assert result["type_distribution"][".bin"]["size_share"] == pytest.approx(0.75)
+
+    def test_small_tree_becomes_exact(self, uniform_tree):
+        """所有目录都被列出后返回精确值"""
+        result = StorageEstimator(str(uniform_tree), time_budget=10, min_probes=1000, seed=1).estimate()
+
+        assert result["done"] is True
+        assert result["total_files"] == {"estimate": 26, "low": 26, "high": 26}
+
+    def test_low_bound_not_below_listed_files(self, tmp_path):
+        """区间下限不低于已列出目录中的文件数"""
+        root = tmp_path / "skewed"
+        (root / "big").mkdir(parents=True)
+        (root / "empty").mkdir()
+        for i in range(5):
+            (root / f"{i}.txt").write_text("x")
+            (root / "big" / f"{i}.txt").write_text("x")
+
+        result = StorageEstimator(str(root), time_budget=0, min_probes=1, seed=3).estimate()
+
+        assert result["probes"] == 1 and result["done"] is False
+        assert result["total_files"]["low"] >= 5
+        assert result["total_files"]["high"] == float("inf")
+
+
+class TestStorageRefinement:
+    """测试后台精确分析"""
+
+    def test_refine_in_background(self, tmp_path, uniform_tree):
+        tools = FileSystemTools({
+            "backup_directory": str(tmp_path / "backups"),
+            "hash_cache": {"enabled": False},
+            "storage_estimate": {"time_budget": 0, "min_probes": 1}
+        })
+
+        estimate = tools.analyze_storage(str(uniform_tree), approximate=True, refine=True)
+        status = tools.get_storage_refinement(estimate["refinement_id"], wait=10)
+
+        assert status["status"] == "done"
+        assert status["report"]["total_files"] == 26
+        with pytest.raises(ValueError):
+            tools.get_storage_refinement(estimate["refinement_id"])
+
+    def test_approximate_does_not_build_index(self, tmp_path, uniform_tree, monkeypatch):
+        """测试近似模式不触发元数据索引的全量建立，索引在后台分析中建立"""
+        tools = FileSystemTools({
+            "backup_directory": str(tmp_path / "backups"),
+            "hash_cache": {"enabled": False},
+            "metadata_index": {"enabled": True, "db_path": str(tmp_path / "index.db")},
+            "storage_estimate": {"time_budget": 0, "min_probes": 1}
+        })
+        refresh = tools.file_index.refresh
+        calls = []
+        monkeypatch.setattr(tools.file_index, "refresh", lambda *a, **k: calls.append(a) or refresh(*a, **k))
+
+        estimate = tools.analyze_storage(str(uniform_tree), approximate=True, refine=True)
+        assert calls == []
+        assert "refinement_id" in estimate
+
+        status = tools.get_storage_refinement(estimate["refinement_id"], wait=10)
+        assert status["report"]["total_files"] == 26
+        assert len(calls) == 1
+        assert tools.file_index.covers(str(uniform_tree))
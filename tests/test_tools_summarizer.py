@@ -0,0 +1,116 @@
+"""分层摘要单元测试"""
+import threading
+import time
+from src.core.prompt_engine import PromptEngine
+from src.tools.summarizer import MapReduceSummarizer, SummaryCache, iter_chunks, estimate_tokens
+from src.tools.file_tools import FileTools
+
+
+class FakeModelManager:
+    """记录调用次数和最大并发数的模型管理器"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def invoke(self, messages, task_type=None):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        prompt = messages[0]["content"]
+        return ("合并" if "分段摘要" in prompt else "摘要") + str(len(prompt))
+
+
+def make_report(sections=40):
+    return "\n\n".join(f"第{i}节 " + "销售数据增长明显，客户反馈良好。" * 20 for i in range(sections))
+
+
+class TestChunking:
+    """测试分块"""
+
+    def test_chunks_respect_budget(self):
+        """测试分块不超过 token 和字符上限，内容完整保留"""
+        text = make_report()
+        chunks = list(iter_chunks([text], chunk_tokens=800, max_chars=1000))
+
+        assert len(chunks) > 1
+        assert all(estimate_tokens(c) <= 800 and len(c) <= 1000 for c in chunks)
+        assert "".join(chunks).replace("\n", "") == text.replace("\n", "")
+
+    def test_edit_only_changes_nearby_chunks(self):
+        """测试修改一个段落后只有附近的分块变化"""
+        paragraphs = [f"段落{i}: " + "内容" * (20 + i % 7) for i in range(200)]
+        before = list(iter_chunks(["\n\n".join(paragraphs)], chunk_tokens=300))
+        paragraphs[5] = "插入的新内容 " + paragraphs[5]
+        after = list(iter_chunks(["\n\n".join(paragraphs)], chunk_tokens=300))
+
+        assert len(set(before) - set(after)) <= 2
+
+
+class TestMapReduceSummarizer:
+    """测试分层摘要"""
+
+    def test_single_chunk_one_call(self):
+        """测试短文档只调用一次模型"""
+        model = FakeModelManager()
+        result = MapReduceSummarizer(model, PromptEngine()).summarize("一段很短的文字。", length=50)
+
+        assert (result["chunks"], result["levels"], model.calls) == (1, 1, 1)
+
+    def test_concurrent_map_then_reduce(self):
+        """测试分块并发摘要(不超过并发上限)后合并"""
+        model = FakeModelManager(delay=0.02)
+        summarizer = MapReduceSummarizer(model, PromptEngine(), chunk_tokens=600, max_concurrency=3)
+
+        result = summarizer.summarize([make_report()], length=100)
+
+        assert result["chunks"] > 3
+        assert result["levels"] >= 2
+        assert result["summary"].startswith("合并")
+        assert 1 < model.max_active <= 3
+        assert result["model_calls"] == model.calls
+
+    def test_cached_chunks_not_recomputed(self, tmp_path):
+        """测试再次摘要时未变化的分块命中缓存"""
+        cache = SummaryCache(str(tmp_path / "summaries.db"))
+        model = FakeModelManager()
+        summarizer = MapReduceSummarizer(model, PromptEngine(), cache=cache, chunk_tokens=600)
+        paragraphs = make_report().split("\n\n")
+
+        first = summarizer.summarize(["\n\n".join(paragraphs)])
+        paragraphs[-1] = "最后一节已修改。"
+        second = summarizer.summarize(["\n\n".join(paragraphs)])
+
+        assert second["cached"] >= first["chunks"] - 2
+        assert second["model_calls"] < first["model_calls"]
+
+
+class TestFileToolsSummary:
+    """测试 FileTools 摘要入口"""
+
+    def test_truncate_without_model(self):
+        """测试没有模型时退回截取"""
+        assert FileTools().extract_summary("abcdef", max_length=3) == "abc..."
+
+    def test_summarize_document(self, tmp_path):
+        """测试对文件做分层摘要"""
+        path = tmp_path / "report.md"
+        path.write_text(make_report(), encoding="utf-8")
+        tools = FileTools(
+            {"summarization": {"cache_db_path": str(tmp_path / "summaries.db"), "chunk_tokens": 600}},
+            model_manager=FakeModelManager(),
+            prompt_engine=PromptEngine()
+        )
+
+        result = tools.summarize_document(str(path), length=100)
+
+        assert result["chunks"] > 1
+        assert result["metadata"]["file_name"] == "report.md"
+        assert tools.extract_summary("短文本。").startswith("摘要")
@@ -0,0 +1,150 @@
+"""文件监听服务单元测试"""
+import time
+import pytest
+from src.tools.filesystem_tools import FileSystemTools
+from src.tools.ingestion_queue import IngestionQueue
+from src.tools.watch_service import ChangeSet, PollingWatcher, InotifyWatcher
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def inotify_available(path):
+    try:
+        InotifyWatcher([str(path)]).close()
+        return True
+    except OSError:
+        return False
+
+
+class TestChangeSet:
+    """测试事件合并"""
+
+    def test_coalesce_events(self):
+        changes = ChangeSet()
+        changes.add("/r/a.txt", "changed", False)
+        changes.add("/r/a.txt", "changed", False)
+        changes.add("/r/a.txt", "deleted", False)
+        changes.add("/r/new", "changed", True)
+        changes.add("/r/old", "deleted", True)
+
+        assert changes.files == {"/r/a.txt": "deleted"}
+        assert changes.created_dirs == {"/r/new"} and changes.deleted_dirs == {"/r/old"}
+        assert changes.directories == {"/r"}
+        assert changes.summary()["events"] == 5
+
+
+class TestIngestionQueue:
+    """测试入库队列"""
+
+    def test_dedupe_and_drain(self):
+        queue = IngestionQueue(max_size=2)
+        queue.put("/a", "upsert")
+        queue.put("/b", "upsert")
+        queue.put("/a", "delete")
+        queue.put("/c", "upsert")
+
+        assert queue.dropped == 1
+        assert queue.drain() == [("/a", "delete"), ("/c", "upsert")]
+        assert len(queue) == 0
+        with pytest.raises(ValueError):
+            queue.put("/x", "rename")
+
+
+class TestWatchers:
+    """测试监听后端"""
+
+    def test_polling_diff(self, tmp_path):
+        (tmp_path / "keep.txt").write_text("a")
+        (tmp_path / "gone.txt").write_text("b")
+        watcher = PollingWatcher([str(tmp_path)], interval=0)
+
+        (tmp_path / "gone.txt").unlink()
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "new.txt").write_text("c")
+        events = set(watcher.read(timeout=0))
+
+        assert events == {
+            (str(tmp_path / "gone.txt"), "deleted", False),
+            (str(tmp_path / "sub"), "changed", True),
+            (str(tmp_path / "sub" / "new.txt"), "changed", False),
+        }
+        assert watcher.read(timeout=0) == []
+
+    def test_inotify_events(self, tmp_path):
+        if not inotify_available(tmp_path):
+            pytest.skip("inotify 不可用")
+        watcher = InotifyWatcher([str(tmp_path)])
+        events = []
+
+        def seen(event):
+            return wait_for(lambda: events.extend(watcher.read(0.1)) or event in events)
+
+        try:
+            (tmp_path / "sub").mkdir()
+            assert seen((str(tmp_path / "sub"), "changed", True))
+            # 新目录被自动加入监听
+            (tmp_path / "sub" / "new.txt").write_text("x")
+            assert seen((str(tmp_path / "sub" / "new.txt"), "changed", False))
+            (tmp_path / "sub" / "new.txt").unlink()
+            assert seen((str(tmp_path / "sub" / "new.txt"), "deleted", False))
+        finally:
+            watcher.close()
+
+
+class TestFileSystemWatch:
+    """测试监听与索引联动"""
+
+    @pytest.fixture
+    def tools(self, tmp_path):
+        tools = FileSystemTools({
+            "backup_directory": str(tmp_path / "backups"),
+            "metadata_index": {"enabled": True, "db_path": str(tmp_path / "cache" / "idx.db"),
+                               "refresh_interval": 3600},
+            "hash_cache": {"db_path": str(tmp_path / "cache" / "hash.db")},
+            "content_index": {"db_path": str(tmp_path / "cache" / "content.db")},
+            "watch": {"backend": "polling", "poll_interval": 0.1, "settle_seconds": 0.1}
+        })
+        yield tools
+        tools.stop_watch()
+
+    def test_watch_updates_index_and_queue(self, tools, tmp_path):
+        root = tmp_path / "docs"
+        root.mkdir()
+        (root / "old.txt").write_text("old")
+
+        status = tools.start_watch([str(root)], ingest_roots=[str(root)])
+        assert status["running"] and status["backend"] == "polling"
+
+        (root / "new.txt").write_text("new document")
+        (root / "old.txt").unlink()
+        assert wait_for(lambda: len(tools.ingest_queue) == 2)
+
+        assert {e.name for e in tools.iter_directory(str(root))} == {"new.txt"}
+        assert sorted(tools.ingest_queue.drain()) == [
+            (str(root / "new.txt"), "upsert"), (str(root / "old.txt"), "delete")
+        ]
+        assert tools.watch_status()["batches"] >= 1
+
+    def test_overflow_requeues_ingest_roots(self, tools, tmp_path):
+        root = tmp_path / "docs"
+        root.mkdir()
+        (root / "old.txt").write_text("old")
+        (root / "image.bin").write_bytes(b"\x00\x01")
+        tools.start_watch([str(root)], ingest_roots=[str(root)])
+        (root / "new.txt").write_text("new document")
+
+        changes = ChangeSet()
+        changes.add("", "overflow", False)
+        stats = tools._apply_changes(changes)
+
+        assert stats["queued"] == 2
+        assert sorted(tools.ingest_queue.drain()) == [
+            (str(root / "new.txt"), "upsert"), (str(root / "old.txt"), "upsert")
+        ]